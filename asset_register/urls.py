@@ -22,6 +22,7 @@ urlpatterns = [
     
     # AJAX endpoints
     path('ajax/search/', views.asset_search_ajax, name='asset_search_ajax'),
+    path('ajax/scan/', views.asset_scan_ajax, name='asset_scan_ajax'),
     path('ajax/stats/', views.asset_stats_ajax, name='asset_stats_ajax'),
     path('ajax/bulk-action/', views.asset_bulk_action, name='asset_bulk_action'),
     
@@ -1,4 +1,5 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
@@ -15,6 +16,8 @@ import csv
 from datetime import datetime, date
 from decimal import Decimal
 
+from rf_scanner.barcodes import resolve_many
+
 from .models import (
     Asset, AssetCategory, AssetLocation, AssetStatus, AssetDepreciation,
     AssetMovement, AssetMaintenance
@@ -512,6 +515,40 @@ def asset_search_ajax(request):
     return JsonResponse({'results': results})
 
 
+@login_required
+@require_GET
+def asset_scan_ajax(request):
+    """AJAX endpoint resolving scanned asset barcodes or QR codes"""
+    codes = request.GET.getlist('code')
+    if not codes:
+        return JsonResponse({'results': []})
+    
+    resolved = resolve_many(codes, kinds=('asset',))
+    assets = Asset.objects.filter(
+        pk__in=[target.pk for target in resolved.values() if target]
+    ).select_related('location', 'status').in_bulk()
+    
+    results = []
+    for code in codes:
+        target = resolved.get(code)
+        asset = assets.get(target.pk) if target else None
+        if asset is None:
+            results.append({'scanned': code, 'found': False})
+            continue
+        results.append({
+            'scanned': code,
+            'found': True,
+            'id': asset.id,
+            'code': asset.asset_code,
+            'name': asset.asset_name,
+            'location': asset.location.name if asset.location else '',
+            'status': asset.status.name if asset.status else '',
+            'url': reverse('asset_register:asset_detail', args=[asset.id]),
+        })
+    
+    return JsonResponse({'results': results})
+
+
 @login_required
 @require_GET
 def asset_stats_ajax(request):
@@ -33,6 +33,12 @@ app.conf.beat_schedule = {
         'task': 'auto_task_scheduler.tasks.system_health_check',
         'schedule': 3600.0,  # 1 hour
     },
+    
+    # Send document emails left behind by a stopped worker every 15 minutes
+    'send-stuck-document-emails': {
+        'task': 'email_configuration.tasks.send_stuck_document_emails',
+        'schedule': 900.0,  # 15 minutes
+    },
 }
 
 # Task routing
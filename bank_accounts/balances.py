@@ -0,0 +1,80 @@
+"""
+Balance maintenance for bank accounts.
+
+BankAccount.current_balance is changed only through F() expression deltas
+applied in the same database transaction as the BankAccountTransaction that
+causes them, so concurrent postings cannot overwrite each other's updates.
+The stored balance can still drift (bulk queryset operations skip signals,
+opening balances get edited), which find_drift / fix_drift detect and repair
+against opening balance + credits - debits.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum, Q, Value, DecimalField
+from django.db.models.functions import Coalesce
+
+from .models import BankAccount
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+
+
+def transaction_delta(transaction_type, amount):
+    """Signed effect of a transaction on the account balance"""
+    amount = amount or ZERO
+    return amount if transaction_type == 'credit' else -amount
+
+
+def apply_balance_delta(bank_account_id, delta):
+    """Add delta to the stored balance and return the new balance.
+
+    The UPDATE takes a row lock that is held until the surrounding transaction
+    commits, so the balance read back is the one this delta produced.
+    """
+    with transaction.atomic():
+        BankAccount.objects.filter(pk=bank_account_id).update(
+            current_balance=F('current_balance') + delta
+        )
+        return BankAccount.objects.filter(pk=bank_account_id).values_list('current_balance', flat=True).get()
+
+
+def with_expected_balance(queryset=None):
+    """Annotate accounts with expected_balance = opening + credits - debits"""
+    queryset = BankAccount.objects.all() if queryset is None else queryset
+    decimal = DecimalField(max_digits=15, decimal_places=2)
+    return queryset.annotate(
+        total_credits=Coalesce(
+            Sum('transactions__amount', filter=Q(transactions__transaction_type='credit')),
+            Value(ZERO), output_field=decimal
+        ),
+        total_debits=Coalesce(
+            Sum('transactions__amount', filter=Q(transactions__transaction_type='debit')),
+            Value(ZERO), output_field=decimal
+        ),
+    ).annotate(
+        expected_balance=F('opening_balance') + F('total_credits') - F('total_debits')
+    )
+
+
+def find_drift(queryset=None):
+    """Return (account, stored balance, expected balance) for every account that has drifted"""
+    return [
+        (account, account.current_balance, account.expected_balance)
+        for account in with_expected_balance(queryset).select_related('currency').order_by('pk')
+        if account.current_balance != account.expected_balance
+    ]
+
+
+def fix_drift(queryset=None):
+    """Reset drifted balances to their expected value. Returns the drift rows fixed."""
+    drift = find_drift(queryset)
+    with transaction.atomic():
+        for account, stored, expected in drift:
+            # Apply the difference as a delta so postings made since the check are kept
+            apply_balance_delta(account.pk, expected - stored)
+    if drift:
+        logger.info(f'Fixed balance drift on {len(drift)} bank accounts')
+    return drift
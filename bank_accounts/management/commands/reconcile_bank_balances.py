@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from bank_accounts.balances import find_drift, fix_drift
+
+
+class Command(BaseCommand):
+    help = 'Report (and optionally fix) bank account balances that drifted from their transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Reset drifted balances to opening balance + credits - debits'
+        )
+
+    def handle(self, *args, **options):
+        drift = fix_drift() if options['fix'] else find_drift()
+        
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('All bank account balances match their transactions'))
+            return
+        
+        for account, stored, expected in drift:
+            self.stdout.write(
+                f'{account}: stored {stored:,.2f}, expected {expected:,.2f} '
+                f'(drift {stored - expected:,.2f})'
+            )
+        
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(drift)} bank account balances'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} bank account balances drifted; run with --fix to repair'))
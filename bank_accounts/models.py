@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from django.utils import timezone
@@ -89,10 +89,14 @@ class BankAccount(models.Model):
         if not self.company_id:
             self.company = Company.objects.filter(is_active=True).first()
         
-        # Update current balance if opening balance changed
-        if self.pk and self._original_balance != self.current_balance:
-            # This would typically be updated through transactions
-            pass
+        # current_balance is maintained by transaction deltas (see balances.py);
+        # unless it was changed on this instance, don't write back a stale copy
+        if not self._state.adding and not kwargs.get('update_fields') and \
+                self._original_balance == self.current_balance:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'current_balance'
+            ]
         
         super().save(*args, **kwargs)
         self._original_balance = self.current_balance
@@ -116,11 +120,9 @@ class BankAccount(models.Model):
     
     def update_balance(self, amount, transaction_type='credit'):
         """Update account balance based on transaction"""
-        if transaction_type == 'credit':
-            self.current_balance += amount
-        else:  # debit
-            self.current_balance -= amount
-        self.save()
+        from .balances import apply_balance_delta, transaction_delta
+        self.current_balance = apply_balance_delta(self.pk, transaction_delta(transaction_type, amount))
+        self._original_balance = self.current_balance
     
     def get_recent_transactions(self, limit=5):
         """Get recent transactions for this account"""
@@ -164,15 +166,17 @@ class BankAccountTransaction(models.Model):
         return f"{self.bank_account.bank_name} - {self.transaction_type} - {self.amount}"
     
     def save(self, *args, **kwargs):
-        if not self.pk:  # New transaction
-            self.balance_before = self.bank_account.current_balance
-            if self.transaction_type == 'credit':
-                self.balance_after = self.balance_before + self.amount
-            else:
-                self.balance_after = self.balance_before - self.amount
-            
-            # Update bank account balance
-            self.bank_account.current_balance = self.balance_after
-            self.bank_account.save()
+        if self.pk:
+            super().save(*args, **kwargs)
+            return
         
-        super().save(*args, **kwargs)
+        from .balances import apply_balance_delta, transaction_delta
+        with transaction.atomic():
+            # Apply the delta first so balance_before/after come from the locked row
+            delta = transaction_delta(self.transaction_type, self.amount)
+            self.balance_after = apply_balance_delta(self.bank_account_id, delta)
+            self.balance_before = self.balance_after - delta
+            super().save(*args, **kwargs)
+        
+        self.bank_account.current_balance = self.balance_after
+        self.bank_account._original_balance = self.balance_after
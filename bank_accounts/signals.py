@@ -1,7 +1,8 @@
-from django.db.models.signals import pre_save, post_save, pre_delete
+from django.db.models.signals import pre_save, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from .models import BankAccount, BankAccountTransaction
+from .balances import apply_balance_delta, transaction_delta
 
 
 @receiver(pre_save, sender=BankAccount)
@@ -26,21 +27,6 @@ def bank_account_pre_save(sender, instance, **kwargs):
         ).exclude(pk=instance.pk).update(is_default_for_receipts=False)
 
 
-@receiver(post_save, sender=BankAccountTransaction)
-def transaction_post_save(sender, instance, created, **kwargs):
-    """Handle post-save operations for transactions"""
-    
-    if created:
-        # Update bank account balance
-        bank_account = instance.bank_account
-        if instance.transaction_type == 'credit':
-            bank_account.current_balance += instance.amount
-        else:  # debit
-            bank_account.current_balance -= instance.amount
-        
-        bank_account.save(update_fields=['current_balance'])
-
-
 @receiver(pre_delete, sender=BankAccount)
 def bank_account_pre_delete(sender, instance, **kwargs):
     """Handle pre-delete operations for bank accounts"""
@@ -54,11 +40,8 @@ def bank_account_pre_delete(sender, instance, **kwargs):
 def transaction_pre_delete(sender, instance, **kwargs):
     """Handle pre-delete operations for transactions"""
     
-    # Reverse the transaction effect on bank account balance
-    bank_account = instance.bank_account
-    if instance.transaction_type == 'credit':
-        bank_account.current_balance -= instance.amount
-    else:  # debit
-        bank_account.current_balance += instance.amount
-    
-    bank_account.save(update_fields=['current_balance']) 
\ No newline at end of file
+    # Reverse the transaction effect on bank account balance; runs inside the delete's transaction
+    apply_balance_delta(
+        instance.bank_account_id,
+        -transaction_delta(instance.transaction_type, instance.amount)
+    )
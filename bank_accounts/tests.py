@@ -1,3 +1,73 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from chart_of_accounts.models import AccountType, ChartOfAccount
+from company.company_model import Company
+from multi_currency.models import Currency
+from .balances import find_drift, fix_drift
+from .models import BankAccount, BankAccountTransaction
+
+
+class BankAccountBalanceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        company = Company.objects.create(
+            name='Test Company', code='TST', address='1 Test Street', phone='1234567', email='info@example.com'
+        )
+        currency = Currency.objects.create(code='AED', name='UAE Dirham', symbol='AED')
+        asset_type = AccountType.objects.create(name='Assets', category='ASSET')
+        chart_account = ChartOfAccount.objects.create(
+            account_code='1100', name='Bank', account_type=asset_type, currency=currency, company=company
+        )
+        self.account = BankAccount.objects.create(
+            bank_name='Test Bank', account_number='1234567890', currency=currency, chart_account=chart_account,
+            company=company, opening_balance=Decimal('1000.00')
+        )
+
+    def post(self, transaction_type, amount):
+        return BankAccountTransaction.objects.create(
+            bank_account=self.account, transaction_date=date(2025, 1, 10), transaction_type=transaction_type,
+            amount=Decimal(amount), description='Test transaction', created_by=self.user
+        )
+
+    def stored_balance(self):
+        return BankAccount.objects.values_list('current_balance', flat=True).get(pk=self.account.pk)
+
+    def test_transactions_move_the_balance(self):
+        deposit = self.post('credit', '500.00')
+        withdrawal = self.post('debit', '200.00')
+
+        self.assertEqual((deposit.balance_before, deposit.balance_after), (Decimal('1000.00'), Decimal('1500.00')))
+        self.assertEqual((withdrawal.balance_before, withdrawal.balance_after), (Decimal('1500.00'), Decimal('1300.00')))
+        self.assertEqual(self.stored_balance(), Decimal('1300.00'))
+
+        deposit.delete()
+        self.assertEqual(self.stored_balance(), Decimal('800.00'))
+        self.assertEqual(find_drift(), [])
+
+    def test_saving_a_stale_account_keeps_the_balance(self):
+        """An account loaded before a posting does not write its old balance back"""
+        stale = BankAccount.objects.get(pk=self.account.pk)
+        self.post('credit', '250.00')
+
+        stale.notes = 'Updated details'
+        stale.save()
+
+        self.assertEqual(self.stored_balance(), Decimal('1250.00'))
+
+    def test_fix_drift(self):
+        self.post('credit', '300.00')
+        BankAccount.objects.filter(pk=self.account.pk).update(current_balance=Decimal('999.00'))
+
+        drift = find_drift()
+        self.assertEqual(
+            [(account.pk, stored, expected) for account, stored, expected in drift],
+            [(self.account.pk, Decimal('999.00'), Decimal('1300.00'))]
+        )
+
+        fix_drift()
+        self.assertEqual(self.stored_balance(), Decimal('1300.00'))
+        self.assertEqual(find_drift(), [])
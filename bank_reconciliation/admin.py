@@ -4,7 +4,7 @@ from django.urls import reverse
 from django.utils.safestring import mark_safe
 from .models import (
     BankReconciliationSession, ERPTransaction, BankStatementEntry, 
-    MatchedEntry, ReconciliationReport
+    MatchedEntry, ReconciliationReport, StatementImport
 )
 from django.db import models
 
@@ -205,7 +205,7 @@ class BankStatementEntryAdmin(admin.ModelAdmin):
         'reconciliation_session__bank_account', 'reconciliation_session__status'
     ]
     search_fields = ['description', 'reference_number', 'import_reference']
-    readonly_fields = ['is_matched', 'matched_erp_entry', 'match_notes']
+    readonly_fields = ['is_matched', 'matched_erp_entry', 'match_notes', 'statement_import', 'content_hash']
     date_hierarchy = 'transaction_date'
     
     fieldsets = (
@@ -219,7 +219,7 @@ class BankStatementEntryAdmin(admin.ModelAdmin):
             'fields': ('debit_amount', 'credit_amount')
         }),
         ('Import Information', {
-            'fields': ('import_source', 'import_reference')
+            'fields': ('import_source', 'import_reference', 'statement_import', 'content_hash')
         }),
         ('Matching', {
             'fields': ('is_matched', 'matched_erp_entry', 'match_notes')
@@ -248,15 +248,33 @@ class BankStatementEntryAdmin(admin.ModelAdmin):
     mark_as_unmatched.short_description = 'Mark as unmatched'
 
 
+@admin.register(StatementImport)
+class StatementImportAdmin(admin.ModelAdmin):
+    list_display = [
+        'file_name', 'file_format', 'reconciliation_session', 'total_lines',
+        'new_lines', 'duplicate_lines', 'rejected_lines', 'imported_by', 'imported_at'
+    ]
+    list_filter = ['file_format', 'imported_at', 'reconciliation_session__bank_account']
+    search_fields = ['file_name', 'file_hash', 'reconciliation_session__session_name']
+    readonly_fields = [
+        'reconciliation_session', 'file_name', 'file_format', 'file_hash', 'total_lines',
+        'new_lines', 'duplicate_lines', 'rejected_lines', 'errors', 'imported_by', 'imported_at'
+    ]
+    date_hierarchy = 'imported_at'
+    
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(MatchedEntry)
 class MatchedEntryAdmin(admin.ModelAdmin):
     list_display = [
         'reconciliation_session', 'erp_entry', 'bank_entry',
-        'match_type', 'match_confidence', 'difference_amount',
+        'match_type', 'match_rule', 'match_confidence', 'difference_amount',
         'created_by', 'created_at'
     ]
     list_filter = [
-        'match_type', 'created_at', 'reconciliation_session__bank_account',
+        'match_type', 'match_rule', 'created_at', 'reconciliation_session__bank_account',
         'reconciliation_session__status'
     ]
     search_fields = [
@@ -272,7 +290,7 @@ class MatchedEntryAdmin(admin.ModelAdmin):
         ('Match Information', {
             'fields': (
                 'reconciliation_session', 'erp_entry', 'bank_entry',
-                'match_type', 'match_confidence', 'difference_amount'
+                'match_type', 'match_rule', 'match_group', 'match_confidence', 'difference_amount'
             )
         }),
         ('Notes', {
@@ -96,8 +96,17 @@ class BankStatementImportForm(forms.Form):
     IMPORT_FORMATS = [
         ('csv', 'CSV File'),
         ('excel', 'Excel File'),
+        ('mt940', 'MT940 Statement'),
+        ('camt053', 'CAMT.053 Statement (XML)'),
     ]
     
+    FILE_EXTENSIONS = {
+        'csv': ['csv'],
+        'excel': ['xlsx', 'xls'],
+        'mt940': ['sta', 'mt940', '940', 'txt'],
+        'camt053': ['xml'],
+    }
+    
     reconciliation_session = forms.ModelChoiceField(
         queryset=BankReconciliationSession.objects.filter(status__in=['open', 'in_progress']),
         widget=forms.Select(attrs={'class': 'form-select'}),
@@ -107,9 +116,9 @@ class BankStatementImportForm(forms.Form):
     import_file = forms.FileField(
         widget=forms.FileInput(attrs={
             'class': 'form-control',
-            'accept': '.csv,.xlsx,.xls'
+            'accept': '.csv,.xlsx,.xls,.sta,.mt940,.940,.txt,.xml'
         }),
-        help_text="Upload CSV or Excel file with bank statement data"
+        help_text="Upload a CSV, Excel, MT940 or CAMT.053 file with bank statement data"
     )
     
     import_format = forms.ChoiceField(
@@ -159,7 +168,7 @@ class BankStatementImportForm(forms.Form):
         required=False,
         initial=True,
         widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
-        help_text="Skip the first row (header row)"
+        help_text="The first row is a header row (otherwise columns are given by number)"
     )
     
     date_format = forms.CharField(
@@ -171,21 +180,33 @@ class BankStatementImportForm(forms.Form):
     
     def clean_import_file(self):
         file = self.cleaned_data['import_file']
-        import_format = self.cleaned_data.get('import_format', 'csv')
         
         if file:
             # Check file size (max 10MB)
             if file.size > 10 * 1024 * 1024:
                 raise ValidationError(_('File size must be less than 10MB.'))
-            
-            # Check file extension
-            file_extension = file.name.split('.')[-1].lower()
-            if import_format == 'csv' and file_extension != 'csv':
-                raise ValidationError(_('Please upload a CSV file.'))
-            elif import_format == 'excel' and file_extension not in ['xlsx', 'xls']:
-                raise ValidationError(_('Please upload an Excel file (.xlsx or .xls).'))
         
         return file
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        file = cleaned_data.get('import_file')
+        import_format = cleaned_data.get('import_format')
+        
+        # Check file extension against the selected format
+        if file and import_format:
+            file_extension = file.name.split('.')[-1].lower()
+            allowed = self.FILE_EXTENSIONS.get(import_format, [])
+            if file_extension not in allowed:
+                self.add_error('import_file', ValidationError(
+                    _('Please upload a %(format)s file (%(extensions)s).'),
+                    params={
+                        'format': dict(self.IMPORT_FORMATS)[import_format],
+                        'extensions': ', '.join(f'.{extension}' for extension in allowed),
+                    }
+                ))
+        
+        return cleaned_data
 
 
 class BankStatementEntryForm(forms.ModelForm):
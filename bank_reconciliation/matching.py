@@ -0,0 +1,344 @@
+"""
+Matching engine for bank reconciliation sessions.
+
+Instead of comparing every unmatched bank line with every unmatched ERP entry,
+ERP candidates are indexed once: by (reference, amount) and by exact amount in
+hash maps, by amount in a sorted list for tolerance lookups, and by date in a
+sorted list for date windows. Matching runs in passes from the most to the
+least certain rule:
+
+1. reference  - same reference number and amount within the date window
+2. exact      - same amount, closest date within the date tolerance
+3. tolerance  - amount within the amount tolerance and date within the window
+4. one_to_many / many_to_one - one line against a small combination of lines
+   on the other side, searched over a bounded candidate set
+
+Each match records the rule that produced it and a confidence score.
+"""
+import bisect
+import logging
+import uuid
+from decimal import Decimal
+from difflib import SequenceMatcher
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from .models import ERPTransaction, BankStatementEntry, MatchedEntry
+
+logger = logging.getLogger(__name__)
+
+# Bounds for the combination search
+MAX_COMBINATION_SIZE = 3
+MAX_COMBINATION_CANDIDATES = 20
+# Upper bound on entries inspected around a date or amount for one lookup
+MAX_WINDOW_SCAN = 500
+
+# Entries updated per statement when saving matches
+UPDATE_CHUNK_SIZE = 900
+
+# Date window used when matching on amount only
+UNBOUNDED_DATE_TOLERANCE = 36500
+
+MATCH_TYPE_BY_RULE = {
+    'reference': 'exact',
+    'exact': 'exact',
+    'tolerance': 'partial',
+    'one_to_many': 'partial',
+    'many_to_one': 'partial',
+}
+
+ENTRY_FIELDS = ('id', 'transaction_date', 'reference_number', 'description', 'debit_amount', 'credit_amount')
+
+
+class MatchLine:
+    """Lightweight view of an ERP or bank entry used while matching"""
+    __slots__ = ('id', 'day', 'reference', 'description', 'cents')
+
+    def __init__(self, row):
+        entry_id, transaction_date, reference, description, debit, credit = row
+        self.id = entry_id
+        self.day = transaction_date.toordinal()
+        self.reference = (reference or '').strip().lower()
+        self.description = description or ''
+        # Same sign convention as the models' amount property
+        amount = credit if credit and credit > 0 else -(debit or Decimal('0'))
+        self.cents = int((amount * 100).to_integral_value())
+
+
+class Match:
+    """A proposed match between ERP entries and bank entries"""
+
+    def __init__(self, rule, erp_lines, bank_lines, confidence):
+        self.rule = rule
+        self.erp_lines = erp_lines
+        self.bank_lines = bank_lines
+        self.confidence = max(Decimal('0.00'), min(Decimal('100.00'), Decimal(confidence).quantize(Decimal('0.01'))))
+
+    @property
+    def difference_cents(self):
+        return abs(sum(line.cents for line in self.erp_lines) - sum(line.cents for line in self.bank_lines))
+
+
+class ReconciliationMatcher:
+    """Matches the unmatched entries of a reconciliation session"""
+
+    def __init__(self, session, criteria='amount_date', date_tolerance=3, amount_tolerance=Decimal('0.01'),
+                 description_similarity=None):
+        self.session = session
+        self.criteria = criteria
+        self.date_tolerance = UNBOUNDED_DATE_TOLERANCE if criteria == 'amount_only' else int(date_tolerance or 0)
+        self.tolerance_cents = int((Decimal(amount_tolerance or 0) * 100).to_integral_value())
+        self.description_similarity = description_similarity if criteria == 'description' else None
+        self.matches = []
+
+    def _load(self):
+        erp_rows = ERPTransaction.objects.filter(
+            reconciliation_session=self.session, is_matched=False
+        ).order_by().values_list(*ENTRY_FIELDS)
+        bank_rows = BankStatementEntry.objects.filter(
+            reconciliation_session=self.session, is_matched=False
+        ).order_by().values_list(*ENTRY_FIELDS)
+        self.erp_lines = [MatchLine(row) for row in erp_rows.iterator(chunk_size=5000)]
+        self.bank_lines = [MatchLine(row) for row in bank_rows.iterator(chunk_size=5000)]
+        self.used_erp = set()
+        self.used_bank = set()
+
+    def _build_indexes(self):
+        self.erp_by_reference = {}
+        self.erp_by_amount = {}
+        for line in self.erp_lines:
+            if line.reference:
+                self.erp_by_reference.setdefault((line.reference, line.cents), []).append(line)
+            self.erp_by_amount.setdefault(line.cents, []).append(line)
+        for bucket in self.erp_by_amount.values():
+            bucket.sort(key=lambda line: line.day)
+        self.erp_by_amount_days = {cents: [line.day for line in bucket] for cents, bucket in self.erp_by_amount.items()}
+
+        self.erp_sorted_by_amount = sorted(self.erp_lines, key=lambda line: line.cents)
+        self.erp_amount_keys = [line.cents for line in self.erp_sorted_by_amount]
+
+    def _description_ok(self, erp_line, bank_line):
+        if self.description_similarity is None:
+            return True
+        ratio = SequenceMatcher(None, erp_line.description.lower(), bank_line.description.lower()).ratio()
+        return ratio * 100 >= self.description_similarity
+
+    def _record(self, rule, erp_lines, bank_lines, confidence):
+        self.matches.append(Match(rule, erp_lines, bank_lines, confidence))
+        self.used_erp.update(line.id for line in erp_lines)
+        self.used_bank.update(line.id for line in bank_lines)
+
+    def _match_by_reference(self):
+        for bank_line in self.bank_lines:
+            if bank_line.id in self.used_bank or not bank_line.reference:
+                continue
+            candidates = self.erp_by_reference.get((bank_line.reference, bank_line.cents), ())
+            best = None
+            for erp_line in candidates:
+                if erp_line.id in self.used_erp or abs(erp_line.day - bank_line.day) > self.date_tolerance:
+                    continue
+                if best is None or abs(erp_line.day - bank_line.day) < abs(best.day - bank_line.day):
+                    best = erp_line
+            if best is not None:
+                self._record('reference', [best], [bank_line], 100)
+
+    def _match_exact_amount(self):
+        for bank_line in self.bank_lines:
+            if bank_line.id in self.used_bank:
+                continue
+            bucket = self.erp_by_amount.get(bank_line.cents)
+            if not bucket:
+                continue
+            days = self.erp_by_amount_days[bank_line.cents]
+            start = bisect.bisect_left(days, bank_line.day - self.date_tolerance)
+            end = bisect.bisect_right(days, bank_line.day + self.date_tolerance)
+            best = None
+            for erp_line in bucket[start:min(end, start + MAX_WINDOW_SCAN)]:
+                if erp_line.id in self.used_erp or not self._description_ok(erp_line, bank_line):
+                    continue
+                if best is None or abs(erp_line.day - bank_line.day) < abs(best.day - bank_line.day):
+                    best = erp_line
+            if best is not None:
+                day_gap = abs(best.day - bank_line.day) if self.criteria != 'amount_only' else 0
+                self._record('exact', [best], [bank_line], 100 - 2 * day_gap)
+
+    def _match_within_tolerance(self):
+        if self.tolerance_cents <= 0:
+            return
+        for bank_line in self.bank_lines:
+            if bank_line.id in self.used_bank:
+                continue
+            start = bisect.bisect_left(self.erp_amount_keys, bank_line.cents - self.tolerance_cents)
+            end = bisect.bisect_right(self.erp_amount_keys, bank_line.cents + self.tolerance_cents)
+            best, best_score = None, None
+            for erp_line in self.erp_sorted_by_amount[start:min(end, start + MAX_WINDOW_SCAN)]:
+                if erp_line.id in self.used_erp:
+                    continue
+                day_gap = abs(erp_line.day - bank_line.day)
+                if day_gap > self.date_tolerance or not self._description_ok(erp_line, bank_line):
+                    continue
+                score = (abs(erp_line.cents - bank_line.cents), day_gap)
+                if best_score is None or score < best_score:
+                    best, best_score = erp_line, score
+            if best is not None:
+                amount_penalty = Decimal(best_score[0] * 100) / max(abs(bank_line.cents), 1)
+                day_penalty = 2 * best_score[1] if self.criteria != 'amount_only' else 0
+                self._record('tolerance', [best], [bank_line], Decimal(90) - amount_penalty - day_penalty)
+
+    def _nearby_candidates(self, target, pool, pool_days, used):
+        """Unused lines of the same sign as target, nearest in date first, within bounds"""
+        position = bisect.bisect_left(pool_days, target.day)
+        left, right = position - 1, position
+        candidates = []
+        scanned = 0
+        while scanned < MAX_WINDOW_SCAN and len(candidates) < MAX_COMBINATION_CANDIDATES:
+            left_gap = target.day - pool_days[left] if left >= 0 else None
+            right_gap = pool_days[right] - target.day if right < len(pool) else None
+            if left_gap is None and right_gap is None:
+                break
+            if right_gap is None or (left_gap is not None and left_gap <= right_gap):
+                line, gap, left = pool[left], left_gap, left - 1
+            else:
+                line, gap, right = pool[right], right_gap, right + 1
+            if gap > self.date_tolerance:
+                # Lines are visited nearest first, so every remaining one is further away
+                break
+            scanned += 1
+            if line.id in used or (line.cents > 0) != (target.cents > 0):
+                continue
+            if abs(line.cents) > abs(target.cents) + self.tolerance_cents:
+                continue
+            candidates.append(line)
+        return candidates
+
+    def _find_pair(self, lines, start, target_cents):
+        """Two-pointer search over lines[start:] (sorted by amount) for a pair summing to target"""
+        low, high = start, len(lines) - 1
+        while low < high:
+            total = lines[low].cents + lines[high].cents
+            if abs(total - target_cents) <= self.tolerance_cents:
+                return [lines[low], lines[high]]
+            if total < target_cents:
+                low += 1
+            else:
+                high -= 1
+        return None
+
+    def _find_combination(self, target, candidates):
+        """Smallest combination of two or three candidates adding up to the target amount"""
+        lines = sorted(candidates, key=lambda line: line.cents)
+        pair = self._find_pair(lines, 0, target.cents)
+        if pair or MAX_COMBINATION_SIZE < 3:
+            return pair
+        for index in range(len(lines) - 2):
+            pair = self._find_pair(lines, index + 1, target.cents - lines[index].cents)
+            if pair:
+                return [lines[index]] + pair
+        return None
+
+    def _match_combinations(self):
+        erp_pool = sorted((line for line in self.erp_lines if line.id not in self.used_erp), key=lambda line: line.day)
+        bank_pool = sorted((line for line in self.bank_lines if line.id not in self.used_bank), key=lambda line: line.day)
+        erp_days = [line.day for line in erp_pool]
+        bank_days = [line.day for line in bank_pool]
+
+        # One bank line settling several ERP entries
+        for bank_line in bank_pool:
+            if bank_line.id in self.used_bank:
+                continue
+            candidates = self._nearby_candidates(bank_line, erp_pool, erp_days, self.used_erp)
+            parts = self._find_combination(bank_line, candidates)
+            if parts:
+                day_gap = max(abs(line.day - bank_line.day) for line in parts)
+                self._record('one_to_many', parts, [bank_line], 80 - 2 * min(day_gap, 10) - 5 * (len(parts) - 2))
+
+        # Several bank lines for one ERP entry
+        for erp_line in erp_pool:
+            if erp_line.id in self.used_erp:
+                continue
+            candidates = self._nearby_candidates(erp_line, bank_pool, bank_days, self.used_bank)
+            parts = self._find_combination(erp_line, candidates)
+            if parts:
+                day_gap = max(abs(line.day - erp_line.day) for line in parts)
+                self._record('many_to_one', [erp_line], parts, 80 - 2 * min(day_gap, 10) - 5 * (len(parts) - 2))
+
+    def find_matches(self):
+        """Compute matches without saving anything. Returns a list of Match."""
+        self._load()
+        self._build_indexes()
+        self.matches = []
+
+        self._match_by_reference()
+        if self.criteria != 'reference':
+            self._match_exact_amount()
+            self._match_within_tolerance()
+            self._match_combinations()
+        return self.matches
+
+    @staticmethod
+    def _notes(rule):
+        return f"Auto-matched ({rule.replace('_', ' ')})"
+
+    @staticmethod
+    def _chunks(ids, size=UPDATE_CHUNK_SIZE):
+        for start in range(0, len(ids), size):
+            yield ids[start:start + size]
+
+    def _mark_matched(self, model, ids, rule, **counterpart):
+        for chunk in self._chunks(ids):
+            updated = model.objects.filter(pk__in=chunk, is_matched=False).update(
+                is_matched=True,
+                match_notes=self._notes(rule),
+                **counterpart
+            )
+            if updated != len(chunk):
+                raise ValueError("Entries were matched by another user while matching. Please run the match again.")
+
+    def apply(self, user=None):
+        """Find and save matches. Returns the list of Match saved."""
+        matches = self.find_matches()
+        if not matches:
+            return matches
+
+        matched_entries = []
+        erp_ids_by_rule = {}
+        bank_ids_by_rule = {}
+        for match in matches:
+            group = uuid.uuid4() if len(match.erp_lines) > 1 or len(match.bank_lines) > 1 else None
+            difference = Decimal(match.difference_cents) / 100
+            for erp_line in match.erp_lines:
+                for bank_line in match.bank_lines:
+                    matched_entries.append(MatchedEntry(
+                        reconciliation_session=self.session,
+                        erp_entry_id=erp_line.id,
+                        bank_entry_id=bank_line.id,
+                        match_type=MATCH_TYPE_BY_RULE[match.rule],
+                        match_rule=match.rule,
+                        match_group=group,
+                        match_confidence=match.confidence,
+                        difference_amount=difference,
+                        notes=self._notes(match.rule),
+                        created_by=user,
+                    ))
+            erp_ids_by_rule.setdefault(match.rule, []).extend(line.id for line in match.erp_lines)
+            bank_ids_by_rule.setdefault(match.rule, []).extend(line.id for line in match.bank_lines)
+
+        with transaction.atomic():
+            # Match records left behind when these entries were unmatched earlier
+            for ids in self._chunks([line_id for ids in erp_ids_by_rule.values() for line_id in ids]):
+                MatchedEntry.objects.filter(reconciliation_session=self.session, erp_entry_id__in=ids).delete()
+            for ids in self._chunks([line_id for ids in bank_ids_by_rule.values() for line_id in ids]):
+                MatchedEntry.objects.filter(reconciliation_session=self.session, bank_entry_id__in=ids).delete()
+            MatchedEntry.objects.bulk_create(matched_entries, batch_size=1000)
+
+            # Link each entry to its counterpart with one UPDATE per rule and chunk
+            for rule, erp_ids in erp_ids_by_rule.items():
+                counterpart = MatchedEntry.objects.filter(erp_entry=OuterRef('pk')).order_by('id').values('bank_entry')[:1]
+                self._mark_matched(ERPTransaction, erp_ids, rule, matched_bank_entry=Subquery(counterpart))
+            for rule, bank_ids in bank_ids_by_rule.items():
+                counterpart = MatchedEntry.objects.filter(bank_entry=OuterRef('pk')).order_by('id').values('erp_entry')[:1]
+                self._mark_matched(BankStatementEntry, bank_ids, rule, matched_erp_entry=Subquery(counterpart))
+
+        logger.info(f'Auto-matched {len(matches)} groups in reconciliation session {self.session.pk}')
+        return matches
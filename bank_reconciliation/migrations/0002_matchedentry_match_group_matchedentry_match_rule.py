@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-18 21:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_reconciliation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchedentry',
+            name='match_group',
+            field=models.UUIDField(blank=True, db_index=True, help_text='Shared by the rows of a one-to-many or many-to-one match', null=True),
+        ),
+        migrations.AddField(
+            model_name='matchedentry',
+            name='match_rule',
+            field=models.CharField(choices=[('manual', 'Manual'), ('reference', 'Reference and Amount'), ('exact', 'Exact Amount'), ('tolerance', 'Amount Within Tolerance'), ('one_to_many', 'One Bank Line to Many ERP Entries'), ('many_to_one', 'Many Bank Lines to One ERP Entry')], default='manual', help_text='Rule that produced the match', max_length=20),
+        ),
+    ]
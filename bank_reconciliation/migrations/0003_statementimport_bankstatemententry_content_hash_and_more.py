@@ -0,0 +1,60 @@
+# Generated by Django 4.2.23 on 2026-10-18 21:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bank_reconciliation', '0002_matchedentry_match_group_matchedentry_match_rule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatementImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(max_length=255)),
+                ('file_format', models.CharField(choices=[('csv', 'CSV'), ('excel', 'Excel'), ('mt940', 'MT940'), ('camt053', 'CAMT.053')], max_length=10)),
+                ('file_hash', models.CharField(db_index=True, help_text='SHA-256 of the uploaded file', max_length=64)),
+                ('total_lines', models.PositiveIntegerField(default=0)),
+                ('new_lines', models.PositiveIntegerField(default=0)),
+                ('duplicate_lines', models.PositiveIntegerField(default=0)),
+                ('rejected_lines', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list, help_text='Rejected lines with the reason')),
+                ('imported_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Statement Import',
+                'verbose_name_plural': 'Statement Imports',
+                'ordering': ['-imported_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='bankstatemententry',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='Hash of the line content, used to skip lines already imported', max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='bankstatemententry',
+            constraint=models.UniqueConstraint(fields=('reconciliation_session', 'content_hash'), name='unique_statement_line_per_session'),
+        ),
+        migrations.AddField(
+            model_name='statementimport',
+            name='imported_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='statementimport',
+            name='reconciliation_session',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statement_imports', to='bank_reconciliation.bankreconciliationsession'),
+        ),
+        migrations.AddField(
+            model_name='bankstatemententry',
+            name='statement_import',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='entries', to='bank_reconciliation.statementimport'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.23 on 2026-10-18 21:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank_reconciliation', '0003_statementimport_bankstatemententry_content_hash_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankreconciliationsession',
+            name='suggestions_refreshed_at',
+            field=models.DateTimeField(blank=True, help_text='When match suggestions were last precomputed for this session', null=True),
+        ),
+        migrations.CreateModel(
+            name='MatchSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('erp', 'ERP Entry'), ('bank', 'Bank Entry')], max_length=4)),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('amount_score', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('date_score', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('reference_score', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('narration_score', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('history_score', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('bank_entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_suggestions', to='bank_reconciliation.bankstatemententry')),
+                ('erp_entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_suggestions', to='bank_reconciliation.erptransaction')),
+                ('reconciliation_session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_suggestions', to='bank_reconciliation.bankreconciliationsession')),
+            ],
+            options={
+                'verbose_name': 'Match Suggestion',
+                'verbose_name_plural': 'Match Suggestions',
+                'ordering': ['entry_type', 'rank'],
+                'indexes': [models.Index(fields=['reconciliation_session', 'entry_type', 'erp_entry', 'rank'], name='bank_reconc_reconci_a24be9_idx'), models.Index(fields=['reconciliation_session', 'entry_type', 'bank_entry', 'rank'], name='bank_reconc_reconci_da10cd_idx')],
+            },
+        ),
+    ]
@@ -50,6 +50,11 @@ class BankReconciliationSession(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    suggestions_refreshed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When match suggestions were last precomputed for this session"
+    )
     
     class Meta:
         ordering = ['-reconciliation_date', '-created_at']
@@ -201,6 +206,19 @@ class BankStatementEntry(models.Model):
     # Import Information
     import_source = models.CharField(max_length=50, default='manual', help_text="Source of import (manual, csv, excel)")
     import_reference = models.CharField(max_length=200, blank=True, null=True, help_text="Reference from import file")
+    statement_import = models.ForeignKey(
+        'StatementImport',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='entries'
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        help_text="Hash of the line content, used to skip lines already imported"
+    )
     
     # Matching Status
     is_matched = models.BooleanField(default=False)
@@ -221,6 +239,12 @@ class BankStatementEntry(models.Model):
         ordering = ['transaction_date', 'created_at']
         verbose_name = 'Bank Statement Entry'
         verbose_name_plural = 'Bank Statement Entries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['reconciliation_session', 'content_hash'],
+                name='unique_statement_line_per_session'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.description} - {self.transaction_date} ({self.reference_number or 'No Ref'})"
@@ -240,6 +264,45 @@ class BankStatementEntry(models.Model):
         return 'debit'
 
 
+class StatementImport(models.Model):
+    """Model for tracking bank statement file imports"""
+    
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('excel', 'Excel'),
+        ('mt940', 'MT940'),
+        ('camt053', 'CAMT.053'),
+    ]
+    
+    reconciliation_session = models.ForeignKey(
+        BankReconciliationSession,
+        on_delete=models.CASCADE,
+        related_name='statement_imports'
+    )
+    file_name = models.CharField(max_length=255)
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    file_hash = models.CharField(max_length=64, db_index=True, help_text="SHA-256 of the uploaded file")
+    
+    # Summary
+    total_lines = models.PositiveIntegerField(default=0)
+    new_lines = models.PositiveIntegerField(default=0)
+    duplicate_lines = models.PositiveIntegerField(default=0)
+    rejected_lines = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="Rejected lines with the reason")
+    
+    # Audit Fields
+    imported_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    imported_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-imported_at']
+        verbose_name = 'Statement Import'
+        verbose_name_plural = 'Statement Imports'
+    
+    def __str__(self):
+        return f"{self.file_name} ({self.new_lines} new, {self.duplicate_lines} duplicate, {self.rejected_lines} rejected)"
+
+
 class MatchedEntry(models.Model):
     """Model for tracking matched entries between ERP and Bank"""
     
@@ -261,6 +324,25 @@ class MatchedEntry(models.Model):
         ],
         default='manual'
     )
+    match_rule = models.CharField(
+        max_length=20,
+        choices=[
+            ('manual', 'Manual'),
+            ('reference', 'Reference and Amount'),
+            ('exact', 'Exact Amount'),
+            ('tolerance', 'Amount Within Tolerance'),
+            ('one_to_many', 'One Bank Line to Many ERP Entries'),
+            ('many_to_one', 'Many Bank Lines to One ERP Entry'),
+        ],
+        default='manual',
+        help_text="Rule that produced the match"
+    )
+    match_group = models.UUIDField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Shared by the rows of a one-to-many or many-to-one match"
+    )
     match_confidence = models.DecimalField(
         max_digits=5, 
         decimal_places=2, 
@@ -304,6 +386,48 @@ class MatchedEntry(models.Model):
         super().save(*args, **kwargs)
 
 
+class MatchSuggestion(models.Model):
+    """Model for precomputed, ranked match suggestions of an unmatched entry"""
+    
+    ENTRY_TYPES = [
+        ('erp', 'ERP Entry'),
+        ('bank', 'Bank Entry'),
+    ]
+    
+    reconciliation_session = models.ForeignKey(
+        BankReconciliationSession,
+        on_delete=models.CASCADE,
+        related_name='match_suggestions'
+    )
+    # The unmatched entry the suggestion is for; the other side is the candidate
+    entry_type = models.CharField(max_length=4, choices=ENTRY_TYPES)
+    erp_entry = models.ForeignKey(ERPTransaction, on_delete=models.CASCADE, related_name='match_suggestions')
+    bank_entry = models.ForeignKey(BankStatementEntry, on_delete=models.CASCADE, related_name='match_suggestions')
+    rank = models.PositiveSmallIntegerField()
+    
+    # Scores (0-100)
+    score = models.DecimalField(max_digits=5, decimal_places=2)
+    amount_score = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    date_score = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    reference_score = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    narration_score = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    history_score = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['entry_type', 'rank']
+        verbose_name = 'Match Suggestion'
+        verbose_name_plural = 'Match Suggestions'
+        indexes = [
+            models.Index(fields=['reconciliation_session', 'entry_type', 'erp_entry', 'rank']),
+            models.Index(fields=['reconciliation_session', 'entry_type', 'bank_entry', 'rank']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_entry_type_display()} suggestion #{self.rank} ({self.score})"
+
+
 class ReconciliationReport(models.Model):
     """Model for storing reconciliation reports"""
     
@@ -0,0 +1,411 @@
+"""
+Bank statement import for reconciliation sessions.
+
+CSV, Excel, MT940 and CAMT.053 files are parsed locally into statement lines.
+Every line gets a content hash (date, amounts, reference, description and its
+occurrence number among identical lines in the file), so uploading an
+overlapping statement again only adds the lines that are new. Lines are
+inserted in chunks with bulk_create(ignore_conflicts=True) against the
+(session, content_hash) unique constraint, and each upload is recorded as a
+StatementImport with counts of new, duplicate and rejected lines.
+"""
+import csv
+import hashlib
+import io
+import logging
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import BankStatementEntry, StatementImport
+
+logger = logging.getLogger(__name__)
+
+# Lines inserted per bulk_create
+CHUNK_SIZE = 1000
+# Rejected lines kept on the import record
+MAX_RECORDED_ERRORS = 200
+
+
+class StatementParseError(ValueError):
+    """Raised when a statement line or file cannot be parsed"""
+
+
+def parse_amount(value):
+    """Parse an amount written with thousands separators or a decimal comma"""
+    if value is None:
+        return Decimal('0.00')
+    if isinstance(value, (int, float, Decimal)):
+        if value != value:  # NaN from empty spreadsheet cells
+            return Decimal('0.00')
+        return Decimal(str(value)).quantize(Decimal('0.01'))
+
+    text = str(value).strip().replace(' ', '')
+    if not text or text == '-':
+        return Decimal('0.00')
+    negative = text.startswith('(') and text.endswith(')')
+    text = text.strip('()')
+    if ',' in text and '.' not in text and re.search(r',\d{1,2}$', text):
+        text = text.replace(',', '.')
+    text = text.replace(',', '')
+    try:
+        amount = Decimal(text).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise StatementParseError(f'Invalid amount "{value}"')
+    return -amount if negative else amount
+
+
+def parse_date(value, date_format):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value or '').strip()
+    if not text:
+        raise StatementParseError('Missing transaction date')
+    try:
+        return datetime.strptime(text, date_format).date()
+    except ValueError:
+        raise StatementParseError(f'Date "{text}" does not match format {date_format}')
+
+
+def _clean(value):
+    if value is None or value != value:
+        return ''
+    return ' '.join(str(value).split())
+
+
+class TabularStatementParser:
+    """Parses CSV and Excel statements using the column mapping from the import form"""
+
+    def __init__(self, options):
+        self.has_header = options.get('skip_first_row', True)
+        self.date_format = options.get('date_format') or '%Y-%m-%d'
+        self.columns = {
+            'date': options.get('date_column'),
+            'description': options.get('description_column'),
+            'reference': options.get('reference_column'),
+            'debit': options.get('debit_column'),
+            'credit': options.get('credit_column'),
+        }
+
+    def _value(self, row, field):
+        column = self.columns.get(field)
+        if not column:
+            return None
+        if isinstance(row, dict):
+            if column not in row:
+                raise StatementParseError(f'Column "{column}" not found')
+            return row[column]
+        # Without a header row columns are given by position (1-based)
+        if not str(column).isdigit():
+            raise StatementParseError(f'Column "{column}" must be a column number when the file has no header row')
+        index = int(column) - 1
+        return row[index] if index < len(row) else None
+
+    def parse_row(self, row):
+        debit = parse_amount(self._value(row, 'debit'))
+        credit = parse_amount(self._value(row, 'credit'))
+        if self.columns['debit'] and self.columns['debit'] == self.columns['credit']:
+            # One signed amount column: negative amounts are debits
+            debit, credit = (-debit, Decimal('0.00')) if debit < 0 else (Decimal('0.00'), credit)
+        return {
+            'transaction_date': parse_date(self._value(row, 'date'), self.date_format),
+            'description': _clean(self._value(row, 'description')),
+            'reference_number': _clean(self._value(row, 'reference')) or None,
+            'debit_amount': abs(debit),
+            'credit_amount': abs(credit),
+        }
+
+    def rows_from_csv(self, content):
+        text = content.decode('utf-8-sig')
+        if self.has_header:
+            return csv.DictReader(io.StringIO(text))
+        return csv.reader(io.StringIO(text))
+
+    def rows_from_excel(self, content):
+        import pandas as pd
+
+        frame = pd.read_excel(io.BytesIO(content), header=0 if self.has_header else None, dtype=object)
+        if self.has_header:
+            frame.columns = [str(column).strip() for column in frame.columns]
+            return frame.to_dict('records')
+        return frame.values.tolist()
+
+    def parse(self, content, file_format):
+        rows = self.rows_from_excel(content) if file_format == 'excel' else self.rows_from_csv(content)
+        first_line = 2 if self.has_header else 1
+        for line_number, row in enumerate(rows, start=first_line):
+            if not any(_clean(value) for value in (row.values() if isinstance(row, dict) else row)):
+                continue
+            try:
+                yield line_number, self.parse_row(row), None
+            except StatementParseError as e:
+                yield line_number, None, str(e)
+
+
+class MT940Parser:
+    """Parses SWIFT MT940 customer statements"""
+
+    # :61:YYMMDD[MMDD]<D|C|RD|RC>[funds code]<amount><N|F><type code><reference>[//bank reference]
+    STATEMENT_LINE = re.compile(
+        r'^(?P<date>\d{6})(?P<entry_date>\d{4})?(?P<mark>RD|RC|D|C)[A-Z]?'
+        r'(?P<amount>\d+,\d{0,2})[NF](?P<type>[A-Z0-9]{3})'
+        r'(?P<reference>[^/\n]*)(?://(?P<bank_reference>[^\n]*))?'
+    )
+    TAG = re.compile(r'^:(?P<tag>\d{2}[A-Z]?):(?P<value>.*)$')
+
+    def _fields(self, text):
+        tag, value = None, []
+        for line in text.splitlines():
+            line = line.rstrip()
+            if line in ('-', '-}') or line.startswith('{'):
+                continue
+            match = self.TAG.match(line)
+            if match:
+                if tag:
+                    yield tag, '\n'.join(value)
+                tag, value = match.group('tag'), [match.group('value')]
+            elif tag:
+                value.append(line)
+        if tag:
+            yield tag, '\n'.join(value)
+
+    def parse(self, content, file_format=None):
+        text = content.decode('utf-8', errors='replace')
+        line_number = 0
+        pending = None
+        for tag, value in self._fields(text):
+            if tag == '61':
+                if pending:
+                    yield pending
+                line_number += 1
+                pending = self._parse_statement_line(line_number, value)
+            elif tag == '86' and pending and pending[1]:
+                pending[1]['description'] = _clean(value.replace('\n', ' '))
+        if pending:
+            yield pending
+
+    def _parse_statement_line(self, line_number, value):
+        match = self.STATEMENT_LINE.match(value)
+        if not match:
+            return line_number, None, f'Unrecognised :61: statement line "{value[:60]}"'
+        try:
+            transaction_date = datetime.strptime(match.group('date'), '%y%m%d').date()
+        except ValueError:
+            return line_number, None, f'Invalid value date "{match.group("date")}"'
+
+        amount = Decimal(match.group('amount').replace(',', '.')).quantize(Decimal('0.01'))
+        # A reversal of a debit is a credit and vice versa
+        is_credit = match.group('mark') in ('C', 'RD')
+        reference = match.group('reference').strip()
+        if reference.upper() == 'NONREF':
+            reference = match.group('bank_reference') or ''
+        supplementary = value.split('\n', 1)[1] if '\n' in value else ''
+        return line_number, {
+            'transaction_date': transaction_date,
+            'description': _clean(supplementary),
+            'reference_number': reference.strip() or None,
+            'debit_amount': Decimal('0.00') if is_credit else amount,
+            'credit_amount': amount if is_credit else Decimal('0.00'),
+        }, None
+
+
+class CAMT053Parser:
+    """Parses ISO 20022 camt.053 bank-to-customer statements"""
+
+    @staticmethod
+    def _local(tag):
+        return tag.rsplit('}', 1)[-1]
+
+    def _find(self, element, path):
+        for name in path.split('/'):
+            if element is None:
+                return None
+            element = next((child for child in element if self._local(child.tag) == name), None)
+        return element
+
+    def _text(self, element, *paths):
+        for path in paths:
+            found = self._find(element, path)
+            if found is not None and found.text and found.text.strip():
+                return found.text.strip()
+        return ''
+
+    def parse(self, content, file_format=None):
+        from defusedxml import ElementTree
+
+        try:
+            root = ElementTree.fromstring(content)
+        except ElementTree.ParseError as e:
+            raise StatementParseError(f'Invalid CAMT.053 file: {e}')
+
+        entries = [element for element in root.iter() if self._local(element.tag) == 'Ntry']
+        for line_number, entry in enumerate(entries, start=1):
+            try:
+                yield line_number, self._parse_entry(entry), None
+            except StatementParseError as e:
+                yield line_number, None, str(e)
+
+    def _parse_entry(self, entry):
+        amount = parse_amount(self._text(entry, 'Amt'))
+        indicator = self._text(entry, 'CdtDbtInd')
+        if indicator not in ('CRDT', 'DBIT'):
+            raise StatementParseError(f'Unknown credit/debit indicator "{indicator}"')
+        if self._text(entry, 'RvslInd').lower() == 'true':
+            indicator = 'DBIT' if indicator == 'CRDT' else 'CRDT'
+
+        booked = self._text(entry, 'BookgDt/Dt', 'BookgDt/DtTm', 'ValDt/Dt', 'ValDt/DtTm')
+        transaction_date = parse_date(booked[:10], '%Y-%m-%d')
+
+        details = self._find(entry, 'NtryDtls/TxDtls')
+        reference = self._text(entry, 'AcctSvcrRef', 'NtryRef')
+        description = self._text(entry, 'AddtlNtryInf')
+        if details is not None:
+            reference = self._text(details, 'Refs/EndToEndId', 'Refs/AcctSvcrRef') or reference
+            if reference == 'NOTPROVIDED':
+                reference = self._text(entry, 'AcctSvcrRef', 'NtryRef')
+            description = self._text(details, 'RmtInf/Ustrd', 'AddtlTxInf') or description
+
+        is_credit = indicator == 'CRDT'
+        return {
+            'transaction_date': transaction_date,
+            'description': _clean(description),
+            'reference_number': reference or None,
+            'debit_amount': Decimal('0.00') if is_credit else amount,
+            'credit_amount': amount if is_credit else Decimal('0.00'),
+        }
+
+
+PARSERS = {
+    'csv': TabularStatementParser,
+    'excel': TabularStatementParser,
+    'mt940': MT940Parser,
+    'camt053': CAMT053Parser,
+}
+
+
+def content_hash(line, occurrence):
+    """Stable hash of a statement line and its occurrence among identical lines"""
+    key = '|'.join([
+        line['transaction_date'].isoformat(),
+        f"{line['debit_amount']:.2f}",
+        f"{line['credit_amount']:.2f}",
+        (line['reference_number'] or '').lower(),
+        line['description'].lower(),
+        str(occurrence),
+    ])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class StatementImporter:
+    """Imports a statement file into a reconciliation session"""
+
+    def __init__(self, session, user=None):
+        self.session = session
+        self.user = user
+
+    def parse(self, content, file_format, options=None):
+        """Return (lines, errors) where errors are {'line', 'error'} dicts"""
+        if file_format in ('csv', 'excel'):
+            parser = TabularStatementParser(options or {})
+        else:
+            parser = PARSERS[file_format]()
+
+        lines, errors = [], []
+        for line_number, line, error in parser.parse(content, file_format):
+            if line and line['debit_amount'] == 0 and line['credit_amount'] == 0:
+                line, error = None, 'Line has no debit or credit amount'
+            if error:
+                errors.append({'line': line_number, 'error': error})
+            else:
+                lines.append(line)
+        return lines, errors
+
+    def _existing_hashes(self, hashes):
+        """Hashes already imported for this bank account, in any of its sessions"""
+        existing = set()
+        hashes = list(hashes)
+        for start in range(0, len(hashes), CHUNK_SIZE):
+            existing.update(BankStatementEntry.objects.filter(
+                reconciliation_session__bank_account_id=self.session.bank_account_id,
+                content_hash__in=hashes[start:start + CHUNK_SIZE]
+            ).values_list('content_hash', flat=True))
+        return existing
+
+    def _update_session_totals(self):
+        """Same totals as the BankStatementEntry post_save signal, which bulk_create skips"""
+        totals = BankStatementEntry.objects.filter(reconciliation_session=self.session).aggregate(
+            credits=Sum('credit_amount'),
+            debits=Sum('debit_amount'),
+        )
+        self.session.total_bank_credits = totals['credits'] or 0
+        self.session.total_bank_debits = totals['debits'] or 0
+        self.session.save(update_fields=['total_bank_credits', 'total_bank_debits'])
+
+    def run(self, file, file_format, options=None):
+        """Import an uploaded file. Returns the StatementImport summary."""
+        content = file.read()
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        file_name = getattr(file, 'name', '') or 'statement'
+
+        lines, errors = self.parse(content, file_format, options)
+
+        # Identical lines within one file are told apart by their occurrence number
+        occurrences = {}
+        hashed = []
+        for line in lines:
+            base = content_hash(line, 0)
+            occurrence = occurrences.get(base, 0)
+            occurrences[base] = occurrence + 1
+            hashed.append((content_hash(line, occurrence), line))
+
+        existing = self._existing_hashes(line_hash for line_hash, _ in hashed)
+
+        with transaction.atomic():
+            statement_import = StatementImport.objects.create(
+                reconciliation_session=self.session,
+                file_name=file_name[:255],
+                file_format=file_format,
+                file_hash=hashlib.sha256(content).hexdigest(),
+                total_lines=len(lines) + len(errors),
+                rejected_lines=len(errors),
+                errors=errors[:MAX_RECORDED_ERRORS],
+                imported_by=self.user,
+            )
+
+            new_entries = [
+                BankStatementEntry(
+                    reconciliation_session=self.session,
+                    import_source=file_format,
+                    import_reference=file_name[:200],
+                    statement_import=statement_import,
+                    content_hash=line_hash,
+                    **line
+                )
+                for line_hash, line in hashed
+                if line_hash not in existing
+            ]
+            for start in range(0, len(new_entries), CHUNK_SIZE):
+                BankStatementEntry.objects.bulk_create(
+                    new_entries[start:start + CHUNK_SIZE], ignore_conflicts=True
+                )
+
+            # Rows skipped on conflict (a concurrent upload of the same lines) count as duplicates
+            statement_import.new_lines = statement_import.entries.count()
+            statement_import.duplicate_lines = len(lines) - statement_import.new_lines
+            statement_import.save(update_fields=['new_lines', 'duplicate_lines'])
+
+            if statement_import.new_lines:
+                self._update_session_totals()
+
+        logger.info(
+            f'Imported {file_name} into reconciliation session {self.session.pk}: '
+            f'{statement_import.new_lines} new, {statement_import.duplicate_lines} duplicate, '
+            f'{statement_import.rejected_lines} rejected'
+        )
+        return statement_import
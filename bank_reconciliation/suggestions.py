@@ -0,0 +1,259 @@
+"""
+Ranked match suggestions for unmatched reconciliation entries.
+
+Candidates for an entry are gathered from a few bounded lookups on the other
+side of the session (nearest by amount, nearest by date, shared reference or
+narration tokens) instead of scanning every line, then scored on:
+
+- amount delta
+- date distance
+- reference similarity
+- narration token similarity
+- counterparty history: how often lines from the same counterparties were
+  matched before on this bank account
+
+The top suggestions for every unmatched entry are precomputed in a background
+pass and stored as MatchSuggestion rows, so the reconciliation screen reads
+them with one indexed query per click.
+"""
+import bisect
+import heapq
+import logging
+import re
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .matching import MatchLine, ENTRY_FIELDS
+from .models import ERPTransaction, BankStatementEntry, MatchedEntry, MatchSuggestion
+
+logger = logging.getLogger(__name__)
+
+TOP_K = 5
+# Candidates taken from each lookup before scoring
+CANDIDATES_PER_LOOKUP = 30
+# Tokens shared by more lines than this are too common to find candidates with
+MAX_TOKEN_FREQUENCY = 200
+# Dates further apart than this score zero
+DATE_HORIZON_DAYS = 15
+# Previously matched pairs read for counterparty history
+HISTORY_LIMIT = 20000
+
+WEIGHTS = {
+    'amount': Decimal('0.35'),
+    'date': Decimal('0.20'),
+    'reference': Decimal('0.20'),
+    'narration': Decimal('0.15'),
+    'history': Decimal('0.10'),
+}
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return {token for token in TOKEN_PATTERN.findall((text or '').lower()) if len(token) >= 3}
+
+
+def counterparty_key(description):
+    """First few words of a narration with numbers removed, e.g. 'acme trading llc'"""
+    words = [word for word in TOKEN_PATTERN.findall((description or '').lower()) if not word.isdigit()]
+    return ' '.join(words[:3])
+
+
+def jaccard(left, right):
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class SuggestionLine(MatchLine):
+    """MatchLine with the tokens used for scoring"""
+    __slots__ = ('reference_tokens', 'narration_tokens', 'counterparty')
+
+    def __init__(self, row):
+        super().__init__(row)
+        self.reference_tokens = tokenize(self.reference)
+        self.narration_tokens = tokenize(self.description)
+        self.counterparty = counterparty_key(self.description)
+
+
+class _CandidatePool:
+    """Indexes one side of the session for bounded candidate lookups"""
+
+    def __init__(self, lines):
+        self.by_amount = sorted(lines, key=lambda line: line.cents)
+        self.amount_keys = [line.cents for line in self.by_amount]
+        self.by_date = sorted(lines, key=lambda line: line.day)
+        self.date_keys = [line.day for line in self.by_date]
+
+        self.by_token = {}
+        for line in lines:
+            for token in line.reference_tokens | line.narration_tokens:
+                self.by_token.setdefault(token, []).append(line)
+
+    @staticmethod
+    def _nearest(lines, keys, value, count):
+        position = bisect.bisect_left(keys, value)
+        left, right = position - 1, position
+        found = []
+        while len(found) < count and (left >= 0 or right < len(lines)):
+            if right >= len(lines) or (left >= 0 and value - keys[left] <= keys[right] - value):
+                found.append(lines[left])
+                left -= 1
+            else:
+                found.append(lines[right])
+                right += 1
+        return found
+
+    def candidates(self, line):
+        found = {}
+        for candidate in self._nearest(self.by_amount, self.amount_keys, line.cents, CANDIDATES_PER_LOOKUP):
+            found[candidate.id] = candidate
+        for candidate in self._nearest(self.by_date, self.date_keys, line.day, CANDIDATES_PER_LOOKUP):
+            found[candidate.id] = candidate
+        shared = Counter()
+        sharing = {}
+        for token in line.reference_tokens | line.narration_tokens:
+            matches = self.by_token.get(token, ())
+            if len(matches) <= MAX_TOKEN_FREQUENCY:
+                for candidate in matches:
+                    shared[candidate.id] += 1
+                    sharing[candidate.id] = candidate
+        for candidate_id, _ in shared.most_common(CANDIDATES_PER_LOOKUP):
+            found[candidate_id] = sharing[candidate_id]
+        return found.values()
+
+
+class SuggestionService:
+    """Scores and stores the top match suggestions for a reconciliation session"""
+
+    def __init__(self, session, top_k=TOP_K):
+        self.session = session
+        self.top_k = top_k
+
+    def _load(self):
+        erp_rows = ERPTransaction.objects.filter(
+            reconciliation_session=self.session, is_matched=False
+        ).order_by().values_list(*ENTRY_FIELDS)
+        bank_rows = BankStatementEntry.objects.filter(
+            reconciliation_session=self.session, is_matched=False
+        ).order_by().values_list(*ENTRY_FIELDS)
+        self.erp_lines = [SuggestionLine(row) for row in erp_rows.iterator(chunk_size=5000)]
+        self.bank_lines = [SuggestionLine(row) for row in bank_rows.iterator(chunk_size=5000)]
+        self.history = self._load_history()
+
+    def _load_history(self):
+        """Counts of (bank counterparty, ERP counterparty) pairs matched on this bank account"""
+        pairs = MatchedEntry.objects.filter(
+            reconciliation_session__bank_account_id=self.session.bank_account_id
+        ).order_by('-id').values_list('bank_entry__description', 'erp_entry__description')[:HISTORY_LIMIT]
+        return Counter(
+            (counterparty_key(bank_description), counterparty_key(erp_description))
+            for bank_description, erp_description in pairs
+        )
+
+    def score(self, erp_line, bank_line):
+        """Return (total, components) with every score on a 0-100 scale"""
+        if erp_line.cents and bank_line.cents and (erp_line.cents > 0) != (bank_line.cents > 0):
+            amount = 0.0
+        else:
+            largest = max(abs(erp_line.cents), abs(bank_line.cents), 1)
+            amount = max(0.0, 1 - abs(erp_line.cents - bank_line.cents) / largest * 5)
+
+        date = max(0.0, 1 - abs(erp_line.day - bank_line.day) / DATE_HORIZON_DAYS)
+
+        if erp_line.reference and erp_line.reference == bank_line.reference:
+            reference = 1.0
+        elif (erp_line.reference_tokens & bank_line.narration_tokens) or \
+                (bank_line.reference_tokens & erp_line.narration_tokens):
+            reference = 0.8
+        else:
+            reference = jaccard(erp_line.reference_tokens, bank_line.reference_tokens)
+
+        narration = jaccard(erp_line.narration_tokens, bank_line.narration_tokens)
+        history = min(self.history.get((bank_line.counterparty, erp_line.counterparty), 0), 3) / 3
+
+        components = {
+            'amount': amount,
+            'date': date,
+            'reference': reference,
+            'narration': narration,
+            'history': history,
+        }
+        components = {name: Decimal(value * 100).quantize(Decimal('0.01')) for name, value in components.items()}
+        total = sum(components[name] * weight for name, weight in WEIGHTS.items()).quantize(Decimal('0.01'))
+        return total, components
+
+    def _rank(self, line, pool, line_is_erp):
+        scored = []
+        for candidate in pool.candidates(line):
+            erp_line, bank_line = (line, candidate) if line_is_erp else (candidate, line)
+            total, components = self.score(erp_line, bank_line)
+            if total > 0:
+                scored.append((total, candidate, components))
+        return heapq.nlargest(self.top_k, scored, key=lambda item: (item[0], -abs(item[1].day - line.day)))
+
+    def _suggestions(self, entry_type, line, pool):
+        line_is_erp = entry_type == 'erp'
+        return [
+            MatchSuggestion(
+                reconciliation_session=self.session,
+                entry_type=entry_type,
+                erp_entry_id=line.id if line_is_erp else candidate.id,
+                bank_entry_id=candidate.id if line_is_erp else line.id,
+                rank=rank,
+                score=total,
+                amount_score=components['amount'],
+                date_score=components['date'],
+                reference_score=components['reference'],
+                narration_score=components['narration'],
+                history_score=components['history'],
+            )
+            for rank, (total, candidate, components) in enumerate(self._rank(line, pool, line_is_erp), start=1)
+        ]
+
+    def refresh(self):
+        """Recompute and store suggestions for every unmatched entry. Returns the rows stored."""
+        started_at = timezone.now()
+        self._load()
+        erp_pool = _CandidatePool(self.erp_lines)
+        bank_pool = _CandidatePool(self.bank_lines)
+
+        suggestions = []
+        for line in self.bank_lines:
+            suggestions.extend(self._suggestions('bank', line, erp_pool))
+        for line in self.erp_lines:
+            suggestions.extend(self._suggestions('erp', line, bank_pool))
+
+        with transaction.atomic():
+            MatchSuggestion.objects.filter(reconciliation_session=self.session).delete()
+            MatchSuggestion.objects.bulk_create(suggestions, batch_size=1000)
+            self.session.suggestions_refreshed_at = started_at
+            self.session.save(update_fields=['suggestions_refreshed_at'])
+
+        logger.info(f'Stored {len(suggestions)} match suggestions for reconciliation session {self.session.pk}')
+        return len(suggestions)
+
+    def suggest_for(self, entry_type, entry_id):
+        """Compute suggestions for a single entry without storing them"""
+        self._load()
+        if entry_type == 'erp':
+            lines, pool = self.erp_lines, _CandidatePool(self.bank_lines)
+        else:
+            lines, pool = self.bank_lines, _CandidatePool(self.erp_lines)
+        line = next((line for line in lines if line.id == entry_id), None)
+        if line is None:
+            return []
+        return self._suggestions(entry_type, line, pool)
+
+    def is_stale(self):
+        """True when entries were added after the last precomputed pass"""
+        refreshed_at = self.session.suggestions_refreshed_at
+        if refreshed_at is None:
+            return True
+        return (
+            ERPTransaction.objects.filter(reconciliation_session=self.session, created_at__gt=refreshed_at).exists() or
+            BankStatementEntry.objects.filter(reconciliation_session=self.session, created_at__gt=refreshed_at).exists()
+        )
@@ -0,0 +1,35 @@
+import logging
+
+from celery import shared_task
+from django.db import transaction
+
+from .models import BankReconciliationSession
+from .suggestions import SuggestionService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def refresh_match_suggestions(self, session_id):
+    """Precompute ranked match suggestions for every unmatched entry of a session"""
+    try:
+        session = BankReconciliationSession.objects.get(pk=session_id)
+        stored = SuggestionService(session).refresh()
+        return {'session_id': session_id, 'suggestions': stored}
+    except BankReconciliationSession.DoesNotExist:
+        logger.warning(f'Reconciliation session {session_id} no longer exists')
+        return {'session_id': session_id, 'suggestions': 0}
+    except Exception as exc:
+        logger.error(f'Error refreshing match suggestions for session {session_id}: {str(exc)}')
+        raise self.retry(exc=exc)
+
+
+def queue_suggestion_refresh(session_id):
+    """Refresh suggestions in the background once the current transaction commits"""
+    def enqueue():
+        try:
+            refresh_match_suggestions.delay(session_id)
+        except Exception as e:
+            # Without a broker the next suggestion request computes them on demand
+            logger.warning(f'Could not queue match suggestion refresh for session {session_id}: {str(e)}')
+    transaction.on_commit(enqueue)
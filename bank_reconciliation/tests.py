@@ -1,3 +1,280 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
 
-# Create your tests here.
+from bank_accounts.models import BankAccount
+from chart_of_accounts.models import AccountType, ChartOfAccount
+from company.company_model import Company
+from multi_currency.models import Currency
+from .matching import ReconciliationMatcher
+from .models import BankReconciliationSession, BankStatementEntry, ERPTransaction, MatchedEntry, MatchSuggestion
+from .statement_import import StatementImporter, StatementParseError, parse_amount
+from .suggestions import SuggestionService, counterparty_key
+
+
+class ReconciliationTestMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        company = Company.objects.create(
+            name='Test Company', code='TST', address='1 Test Street', phone='1234567', email='info@example.com'
+        )
+        currency = Currency.objects.create(pk=1, code='AED', name='UAE Dirham', symbol='AED')
+        asset_type = AccountType.objects.create(name='Assets', category='ASSET')
+        self.chart_account = ChartOfAccount.objects.create(
+            account_code='1100', name='Bank', account_type=asset_type, currency=currency, company=company
+        )
+        self.bank_account = BankAccount.objects.create(
+            bank_name='Test Bank', account_number='1234567890', currency=currency,
+            chart_account=self.chart_account, company=company
+        )
+        self.session = self.create_session()
+
+    def create_session(self, name='January 2025'):
+        return BankReconciliationSession.objects.create(
+            bank_account=self.bank_account, session_name=name, reconciliation_date=date(2025, 1, 31),
+            created_by=self.user
+        )
+
+    def erp(self, day, amount, reference=None, description='Receipt', session=None):
+        return ERPTransaction.objects.create(
+            reconciliation_session=session or self.session, chart_account=self.chart_account,
+            transaction_date=date(2025, 1, day), description=description, reference_number=reference,
+            **self.amounts(amount)
+        )
+
+    def bank(self, day, amount, reference=None, description='Transfer', session=None):
+        return BankStatementEntry.objects.create(
+            reconciliation_session=session or self.session, transaction_date=date(2025, 1, day),
+            description=description, reference_number=reference, **self.amounts(amount)
+        )
+
+    @staticmethod
+    def amounts(amount):
+        """Positive amounts are credits, negative ones debits"""
+        amount = Decimal(amount)
+        if amount > 0:
+            return {'credit_amount': amount}
+        return {'debit_amount': -amount}
+
+
+class ReconciliationMatcherTest(ReconciliationTestMixin, TestCase):
+    def matched(self, matches):
+        return {
+            (match.rule, tuple(sorted(line.id for line in match.erp_lines)),
+             tuple(sorted(line.id for line in match.bank_lines)))
+            for match in matches
+        }
+
+    def test_reference_match_wins_over_closer_amount_match(self):
+        by_reference = self.erp(1, '100.00', reference='INV-1')
+        same_day = self.erp(4, '100.00')
+        bank = self.bank(4, '100.00', reference='inv-1 ')
+
+        matches = ReconciliationMatcher(self.session).find_matches()
+
+        self.assertEqual(self.matched(matches), {('reference', (by_reference.pk,), (bank.pk,))})
+        self.assertEqual(matches[0].confidence, Decimal('100.00'))
+        self.assertNotIn(same_day.pk, {line.id for match in matches for line in match.erp_lines})
+
+    def test_exact_amount_takes_the_closest_date_within_tolerance(self):
+        self.erp(1, '-250.00')
+        closest = self.erp(9, '-250.00')
+        self.erp(20, '-250.00')
+        bank = self.bank(10, '-250.00')
+
+        matches = ReconciliationMatcher(self.session, date_tolerance=3).find_matches()
+
+        self.assertEqual(self.matched(matches), {('exact', (closest.pk,), (bank.pk,))})
+        self.assertEqual(matches[0].confidence, Decimal('98.00'))
+
+    def test_amount_and_date_tolerance(self):
+        erp = self.erp(10, '100.00')
+        bank = self.bank(11, '100.01')
+        self.bank(25, '100.00')
+
+        matches = ReconciliationMatcher(self.session, date_tolerance=3).find_matches()
+        self.assertEqual(self.matched(matches), {('tolerance', (erp.pk,), (bank.pk,))})
+
+        strict = ReconciliationMatcher(self.session, date_tolerance=3, amount_tolerance=Decimal('0'))
+        self.assertEqual(strict.find_matches(), [])
+
+    def test_one_bank_line_settling_several_erp_entries(self):
+        first = self.erp(5, '120.00')
+        second = self.erp(6, '80.00')
+        self.erp(6, '-80.00')
+        bank = self.bank(7, '200.00')
+
+        matches = ReconciliationMatcher(self.session).find_matches()
+
+        self.assertEqual(self.matched(matches), {('one_to_many', (first.pk, second.pk), (bank.pk,))})
+
+    def test_apply_saves_and_links_matches(self):
+        reference_erp = self.erp(2, '500.00', reference='PAY-7')
+        reference_bank = self.bank(2, '500.00', reference='PAY-7')
+        parts = [self.erp(5, '30.00'), self.erp(5, '70.00')]
+        combined = self.bank(6, '100.00')
+
+        matches = ReconciliationMatcher(self.session).apply(user=self.user)
+
+        self.assertEqual(len(matches), 2)
+        reference_erp.refresh_from_db()
+        reference_bank.refresh_from_db()
+        self.assertTrue(reference_erp.is_matched)
+        self.assertEqual(reference_erp.matched_bank_entry, reference_bank)
+        self.assertEqual(reference_bank.matched_erp_entry, reference_erp)
+        group = MatchedEntry.objects.filter(bank_entry=combined)
+        self.assertEqual(group.count(), 2)
+        self.assertEqual(len({entry.match_group for entry in group}), 1)
+        self.assertTrue(all(entry.match_rule == 'one_to_many' for entry in group))
+        for part in parts:
+            part.refresh_from_db()
+            self.assertEqual(part.matched_bank_entry, combined)
+        self.assertEqual(ReconciliationMatcher(self.session).apply(), [])
+
+
+MT940_STATEMENT = b"""{1:F01TESTBANKXXXX0000000000}{4:
+:20:STATEMENT1
+:25:1234567890
+:28C:1/1
+:60F:C250101AED1000,00
+:61:2501060106C150,25NTRFINV-100//BANKREF1
+:86:Payment from customer
+:61:2501070107D20,00NCHGNONREF//CHG-7
+:86:Bank charges
+:62F:C250107AED1130,25
+-}"""
+
+
+class StatementImportTest(ReconciliationTestMixin, TestCase):
+    CSV_OPTIONS = {
+        'skip_first_row': True,
+        'date_format': '%d/%m/%Y',
+        'date_column': 'Date',
+        'description_column': 'Narration',
+        'reference_column': 'Ref',
+        'debit_column': 'Amount',
+        'credit_column': 'Amount',
+    }
+
+    def import_csv(self, rows, session=None):
+        content = ('Date,Narration,Ref,Amount\n' + '\n'.join(rows)).encode('utf-8')
+        file = SimpleUploadedFile('statement.csv', content)
+        return StatementImporter(session or self.session, user=self.user).run(file, 'csv', self.CSV_OPTIONS)
+
+    def test_parse_amount_formats(self):
+        self.assertEqual(parse_amount('1,234.50'), Decimal('1234.50'))
+        self.assertEqual(parse_amount('1234,5'), Decimal('1234.50'))
+        self.assertEqual(parse_amount('(75.00)'), Decimal('-75.00'))
+        self.assertEqual(parse_amount(''), Decimal('0.00'))
+        with self.assertRaises(StatementParseError):
+            parse_amount('12abc')
+
+    def test_csv_import_with_signed_amount_column(self):
+        statement_import = self.import_csv([
+            '05/01/2025,Customer payment,INV-1,"1,200.00"',
+            '06/01/2025,Rent,,-450.00',
+            '07/01/2025,No amount,,0',
+            '32/01/2025,Bad date,,10.00',
+        ])
+
+        self.assertEqual(
+            (statement_import.total_lines, statement_import.new_lines, statement_import.rejected_lines), (4, 2, 2)
+        )
+        self.assertEqual([error['line'] for error in statement_import.errors], [4, 5])
+        rent = BankStatementEntry.objects.get(description='Rent')
+        self.assertEqual((rent.debit_amount, rent.credit_amount, rent.reference_number), (Decimal('450.00'), 0, None))
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.total_bank_credits, Decimal('1200.00'))
+        self.assertEqual(self.session.total_bank_debits, Decimal('450.00'))
+
+    def test_overlapping_statement_only_adds_new_lines(self):
+        """Identical lines in one file are kept apart, lines already imported for the account are skipped"""
+        first = self.import_csv([
+            '05/01/2025,Card fee,,-5.00',
+            '05/01/2025,Card fee,,-5.00',
+        ])
+        self.assertEqual(first.new_lines, 2)
+
+        second = self.import_csv([
+            '05/01/2025,Card fee,,-5.00',
+            '05/01/2025,Card fee,,-5.00',
+            '05/01/2025,Card fee,,-5.00',
+            '06/01/2025,Deposit,,300.00',
+        ], session=self.create_session('February 2025'))
+
+        self.assertEqual((second.new_lines, second.duplicate_lines), (2, 2))
+        self.assertEqual(BankStatementEntry.objects.count(), 4)
+
+    def test_mt940_import(self):
+        statement_import = StatementImporter(self.session).run(
+            SimpleUploadedFile('statement.sta', MT940_STATEMENT), 'mt940'
+        )
+
+        self.assertEqual(statement_import.new_lines, 2)
+        payment, charges = BankStatementEntry.objects.order_by('transaction_date')
+        self.assertEqual(payment.transaction_date, date(2025, 1, 6))
+        self.assertEqual((payment.credit_amount, payment.reference_number), (Decimal('150.25'), 'INV-100'))
+        self.assertEqual(payment.description, 'Payment from customer')
+        self.assertEqual((charges.debit_amount, charges.reference_number), (Decimal('20.00'), 'CHG-7'))
+
+
+class SuggestionServiceTest(ReconciliationTestMixin, TestCase):
+    def test_counterparty_key(self):
+        self.assertEqual(counterparty_key('ACME Trading LLC inv 2231 Jan'), 'acme trading llc')
+        self.assertEqual(counterparty_key('2231 / 998 Payroll'), 'payroll')
+
+    def test_candidates_ranked_by_score(self):
+        bank = self.bank(10, '400.00', reference='INV-2231', description='ACME TRADING LLC INV-2231')
+        best = self.erp(10, '400.00', reference='INV-2231', description='Acme Trading receipt')
+        close_amount = self.erp(11, '401.00', description='Receipt')
+        far = self.erp(28, '400.00', description='Receipt')
+        wrong_sign = self.erp(10, '-400.00', description='Refund')
+
+        suggestions = SuggestionService(self.session).suggest_for('bank', bank.pk)
+
+        ranked = [suggestion.erp_entry_id for suggestion in suggestions]
+        self.assertEqual(ranked[0], best.pk)
+        self.assertEqual(suggestions[0].reference_score, Decimal('100.00'))
+        self.assertLess(ranked.index(close_amount.pk), ranked.index(far.pk))
+        # An amount in the opposite direction scores nothing for the amount
+        self.assertEqual(ranked[-1], wrong_sign.pk)
+        self.assertEqual(suggestions[-1].amount_score, Decimal('0.00'))
+
+    def test_counterparty_history_breaks_ties(self):
+        previous = self.create_session('December 2024')
+        for day in (5, 12, 19):
+            MatchedEntry.objects.create(
+                reconciliation_session=previous,
+                erp_entry=self.erp(day, '75.00', description='Globex utilities', session=previous),
+                bank_entry=self.bank(day, '75.00', description='DEWA bill payment', session=previous),
+            )
+        bank = self.bank(15, '-75.00', description='DEWA bill payment')
+        self.erp(15, '-75.00', description='Office supplies')
+        usual = self.erp(15, '-75.00', description='Globex utilities')
+
+        suggestions = SuggestionService(self.session).suggest_for('bank', bank.pk)
+
+        self.assertEqual(suggestions[0].erp_entry_id, usual.pk)
+        self.assertEqual(suggestions[0].history_score, Decimal('100.00'))
+        self.assertEqual(suggestions[1].history_score, Decimal('0.00'))
+
+    def test_refresh_stores_top_suggestions(self):
+        for day in range(1, 9):
+            self.erp(day, '100.00')
+        bank = self.bank(4, '100.00')
+        service = SuggestionService(self.session, top_k=3)
+        self.assertTrue(service.is_stale())
+
+        stored = service.refresh()
+
+        self.assertEqual(stored, 3 + 8)
+        self.assertEqual(
+            list(MatchSuggestion.objects.filter(entry_type='bank', bank_entry=bank).values_list('rank', flat=True)),
+            [1, 2, 3]
+        )
+        self.assertFalse(service.is_stale())
+        self.bank(5, '100.00')
+        self.assertTrue(service.is_stale())
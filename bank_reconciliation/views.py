@@ -14,12 +14,15 @@ import json
 import csv
 import io
 from datetime import datetime, timedelta, date
-from decimal import Decimal
 
 from .models import (
     BankReconciliationSession, ERPTransaction, BankStatementEntry, 
-    MatchedEntry, ReconciliationReport
+    MatchedEntry, ReconciliationReport, MatchSuggestion
 )
+from .matching import ReconciliationMatcher
+from .statement_import import StatementImporter
+from .suggestions import SuggestionService
+from .tasks import queue_suggestion_refresh
 from .forms import (
     BankReconciliationSessionForm, BankStatementImportForm, BankStatementEntryForm,
     ReconciliationFilterForm, ManualMatchForm, BulkMatchForm, ReconciliationReportForm
@@ -300,12 +303,22 @@ def import_bank_statement(request, session_pk):
         form = BankStatementImportForm(request.POST, request.FILES)
         if form.is_valid():
             try:
-                imported_count = process_bank_statement_import(
+                statement_import = process_bank_statement_import(
                     session, 
                     form.cleaned_data, 
-                    request.FILES['import_file']
+                    request.FILES['import_file'],
+                    user=request.user
                 )
-                messages.success(request, f'Successfully imported {imported_count} bank statement entries.')
+                messages.success(
+                    request,
+                    f'Imported {statement_import.new_lines} new bank statement entries. '
+                    f'{statement_import.duplicate_lines} duplicate lines skipped, '
+                    f'{statement_import.rejected_lines} lines rejected.'
+                )
+                for error in statement_import.errors[:5]:
+                    messages.warning(request, f"Line {error['line']}: {error['error']}")
+                if statement_import.new_lines:
+                    queue_suggestion_refresh(session.pk)
                 return redirect('bank_reconciliation:session_detail', pk=session.pk)
             except Exception as e:
                 messages.error(request, f'Import failed: {str(e)}')
@@ -322,62 +335,11 @@ def import_bank_statement(request, session_pk):
     return render(request, 'bank_reconciliation/import_form.html', context)
 
 
-def process_bank_statement_import(session, form_data, file):
-    """Process bank statement import"""
-    
-    import_format = form_data['import_format']
-    skip_first_row = form_data['skip_first_row']
-    date_format = form_data['date_format']
-    
-    # Column mappings
-    date_col = form_data['date_column']
-    desc_col = form_data['description_column']
-    ref_col = form_data['reference_column']
-    debit_col = form_data['debit_column']
-    credit_col = form_data['credit_column']
-    
-    imported_count = 0
+def process_bank_statement_import(session, form_data, file, user=None):
+    """Process bank statement import. Returns the StatementImport summary."""
     
-    if import_format == 'csv':
-        # Read CSV file
-        decoded_file = file.read().decode('utf-8')
-        csv_data = csv.DictReader(io.StringIO(decoded_file))
-        
-        for row in csv_data:
-            if skip_first_row and imported_count == 0:
-                continue
-            
-            try:
-                # Parse date
-                date_str = row.get(date_col, '').strip()
-                if not date_str:
-                    continue
-                
-                transaction_date = datetime.strptime(date_str, date_format).date()
-                
-                # Parse amounts
-                debit_amount = Decimal(row.get(debit_col, '0').replace(',', '')) or 0
-                credit_amount = Decimal(row.get(credit_col, '0').replace(',', '')) or 0
-                
-                # Create bank statement entry
-                BankStatementEntry.objects.create(
-                    reconciliation_session=session,
-                    transaction_date=transaction_date,
-                    description=row.get(desc_col, '').strip(),
-                    reference_number=row.get(ref_col, '').strip() or None,
-                    debit_amount=debit_amount,
-                    credit_amount=credit_amount,
-                    import_source='csv',
-                    import_reference=file.name
-                )
-                
-                imported_count += 1
-                
-            except (ValueError, KeyError) as e:
-                # Skip invalid rows
-                continue
-    
-    return imported_count
+    importer = StatementImporter(session, user=user)
+    return importer.run(file, form_data['import_format'], options=form_data)
 
 
 @login_required
@@ -470,13 +432,22 @@ def bulk_match(request, session_pk):
             date_tolerance = form.cleaned_data['date_tolerance']
             amount_tolerance = form.cleaned_data['amount_tolerance']
             auto_confirm = form.cleaned_data['auto_confirm_matches']
+            description_similarity = form.cleaned_data['description_similarity']
             
             # Perform bulk matching
-            matches_found = perform_bulk_matching(
-                session, criteria, date_tolerance, amount_tolerance, auto_confirm, request.user
-            )
+            try:
+                matches_found = perform_bulk_matching(
+                    session, criteria, date_tolerance, amount_tolerance, auto_confirm, request.user,
+                    description_similarity=description_similarity
+                )
+            except ValueError as e:
+                messages.error(request, str(e))
+                return redirect('bank_reconciliation:session_detail', pk=session.pk)
             
-            messages.success(request, f'Found {matches_found} potential matches.')
+            if auto_confirm:
+                messages.success(request, f'Matched {matches_found} entries automatically.')
+            else:
+                messages.success(request, f'Found {matches_found} potential matches.')
             return redirect('bank_reconciliation:session_detail', pk=session.pk)
     else:
         form = BulkMatchForm()
@@ -491,68 +462,25 @@ def bulk_match(request, session_pk):
     return render(request, 'bank_reconciliation/bulk_match_form.html', context)
 
 
-def perform_bulk_matching(session, criteria, date_tolerance, amount_tolerance, auto_confirm, user):
-    """Perform bulk matching based on criteria"""
-    
-    matches_found = 0
+def perform_bulk_matching(session, criteria, date_tolerance, amount_tolerance, auto_confirm, user,
+                          description_similarity=None):
+    """Perform bulk matching based on criteria. Returns the number of matches found (or made)."""
     
-    # Get unmatched entries
-    unmatched_erp = ERPTransaction.objects.filter(
-        reconciliation_session=session,
-        is_matched=False
+    matcher = ReconciliationMatcher(
+        session,
+        criteria=criteria,
+        date_tolerance=date_tolerance,
+        amount_tolerance=amount_tolerance,
+        description_similarity=description_similarity,
     )
     
-    unmatched_bank = BankStatementEntry.objects.filter(
-        reconciliation_session=session,
-        is_matched=False
-    )
+    if auto_confirm:
+        matches = matcher.apply(user=user)
+    else:
+        # Just count potential matches
+        matches = matcher.find_matches()
     
-    for erp_entry in unmatched_erp:
-        for bank_entry in unmatched_bank:
-            if is_match_candidate(erp_entry, bank_entry, criteria, date_tolerance, amount_tolerance):
-                if auto_confirm:
-                    # Auto-confirm match
-                    with transaction.atomic():
-                        erp_entry.match_with_bank_entry(bank_entry, "Auto-matched")
-                        
-                        MatchedEntry.objects.create(
-                            reconciliation_session=session,
-                            erp_entry=erp_entry,
-                            bank_entry=bank_entry,
-                            match_type='exact' if criteria == 'amount_date' else 'partial',
-                            notes="Auto-matched",
-                            created_by=user
-                        )
-                else:
-                    # Just count potential matches
-                    matches_found += 1
-    
-    return matches_found
-
-
-def is_match_candidate(erp_entry, bank_entry, criteria, date_tolerance, amount_tolerance):
-    """Check if two entries are potential matches"""
-    
-    # Check amount match
-    amount_diff = abs(erp_entry.amount - bank_entry.amount)
-    if amount_diff > amount_tolerance:
-        return False
-    
-    if criteria == 'amount_only':
-        return True
-    
-    # Check date match
-    if criteria in ['amount_date', 'reference']:
-        date_diff = abs((erp_entry.transaction_date - bank_entry.transaction_date).days)
-        if date_diff > date_tolerance:
-            return False
-    
-    # Check reference match
-    if criteria == 'reference':
-        if erp_entry.reference_number and bank_entry.reference_number:
-            return erp_entry.reference_number.lower() == bank_entry.reference_number.lower()
-    
-    return True
+    return len(matches)
 
 
 @login_required
@@ -803,35 +731,48 @@ def ajax_unmatch_entry(request, entry_type, entry_id):
 @login_required
 @csrf_exempt
 def ajax_get_matching_suggestions(request, session_pk):
-    """AJAX endpoint to get matching suggestions"""
+    """AJAX endpoint to get ranked matching suggestions, served from the precomputed table"""
     
     session = get_object_or_404(BankReconciliationSession, pk=session_pk)
     entry_id = request.GET.get('entry_id')
-    entry_type = request.GET.get('entry_type')
+    entry_type = 'erp' if request.GET.get('entry_type') == 'erp' else 'bank'
     
     if entry_type == 'erp':
-        entry = get_object_or_404(ERPTransaction, pk=entry_id)
-        suggestions = BankStatementEntry.objects.filter(
-            reconciliation_session=session,
-            is_matched=False,
-            amount=entry.amount
-        )[:5]
+        entry = get_object_or_404(ERPTransaction, pk=entry_id, reconciliation_session=session)
+        suggestions = MatchSuggestion.objects.filter(
+            reconciliation_session=session, entry_type='erp', erp_entry=entry, bank_entry__is_matched=False
+        ).select_related('bank_entry')
     else:
-        entry = get_object_or_404(BankStatementEntry, pk=entry_id)
-        suggestions = ERPTransaction.objects.filter(
-            reconciliation_session=session,
-            is_matched=False,
-            amount=entry.amount
-        )[:5]
+        entry = get_object_or_404(BankStatementEntry, pk=entry_id, reconciliation_session=session)
+        suggestions = MatchSuggestion.objects.filter(
+            reconciliation_session=session, entry_type='bank', bank_entry=entry, erp_entry__is_matched=False
+        ).select_related('erp_entry')
+    suggestions = list(suggestions.order_by('rank'))
+    
+    service = SuggestionService(session)
+    if not suggestions and service.is_stale():
+        # Not precomputed yet: answer this click directly and refresh the rest in the background
+        suggestions = service.suggest_for(entry_type, entry.pk)
+        queue_suggestion_refresh(session.pk)
     
     suggestions_data = []
     for suggestion in suggestions:
+        candidate = suggestion.bank_entry if entry_type == 'erp' else suggestion.erp_entry
         suggestions_data.append({
-            'id': suggestion.id,
-            'date': suggestion.transaction_date.strftime('%Y-%m-%d'),
-            'description': suggestion.description,
-            'reference': suggestion.reference_number or '',
-            'amount': float(suggestion.amount),
+            'id': candidate.id,
+            'date': candidate.transaction_date.strftime('%Y-%m-%d'),
+            'description': candidate.description,
+            'reference': candidate.reference_number or '',
+            'amount': float(candidate.amount),
+            'rank': suggestion.rank,
+            'score': float(suggestion.score),
+            'scores': {
+                'amount': float(suggestion.amount_score),
+                'date': float(suggestion.date_score),
+                'reference': float(suggestion.reference_score),
+                'narration': float(suggestion.narration_score),
+                'history': float(suggestion.history_score),
+            },
         })
     
     return JsonResponse({'suggestions': suggestions_data})
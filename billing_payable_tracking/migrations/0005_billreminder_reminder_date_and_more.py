@@ -0,0 +1,36 @@
+# Generated by Django 4.2.23 on 2026-10-18 21:54
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def backfill_reminder_date(apps, schema_editor):
+    BillReminder = apps.get_model('billing_payable_tracking', 'BillReminder')
+    reminders = list(BillReminder.objects.only('id', 'sent_date'))
+    for reminder in reminders:
+        reminder.reminder_date = django.utils.timezone.localdate(reminder.sent_date)
+    BillReminder.objects.bulk_update(reminders, ['reminder_date'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing_payable_tracking', '0004_bill_bill_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billreminder',
+            name='reminder_date',
+            field=models.DateField(default=django.utils.timezone.localdate, help_text='Day the reminder was sent for'),
+        ),
+        migrations.RunPython(backfill_reminder_date, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='billreminder',
+            index=models.Index(fields=['reminder_date'], name='billing_pay_reminde_54e1dc_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='billreminder',
+            constraint=models.UniqueConstraint(condition=models.Q(('sent_successfully', True)), fields=('bill', 'reminder_type', 'reminder_date'), name='unique_sent_bill_reminder_per_day'),
+        ),
+    ]
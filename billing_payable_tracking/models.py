@@ -245,12 +245,24 @@ class BillReminder(models.Model):
     bill = models.ForeignKey(Bill, on_delete=models.CASCADE, related_name='reminders')
     reminder_type = models.CharField(max_length=20, choices=REMINDER_TYPES)
     sent_date = models.DateTimeField(auto_now_add=True)
+    reminder_date = models.DateField(default=timezone.localdate, help_text="Day the reminder was sent for")
     recipient_email = models.EmailField()
     sent_successfully = models.BooleanField(default=False)
     error_message = models.TextField(blank=True, null=True)
     
     class Meta:
         ordering = ['-sent_date']
+        constraints = [
+            # A bill gets each kind of reminder at most once a day
+            models.UniqueConstraint(
+                fields=['bill', 'reminder_type', 'reminder_date'],
+                condition=models.Q(sent_successfully=True),
+                name='unique_sent_bill_reminder_per_day',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['reminder_date']),
+        ]
         
     def __str__(self):
         return f"{self.bill.bill_no} - {self.reminder_type} reminder"
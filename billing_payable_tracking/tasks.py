@@ -2,104 +2,42 @@ import logging
 from datetime import datetime, timedelta
 from celery import shared_task
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import send_mail, EmailMultiAlternatives
 from django.utils import timezone
+from django.utils.html import strip_tags
 from django.contrib.auth.models import User
 from django.template.loader import render_to_string
 from django.urls import reverse
 
+from email_configuration.mailer import ThrottledMailer
 from .models import Bill, Vendor, BillReminder
 
 logger = logging.getLogger(__name__)
 
+REMINDER_BILL_STATUSES = ['pending', 'overdue']
+UPCOMING_REMINDER_DAYS = 3
+OVERDUE_REMINDER_INTERVAL = 3
+REMINDER_EMAILS_PER_MINUTE = getattr(settings, 'BILL_REMINDER_EMAILS_PER_MINUTE', 30)
+DIGEST_SECTIONS = [
+    ('overdue', 'Overdue'),
+    ('due_today', 'Due Today'),
+    ('upcoming', 'Due Soon'),
+]
+
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=300)
 def send_bill_reminder_notifications(self):
     """
-    Send reminder notifications for bills that are due soon or overdue
-    This task should be scheduled to run daily
+    Send one reminder digest per recipient for bills that are due soon or overdue
+    This task should be scheduled to run daily; running it again the same day
+    only retries reminders that were not sent
     """
     try:
-        today = timezone.now().date()
-        
-        # Get bills that are due today or overdue
-        due_bills = Bill.objects.filter(
-            status__in=['pending', 'confirmed'],
-            due_date__lte=today
-        ).select_related('vendor', 'created_by')
-        
-        # Get bills due in the next 3 days (upcoming reminders)
-        upcoming_bills = Bill.objects.filter(
-            status__in=['pending', 'confirmed'],
-            due_date__gt=today,
-            due_date__lte=today + timedelta(days=3)
-        ).select_related('vendor', 'created_by')
-        
-        notifications_sent = 0
-        
-        # Process overdue and due today bills
-        for bill in due_bills:
-            days_overdue = (today - bill.due_date).days
-            
-            # Check if we should send a reminder based on frequency
-            should_send = False
-            
-            if days_overdue == 0:  # Due today
-                should_send = True
-                reminder_type = 'due_today'
-            elif days_overdue > 0:  # Overdue
-                # Send reminders every 3 days for overdue bills
-                if days_overdue % 3 == 0:
-                    should_send = True
-                reminder_type = 'overdue'
-            
-            if should_send:
-                # Check if we already sent a reminder today
-                existing_reminder = BillReminder.objects.filter(
-                    bill=bill,
-                    reminder_date=today,
-                    reminder_type=reminder_type
-                ).exists()
-                
-                if not existing_reminder:
-                    success = send_bill_reminder_email(bill, reminder_type, days_overdue)
-                    if success:
-                        # Create reminder record
-                        BillReminder.objects.create(
-                            bill=bill,
-                            reminder_type=reminder_type,
-                            reminder_date=today,
-                            sent_to=bill.created_by.email if bill.created_by else '',
-                            status='sent'
-                        )
-                        notifications_sent += 1
-        
-        # Process upcoming bills (3-day advance notice)
-        for bill in upcoming_bills:
-            days_until_due = (bill.due_date - today).days
-            
-            # Send 3-day advance notice
-            if days_until_due == 3:
-                existing_reminder = BillReminder.objects.filter(
-                    bill=bill,
-                    reminder_date=today,
-                    reminder_type='upcoming'
-                ).exists()
-                
-                if not existing_reminder:
-                    success = send_bill_reminder_email(bill, 'upcoming', days_until_due)
-                    if success:
-                        BillReminder.objects.create(
-                            bill=bill,
-                            reminder_type='upcoming',
-                            reminder_date=today,
-                            sent_to=bill.created_by.email if bill.created_by else '',
-                            status='sent'
-                        )
-                        notifications_sent += 1
-        
-        logger.info(f"Bill reminder notifications completed. Sent {notifications_sent} notifications.")
-        return f"Successfully sent {notifications_sent} bill reminder notifications"
+        summary = send_reminder_digests()
+        return (
+            f"Successfully sent {summary['digests_sent']} bill reminder digests "
+            f"covering {summary['reminders_sent']} reminders ({summary['digests_failed']} failed)"
+        )
         
     except Exception as e:
         logger.error(f"Error in send_bill_reminder_notifications: {str(e)}")
@@ -243,53 +181,103 @@ def cleanup_old_reminders(self):
         raise self.retry(exc=e)
 
 
-def send_bill_reminder_email(bill, reminder_type, days_info):
+def due_reminders(today):
     """
-    Helper function to send bill reminder email
+    Reminders due today, grouped per recipient email
+    Returns {email: (user, [(reminder_type, bill, days), ...])}
     """
-    try:
-        if not bill.created_by or not bill.created_by.email:
-            logger.warning(f"No email address for bill {bill.bill_no} creator")
-            return False
-        
-        # Determine subject and template based on reminder type
-        if reminder_type == 'overdue':
-            subject = f"OVERDUE: Bill {bill.bill_no} - {days_info} days overdue"
-            template = 'billing_payable_tracking/emails/overdue_reminder.html'
-        elif reminder_type == 'due_today':
-            subject = f"DUE TODAY: Bill {bill.bill_no} - Payment Required"
-            template = 'billing_payable_tracking/emails/due_today_reminder.html'
-        elif reminder_type == 'upcoming':
-            subject = f"UPCOMING: Bill {bill.bill_no} - Due in {days_info} days"
-            template = 'billing_payable_tracking/emails/upcoming_reminder.html'
+    bills = Bill.objects.filter(
+        status__in=REMINDER_BILL_STATUSES,
+        due_date__lte=today + timedelta(days=UPCOMING_REMINDER_DAYS),
+        created_by__email__gt='',
+    ).select_related('vendor', 'currency', 'created_by').order_by('due_date', 'bill_no')
+    
+    already_sent = set(BillReminder.objects.filter(
+        reminder_date=today,
+        sent_successfully=True,
+    ).values_list('bill_id', 'reminder_type'))
+    
+    recipients = {}
+    for bill in bills:
+        days_overdue = (today - bill.due_date).days
+        if days_overdue == 0:
+            reminder_type, days = 'due_today', 0
+        elif days_overdue > 0 and days_overdue % OVERDUE_REMINDER_INTERVAL == 0:
+            # Overdue bills are reminded every few days
+            reminder_type, days = 'overdue', days_overdue
+        elif days_overdue == -UPCOMING_REMINDER_DAYS:
+            reminder_type, days = 'upcoming', -days_overdue
         else:
-            logger.error(f"Unknown reminder type: {reminder_type}")
-            return False
+            continue
         
-        # Render email content
-        html_content = render_to_string(template, {
-            'bill': bill,
-            'user': bill.created_by,
-            'days_info': days_info,
-            'bill_url': f"{settings.SITE_URL}/accounting/billing-payable-tracking/bills/{bill.id}/",
-        })
+        if (bill.id, reminder_type) in already_sent:
+            continue
         
-        # Send email
-        send_mail(
-            subject=subject,
-            message='',  # Plain text version
-            html_message=html_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[bill.created_by.email],
-            fail_silently=False
-        )
-        
-        logger.info(f"Sent {reminder_type} reminder for bill {bill.bill_no} to {bill.created_by.email}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"Failed to send reminder email for bill {bill.bill_no}: {str(e)}")
-        return False
+        user = bill.created_by
+        recipients.setdefault(user.email, (user, []))[1].append((reminder_type, bill, days))
+    return recipients
+
+
+def build_reminder_digest(user, items, today):
+    """Subject and HTML body of one recipient's digest"""
+    sections = []
+    for reminder_type, title in DIGEST_SECTIONS:
+        section_items = [{'bill': bill, 'days': days} for kind, bill, days in items if kind == reminder_type]
+        if section_items:
+            sections.append({'reminder_type': reminder_type, 'title': title, 'items': section_items})
+    
+    counts = [f"{len(section['items'])} {section['title'].lower()}" for section in sections]
+    subject = f"Bill reminders for {today.strftime('%B %d, %Y')}: {', '.join(counts)}"
+    html_content = render_to_string('billing_payable_tracking/emails/reminder_digest.html', {
+        'user': user,
+        'sections': sections,
+        'bill_count': len(items),
+        'site_url': settings.SITE_URL,
+    })
+    return subject, html_content
+
+
+def send_reminder_digests(today=None):
+    """
+    Send each recipient one digest of their due reminders over a single
+    throttled mail connection, then record the reminders in bulk
+    """
+    today = today or timezone.now().date()
+    recipients = due_reminders(today)
+    from_email = getattr(settings, 'BILLING_NOTIFICATION_FROM_EMAIL', settings.DEFAULT_FROM_EMAIL)
+    
+    reminders = []
+    summary = {'digests_sent': 0, 'digests_failed': 0, 'reminders_sent': 0}
+    with ThrottledMailer(rate_per_minute=REMINDER_EMAILS_PER_MINUTE) as mailer:
+        for email, (user, items) in recipients.items():
+            subject, html_content = build_reminder_digest(user, items, today)
+            message = EmailMultiAlternatives(subject=subject, body=strip_tags(html_content), from_email=from_email, to=[email])
+            message.attach_alternative(html_content, 'text/html')
+            
+            sent, error = mailer.send(message)
+            summary['digests_sent' if sent else 'digests_failed'] += 1
+            if sent:
+                summary['reminders_sent'] += len(items)
+            reminders.extend(
+                BillReminder(
+                    bill=bill,
+                    reminder_type=reminder_type,
+                    reminder_date=today,
+                    recipient_email=email,
+                    sent_successfully=sent,
+                    error_message=error,
+                )
+                for reminder_type, bill, _ in items
+            )
+    
+    # A concurrent run may have recorded the same reminders; the unique constraint keeps one
+    BillReminder.objects.bulk_create(reminders, batch_size=1000, ignore_conflicts=True)
+    
+    logger.info(
+        f"Bill reminder digests for {today}: {summary['digests_sent']} sent, "
+        f"{summary['digests_failed']} failed, {summary['reminders_sent']} reminders"
+    )
+    return summary
 
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=300)
@@ -1,3 +1,79 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.test import TestCase, override_settings
+
+from .models import Bill, BillReminder, Vendor
+from .tasks import due_reminders, send_reminder_digests
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+@patch('billing_payable_tracking.tasks.REMINDER_EMAILS_PER_MINUTE', 0)
+class BillReminderDigestTest(TestCase):
+    def setUp(self):
+        self.today = date(2025, 3, 10)
+        self.user = User.objects.create_user(username='testuser', password='testpass123', email='ap@example.com')
+        self.other = User.objects.create_user(username='otheruser', password='testpass123', email='finance@example.com')
+        self.vendor = Vendor.objects.create(name='Test Vendor')
+
+    def create_bill(self, bill_no, days_until_due, status='pending', user=None):
+        return Bill.objects.create(
+            vendor=self.vendor, bill_no=bill_no, bill_date=self.today - timedelta(days=30),
+            due_date=self.today + timedelta(days=days_until_due), amount=Decimal('100.00'),
+            status=status, created_by=user or self.user
+        )
+
+    def test_due_reminders_grouped_per_recipient(self):
+        due_today = self.create_bill('B-1', 0)
+        upcoming = self.create_bill('B-2', 3)
+        overdue = self.create_bill('B-3', -6, status='overdue')
+        self.create_bill('B-4', -4, status='overdue')
+        self.create_bill('B-5', 2)
+        self.create_bill('B-6', 0, status='paid')
+        other_bill = self.create_bill('B-7', 0, user=self.other)
+        no_email = User.objects.create_user(username='noemail', password='testpass123')
+        self.create_bill('B-8', 0, user=no_email)
+
+        recipients = due_reminders(self.today)
+
+        self.assertEqual(set(recipients), {'ap@example.com', 'finance@example.com'})
+        self.assertEqual(
+            sorted((kind, bill.pk, days) for kind, bill, days in recipients['ap@example.com'][1]),
+            sorted([('due_today', due_today.pk, 0), ('upcoming', upcoming.pk, 3), ('overdue', overdue.pk, 6)])
+        )
+        self.assertEqual([bill.pk for _, bill, _ in recipients['finance@example.com'][1]], [other_bill.pk])
+
+    def test_one_digest_per_recipient_sent_once_a_day(self):
+        self.create_bill('B-1', 0)
+        self.create_bill('B-2', -3, status='overdue')
+        self.create_bill('B-3', 3, user=self.other)
+
+        summary = send_reminder_digests(self.today)
+
+        self.assertEqual(summary, {'digests_sent': 2, 'digests_failed': 0, 'reminders_sent': 3})
+        self.assertEqual(len(mail.outbox), 2)
+        digest = next(message for message in mail.outbox if message.to == ['ap@example.com'])
+        self.assertEqual(digest.subject, 'Bill reminders for March 10, 2025: 1 overdue, 1 due today')
+        self.assertEqual(BillReminder.objects.filter(sent_successfully=True).count(), 3)
+
+        summary = send_reminder_digests(self.today)
+        self.assertEqual(summary['digests_sent'], 0)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_failed_digest_is_retried(self):
+        self.create_bill('B-1', 0)
+
+        with patch('billing_payable_tracking.tasks.ThrottledMailer.send', return_value=(False, 'Connection refused')):
+            summary = send_reminder_digests(self.today)
+
+        self.assertEqual((summary['digests_sent'], summary['digests_failed']), (0, 1))
+        reminder = BillReminder.objects.get()
+        self.assertFalse(reminder.sent_successfully)
+        self.assertEqual(reminder.error_message, 'Connection refused')
+
+        summary = send_reminder_digests(self.today)
+        self.assertEqual(summary['digests_sent'], 1)
+        self.assertEqual(len(mail.outbox), 1)
@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.contenttypes.fields import GenericRelation
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from job.models import Job, JobCargo
@@ -297,6 +298,9 @@ class CrossStuffing(models.Model):
     created_at = models.DateTimeField(default=timezone.now, verbose_name="Created At")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
     
+    # Queued emails and their delivery status
+    document_emails = GenericRelation('email_configuration.DocumentEmail')
+    
     class Meta:
         verbose_name = "Cross Stuffing"
         verbose_name_plural = "Cross Stuffings"
@@ -7,7 +7,6 @@ from django.db.models import Q, Sum
 from django.urls import reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
 from django.template.loader import render_to_string
-from django.core.mail import EmailMessage
 from django.conf import settings
 import json
 import weasyprint
@@ -18,6 +17,7 @@ from .forms import CrossStuffingForm
 from job.models import Job, JobCargo
 from customer.models import Customer
 from company.company_model import Company
+from email_configuration.documents import document_part, queue_document_email
 
 
 @login_required
@@ -253,6 +253,7 @@ def crossstuffing_detail(request, pk):
     
     context = {
         'crossstuffing': crossstuffing,
+        'document_emails': crossstuffing.document_emails.select_related('created_by')[:10],
     }
     
     return render(request, 'crossstuffing/crossstuffing_detail.html', context)
@@ -542,149 +543,61 @@ def crossstuffing_print_cs_summary(request, pk):
 
 
 # Email Views
-@login_required
-def crossstuffing_email_invoice(request, pk):
-    """Email invoice as PDF attachment"""
+def _queue_document_email(request, pk, kind, template, title, description, filename):
+    """Queue a cross stuffing document for the customer; the PDF is rendered and sent in the background"""
     try:
         crossstuffing = get_object_or_404(CrossStuffing, pk=pk)
         company = Company.objects.filter(is_active=True).first()
         
-        # Generate PDF
-        html = render_to_string('crossstuffing/print/invoice.html', {
+        html = render_to_string(template, {
             'crossstuffing': crossstuffing,
             'company': company,
             'cargo_items': crossstuffing.cargo_items.all(),
             'summary_items': crossstuffing.summary_items.all()
         })
-        pdf = weasyprint.HTML(string=html).write_pdf()
         
-        # Create email
-        subject = f'Invoice - {crossstuffing.cs_number}'
-        message = f'Please find attached the invoice for cross stuffing {crossstuffing.cs_number}.'
-        
-        email = EmailMessage(
-            subject=subject,
-            body=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[crossstuffing.customer.email] if crossstuffing.customer and crossstuffing.customer.email else [settings.DEFAULT_FROM_EMAIL]
+        queue_document_email(
+            crossstuffing,
+            subject=f'{title} - {crossstuffing.cs_number}',
+            body=f'Please find attached the {description} for cross stuffing {crossstuffing.cs_number}.',
+            to=[crossstuffing.customer.email] if crossstuffing.customer and crossstuffing.customer.email else [settings.DEFAULT_FROM_EMAIL],
+            attachments=[(f'{filename}_{crossstuffing.cs_number}.pdf', [document_part(crossstuffing, kind, html)])],
+            user=request.user,
         )
         
-        email.attach(f'Invoice_{crossstuffing.cs_number}.pdf', pdf, 'application/pdf')
-        email.send()
-        
-        messages.success(request, f'Invoice for {crossstuffing.cs_number} has been sent via email.')
-        return redirect('crossstuffing:crossstuffing_detail', pk=pk)
+        messages.success(request, f'{title} for {crossstuffing.cs_number} has been queued for email.')
     except Exception as e:
         messages.error(request, f'Error sending email: {str(e)}')
-        return redirect('crossstuffing:crossstuffing_detail', pk=pk)
+    return redirect('crossstuffing:crossstuffing_detail', pk=pk)
+
+
+@login_required
+def crossstuffing_email_invoice(request, pk):
+    """Email invoice as PDF attachment"""
+    return _queue_document_email(
+        request, pk, 'invoice', 'crossstuffing/print/invoice.html', 'Invoice', 'invoice', 'Invoice'
+    )
 
 
 @login_required
 def crossstuffing_email_packing_list(request, pk):
     """Email packing list as PDF attachment"""
-    try:
-        crossstuffing = get_object_or_404(CrossStuffing, pk=pk)
-        company = Company.objects.filter(is_active=True).first()
-        
-        # Generate PDF
-        html = render_to_string('crossstuffing/print/packing_list.html', {
-            'crossstuffing': crossstuffing,
-            'company': company,
-            'cargo_items': crossstuffing.cargo_items.all(),
-            'summary_items': crossstuffing.summary_items.all()
-        })
-        pdf = weasyprint.HTML(string=html).write_pdf()
-        
-        # Create email
-        subject = f'Packing List - {crossstuffing.cs_number}'
-        message = f'Please find attached the packing list for cross stuffing {crossstuffing.cs_number}.'
-        
-        email = EmailMessage(
-            subject=subject,
-            body=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[crossstuffing.customer.email] if crossstuffing.customer and crossstuffing.customer.email else [settings.DEFAULT_FROM_EMAIL]
-        )
-        
-        email.attach(f'PackingList_{crossstuffing.cs_number}.pdf', pdf, 'application/pdf')
-        email.send()
-        
-        messages.success(request, f'Packing list for {crossstuffing.cs_number} has been sent via email.')
-        return redirect('crossstuffing:crossstuffing_detail', pk=pk)
-    except Exception as e:
-        messages.error(request, f'Error sending email: {str(e)}')
-        return redirect('crossstuffing:crossstuffing_detail', pk=pk)
+    return _queue_document_email(
+        request, pk, 'packing_list', 'crossstuffing/print/packing_list.html', 'Packing List', 'packing list', 'PackingList'
+    )
 
 
 @login_required
 def crossstuffing_email_da(request, pk):
     """Email DA (Delivery Authorization) as PDF attachment"""
-    try:
-        crossstuffing = get_object_or_404(CrossStuffing, pk=pk)
-        company = Company.objects.filter(is_active=True).first()
-        
-        # Generate PDF
-        html = render_to_string('crossstuffing/print/da.html', {
-            'crossstuffing': crossstuffing,
-            'company': company,
-            'cargo_items': crossstuffing.cargo_items.all(),
-            'summary_items': crossstuffing.summary_items.all()
-        })
-        pdf = weasyprint.HTML(string=html).write_pdf()
-        
-        # Create email
-        subject = f'Delivery Authorization - {crossstuffing.cs_number}'
-        message = f'Please find attached the delivery authorization for cross stuffing {crossstuffing.cs_number}.'
-        
-        email = EmailMessage(
-            subject=subject,
-            body=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[crossstuffing.customer.email] if crossstuffing.customer and crossstuffing.customer.email else [settings.DEFAULT_FROM_EMAIL]
-        )
-        
-        email.attach(f'DA_{crossstuffing.cs_number}.pdf', pdf, 'application/pdf')
-        email.send()
-        
-        messages.success(request, f'Delivery Authorization for {crossstuffing.cs_number} has been sent via email.')
-        return redirect('crossstuffing:crossstuffing_detail', pk=pk)
-    except Exception as e:
-        messages.error(request, f'Error sending email: {str(e)}')
-        return redirect('crossstuffing:crossstuffing_detail', pk=pk)
+    return _queue_document_email(
+        request, pk, 'da', 'crossstuffing/print/da.html', 'Delivery Authorization', 'delivery authorization', 'DA'
+    )
 
 
 @login_required
 def crossstuffing_email_cs_summary(request, pk):
     """Email CS Summary as PDF attachment"""
-    try:
-        crossstuffing = get_object_or_404(CrossStuffing, pk=pk)
-        company = Company.objects.filter(is_active=True).first()
-        
-        # Generate PDF
-        html = render_to_string('crossstuffing/print/cs_summary.html', {
-            'crossstuffing': crossstuffing,
-            'company': company,
-            'cargo_items': crossstuffing.cargo_items.all(),
-            'summary_items': crossstuffing.summary_items.all()
-        })
-        pdf = weasyprint.HTML(string=html).write_pdf()
-        
-        # Create email
-        subject = f'CS Summary - {crossstuffing.cs_number}'
-        message = f'Please find attached the CS Summary for cross stuffing {crossstuffing.cs_number}.'
-        
-        email = EmailMessage(
-            subject=subject,
-            body=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[crossstuffing.customer.email] if crossstuffing.customer and crossstuffing.customer.email else [settings.DEFAULT_FROM_EMAIL]
-        )
-        
-        email.attach(f'CS_Summary_{crossstuffing.cs_number}.pdf', pdf, 'application/pdf')
-        email.send()
-        
-        messages.success(request, f'CS Summary for {crossstuffing.cs_number} has been sent via email.')
-        return redirect('crossstuffing:crossstuffing_detail', pk=pk)
-    except Exception as e:
-        messages.error(request, f'Error sending email: {str(e)}')
-        return redirect('crossstuffing:crossstuffing_detail', pk=pk) 
\ No newline at end of file
+    return _queue_document_email(
+        request, pk, 'cs_summary', 'crossstuffing/print/cs_summary.html', 'CS Summary', 'CS Summary', 'CS_Summary'
+    )
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Customer, CustomerType
+from .models import Customer, CustomerType, CustomerCreditExposure
 
 @admin.register(CustomerType)
 class CustomerTypeAdmin(admin.ModelAdmin):
@@ -24,7 +24,7 @@ class CustomerAdmin(admin.ModelAdmin):
             'fields': ('billing_address', 'billing_city', 'billing_state', 'billing_country', 'billing_postal_code', 'shipping_address', 'shipping_city', 'shipping_state', 'shipping_country', 'shipping_postal_code')
         }),
         ('Financial', {
-            'fields': ('credit_limit', 'payment_terms', 'currency', 'tax_exempt', 'tax_rate', 'discount_percentage')
+            'fields': ('credit_limit', 'credit_check_mode', 'payment_terms', 'currency', 'tax_exempt', 'tax_rate', 'discount_percentage')
         }),
         ('Customer Portal', {
             'fields': ('portal_username', 'portal_password', 'portal_active', 'portal_last_login')
@@ -45,3 +45,12 @@ class CustomerAdmin(admin.ModelAdmin):
         else:  # Updating existing customer
             obj.updated_by = request.user
         super().save_model(request, obj, form, change)
+
+@admin.register(CustomerCreditExposure)
+class CustomerCreditExposureAdmin(admin.ModelAdmin):
+    list_display = ['customer', 'outstanding_balance', 'updated_at']
+    search_fields = ['customer__customer_code', 'customer__customer_name']
+    readonly_fields = ['customer', 'outstanding_balance', 'updated_at']
+    
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,204 @@
+"""
+Customer credit exposure.
+
+CustomerCreditExposure.outstanding_balance holds what a customer owes on
+issued invoices (every status except draft and cancelled) less what has been
+received or discounted against them. It is changed only through F()
+expression deltas applied by the invoice and payment allocation signals, so
+a credit check is a single primary-key read instead of summing invoices and
+payments each time.
+
+Bulk queryset operations skip the signals, so find_drift / fix_drift compare
+the stored balances with a full recomputation and repair them.
+"""
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, When, DecimalField, F, Q, Sum
+from django.utils import timezone
+
+from .models import Customer, CustomerCreditExposure
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+# Invoices that do not count towards a customer's exposure
+EXCLUDED_INVOICE_STATUSES = ('draft', 'cancelled')
+DEFAULT_CHECK_MODE = getattr(settings, 'CUSTOMER_CREDIT_CHECK_MODE', 'warn')
+
+
+def counts_towards_exposure(invoice_status):
+    return invoice_status not in EXCLUDED_INVOICE_STATUSES
+
+
+def invoice_total(invoice_items):
+    """Sale total of invoice items, as Invoice.total_sale computes it"""
+    Invoice = apps.get_model('invoice', 'Invoice')
+    return Invoice(invoice_items=invoice_items).total_sale
+
+
+def invoice_settled(invoice_id):
+    """Amount received plus discounts allocated to an invoice"""
+    CustomerPaymentInvoice = apps.get_model('customer_payments', 'CustomerPaymentInvoice')
+    return CustomerPaymentInvoice.objects.filter(invoice_id=invoice_id).aggregate(
+        total=Sum(F('amount_received') + F('discount_amount'))
+    )['total'] or ZERO
+
+
+def apply_exposure_delta(customer_id, delta, create=True):
+    """Add delta to a customer's stored exposure, creating the row on first use.
+
+    Delete handlers pass create=False: the row may be going away with its customer.
+    """
+    if not customer_id or not delta:
+        return
+    with transaction.atomic():
+        updated = CustomerCreditExposure.objects.filter(customer_id=customer_id).update(
+            outstanding_balance=F('outstanding_balance') + delta,
+            updated_at=timezone.now(),
+        )
+        if not updated and create:
+            exposure, created = CustomerCreditExposure.objects.get_or_create(
+                customer_id=customer_id,
+                defaults={'outstanding_balance': delta},
+            )
+            if not created:
+                # Another transaction created the row in the meantime
+                CustomerCreditExposure.objects.filter(customer_id=customer_id).update(
+                    outstanding_balance=F('outstanding_balance') + delta,
+                    updated_at=timezone.now(),
+                )
+
+
+def get_exposure(customer_id):
+    return CustomerCreditExposure.objects.filter(customer_id=customer_id).values_list(
+        'outstanding_balance', flat=True
+    ).first() or ZERO
+
+
+@dataclass
+class CreditCheck:
+    customer: Customer
+    mode: str
+    credit_limit: Decimal
+    exposure: Decimal
+    amount: Decimal
+
+    @property
+    def projected(self):
+        return self.exposure + self.amount
+
+    @property
+    def available(self):
+        return self.credit_limit - self.exposure
+
+    @property
+    def exceeded(self):
+        # A limit of zero means no limit has been set
+        return self.credit_limit > 0 and self.projected > self.credit_limit
+
+    @property
+    def allowed(self):
+        return not (self.exceeded and self.mode == 'block')
+
+    @property
+    def message(self):
+        return (
+            f'{self.customer.customer_name} is over the credit limit: outstanding '
+            f'{self.customer.currency} {self.exposure:,.2f}'
+            + (f' + {self.amount:,.2f} new' if self.amount else '')
+            + f' against a limit of {self.credit_limit:,.2f}.'
+        )
+
+
+def check_credit(customer, amount=ZERO):
+    """Check whether new business of the given amount fits the customer's credit limit"""
+    mode = customer.credit_check_mode or DEFAULT_CHECK_MODE
+    exposure = ZERO if mode == 'off' else get_exposure(customer.pk)
+    return CreditCheck(
+        customer=customer,
+        mode=mode,
+        credit_limit=Decimal(customer.credit_limit or 0),
+        exposure=exposure,
+        amount=Decimal(amount or 0),
+    )
+
+
+def enforce_credit_limit(request, customer, amount=ZERO):
+    """Run the credit check for a view; adds a message and returns False when the action is blocked"""
+    from django.contrib import messages
+
+    if customer is None:
+        return True
+    result = check_credit(customer, amount)
+    if not result.exceeded or result.mode == 'off':
+        return True
+    if result.allowed:
+        messages.warning(request, result.message)
+        return True
+    messages.error(request, f'{result.message} Blocked by the credit control settings.')
+    return False
+
+
+def utilization_report(queryset=None):
+    """Exposure rows annotated with limit, available credit and utilization %, most utilized first"""
+    queryset = CustomerCreditExposure.objects.all() if queryset is None else queryset
+    amount = DecimalField(max_digits=15, decimal_places=2)
+    has_limit = Q(customer__credit_limit__gt=0)
+    return queryset.select_related('customer').annotate(
+        credit_limit=F('customer__credit_limit'),
+        available=Case(
+            When(has_limit, then=F('customer__credit_limit') - F('outstanding_balance')),
+            output_field=amount,
+        ),
+        utilization=Case(
+            When(has_limit, then=F('outstanding_balance') * 100 / F('customer__credit_limit')),
+            output_field=amount,
+        ),
+    ).order_by(F('utilization').desc(nulls_last=True), '-outstanding_balance')
+
+
+def expected_exposures():
+    """Exposure per customer id recomputed from all invoices and allocations"""
+    Invoice = apps.get_model('invoice', 'Invoice')
+    CustomerPaymentInvoice = apps.get_model('customer_payments', 'CustomerPaymentInvoice')
+    expected = defaultdict(lambda: ZERO)
+    invoices = Invoice.objects.exclude(status__in=EXCLUDED_INVOICE_STATUSES).only('id', 'customer_id', 'invoice_items')
+    for invoice in invoices.iterator(chunk_size=2000):
+        expected[invoice.customer_id] += invoice.total_sale
+    settled = CustomerPaymentInvoice.objects.exclude(
+        invoice__status__in=EXCLUDED_INVOICE_STATUSES
+    ).order_by().values('invoice__customer_id').annotate(
+        total=Sum(F('amount_received') + F('discount_amount'))
+    ).values_list('invoice__customer_id', 'total')
+    for customer_id, total in settled:
+        expected[customer_id] -= total or ZERO
+    return expected
+
+
+def find_drift():
+    """Return (customer_id, stored, expected) for every customer whose stored exposure is wrong"""
+    expected = expected_exposures()
+    stored = dict(CustomerCreditExposure.objects.values_list('customer_id', 'outstanding_balance'))
+    return [
+        (customer_id, stored.get(customer_id, ZERO), expected.get(customer_id, ZERO))
+        for customer_id in sorted(set(expected) | set(stored))
+        if stored.get(customer_id, ZERO) != expected.get(customer_id, ZERO)
+    ]
+
+
+def fix_drift():
+    """Bring drifted exposures back to their recomputed value. Returns the drift rows fixed."""
+    drift = find_drift()
+    with transaction.atomic():
+        for customer_id, stored, expected in drift:
+            # Applied as a delta so postings made since the check are kept
+            apply_exposure_delta(customer_id, expected - stored)
+    if drift:
+        logger.info(f'Fixed credit exposure drift on {len(drift)} customers')
+    return drift
@@ -38,6 +38,7 @@ class CustomerForm(forms.ModelForm):
             
             # Financial
             'credit_limit': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'placeholder': 'Enter credit limit'}),
+            'credit_check_mode': forms.Select(attrs={'class': 'form-select'}),
             'payment_terms': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter payment terms'}),
             'currency': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter currency code'}),
             'tax_exempt': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
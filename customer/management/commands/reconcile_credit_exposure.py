@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from customer.credit import find_drift, fix_drift
+from customer.models import Customer
+
+
+class Command(BaseCommand):
+    help = 'Report (and optionally fix) customer credit exposures that drifted from their invoices and payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Reset drifted exposures to issued invoice totals minus amounts received (also initializes them)'
+        )
+
+    def handle(self, *args, **options):
+        drift = fix_drift() if options['fix'] else find_drift()
+        
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('All customer credit exposures match their invoices and payments'))
+            return
+        
+        names = dict(Customer.objects.filter(pk__in=[row[0] for row in drift]).values_list('pk', 'customer_name'))
+        for customer_id, stored, expected in drift:
+            self.stdout.write(
+                f'{names.get(customer_id, customer_id)}: stored {stored:,.2f}, expected {expected:,.2f} '
+                f'(drift {stored - expected:,.2f})'
+            )
+        
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(drift)} customer credit exposures'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} customer credit exposures drifted; run with --fix to repair'))
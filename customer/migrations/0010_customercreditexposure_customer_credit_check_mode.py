@@ -0,0 +1,31 @@
+# Generated by Django 4.2.23 on 2026-10-18 21:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0009_fix_null_customer_codes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerCreditExposure',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='credit_exposure', serialize=False, to='customer.customer')),
+                ('outstanding_balance', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Customer Credit Exposure',
+                'verbose_name_plural': 'Customer Credit Exposures',
+            },
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='credit_check_mode',
+            field=models.CharField(blank=True, choices=[('', 'System Default'), ('off', 'Off'), ('warn', 'Warn'), ('block', 'Block')], help_text='What happens when new business would take the customer over the credit limit', max_length=10),
+        ),
+    ]
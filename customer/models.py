@@ -45,7 +45,20 @@ class Customer(models.Model):
     shipping_postal_code = models.CharField(max_length=20, blank=True)
     
     # Financial
+    CREDIT_CHECK_CHOICES = [
+        ('', 'System Default'),
+        ('off', 'Off'),
+        ('warn', 'Warn'),
+        ('block', 'Block'),
+    ]
+    
     credit_limit = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    credit_check_mode = models.CharField(
+        max_length=10,
+        choices=CREDIT_CHECK_CHOICES,
+        blank=True,
+        help_text="What happens when new business would take the customer over the credit limit"
+    )
     payment_terms = models.CharField(max_length=100, blank=True)
     currency = models.CharField(max_length=3, default='AED')
     tax_exempt = models.BooleanField(default=False)
@@ -125,3 +138,17 @@ class Customer(models.Model):
     def get_customer_types_display(self):
         """Get comma-separated list of customer types"""
         return ", ".join([ct.name for ct in self.customer_types.all()])
+
+
+class CustomerCreditExposure(models.Model):
+    """Outstanding receivable per customer, maintained incrementally (see customer.credit)"""
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name='credit_exposure')
+    outstanding_balance = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Customer Credit Exposure'
+        verbose_name_plural = 'Customer Credit Exposures'
+    
+    def __str__(self):
+        return f"{self.customer.customer_name} - {self.outstanding_balance}"
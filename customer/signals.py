@@ -0,0 +1,108 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .credit import (
+    ZERO, apply_exposure_delta, counts_towards_exposure, invoice_settled, invoice_total
+)
+
+# Deleting the customer deletes its exposure row along with its invoices and payments
+CUSTOMER_LABEL = 'customer.customer'
+
+
+def _origin_label(origin):
+    if origin is None:
+        return None
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model._meta.label_lower
+
+
+@receiver(pre_save, sender='invoice.Invoice')
+def remember_invoice_exposure(sender, instance, **kwargs):
+    """Keep the stored state of an invoice so post_save can apply the difference"""
+    instance._credit_previous = None
+    if instance.pk:
+        instance._credit_previous = sender.objects.filter(pk=instance.pk).values(
+            'customer_id', 'status', 'invoice_items'
+        ).first()
+
+
+@receiver(post_save, sender='invoice.Invoice')
+def update_exposure_on_invoice_save(sender, instance, created, **kwargs):
+    """Apply the change in what the invoice adds to its customer's exposure"""
+    previous = getattr(instance, '_credit_previous', None)
+    instance._credit_previous = None
+    
+    new = (instance.customer_id, instance.total_sale) if counts_towards_exposure(instance.status) else None
+    old = None
+    if previous and counts_towards_exposure(previous['status']):
+        old = (previous['customer_id'], invoice_total(previous['invoice_items']))
+    
+    if old and new and old[0] == new[0]:
+        # Payments received are unaffected, only the invoice total can have changed
+        apply_exposure_delta(new[0], new[1] - old[1])
+        return
+    if not old and not new:
+        return
+    
+    # The invoice was issued, cancelled or moved to another customer: move its open amount
+    settled = ZERO if created else invoice_settled(instance.pk)
+    if old:
+        apply_exposure_delta(old[0], settled - old[1])
+    if new:
+        apply_exposure_delta(new[0], new[1] - settled)
+
+
+@receiver(post_delete, sender='invoice.Invoice')
+def update_exposure_on_invoice_delete(sender, instance, origin=None, **kwargs):
+    if _origin_label(origin) == CUSTOMER_LABEL:
+        return
+    # Allocations are deleted first by the cascade and have already given back what they settled
+    if counts_towards_exposure(instance.status):
+        apply_exposure_delta(instance.customer_id, -instance.total_sale, create=False)
+
+
+def _allocation_effect(invoice_id, amount):
+    """(customer_id, amount) a payment allocation takes off exposure"""
+    from invoice.models import Invoice
+    invoice = Invoice.objects.filter(pk=invoice_id).values('customer_id', 'status').first()
+    if not invoice or not counts_towards_exposure(invoice['status']):
+        return None, ZERO
+    return invoice['customer_id'], amount
+
+
+@receiver(pre_save, sender='customer_payments.CustomerPaymentInvoice')
+def remember_allocation_exposure(sender, instance, **kwargs):
+    instance._credit_previous = None
+    if instance.pk:
+        instance._credit_previous = sender.objects.filter(pk=instance.pk).values(
+            'invoice_id', 'amount_received', 'discount_amount'
+        ).first()
+
+
+@receiver(post_save, sender='customer_payments.CustomerPaymentInvoice')
+def update_exposure_on_allocation_save(sender, instance, **kwargs):
+    """Payments received against an invoice reduce the customer's exposure"""
+    previous = getattr(instance, '_credit_previous', None)
+    instance._credit_previous = None
+    
+    if previous:
+        customer_id, amount = _allocation_effect(
+            previous['invoice_id'], previous['amount_received'] + previous['discount_amount']
+        )
+        apply_exposure_delta(customer_id, amount)
+    
+    customer_id, amount = _allocation_effect(
+        instance.invoice_id, (instance.amount_received or ZERO) + (instance.discount_amount or ZERO)
+    )
+    apply_exposure_delta(customer_id, -amount)
+
+
+@receiver(post_delete, sender='customer_payments.CustomerPaymentInvoice')
+def update_exposure_on_allocation_delete(sender, instance, origin=None, **kwargs):
+    if _origin_label(origin) == CUSTOMER_LABEL:
+        return
+    customer_id, amount = _allocation_effect(
+        instance.invoice_id, (instance.amount_received or ZERO) + (instance.discount_amount or ZERO)
+    )
+    apply_exposure_delta(customer_id, amount, create=False)
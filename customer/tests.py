@@ -0,0 +1,101 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from customer_payments.models import CustomerPayment, CustomerPaymentInvoice
+from invoice.models import Invoice
+from .credit import check_credit, find_drift, get_exposure
+from .models import Customer, CustomerCreditExposure
+
+
+def invoice_items(*totals):
+    return [{'sale_total': str(total)} for total in totals]
+
+
+class CustomerCreditExposureTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.customer = Customer.objects.create(
+            customer_code='CUST001',
+            customer_name='Test Customer',
+            credit_limit=Decimal('1000.00')
+        )
+
+    def create_invoice(self, status='sent', totals=(100,), customer=None):
+        return Invoice.objects.create(
+            invoice_date=date(2025, 1, 15),
+            customer=customer or self.customer,
+            status=status,
+            invoice_items=invoice_items(*totals),
+            created_by=self.user
+        )
+
+    def test_exposure_follows_invoice_create_edit_and_delete(self):
+        """Issued invoices add their total, edits move it by the difference, deletes take it back"""
+        draft = self.create_invoice(status='draft', totals=(500,))
+        self.assertEqual(get_exposure(self.customer.pk), Decimal('0.00'))
+
+        invoice = self.create_invoice(totals=(100, 50))
+        self.assertEqual(get_exposure(self.customer.pk), Decimal('150.00'))
+
+        invoice.invoice_items = invoice_items(100, 80)
+        invoice.save()
+        self.assertEqual(get_exposure(self.customer.pk), Decimal('180.00'))
+
+        draft.status = 'sent'
+        draft.save()
+        self.assertEqual(get_exposure(self.customer.pk), Decimal('680.00'))
+
+        invoice.status = 'cancelled'
+        invoice.save()
+        self.assertEqual(get_exposure(self.customer.pk), Decimal('500.00'))
+
+        draft.delete()
+        self.assertEqual(get_exposure(self.customer.pk), Decimal('0.00'))
+        self.assertEqual(find_drift(), [])
+
+    def test_payments_reduce_exposure(self):
+        invoice = self.create_invoice(totals=(400,))
+        payment = CustomerPayment.objects.create(
+            customer=self.customer, payment_date=date(2025, 1, 20), amount=Decimal('150.00')
+        )
+        allocation = CustomerPaymentInvoice.objects.create(
+            payment=payment, invoice=invoice, amount_received=Decimal('150.00')
+        )
+        self.assertEqual(get_exposure(self.customer.pk), Decimal('250.00'))
+
+        allocation.delete()
+        self.assertEqual(get_exposure(self.customer.pk), Decimal('400.00'))
+        self.assertEqual(find_drift(), [])
+
+    def test_credit_check_includes_new_amount(self):
+        self.create_invoice(totals=(900,))
+        result = check_credit(self.customer, Decimal('200.00'))
+        self.assertTrue(result.exceeded)
+        self.assertFalse(check_credit(self.customer, Decimal('50.00')).exceeded)
+
+    def test_delete_customer_with_invoices(self):
+        """Deleting a customer cascades through its invoices without recreating its exposure row"""
+        invoice = self.create_invoice(totals=(300,))
+        payment = CustomerPayment.objects.create(
+            customer=self.customer, payment_date=date(2025, 1, 20), amount=Decimal('100.00')
+        )
+        CustomerPaymentInvoice.objects.create(payment=payment, invoice=invoice, amount_received=Decimal('100.00'))
+        other = Customer.objects.create(customer_code='CUST002', customer_name='Other Customer')
+        self.create_invoice(totals=(75,), customer=other)
+
+        self.customer.delete()
+
+        self.assertFalse(Invoice.objects.filter(customer_id=invoice.customer_id).exists())
+        self.assertFalse(CustomerCreditExposure.objects.filter(customer_id=invoice.customer_id).exists())
+        self.assertEqual(get_exposure(other.pk), Decimal('75.00'))
+
+    def test_delete_handler_does_not_create_exposure_rows(self):
+        invoice = self.create_invoice(totals=(120,))
+        CustomerCreditExposure.objects.filter(customer=self.customer).delete()
+
+        invoice.delete()
+
+        self.assertFalse(CustomerCreditExposure.objects.filter(customer=self.customer).exists())
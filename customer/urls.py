@@ -12,4 +12,5 @@ urlpatterns = [
     path('<int:pk>/generate-portal-credentials/', views.generate_portal_credentials, name='generate_portal_credentials'),
     path('<int:pk>/toggle-portal-status/', views.toggle_portal_status, name='toggle_portal_status'),
     path('api/<int:pk>/address/', views.get_customer_address, name='get_customer_address'),
+    path('credit-utilization/', views.credit_utilization, name='credit_utilization'),
 ] 
\ No newline at end of file
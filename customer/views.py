@@ -9,6 +9,7 @@ from django.contrib.auth.models import User
 from django.db import models
 from .models import Customer
 from .forms import CustomerForm, CustomerSearchForm
+from .credit import check_credit, utilization_report
 
 @login_required
 def customer_list(request):
@@ -127,6 +128,7 @@ def customer_detail(request, pk):
     
     context = {
         'customer': customer,
+        'credit': check_credit(customer),
     }
     return render(request, 'customer/customer_detail.html', context)
 
@@ -227,3 +229,27 @@ def get_customer_address(request, pk):
         'address': address,
         'customer_name': customer.customer_name
     })
+
+@login_required
+def credit_utilization(request):
+    """Credit utilization per customer, read from the maintained exposure table"""
+    rows = utilization_report()
+    
+    search = request.GET.get('search', '')
+    if search:
+        rows = rows.filter(
+            Q(customer__customer_code__icontains=search) |
+            Q(customer__customer_name__icontains=search)
+        )
+    if request.GET.get('over_limit'):
+        rows = rows.filter(utilization__gt=100)
+    
+    paginator = Paginator(rows, 50)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    context = {
+        'page_obj': page_obj,
+        'search': search,
+        'over_limit': request.GET.get('over_limit', ''),
+    }
+    return render(request, 'customer/credit_utilization.html', context)
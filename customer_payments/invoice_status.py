@@ -0,0 +1,120 @@
+"""
+Set-based invoice payment status recomputation.
+
+Statuses for a set of invoices are derived from one grouped aggregate over
+their payment allocations and written back with one UPDATE per target status,
+instead of summing allocations in Python and saving each invoice.
+
+Signals don't recompute straight away: they add the affected invoice ids to
+a pending set held in a context variable (so it is private to the current
+request/thread) and the set is flushed once, after the surrounding
+transaction commits. Ids left behind by a rolled back transaction are
+refreshed with the next flush; recomputing a status that did not change
+writes nothing.
+"""
+import logging
+from collections import defaultdict
+from contextvars import ContextVar
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from invoice.models import Invoice
+from .models import CustomerPaymentInvoice
+
+logger = logging.getLogger(__name__)
+
+# Keeps IN (...) lists under sqlite's variable limit
+CHUNK_SIZE = 900
+# Statuses payments never change
+FROZEN_STATUSES = ('cancelled',)
+
+_pending_invoice_ids = ContextVar('pending_invoice_status_ids', default=None)
+
+
+def payment_status(total, settled, due_date, current_status, today):
+    """Status of an invoice given its total and the amount received plus discounts"""
+    if total > 0 and settled >= total:
+        return 'paid'
+    if due_date and due_date < today:
+        return 'overdue'
+    if settled > 0:
+        return 'partial'
+    # Nothing received yet: drafts stay drafts, anything else is open again
+    return 'draft' if current_status == 'draft' else 'sent'
+
+
+def compute_status_changes(invoice_ids, today=None):
+    """Return [(invoice, new status, settled amount)] for invoices whose status is out of date"""
+    today = today or date.today()
+    invoice_ids = list(invoice_ids)
+    changes = []
+    for start in range(0, len(invoice_ids), CHUNK_SIZE):
+        chunk = invoice_ids[start:start + CHUNK_SIZE]
+        settled_by_invoice = dict(
+            CustomerPaymentInvoice.objects.filter(invoice_id__in=chunk)
+            .order_by()
+            .values('invoice_id')
+            .annotate(settled=Sum(F('amount_received') + F('discount_amount')))
+            .values_list('invoice_id', 'settled')
+        )
+        invoices = Invoice.objects.filter(pk__in=chunk).exclude(
+            status__in=FROZEN_STATUSES
+        ).only('id', 'invoice_number', 'status', 'due_date', 'invoice_items')
+        for invoice in invoices:
+            settled = settled_by_invoice.get(invoice.pk) or Decimal('0.00')
+            new_status = payment_status(invoice.total_sale, settled, invoice.due_date, invoice.status, today)
+            if new_status != invoice.status:
+                changes.append((invoice, new_status, settled))
+    return changes
+
+
+def apply_status_changes(changes):
+    """Write computed status changes back with one UPDATE per target status"""
+    ids_by_status = defaultdict(list)
+    for invoice, new_status, settled in changes:
+        ids_by_status[new_status].append(invoice.pk)
+
+    now = timezone.now()
+    with transaction.atomic():
+        for new_status, ids in ids_by_status.items():
+            for start in range(0, len(ids), CHUNK_SIZE):
+                Invoice.objects.filter(pk__in=ids[start:start + CHUNK_SIZE]).update(
+                    status=new_status, updated_at=now
+                )
+
+    if changes:
+        logger.info(f'Updated payment status of {len(changes)} invoices')
+    return len(changes)
+
+
+def refresh_invoice_statuses(invoice_ids, today=None):
+    """Recompute and store payment statuses for the given invoices. Returns the number changed."""
+    return apply_status_changes(compute_status_changes(invoice_ids, today=today))
+
+
+def _flush_pending():
+    pending = _pending_invoice_ids.get()
+    try:
+        if pending:
+            refresh_invoice_statuses(pending)
+    finally:
+        _pending_invoice_ids.set(None)
+
+
+def schedule_status_refresh(invoice_ids):
+    """Queue invoices for a status refresh once the current transaction commits"""
+    invoice_ids = {invoice_id for invoice_id in invoice_ids if invoice_id}
+    if not invoice_ids:
+        return
+    pending = _pending_invoice_ids.get()
+    if pending is None:
+        pending = set()
+        _pending_invoice_ids.set(pending)
+    pending.update(invoice_ids)
+    # Registered on every call: callbacks of a rolled back block are dropped, and
+    # whichever callback runs first flushes the whole set, leaving later ones no-ops
+    transaction.on_commit(_flush_pending)
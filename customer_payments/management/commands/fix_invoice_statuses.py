@@ -1,8 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from customer_payments.models import CustomerPaymentInvoice
+from customer_payments.invoice_status import compute_status_changes, apply_status_changes
 from invoice.models import Invoice
-from decimal import Decimal
 
 
 class Command(BaseCommand):
@@ -23,48 +22,23 @@ class Command(BaseCommand):
         
         self.stdout.write('🔍 Checking invoice statuses...')
         
-        invoices_checked = 0
-        invoices_updated = 0
-        
         try:
             with transaction.atomic():
-                # Get all invoices
-                all_invoices = Invoice.objects.all()
+                # Open invoices change to overdue as time passes, so check all of them
+                invoice_ids = list(Invoice.objects.values_list('pk', flat=True))
+                invoices_checked = len(invoice_ids)
+                changes = compute_status_changes(invoice_ids)
+                invoices_updated = len(changes)
                 
-                for invoice in all_invoices:
-                    invoices_checked += 1
-                    
-                    # Get all payments for this invoice
-                    payment_invoices = CustomerPaymentInvoice.objects.filter(invoice=invoice)
-                    total_paid = sum(pi.amount_received for pi in payment_invoices)
-                    
-                    # Determine correct status
-                    if total_paid >= invoice.total_sale:
-                        correct_status = 'paid'
-                    elif total_paid > 0:
-                        correct_status = 'partial'
-                    else:
-                        correct_status = 'sent'
-                    
-                    # Check if status needs updating
-                    if invoice.status != correct_status:
-                        self.stdout.write(
-                            f'🔄 Invoice {invoice.invoice_number}: '
-                            f'Status "{invoice.status}" → "{correct_status}" '
-                            f'(Paid: {total_paid}, Total: {invoice.total_sale})'
-                        )
-                        
-                        if not dry_run:
-                            invoice.status = correct_status
-                            invoice.save(update_fields=['status'])
-                        
-                        invoices_updated += 1
-                    else:
-                        self.stdout.write(
-                            f'✅ Invoice {invoice.invoice_number}: '
-                            f'Status "{invoice.status}" is correct '
-                            f'(Paid: {total_paid}, Total: {invoice.total_sale})'
-                        )
+                for invoice, correct_status, settled in changes:
+                    self.stdout.write(
+                        f'🔄 Invoice {invoice.invoice_number}: '
+                        f'Status "{invoice.status}" → "{correct_status}" '
+                        f'(Paid: {settled}, Total: {invoice.total_sale})'
+                    )
+                
+                if not dry_run:
+                    apply_status_changes(changes)
                 
                 if dry_run:
                     self.stdout.write(
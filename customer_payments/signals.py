@@ -1,132 +1,29 @@
-from django.db.models.signals import post_delete, post_save, pre_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.db import transaction
 from .models import CustomerPayment, CustomerPaymentInvoice
 from .views import get_or_create_cash_in_hand_account
-from invoice.models import Invoice
+from .invoice_status import schedule_status_refresh
 from ledger.models import Ledger
 from chart_of_accounts.models import ChartOfAccount
 from fiscal_year.models import FiscalYear
 from company.company_model import Company
 from decimal import Decimal
 
-# Store affected invoices before deletion
-_affected_invoices = set()
-
-@receiver(pre_delete, sender=CustomerPayment)
-def capture_affected_invoices(sender, instance, **kwargs):
-    """
-    Capture affected invoices before payment deletion
-    """
-    global _affected_invoices
-    _affected_invoices.clear()
-    
-    try:
-        # Get all invoices that will be affected by this payment deletion
-        for payment_invoice in instance.payment_invoices.all():
-            _affected_invoices.add(payment_invoice.invoice.id)
-        
-        print(f"📝 Pre-delete: Captured {len(_affected_invoices)} affected invoices for payment {instance.formatted_payment_id}")
-        
-    except Exception as e:
-        print(f"❌ Error in capture_affected_invoices signal: {e}")
-        _affected_invoices.clear()
-
-@receiver(post_delete, sender=CustomerPayment)
+@receiver(post_delete, sender=CustomerPaymentInvoice)
 def update_invoice_status_on_payment_delete(sender, instance, **kwargs):
     """
-    Update invoice statuses when a payment is deleted
+    Update invoice status when a payment-invoice relationship is deleted,
+    directly or through deleting its payment
     """
-    global _affected_invoices
-    
-    try:
-        print(f"🔄 Post-delete signal triggered: Payment deleted")
-        print(f"📝 Affected invoices captured: {_affected_invoices}")
-        
-        # Update statuses for the specific invoices that were affected
-        updated_count = 0
-        
-        for invoice_id in _affected_invoices:
-            try:
-                invoice = Invoice.objects.get(id=invoice_id)
-                
-                # Get current payment status for this invoice
-                remaining_payments = CustomerPaymentInvoice.objects.filter(invoice=invoice)
-                
-                if remaining_payments.exists():
-                    # Calculate total paid from remaining payments
-                    total_paid = sum(pi.amount_received for pi in remaining_payments)
-                    
-                    if total_paid >= invoice.total_sale:
-                        new_status = 'paid'
-                    elif total_paid > 0:
-                        new_status = 'partial'
-                    else:
-                        new_status = 'sent'
-                else:
-                    # No payments remain, should be sent status
-                    new_status = 'sent'
-                
-                # Update invoice status if it changed
-                if invoice.status != new_status:
-                    old_status = invoice.status
-                    invoice.status = new_status
-                    invoice.save(update_fields=['status'])
-                    print(f"  ✅ Invoice {invoice.invoice_number}: '{old_status}' → '{new_status}' (Paid: {total_paid if 'total_paid' in locals() else 0}, Total: {invoice.total_sale})")
-                    updated_count += 1
-                else:
-                    total_paid = sum(pi.amount_received for pi in remaining_payments) if remaining_payments.exists() else 0
-                    print(f"  ℹ️ Invoice {invoice.invoice_number}: Status '{invoice.status}' unchanged (Paid: {total_paid}, Total: {invoice.total_sale})")
-                    
-            except Invoice.DoesNotExist:
-                print(f"  ⚠️ Invoice ID {invoice_id} not found (may have been deleted)")
-                continue
-        
-        print(f"🔄 Signal completed: {updated_count} invoice statuses updated")
-        
-        # Clear the captured invoices
-        _affected_invoices.clear()
-                
-    except Exception as e:
-        print(f"❌ Error in update_invoice_status_on_payment_delete signal: {e}")
-        import traceback
-        traceback.print_exc()
-        _affected_invoices.clear()
+    schedule_status_refresh([instance.invoice_id])
 
 @receiver(post_save, sender=CustomerPaymentInvoice)
 def update_invoice_status_on_payment_save(sender, instance, created, **kwargs):
     """
     Update invoice status when a payment-invoice relationship is created or modified
     """
-    try:
-        invoice = instance.invoice
-        
-        # Get all payments for this invoice
-        all_payments = CustomerPaymentInvoice.objects.filter(invoice=invoice)
-        total_paid = sum(pi.amount_received for pi in all_payments)
-        
-        # Determine new status
-        if total_paid >= invoice.total_sale:
-            new_status = 'paid'
-        elif total_paid > 0:
-            new_status = 'partial'
-        else:
-            new_status = 'sent'
-        
-        # Update invoice status if it changed
-        if invoice.status != new_status:
-            old_status = invoice.status
-            invoice.status = new_status
-            invoice.save(update_fields=['status'])
-            
-            action = "created" if created else "modified"
-            print(f"🔄 Signal: Invoice {invoice.invoice_number} status updated from '{old_status}' to '{new_status}' after payment {action}")
-        else:
-            action = "created" if created else "modified"
-            print(f"ℹ️ Signal: Invoice {invoice.invoice_number} status unchanged ({invoice.status}) after payment {action}")
-            
-    except Exception as e:
-            print(f"❌ Error in update_invoice_status_on_payment_save signal: {e}")
+    schedule_status_refresh([instance.invoice_id])
 
 
 @receiver(post_save, sender=CustomerPayment)
@@ -0,0 +1,58 @@
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.db import transaction
+from django.test import TestCase
+
+from .invoice_status import payment_status, schedule_status_refresh
+
+
+class PaymentStatusTest(TestCase):
+    def setUp(self):
+        self.today = date(2025, 6, 15)
+
+    def test_fully_settled_invoice_is_paid(self):
+        """Received plus discount covering the total marks the invoice paid"""
+        self.assertEqual(payment_status(Decimal('100'), Decimal('100'), None, 'sent', self.today), 'paid')
+
+    def test_past_due_invoice_is_overdue(self):
+        self.assertEqual(payment_status(Decimal('100'), Decimal('40'), date(2025, 6, 1), 'partial', self.today), 'overdue')
+
+    def test_partial_payment(self):
+        self.assertEqual(payment_status(Decimal('100'), Decimal('40'), date(2025, 7, 1), 'sent', self.today), 'partial')
+
+    def test_unpaid_draft_stays_draft(self):
+        self.assertEqual(payment_status(Decimal('100'), Decimal('0'), None, 'draft', self.today), 'draft')
+        self.assertEqual(payment_status(Decimal('100'), Decimal('0'), None, 'partial', self.today), 'sent')
+
+
+@patch('customer_payments.invoice_status.refresh_invoice_statuses')
+class ScheduleStatusRefreshTest(TestCase):
+    def test_ids_are_flushed_once_per_transaction(self, refresh):
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_status_refresh([1, 2])
+            schedule_status_refresh([2, 3, None])
+        refresh.assert_called_once_with({1, 2, 3})
+
+    def test_rolled_back_ids_wait_for_the_next_flush(self, refresh):
+        """Ids queued by a rolled back transaction are not refreshed until a later commit"""
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                schedule_status_refresh([101])
+                raise RuntimeError('rolled back')
+        refresh.assert_not_called()
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_status_refresh([202])
+        refresh.assert_called_once_with({101, 202})
+
+    def test_failed_flush_clears_pending_ids(self, refresh):
+        refresh.side_effect = RuntimeError('database unavailable')
+        with self.assertRaises(RuntimeError):
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_status_refresh([7])
+        refresh.side_effect = None
+        refresh.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_status_refresh([8])
+        refresh.assert_called_once_with({8})
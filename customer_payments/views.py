@@ -142,19 +142,9 @@ def payment_create(request):
                                 
                                 total_paid += amount_received
                                 
-                                # Update invoice status based on payment
-                                if partial_payment_option == 'discount':
-                                    # When applying discount, mark as paid since the remaining amount is written off
-                                    invoice.status = 'paid'
-                                elif amount_received >= original_amount:
-                                    invoice.status = 'paid'
-                                else:
-                                    # For keep_open option, mark as partial to keep it open
-                                    invoice.status = 'partial'
-                                
-                                invoice.save()
+                                # Invoice status (paid when received + discount covers the total,
+                                # partial otherwise) is recomputed for all allocations on commit
                                 print(f"✅ Created CustomerPaymentInvoice: {payment_invoice}")
-                                print(f"✅ Updated invoice {invoice.invoice_number} status to: {invoice.status}")
                                 
                             except Invoice.DoesNotExist:
                                 print(f"❌ Invoice {invoice_id} not found")
@@ -493,9 +483,6 @@ def payment_delete(request, pk):
     if request.method == 'POST':
         try:
             with transaction.atomic():
-                # Get all payment-invoice relationships before deleting
-                payment_invoices = list(payment.payment_invoices.all())
-                
                 # Delete related ledger entries before deleting the payment
                 ledger_entries = Ledger.objects.filter(
                     Q(reference=payment.formatted_payment_id) |
@@ -509,45 +496,10 @@ def payment_delete(request, pk):
                 else:
                     print(f"ℹ️ No ledger entries found for payment {payment.formatted_payment_id}")
                 
-                # Delete the payment (this will cascade delete CustomerPaymentInvoice records)
+                # Delete the payment (this will cascade delete CustomerPaymentInvoice records);
+                # invoice statuses are recomputed from the remaining payments on commit
                 payment.delete()
                 
-                # Revert invoice statuses to allow customers to create new payments
-                for pi in payment_invoices:
-                    try:
-                        invoice = pi.invoice
-                        
-                        # Since the payment was already deleted, we need to check for any remaining payments
-                        # by looking at the current state of CustomerPaymentInvoice records
-                        remaining_payments = CustomerPaymentInvoice.objects.filter(invoice=invoice)
-                        
-                        if remaining_payments.exists():
-                            # Calculate total paid from remaining payments
-                            total_paid = sum(pi.amount_received for pi in remaining_payments)
-                            print(f"Invoice {invoice.invoice_number}: Remaining payments total: {total_paid}, Invoice amount: {invoice.total_sale}")
-                            
-                            if total_paid >= invoice.total_sale:
-                                invoice.status = 'paid'
-                                print(f"  → Status set to: paid (fully paid)")
-                            elif total_paid > 0:
-                                invoice.status = 'partial'
-                                print(f"  → Status set to: partial (partially paid)")
-                            else:
-                                invoice.status = 'sent'
-                                print(f"  → Status set to: sent (no payments)")
-                        else:
-                            # No payments remain, revert to sent status
-                            if invoice.status in ['paid', 'partial']:
-                                invoice.status = 'sent'
-                                print(f"  → Status reverted to: sent (no payments remain)")
-                        
-                        invoice.save()
-                        print(f"✅ Invoice {invoice.invoice_number} status updated to: {invoice.status}")
-                        
-                    except Exception as e:
-                        print(f"❌ Error reverting invoice {pi.invoice.invoice_number}: {e}")
-                        continue
-                
                 messages.success(request, f'Payment {payment.formatted_payment_id} deleted successfully! Invoice statuses have been reverted.')
                 
                 # Force refresh the page to show updated invoice statuses
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CustomsBoeReportConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'customs_BOE_report'
+
+    def ready(self):
+        import customs_BOE_report.signals
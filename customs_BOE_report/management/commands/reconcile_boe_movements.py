@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from customs_BOE_report.movements import find_drift, fix_drift
+
+
+class Command(BaseCommand):
+    help = 'Report (and optionally fix) customs BOE movement lines that drifted from their containers and documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rebuild drifted lines from their sources (also fills the table initially)'
+        )
+
+    def handle(self, *args, **options):
+        drift = fix_drift() if options['fix'] else find_drift()
+        
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('BOE movement lines match their containers and documents'))
+            return
+        
+        for key, stored, expected in drift:
+            if stored is None:
+                state = 'missing'
+            elif expected is None:
+                state = 'no longer has a source'
+            else:
+                state = ', '.join(
+                    f'{field} {stored[field]} -> {expected[field]}' for field in expected if stored[field] != expected[field]
+                )
+            self.stdout.write(f'{key}: {state}')
+        
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(drift)} BOE movement lines'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} BOE movement lines drifted; run with --fix to repair'))
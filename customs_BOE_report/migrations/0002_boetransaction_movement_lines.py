@@ -0,0 +1,80 @@
+# Generated by Django 4.2.23 on 2026-10-18 22:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('job', '0017_job_com_invoice_job_com_invoice_date'),
+        ('crossstuffing', '0008_crossstuffingsummary_exp_cntr_and_more'),
+        ('documentation', '0010_documentation_deliver_to'),
+        ('customs_BOE_report', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boetransaction',
+            name='container_number',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Container Number'),
+        ),
+        migrations.AddField(
+            model_name='boetransaction',
+            name='crossstuffing_cargo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='boe_transactions', to='crossstuffing.crossstuffingcargo'),
+        ),
+        migrations.AddField(
+            model_name='boetransaction',
+            name='documentation_cargo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='boe_transactions', to='documentation.documentationcargo'),
+        ),
+        migrations.AddField(
+            model_name='boetransaction',
+            name='job_cargo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='boe_transactions', to='job.jobcargo'),
+        ),
+        migrations.AddField(
+            model_name='boetransaction',
+            name='job_code',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Job Code'),
+        ),
+        migrations.AddField(
+            model_name='boetransaction',
+            name='job_container',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='boe_transactions', to='job.jobcontainer'),
+        ),
+        migrations.AddField(
+            model_name='boetransaction',
+            name='last_out_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Last Out Date'),
+        ),
+        migrations.AddField(
+            model_name='boetransaction',
+            name='line_key',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='boetransaction',
+            name='line_type',
+            field=models.CharField(blank=True, choices=[('cargo', 'Container Cargo'), ('container', 'Container'), ('documentation', 'Documentation'), ('crossstuffing', 'Cross Stuffing')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='boetransaction',
+            name='qty_in',
+            field=models.FloatField(default=0.0, verbose_name='Quantity In'),
+        ),
+        migrations.AlterField(
+            model_name='boetransaction',
+            name='qty_out',
+            field=models.FloatField(default=0.0, verbose_name='Quantity Out'),
+        ),
+        migrations.AddIndex(
+            model_name='boetransaction',
+            index=models.Index(fields=['date'], name='customs_boe_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='boetransaction',
+            index=models.Index(fields=['declaration_no'], name='customs_boe_declaration_idx'),
+        ),
+    ]
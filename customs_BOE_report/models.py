@@ -2,6 +2,14 @@ from django.db import models
 from django.utils import timezone
 
 class BOETransaction(models.Model):
+    """One line of the customs BOE stock report, maintained by customs_BOE_report.movements"""
+    LINE_TYPES = [
+        ('cargo', 'Container Cargo'),
+        ('container', 'Container'),
+        ('documentation', 'Documentation'),
+        ('crossstuffing', 'Cross Stuffing'),
+    ]
+    
     declaration_no = models.CharField(max_length=100, verbose_name="Declaration No")
     bill_no = models.CharField(max_length=100, verbose_name="Bill No")
     date = models.DateField(verbose_name="Date")
@@ -9,14 +17,25 @@ class BOETransaction(models.Model):
     particulars = models.CharField(max_length=255, verbose_name="Particulars")
     cog = models.CharField(max_length=100, verbose_name="COG")
     pkg_type = models.CharField(max_length=50, verbose_name="Package Type")
-    qty_in = models.IntegerField(default=0, verbose_name="Quantity In")
+    qty_in = models.FloatField(default=0.0, verbose_name="Quantity In")
     wt_in = models.FloatField(default=0.0, verbose_name="Weight In")
     value_in = models.FloatField(default=0.0, verbose_name="Value In")
-    qty_out = models.IntegerField(default=0, verbose_name="Quantity Out")
+    qty_out = models.FloatField(default=0.0, verbose_name="Quantity Out")
     wt_out = models.FloatField(default=0.0, verbose_name="Weight Out")
     value_out = models.FloatField(default=0.0, verbose_name="Value Out")
     duty = models.FloatField(default=0.0, verbose_name="Duty")
     total_dues = models.FloatField(default=0.0, verbose_name="Total Dues")
+    last_out_date = models.DateField(null=True, blank=True, verbose_name="Last Out Date")
+    job_code = models.CharField(max_length=50, blank=True, verbose_name="Job Code")
+    container_number = models.CharField(max_length=100, blank=True, verbose_name="Container Number")
+    
+    # Source of a maintained line; rows without a line_key are entered by hand
+    line_key = models.CharField(max_length=100, unique=True, null=True, blank=True, editable=False)
+    line_type = models.CharField(max_length=20, choices=LINE_TYPES, blank=True)
+    job_container = models.ForeignKey('job.JobContainer', on_delete=models.CASCADE, null=True, blank=True, related_name='boe_transactions')
+    job_cargo = models.ForeignKey('job.JobCargo', on_delete=models.CASCADE, null=True, blank=True, related_name='boe_transactions')
+    documentation_cargo = models.ForeignKey('documentation.DocumentationCargo', on_delete=models.CASCADE, null=True, blank=True, related_name='boe_transactions')
+    crossstuffing_cargo = models.ForeignKey('crossstuffing.CrossStuffingCargo', on_delete=models.CASCADE, null=True, blank=True, related_name='boe_transactions')
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -26,6 +45,10 @@ class BOETransaction(models.Model):
         verbose_name = 'BOE Transaction'
         verbose_name_plural = 'BOE Transactions'
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['date'], name='customs_boe_date_idx'),
+            models.Index(fields=['declaration_no'], name='customs_boe_declaration_idx'),
+        ]
     
     def __str__(self):
         return f"{self.declaration_no} - {self.bill_no}"
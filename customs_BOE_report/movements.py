@@ -0,0 +1,373 @@
+"""
+Customs BOE movement table.
+
+BOETransaction holds the customs BOE stock report line by line, so every
+report format reads indexed rows instead of walking containers, cargo and
+outbound documents:
+
+- cargo: a job cargo line of a declared container (one with an ED or M1
+  number). Received is the cargo quantity, weight and value; delivered is
+  what non-cancelled delivery orders for the container's BOE or container
+  number shipped of the same item, with weight and value in proportion.
+- container: a declared container whose job has no cargo, counted as one
+  package against everything its delivery orders shipped.
+- documentation / crossstuffing: an outbound cargo line of a documentation
+  or (not cancelled) cross stuffing record that names a BOE.
+
+Lines are refreshed per container or outbound document whenever one of
+their sources is saved: the lines the sources produce now are compared with
+the stored ones and only changed lines are written (one upsert), lines
+whose source no longer qualifies are deleted, and deleting a source removes
+its lines by cascade. Bulk queryset updates send no signals, so
+find_drift / fix_drift rebuild the table from the source documents.
+"""
+import logging
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import BOETransaction
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 1000
+REFRESH_CHUNK_SIZE = 500
+# Weights and values are derived in proportion to shipped quantities
+PRECISION = 4
+EXCLUDED_CROSSSTUFFING_STATUSES = ['draft', 'cancelled', 'demo']
+
+VALUE_FIELDS = [
+    'declaration_no', 'bill_no', 'date', 'hs_code', 'particulars', 'cog', 'pkg_type',
+    'qty_in', 'wt_in', 'value_in', 'qty_out', 'wt_out', 'value_out', 'last_out_date',
+    'job_code', 'container_number', 'line_type',
+    'job_container_id', 'job_cargo_id', 'documentation_cargo_id', 'crossstuffing_cargo_id',
+]
+SCOPES = {
+    'container': 'job_container_id__in',
+    'documentation': 'documentation_cargo__documentation_id__in',
+    'crossstuffing': 'crossstuffing_cargo__crossstuffing_id__in',
+}
+
+
+def _chunks(values, size=REFRESH_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _number(value):
+    return round(float(value or 0), PRECISION)
+
+
+def _line(line_type, **values):
+    line = {field: None for field in VALUE_FIELDS if field.endswith('_id') or field == 'last_out_date'}
+    line.update(
+        line_type=line_type, hs_code='', cog='', pkg_type='',
+        qty_in=0.0, wt_in=0.0, value_in=0.0, qty_out=0.0, wt_out=0.0, value_out=0.0, job_code='', container_number='',
+    )
+    line.update(values)
+    for field in ('qty_in', 'wt_in', 'value_in', 'qty_out', 'wt_out', 'value_out'):
+        line[field] = _number(line[field])
+    return line
+
+
+# Lines per source
+
+def _declared():
+    return Q(ed_number__gt='') | Q(m1_number__gt='')
+
+
+def _delivery_orders(containers):
+    """{container pk: [(order date, [item rows])]} for the delivery orders matching each container"""
+    DeliveryOrder = apps.get_model('delivery_order', 'DeliveryOrder')
+    DeliveryOrderItem = apps.get_model('delivery_order', 'DeliveryOrderItem')
+    boes = {container.ed_number for container in containers if container.ed_number}
+    numbers = {container.container_number for container in containers if container.container_number}
+    if not boes and not numbers:
+        return {}
+
+    orders = list(
+        DeliveryOrder.objects.exclude(status='cancelled')
+        .filter(Q(boe__in=boes) | Q(container__in=numbers))
+        .values_list('pk', 'boe', 'container', 'date')
+    )
+    items = defaultdict(list)
+    for row in DeliveryOrderItem.objects.filter(delivery_order_id__in=[order[0] for order in orders]).values(
+        'delivery_order_id', 'item_id', 'shipped_qty', 'unit_price', 'item__gross_weight', 'item__net_weight'
+    ):
+        items[row['delivery_order_id']].append(row)
+    by_boe, by_number = defaultdict(set), defaultdict(set)
+    for pk, boe, number, _ in orders:
+        by_boe[boe].add(pk)
+        by_number[number].add(pk)
+    dates = {pk: order_date for pk, _, _, order_date in orders}
+
+    matched = {}
+    for container in containers:
+        pks = (by_boe[container.ed_number] if container.ed_number else set()) | (
+            by_number[container.container_number] if container.container_number else set()
+        )
+        matched[container.pk] = [(dates[pk], items[pk]) for pk in sorted(pks)]
+    return matched
+
+
+def _last_date(orders, item_id=None):
+    dates = [
+        order_date for order_date, rows in orders
+        if any(row['shipped_qty'] and (item_id is None or row['item_id'] == item_id) for row in rows)
+    ]
+    return max(dates) if dates else None
+
+
+def container_lines(container_ids):
+    """{line_key: values} for the cargo and container lines of these containers"""
+    JobContainer = apps.get_model('job', 'JobContainer')
+    JobCargo = apps.get_model('job', 'JobCargo')
+    containers = list(JobContainer.objects.filter(_declared(), pk__in=container_ids).select_related('job'))
+    cargo = defaultdict(list)
+    for row in JobCargo.objects.filter(job_id__in={container.job_id for container in containers}).order_by(
+        'created_at', 'pk'
+    ).values(
+        'pk', 'job_id', 'item_id', 'item__item_name', 'item_code', 'hs_code', 'coo', 'unit',
+        'quantity', 'gross_weight', 'net_weight', 'amount',
+    ):
+        cargo[row['job_id']].append(row)
+    orders = _delivery_orders(containers)
+
+    lines = {}
+    for container in containers:
+        job = container.job
+        common = {
+            'declaration_no': container.ed_number or '',
+            'bill_no': container.m1_number or '',
+            'date': timezone.localdate(job.created_at),
+            'job_code': job.job_code,
+            'container_number': container.container_number or '',
+            'job_container_id': container.pk,
+        }
+        matched = orders.get(container.pk, [])
+        for row in cargo[job.pk]:
+            weight = float(row['gross_weight'] or row['net_weight'] or 0)
+            amount = float(row['amount'] or 0)
+            quantity = float(row['quantity'] or 0)
+            shipped = sum(
+                float(item['shipped_qty'] or 0)
+                for _, rows in matched for item in rows if row['item_id'] and item['item_id'] == row['item_id']
+            )
+            ratio = shipped / quantity if quantity > 0 else 0
+            lines[f'cargo:{container.pk}:{row["pk"]}'] = _line(
+                'cargo', **common,
+                job_cargo_id=row['pk'],
+                hs_code=row['hs_code'] or '',
+                particulars=row['item__item_name'] or row['item_code'] or f'Container {container.container_number or "N/A"}',
+                cog=row['coo'] or '',
+                pkg_type=row['unit'] or '',
+                qty_in=quantity, wt_in=weight, value_in=amount,
+                qty_out=shipped, wt_out=weight * ratio, value_out=amount * ratio,
+                last_out_date=_last_date(matched, row['item_id']) if row['item_id'] else None,
+            )
+        if not cargo[job.pk]:
+            rows = [item for _, items in matched for item in items]
+            lines[f'container:{container.pk}'] = _line(
+                'container', **common,
+                particulars=f'Container {container.container_number or "N/A"} - {job.job_code}',
+                pkg_type=container.container_size or '',
+                qty_in=1,
+                qty_out=sum(float(item['shipped_qty'] or 0) for item in rows),
+                wt_out=sum(
+                    float(item['item__gross_weight'] or item['item__net_weight'] or 0) * float(item['shipped_qty'] or 0)
+                    for item in rows
+                ),
+                value_out=sum(float(item['unit_price'] or 0) * float(item['shipped_qty'] or 0) for item in rows),
+                last_out_date=_last_date(matched),
+            )
+    return lines
+
+
+def documentation_lines(documentation_ids):
+    """{line_key: values} for the outbound cargo lines of these documentation records"""
+    DocumentationCargo = apps.get_model('documentation', 'DocumentationCargo')
+    rows = DocumentationCargo.objects.filter(
+        documentation_id__in=documentation_ids, documentation__boe__gt='', quantity__gt=0
+    ).values(
+        'pk', 'item_name', 'hs_code', 'coo', 'unit', 'quantity', 'gross_weight', 'net_weight', 'amount',
+        'documentation__boe', 'documentation__document_no', 'documentation__created_at',
+    )
+    lines = {}
+    for row in rows:
+        day = timezone.localdate(row['documentation__created_at'])
+        lines[f'documentation:{row["pk"]}'] = _line(
+            'documentation',
+            documentation_cargo_id=row['pk'],
+            declaration_no=row['documentation__boe'],
+            bill_no=row['documentation__document_no'] or '',
+            date=day,
+            hs_code=row['hs_code'] or '',
+            particulars=row['item_name'] or '',
+            cog=row['coo'] or '',
+            pkg_type=row['unit'] or '',
+            qty_out=row['quantity'],
+            wt_out=row['gross_weight'] or row['net_weight'],
+            value_out=row['amount'],
+            last_out_date=day,
+            job_code=row['documentation__document_no'] or '',
+        )
+    return lines
+
+
+def crossstuffing_lines(crossstuffing_ids):
+    """{line_key: values} for the outbound cargo lines of these cross stuffing records"""
+    CrossStuffingCargo = apps.get_model('crossstuffing', 'CrossStuffingCargo')
+    rows = CrossStuffingCargo.objects.filter(
+        crossstuffing_id__in=crossstuffing_ids, crossstuffing__boe__gt='', quantity__gt=0
+    ).exclude(
+        crossstuffing__status__in=EXCLUDED_CROSSSTUFFING_STATUSES
+    ).values(
+        'pk', 'quantity', 'gross_weight', 'net_weight', 'amount',
+        'job_cargo__item__item_name', 'job_cargo__hs_code', 'job_cargo__coo', 'job_cargo__unit',
+        'crossstuffing__boe', 'crossstuffing__cs_number', 'crossstuffing__created_at',
+    )
+    lines = {}
+    for row in rows:
+        day = timezone.localdate(row['crossstuffing__created_at'])
+        lines[f'crossstuffing:{row["pk"]}'] = _line(
+            'crossstuffing',
+            crossstuffing_cargo_id=row['pk'],
+            declaration_no=row['crossstuffing__boe'],
+            bill_no=row['crossstuffing__cs_number'] or '',
+            date=day,
+            hs_code=row['job_cargo__hs_code'] or '',
+            particulars=row['job_cargo__item__item_name'] or '',
+            cog=row['job_cargo__coo'] or '',
+            pkg_type=row['job_cargo__unit'] or '',
+            qty_out=row['quantity'],
+            wt_out=row['gross_weight'] or row['net_weight'],
+            value_out=row['amount'],
+            last_out_date=day,
+            job_code=row['crossstuffing__cs_number'] or '',
+        )
+    return lines
+
+
+BUILDERS = {
+    'container': container_lines,
+    'documentation': documentation_lines,
+    'crossstuffing': crossstuffing_lines,
+}
+
+
+# Writing
+
+def stored_lines(queryset):
+    """{line_key: values} as stored"""
+    return {row.pop('line_key'): row for row in queryset.values('line_key', *VALUE_FIELDS)}
+
+
+def write_lines(desired, stored):
+    """Upsert the desired lines that differ from stored and delete stored lines no longer desired.
+
+    Returns (lines written, lines deleted).
+    """
+    changed = [
+        BOETransaction(line_key=key, **values)
+        for key, values in desired.items() if stored.get(key) != values
+    ]
+    removed = [key for key in stored if key not in desired]
+    with transaction.atomic():
+        if changed:
+            # A concurrent refresh of the same source may have inserted the line first
+            BOETransaction.objects.bulk_create(
+                changed, batch_size=BULK_BATCH_SIZE,
+                update_conflicts=True, unique_fields=['line_key'], update_fields=VALUE_FIELDS + ['updated_at'],
+            )
+        if removed:
+            BOETransaction.objects.filter(line_key__in=removed).delete()
+    return len(changed), len(removed)
+
+
+def refresh(scope, ids):
+    """Rebuild the lines of these containers, documentation or cross stuffing records"""
+    ids = [pk for pk in set(ids) if pk is not None]
+    if not ids:
+        return 0, 0
+    desired = BUILDERS[scope](ids)
+    stored = stored_lines(BOETransaction.objects.filter(**{SCOPES[scope]: ids}))
+    written, deleted = write_lines(desired, stored)
+    if written or deleted:
+        logger.debug(f'BOE movements for {scope} {ids}: {written} written, {deleted} deleted')
+    return written, deleted
+
+
+def refresh_containers(container_ids):
+    return refresh('container', container_ids)
+
+
+def refresh_documentation(documentation_ids):
+    return refresh('documentation', documentation_ids)
+
+
+def refresh_crossstuffing(crossstuffing_ids):
+    return refresh('crossstuffing', crossstuffing_ids)
+
+
+def containers_for_jobs(job_ids):
+    JobContainer = apps.get_model('job', 'JobContainer')
+    return list(JobContainer.objects.filter(job_id__in=job_ids).values_list('pk', flat=True))
+
+
+def containers_for_delivery(boes, container_numbers):
+    """Containers whose lines count delivery orders with these BOE or container numbers"""
+    JobContainer = apps.get_model('job', 'JobContainer')
+    boes = {value for value in boes if value}
+    container_numbers = {value for value in container_numbers if value}
+    if not boes and not container_numbers:
+        return []
+    return list(
+        JobContainer.objects.filter(Q(ed_number__in=boes) | Q(container_number__in=container_numbers))
+        .values_list('pk', flat=True)
+    )
+
+
+# Repair
+
+def expected_lines():
+    """{line_key: values} for every source document"""
+    JobContainer = apps.get_model('job', 'JobContainer')
+    Documentation = apps.get_model('documentation', 'Documentation')
+    CrossStuffing = apps.get_model('crossstuffing', 'CrossStuffing')
+    sources = {
+        'container': JobContainer.objects.filter(_declared()),
+        'documentation': Documentation.objects.filter(boe__gt=''),
+        'crossstuffing': CrossStuffing.objects.filter(boe__gt=''),
+    }
+    lines = {}
+    for scope, queryset in sources.items():
+        for ids in _chunks(queryset.order_by('pk').values_list('pk', flat=True)):
+            lines.update(BUILDERS[scope](ids))
+    return lines
+
+
+def find_drift():
+    """Return (line_key, stored, expected) for every maintained line that differs from its sources"""
+    expected = expected_lines()
+    stored = stored_lines(BOETransaction.objects.filter(line_key__isnull=False))
+    return [
+        (key, stored.get(key), expected.get(key))
+        for key in sorted(set(expected) | set(stored))
+        if stored.get(key) != expected.get(key)
+    ]
+
+
+def fix_drift():
+    """Rebuild drifted lines from their sources. Returns the drift rows fixed."""
+    drift = find_drift()
+    write_lines(
+        {key: expected for key, _, expected in drift if expected is not None},
+        {key: stored for key, stored, _ in drift if stored is not None},
+    )
+    if drift:
+        logger.info(f'Fixed {len(drift)} BOE movement lines')
+    return drift
@@ -0,0 +1,71 @@
+"""
+Shared query for every format of the customs BOE stock report.
+
+The screen, Excel and PDF views take the same GET parameters and read the
+same BOETransaction rows (see customs_BOE_report.movements): filtering,
+ordering and the date range label are decided here once, in SQL, and each
+format only renders the rows it is given.
+"""
+from datetime import date, datetime
+
+from django.db.models import Case, IntegerField, Min, Q, Value, When
+from django.utils import timezone
+
+from .models import BOETransaction
+
+DATE_FORMAT = '%Y-%m-%d'
+DISPLAY_DATE_FORMAT = '%d/%m/%Y'
+TEXT_FILTERS = ('declaration_no', 'hs_code', 'particulars', 'cog')
+TYPE_FILTERS = {
+    'in_boe': Q(qty_in__gt=0),
+    'out_boe': Q(qty_out__gt=0),
+    'balance_boe': Q(qty_in__gt=0) | Q(qty_out__gt=0),
+}
+
+
+class BOEReport:
+    """Filters of one report request and the rows they select"""
+
+    def __init__(self, params):
+        self.filter_type = params.get('filter', 'all')
+        self.text_filters = {field: params.get(field, '').strip() for field in TEXT_FILTERS}
+        self.errors = []
+        self.from_date = params.get('from_date') or self._earliest_date().strftime(DATE_FORMAT)
+        self.to_date = params.get('to_date') or date.today().strftime(DATE_FORMAT)
+        self.from_date_value = self._parse(self.from_date, 'from')
+        self.to_date_value = self._parse(self.to_date, 'to')
+
+    def _earliest_date(self):
+        return BOETransaction.objects.aggregate(earliest=Min('date'))['earliest'] or date.today()
+
+    def _parse(self, value, label):
+        try:
+            return datetime.strptime(value, DATE_FORMAT).date()
+        except ValueError:
+            self.errors.append(f'Invalid {label} date format. Please use YYYY-MM-DD.')
+            return None
+
+    @property
+    def transactions(self):
+        """Matching lines by date, today's last"""
+        queryset = BOETransaction.objects.all()
+        if self.from_date_value:
+            queryset = queryset.filter(date__gte=self.from_date_value)
+        if self.to_date_value:
+            queryset = queryset.filter(date__lte=self.to_date_value)
+        for field, value in self.text_filters.items():
+            if value:
+                queryset = queryset.filter(**{f'{field}__icontains': value})
+        if self.filter_type in TYPE_FILTERS:
+            queryset = queryset.filter(TYPE_FILTERS[self.filter_type])
+        today_last = Case(When(date=timezone.now().date(), then=Value(1)), default=Value(0), output_field=IntegerField())
+        return queryset.order_by(today_last, 'date', 'pk')
+
+    def date_range(self, date_format=DISPLAY_DATE_FORMAT):
+        if self.from_date_value and self.to_date_value:
+            return f'{self.from_date_value.strftime(date_format)} to {self.to_date_value.strftime(date_format)}'
+        return 'Invalid date range'
+
+    @property
+    def activity(self):
+        return self.filter_type.replace('_', ' ').title()
@@ -0,0 +1,88 @@
+from django.apps import apps
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .movements import (
+    containers_for_delivery, containers_for_jobs, refresh_containers, refresh_crossstuffing, refresh_documentation,
+)
+
+# Deleting these deletes the lines by cascade
+CASCADING_MODELS = {'job.job', 'job.jobcontainer', 'documentation.documentation', 'crossstuffing.crossstuffing'}
+
+
+def _origin_label(origin):
+    if origin is None:
+        return None
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model._meta.label_lower
+
+
+@receiver(post_save, sender='job.Job')
+def refresh_job_lines(sender, instance, **kwargs):
+    refresh_containers(containers_for_jobs([instance.pk]))
+
+
+@receiver(post_save, sender='job.JobContainer')
+def refresh_container_lines(sender, instance, **kwargs):
+    refresh_containers([instance.pk])
+
+
+@receiver(post_save, sender='job.JobCargo')
+@receiver(post_delete, sender='job.JobCargo')
+def refresh_cargo_lines(sender, instance, origin=None, **kwargs):
+    if _origin_label(origin) in CASCADING_MODELS:
+        return
+    refresh_containers(containers_for_jobs([instance.job_id]))
+    # Cross stuffing lines show the cargo's HS code, origin and unit
+    refresh_crossstuffing(instance.crossstuffing_items.values_list('crossstuffing_id', flat=True))
+
+
+@receiver(pre_save, sender='delivery_order.DeliveryOrder')
+def remember_delivery_order_values(sender, instance, **kwargs):
+    """Keep the stored BOE and container so the lines they counted towards are refreshed as well"""
+    instance._boe_previous = None
+    if instance.pk:
+        instance._boe_previous = sender.objects.filter(pk=instance.pk).values_list('boe', 'container').first()
+
+
+@receiver(post_save, sender='delivery_order.DeliveryOrder')
+@receiver(post_delete, sender='delivery_order.DeliveryOrder')
+def refresh_delivery_order_lines(sender, instance, **kwargs):
+    values = [(instance.boe, instance.container)]
+    if getattr(instance, '_boe_previous', None):
+        values.append(instance._boe_previous)
+    instance._boe_previous = None
+    refresh_containers(containers_for_delivery([boe for boe, _ in values], [number for _, number in values]))
+
+
+@receiver(post_save, sender='delivery_order.DeliveryOrderItem')
+@receiver(post_delete, sender='delivery_order.DeliveryOrderItem')
+def refresh_delivery_item_lines(sender, instance, origin=None, **kwargs):
+    # Deleting the order refreshes its lines once after the items are gone
+    if _origin_label(origin) == 'delivery_order.deliveryorder':
+        return
+    DeliveryOrder = apps.get_model('delivery_order', 'DeliveryOrder')
+    order = DeliveryOrder.objects.filter(pk=instance.delivery_order_id).values_list('boe', 'container').first()
+    if order:
+        refresh_containers(containers_for_delivery([order[0]], [order[1]]))
+
+
+@receiver(post_save, sender='documentation.Documentation')
+def refresh_documentation_lines(sender, instance, **kwargs):
+    refresh_documentation([instance.pk])
+
+
+@receiver(post_save, sender='documentation.DocumentationCargo')
+def refresh_documentation_cargo_lines(sender, instance, **kwargs):
+    refresh_documentation([instance.documentation_id])
+
+
+@receiver(post_save, sender='crossstuffing.CrossStuffing')
+def refresh_crossstuffing_lines(sender, instance, **kwargs):
+    refresh_crossstuffing([instance.pk])
+
+
+@receiver(post_save, sender='crossstuffing.CrossStuffingCargo')
+def refresh_crossstuffing_cargo_lines(sender, instance, **kwargs):
+    refresh_crossstuffing([instance.crossstuffing_id])
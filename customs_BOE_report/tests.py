@@ -1,3 +1,118 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from customer.models import Customer
+from delivery_order.models import DeliveryOrder, DeliveryOrderItem
+from documentation.models import Documentation, DocumentationCargo
+from facility.models import Facility
+from items.models import Item
+from job.models import Job, JobCargo, JobContainer
+from .models import BOETransaction
+from .movements import find_drift, fix_drift
+
+
+class BOEMovementTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.customer = Customer.objects.create(customer_code='CUST001', customer_name='Test Customer')
+        self.facility = Facility.objects.create(
+            facility_code='WH01', facility_name='Main Warehouse', address='1 Dock Road',
+            city='Dubai', state='Dubai', postal_code='00000'
+        )
+        self.item = Item.objects.create(item_code='SKU-001', item_name='Test Item', barcode='1000000001')
+        self.job = Job.objects.create(
+            job_type='Inbound', doc_type='Import', shipment_type='FCL-FCL', customer_ref='REF-001',
+            created_by=self.user
+        )
+
+    def add_cargo(self, quantity='100', gross_weight='500', amount='1000'):
+        return JobCargo.objects.create(
+            job=self.job, item=self.item, unit='CTN', quantity=Decimal(quantity),
+            gross_weight=Decimal(gross_weight), amount=Decimal(amount)
+        )
+
+    def ship(self, quantity, boe='BOE-001', container='', status='pending', unit_price=None):
+        order = DeliveryOrder.objects.create(
+            customer=self.customer, facility=self.facility, boe=boe, container=container, status=status,
+            created_by=self.user
+        )
+        DeliveryOrderItem.objects.create(
+            delivery_order=order, item=self.item, requested_qty=Decimal(quantity), shipped_qty=Decimal(quantity),
+            unit_price=unit_price
+        )
+        return order
+
+    def line(self, line_type):
+        return BOETransaction.objects.get(line_type=line_type)
+
+    def test_cargo_lines_follow_deliveries(self):
+        """Delivered quantities of the container's BOE count out, with weight and value in proportion"""
+        container = JobContainer.objects.create(job=self.job, ed_number='BOE-001', container_number='MSCU1234567')
+        self.add_cargo()
+        line = self.line('cargo')
+        self.assertEqual((line.qty_in, line.wt_in, line.value_in, line.qty_out), (100, 500, 1000, 0))
+
+        order = self.ship('25')
+        self.ship('15', boe='', container='MSCU1234567')
+        line = self.line('cargo')
+        self.assertEqual((line.qty_out, line.wt_out, line.value_out), (40, 200, 400))
+        self.assertEqual(line.job_container_id, container.pk)
+
+        order.status = 'cancelled'
+        order.save()
+        self.assertEqual(self.line('cargo').qty_out, 15)
+        self.assertEqual(find_drift(), [])
+
+    def test_undeclared_containers_have_no_lines(self):
+        container = JobContainer.objects.create(job=self.job, container_number='MSCU1234567')
+        self.add_cargo()
+        self.assertFalse(BOETransaction.objects.exists())
+
+        container.m1_number = 'M1-001'
+        container.save()
+        self.assertEqual(self.line('cargo').bill_no, 'M1-001')
+
+        container.m1_number = ''
+        container.save()
+        self.assertFalse(BOETransaction.objects.exists())
+
+    def test_container_without_cargo_counts_one_package(self):
+        JobContainer.objects.create(job=self.job, ed_number='BOE-001', container_size='40FT')
+        self.ship('6', unit_price=Decimal('2.50'))
+
+        line = self.line('container')
+        self.assertEqual((line.qty_in, line.qty_out, line.value_out, line.pkg_type), (1, 6, 15, '40FT'))
+
+        # Adding cargo replaces the container line with the cargo line
+        self.add_cargo()
+        self.assertEqual(list(BOETransaction.objects.values_list('line_type', flat=True)), ['cargo'])
+
+    def test_documentation_lines(self):
+        cargo = self.add_cargo()
+        documentation = Documentation.objects.create(boe='BOE-009', created_by=self.user)
+        DocumentationCargo.objects.create(
+            documentation=documentation, job_cargo=cargo, item_name='Test Item', quantity=Decimal('12'),
+            net_weight=Decimal('30'), amount=Decimal('120')
+        )
+
+        line = self.line('documentation')
+        self.assertEqual((line.declaration_no, line.qty_out, line.wt_out, line.value_out), ('BOE-009', 12, 30, 120))
+
+        documentation.delete()
+        self.assertFalse(BOETransaction.objects.exists())
+
+    def test_fix_drift_rebuilds_bulk_updates(self):
+        """Queryset updates send no signals; fix_drift rebuilds the lines from their sources"""
+        container = JobContainer.objects.create(job=self.job, ed_number='BOE-001')
+        self.add_cargo()
+        JobCargo.objects.filter(job=self.job).update(quantity=Decimal('80'))
+        JobContainer.objects.create(job=self.job, ed_number='BOE-002')
+        BOETransaction.objects.filter(job_container=container).update(particulars='Edited')
+
+        drift = find_drift()
+        self.assertEqual(len(drift), 1)
+        fix_drift()
+        self.assertEqual(find_drift(), [])
+        self.assertEqual(BOETransaction.objects.get(job_container=container).qty_in, 80)
@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator
@@ -96,6 +97,9 @@ class DeliveryOrder(models.Model):
     created_at = models.DateTimeField(default=timezone.now, verbose_name="Created At")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
     
+    # Queued emails and their delivery status
+    document_emails = GenericRelation('email_configuration.DocumentEmail')
+    
     class Meta:
         verbose_name = "Delivery Order"
         verbose_name_plural = "Delivery Orders"
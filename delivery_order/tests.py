@@ -1,3 +1,95 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+
+from customer.models import Customer
+from facility.models import Facility
+from grn.models import GRN, GRNItem
+from items.models import Item
+from .models import DeliveryOrder, DeliveryOrderItem
+
+
+class CustomerItemsPickerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.customer = Customer.objects.create(customer_code='CUST001', customer_name='Test Customer')
+        self.facility = Facility.objects.create(
+            facility_code='WH01', facility_name='Main Warehouse', address='1 Dock Road',
+            city='Dubai', state='Dubai', postal_code='00000'
+        )
+        self.item = Item.objects.create(item_code='SKU-001', item_name='Test Item', barcode='1000000001')
+        self.grns = [self.receive(Decimal('60')), self.receive(Decimal('40'))]
+
+    def receive(self, quantity, status='received'):
+        grn = GRN.objects.create(customer=self.customer, facility=self.facility, status=status, created_by=self.user)
+        GRNItem.objects.create(grn=grn, item=self.item, item_code=self.item.item_code, received_qty=quantity)
+        return grn
+
+    def order(self, quantity, status='draft'):
+        delivery_order = DeliveryOrder.objects.create(
+            customer=self.customer, facility=self.facility, status=status, created_by=self.user
+        )
+        DeliveryOrderItem.objects.create(delivery_order=delivery_order, item=self.item, requested_qty=quantity)
+        return delivery_order
+
+    def picker_quantities(self, **params):
+        response = self.client.get(reverse('delivery_order:get_customer_items', args=[self.customer.pk]), params)
+        data = response.json()
+        self.assertTrue(data['success'], data.get('error'))
+        return [(line['grn_id'], line['quantity']) for line in data['items']]
+
+    def test_available_quantity_comes_from_stock_on_hand(self):
+        """Shipped orders are issued from on-hand, open orders reserve their requested quantity"""
+        self.order(Decimal('30'), status='shipped')
+        self.order(Decimal('50'))
+
+        self.assertEqual(self.picker_quantities(), [(self.grns[1].pk, 20.0)])
+
+    def test_order_being_edited_keeps_its_quantity(self):
+        editing = self.order(Decimal('50'))
+
+        self.assertEqual(
+            self.picker_quantities(current_do_id=editing.pk),
+            [(self.grns[0].pk, 60.0), (self.grns[1].pk, 40.0)]
+        )
+
+    def test_unreceived_grn_has_no_stock(self):
+        self.grns[1].status = 'draft'
+        self.grns[1].save()
+
+        self.assertEqual(self.picker_quantities(), [(self.grns[0].pk, 60.0)])
+
+    def test_completed_grn_stock_is_offered(self):
+        """Completed GRNs keep their stock on hand, so the picker lists their lines"""
+        self.grns[0].status = 'completed'
+        self.grns[0].save()
+
+        self.assertEqual(self.picker_quantities(), [(self.grns[0].pk, 60.0), (self.grns[1].pk, 40.0)])
+
+    def test_customers_with_available_items(self):
+        self.order(Decimal('100'), status='shipped')
+        other = Customer.objects.create(customer_code='CUST002', customer_name='Other Customer')
+        grn = GRN.objects.create(customer=other, facility=self.facility, status='received', created_by=self.user)
+        GRNItem.objects.create(grn=grn, item=self.item, item_code=self.item.item_code, received_qty=Decimal('5'))
+
+        response = self.client.get(reverse('delivery_order:get_customers_with_grns'))
+
+        self.assertEqual(
+            [(customer['id'], customer['available_items_count']) for customer in response.json()['customers']],
+            [(other.pk, 1)]
+        )
+
+    def test_customer_with_only_completed_grns_is_listed(self):
+        for grn in self.grns:
+            grn.status = 'completed'
+            grn.save()
+
+        response = self.client.get(reverse('delivery_order:get_customers_with_grns'))
 
-# Create your tests here.
+        self.assertEqual(
+            [(customer['id'], customer['available_items_count']) for customer in response.json()['customers']],
+            [(self.customer.pk, 2)]
+        )
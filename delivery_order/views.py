@@ -6,15 +6,16 @@ from django.db.models import Q, Sum
 from django.http import JsonResponse, HttpResponse
 from django.forms import formset_factory
 from django.utils import timezone
-from django.core.mail import EmailMessage
+from django.urls import reverse
 from django.template.loader import render_to_string
 from django.conf import settings
-from django.utils.html import strip_tags
 import os
 from weasyprint import HTML, CSS
 from weasyprint.text.fonts import FontConfiguration
 from .models import DeliveryOrder, DeliveryOrderItem
 from .forms import DeliveryOrderForm, DeliveryOrderItemForm, DeliveryOrderItemFormSet
+from customer.credit import enforce_credit_limit
+from email_configuration.documents import document_part, queue_document_email
 from datetime import datetime
 
 @login_required
@@ -67,101 +68,103 @@ def delivery_order_create(request):
     if request.method == 'POST':
         form = DeliveryOrderForm(request.POST)
         if form.is_valid():
-            delivery_order = form.save(commit=False)
-            delivery_order.created_by = request.user
+            # A customer over their credit limit is sent back to the form; the check added the message
+            if enforce_credit_limit(request, form.cleaned_data.get('customer')):
+                delivery_order = form.save(commit=False)
+                delivery_order.created_by = request.user
             
-            # Get the selected GRN from the form
-            grn_id = request.POST.get('grn')
-            if grn_id:
-                from grn.models import GRN
-                try:
-                    delivery_order.grn = GRN.objects.get(id=grn_id)
-                except GRN.DoesNotExist:
-                    pass
+                # Get the selected GRN from the form
+                grn_id = request.POST.get('grn')
+                if grn_id:
+                    from grn.models import GRN
+                    try:
+                        delivery_order.grn = GRN.objects.get(id=grn_id)
+                    except GRN.DoesNotExist:
+                        pass
             
-            delivery_order.save()
-            print(f"Generated DO number: {delivery_order.do_number}")
+                delivery_order.save()
+                print(f"Generated DO number: {delivery_order.do_number}")
             
-            # Handle selected items data
-            selected_items_data = request.POST.get('selected_items_data', '')
-            if selected_items_data:
-                import json
-                try:
-                    selected_items = json.loads(selected_items_data)
-                    for item_data in selected_items:
-                        # Get the item from GRN item ID
-                        from grn.models import GRNItem
-                        grn_item = GRNItem.objects.get(id=item_data.get('id'))
+                # Handle selected items data
+                selected_items_data = request.POST.get('selected_items_data', '')
+                if selected_items_data:
+                    import json
+                    try:
+                        selected_items = json.loads(selected_items_data)
+                        for item_data in selected_items:
+                            # Get the item from GRN item ID
+                            from grn.models import GRNItem
+                            grn_item = GRNItem.objects.get(id=item_data.get('id'))
                         
-                        # Create delivery order item with all GRN item data
-                        delivery_order_item = DeliveryOrderItem.objects.create(
-                            delivery_order=delivery_order,
-                            item=grn_item.item,
-                            requested_qty=float(item_data.get('quantity', 0)),
-                            unit_price=float(item_data.get('rate', 0)),
-                            notes=item_data.get('notes', ''),
-                            source_location_id=item_data.get('source_location_id'),
-                        )
+                            # Create delivery order item with all GRN item data
+                            delivery_order_item = DeliveryOrderItem.objects.create(
+                                delivery_order=delivery_order,
+                                item=grn_item.item,
+                                requested_qty=float(item_data.get('quantity', 0)),
+                                unit_price=float(item_data.get('rate', 0)),
+                                notes=item_data.get('notes', ''),
+                                source_location_id=item_data.get('source_location_id'),
+                            )
                         
-                        # Store all GRN item details in notes for complete data preservation
-                        additional_info = []
+                            # Store all GRN item details in notes for complete data preservation
+                            additional_info = []
                         
-                        # Store GRN number - always save it from the GRN item
-                        if delivery_order.grn:
-                            additional_info.append(f"GRN-No: {delivery_order.grn.grn_number}")
-                        elif grn_item.grn:
-                            additional_info.append(f"GRN-No: {grn_item.grn.grn_number}")
+                            # Store GRN number - always save it from the GRN item
+                            if delivery_order.grn:
+                                additional_info.append(f"GRN-No: {delivery_order.grn.grn_number}")
+                            elif grn_item.grn:
+                                additional_info.append(f"GRN-No: {grn_item.grn.grn_number}")
                         
-                        # Store all GRN item details
-                        if grn_item.hs_code:
-                            additional_info.append(f"HS-Code: {grn_item.hs_code}")
-                        if grn_item.coo:
-                            additional_info.append(f"COO: {grn_item.coo}")
-                        if grn_item.net_weight:
-                            additional_info.append(f"N-weight: {grn_item.net_weight}")
-                        if grn_item.gross_weight:
-                            additional_info.append(f"G-weight: {grn_item.gross_weight}")
-                        if grn_item.volume:
-                            additional_info.append(f"Volume: {grn_item.volume}")
-                        if grn_item.p_date:
-                            additional_info.append(f"P-Date: {grn_item.p_date}")
-                        if grn_item.expiry_date:
-                            additional_info.append(f"E-Date: {grn_item.expiry_date}")
-                        if grn_item.color:
-                            additional_info.append(f"Color: {grn_item.color}")
-                        if grn_item.size:
-                            additional_info.append(f"Size: {grn_item.size}")
-                        if grn_item.batch_number:
-                            additional_info.append(f"Barcode: {grn_item.batch_number}")
-                        if grn_item.ed:
-                            additional_info.append(f"ED: {grn_item.ed}")
+                            # Store all GRN item details
+                            if grn_item.hs_code:
+                                additional_info.append(f"HS-Code: {grn_item.hs_code}")
+                            if grn_item.coo:
+                                additional_info.append(f"COO: {grn_item.coo}")
+                            if grn_item.net_weight:
+                                additional_info.append(f"N-weight: {grn_item.net_weight}")
+                            if grn_item.gross_weight:
+                                additional_info.append(f"G-weight: {grn_item.gross_weight}")
+                            if grn_item.volume:
+                                additional_info.append(f"Volume: {grn_item.volume}")
+                            if grn_item.p_date:
+                                additional_info.append(f"P-Date: {grn_item.p_date}")
+                            if grn_item.expiry_date:
+                                additional_info.append(f"E-Date: {grn_item.expiry_date}")
+                            if grn_item.color:
+                                additional_info.append(f"Color: {grn_item.color}")
+                            if grn_item.size:
+                                additional_info.append(f"Size: {grn_item.size}")
+                            if grn_item.batch_number:
+                                additional_info.append(f"Barcode: {grn_item.batch_number}")
+                            if grn_item.ed:
+                                additional_info.append(f"ED: {grn_item.ed}")
                         
-                        # Also store any additional data from the form
-                        if item_data.get('volume') and item_data.get('volume') != '-':
-                            additional_info.append(f"Volume: {item_data.get('volume')}")
-                        if item_data.get('p_date') and item_data.get('p_date') != '-':
-                            additional_info.append(f"P-Date: {item_data.get('p_date')}")
-                        if item_data.get('expiry_date') and item_data.get('expiry_date') != '-':
-                            additional_info.append(f"E-Date: {item_data.get('expiry_date')}")
-                        if item_data.get('color') and item_data.get('color') != '-':
-                            additional_info.append(f"Color: {item_data.get('color')}")
-                        if item_data.get('size') and item_data.get('size') != '-':
-                            additional_info.append(f"Size: {item_data.get('size')}")
-                        if item_data.get('barcode') and item_data.get('barcode') != '-':
-                            additional_info.append(f"Barcode: {item_data.get('barcode')}")
-                        if item_data.get('ed') and item_data.get('ed') != '-':
-                            additional_info.append(f"ED: {item_data.get('ed')}")
+                            # Also store any additional data from the form
+                            if item_data.get('volume') and item_data.get('volume') != '-':
+                                additional_info.append(f"Volume: {item_data.get('volume')}")
+                            if item_data.get('p_date') and item_data.get('p_date') != '-':
+                                additional_info.append(f"P-Date: {item_data.get('p_date')}")
+                            if item_data.get('expiry_date') and item_data.get('expiry_date') != '-':
+                                additional_info.append(f"E-Date: {item_data.get('expiry_date')}")
+                            if item_data.get('color') and item_data.get('color') != '-':
+                                additional_info.append(f"Color: {item_data.get('color')}")
+                            if item_data.get('size') and item_data.get('size') != '-':
+                                additional_info.append(f"Size: {item_data.get('size')}")
+                            if item_data.get('barcode') and item_data.get('barcode') != '-':
+                                additional_info.append(f"Barcode: {item_data.get('barcode')}")
+                            if item_data.get('ed') and item_data.get('ed') != '-':
+                                additional_info.append(f"ED: {item_data.get('ed')}")
                         
-                        if additional_info:
-                            delivery_order_item.notes = f"{delivery_order_item.notes}\n" + "\n".join(additional_info)
-                            delivery_order_item.save()
+                            if additional_info:
+                                delivery_order_item.notes = f"{delivery_order_item.notes}\n" + "\n".join(additional_info)
+                                delivery_order_item.save()
                         
-                except (json.JSONDecodeError, KeyError, GRNItem.DoesNotExist) as e:
-                    messages.warning(request, f'Error processing selected items: {str(e)}')
+                    except (json.JSONDecodeError, KeyError, GRNItem.DoesNotExist) as e:
+                        messages.warning(request, f'Error processing selected items: {str(e)}')
             
-            messages.success(request, f'Delivery Order {delivery_order.do_number} created successfully!')
-            print(f"Redirecting to delivery order detail: {delivery_order.pk}")
-            return redirect('delivery_order:delivery_order_detail', pk=delivery_order.pk)
+                messages.success(request, f'Delivery Order {delivery_order.do_number} created successfully!')
+                print(f"Redirecting to delivery order detail: {delivery_order.pk}")
+                return redirect('delivery_order:delivery_order_detail', pk=delivery_order.pk)
         else:
             print("Form validation failed")
             print("Form errors:", form.errors)
@@ -363,6 +366,7 @@ def delivery_order_detail(request, pk):
     context = {
         'delivery_order': delivery_order,
         'grn_items_data': grn_items_data,
+        'document_emails': delivery_order.document_emails.select_related('created_by')[:10],
     }
     
     return render(request, 'delivery_order/delivery_order_detail.html', context)
@@ -563,108 +567,122 @@ def get_grn_items(request, grn_id):
             'error': str(e)
         })
 
+def _available_by_item(customer_ids, current_do_id=None):
+    """Quantity free to request per (customer, item).
+
+    Stock on hand less what open delivery orders have requested; shipped and
+    delivered orders are already issued from on-hand. The order being edited
+    is left out so its own lines stay available to it.
+    """
+    from stock_transfer.models import StockOnHand
+    
+    available = {
+        (customer_id, item_id): total
+        for customer_id, item_id, total in StockOnHand.objects.filter(customer_id__in=customer_ids).values(
+            'customer_id', 'item_id'
+        ).annotate(total=Sum('quantity')).values_list('customer_id', 'item_id', 'total')
+    }
+    
+    requested = DeliveryOrderItem.objects.filter(
+        delivery_order__customer_id__in=customer_ids,
+        item__isnull=False,
+    ).exclude(delivery_order__status__in=['shipped', 'delivered', 'cancelled'])
+    if current_do_id:
+        requested = requested.exclude(delivery_order_id=current_do_id)
+    for customer_id, item_id, total in requested.values(
+        'delivery_order__customer_id', 'item_id'
+    ).annotate(total=Sum('requested_qty')).values_list('delivery_order__customer_id', 'item_id', 'total'):
+        key = (customer_id, item_id)
+        available[key] = available.get(key, 0) - (total or 0)
+    return available
+
+def _grn_lines_with_availability(grn_items, available):
+    """[(grn_item, available_qty)] for the GRN lines that still have stock, in GRN order.
+
+    Stock is issued first in, first out, so an item's available quantity is
+    assigned to its most recent GRN lines first, each taking at most what it
+    received.
+    """
+    remaining = dict(available)
+    lines = []
+    for grn_item in reversed(list(grn_items)):
+        key = (grn_item.grn.customer_id, grn_item.item_id)
+        quantity = min(grn_item.received_qty or 0, remaining.get(key) or 0)
+        if quantity > 0:
+            remaining[key] -= quantity
+            lines.append((grn_item, quantity))
+    return lines[::-1]
+
+def _available_grn_items(customer_ids):
+    """GRN lines of the customers' received and completed GRNs, oldest first; draft GRNs have no stock on hand yet"""
+    from grn.models import GRNItem
+    
+    return GRNItem.objects.filter(
+        grn__customer_id__in=customer_ids,
+        grn__status__in=['received', 'completed'],
+        item__isnull=False,
+    ).select_related('grn', 'item').order_by('grn__grn_date', 'grn_id', 'id')
+
 @login_required
 def get_customer_items(request, customer_id):
     """AJAX endpoint to get available items for a customer from GRNs"""
     try:
-        from grn.models import GRN, GRNItem
-        from django.db.models import Sum, F
+        from job.models import JobCargo
         
         # Get current delivery order ID if editing (from request parameters)
         current_do_id = request.GET.get('current_do_id')
         if current_do_id == 'None':
             current_do_id = None
         
-        # Get all GRNs for the customer that have draft or received status
-        grns = GRN.objects.filter(
-            customer_id=customer_id,
-            status__in=['draft', 'received']
-        ).prefetch_related('items')
+        available = _available_by_item([customer_id], current_do_id)
+        lines = _grn_lines_with_availability(_available_grn_items([customer_id]), available)
         
-        items_data = []
+        # Rate and amount from the job cargo of each GRN's job: matched on the item,
+        # else on the item code, first entry wins
+        cargo_by_item = {}
+        cargo_by_code = {}
+        job_ids = {grn_item.grn.job_ref_id for grn_item, _ in lines if grn_item.grn.job_ref_id}
+        for cargo in JobCargo.objects.filter(job_id__in=job_ids):
+            if cargo.item_id:
+                cargo_by_item.setdefault((cargo.job_id, cargo.item_id), cargo)
+            cargo_by_code.setdefault((cargo.job_id, cargo.item_code), cargo)
         
-        for grn in grns:
-            # Get all items from this GRN
-            grn_items = GRNItem.objects.filter(grn=grn).select_related('item')
-            
-            for grn_item in grn_items:
-                # Calculate used quantity from existing delivery orders
-                # Exclude the current delivery order if editing
-                used_qty_query = DeliveryOrderItem.objects.filter(
-                    item=grn_item.item,
-                    delivery_order__customer_id=customer_id
+        items_data = []
+        for grn_item, available_qty in lines:
+            grn = grn_item.grn
+            job_cargo = None
+            if grn.job_ref_id:
+                job_cargo = (
+                    cargo_by_item.get((grn.job_ref_id, grn_item.item_id))
+                    or cargo_by_code.get((grn.job_ref_id, grn_item.item_code))
                 )
-                
-                if current_do_id:
-                    # Exclude current delivery order from used quantity calculation
-                    used_qty_query = used_qty_query.exclude(delivery_order_id=current_do_id)
-                
-                used_qty = used_qty_query.aggregate(
-                    total_used=Sum('requested_qty')
-                )['total_used'] or 0
-                
-                # Calculate available quantity
-                available_qty = float(grn_item.received_qty or 0) - float(used_qty)
-                
-                if available_qty > 0:
-                    # Calculate weights and amounts
-                    n_weight = float(grn_item.net_weight or 0)
-                    g_weight = float(grn_item.gross_weight or 0)
-                    volume = float(grn_item.volume or 0)
-                    
-                    # Get rate and amount from job cargo if GRN has job reference
-                    rate = 0.0
-                    amount = 0.0
-                    
-                    if grn.job_ref:
-                        from job.models import JobCargo
-                        # Try to find matching job cargo item
-                        job_cargo = JobCargo.objects.filter(
-                            job=grn.job_ref,
-                            item=grn_item.item
-                        ).first()
-                        
-                        if job_cargo:
-                            rate = float(job_cargo.rate or 0)
-                            amount = float(job_cargo.amount or 0)
-                        else:
-                            # If no exact item match, try to find by item code
-                            job_cargo = JobCargo.objects.filter(
-                                job=grn.job_ref,
-                                item_code=grn_item.item_code
-                            ).first()
-                            
-                            if job_cargo:
-                                rate = float(job_cargo.rate or 0)
-                                amount = float(job_cargo.amount or 0)
-                    
-                    # Get ED number from GRNItem ed field
-                    ed_number = grn_item.ed or ''
-                    
-                    items_data.append({
-                        'id': grn_item.id,
-                        'grn_id': grn.id,
-                        'grn_number': grn.grn_number,
-                        'item_code': grn_item.item_code or '',
-                        'item_name': grn_item.item_name or grn_item.item.item_name if grn_item.item else '',
-                        'hs_code': grn_item.hs_code or '',  # Use GRN item hs_code
-                        'unit': grn_item.unit or '',
-                        'quantity': available_qty,
-                        'original_quantity': float(grn_item.received_qty or 0),
-                        'used_quantity': float(used_qty),
-                        'coo': grn_item.coo or '',
-                        'n_weight': n_weight,
-                        'g_weight': g_weight,
-                        'volume': volume,
-                        'p_date': grn_item.p_date.strftime('%Y-%m-%d') if grn_item.p_date else '',
-                        'expiry_date': grn_item.expiry_date.strftime('%Y-%m-%d') if grn_item.expiry_date else '',
-                        'color': grn_item.color or '',
-                        'size': grn_item.size or '',
-                        'barcode': grn_item.batch_number or '',  # Using batch_number as barcode
-                        'rate': rate,
-                        'amount': amount,
-                        'ed': ed_number,
-                    })
+            rate = float(job_cargo.rate or 0) if job_cargo else 0.0
+            amount = float(job_cargo.amount or 0) if job_cargo else 0.0
+            
+            items_data.append({
+                'id': grn_item.id,
+                'grn_id': grn.id,
+                'grn_number': grn.grn_number,
+                'item_code': grn_item.item_code or '',
+                'item_name': grn_item.item_name or grn_item.item.item_name,
+                'hs_code': grn_item.hs_code or '',  # Use GRN item hs_code
+                'unit': grn_item.unit or '',
+                'quantity': float(available_qty),
+                'original_quantity': float(grn_item.received_qty or 0),
+                'used_quantity': float((grn_item.received_qty or 0) - available_qty),
+                'coo': grn_item.coo or '',
+                'n_weight': float(grn_item.net_weight or 0),
+                'g_weight': float(grn_item.gross_weight or 0),
+                'volume': float(grn_item.volume or 0),
+                'p_date': grn_item.p_date.strftime('%Y-%m-%d') if grn_item.p_date else '',
+                'expiry_date': grn_item.expiry_date.strftime('%Y-%m-%d') if grn_item.expiry_date else '',
+                'color': grn_item.color or '',
+                'size': grn_item.size or '',
+                'barcode': grn_item.batch_number or '',  # Using batch_number as barcode
+                'rate': rate,
+                'amount': amount,
+                'ed': grn_item.ed or '',
+            })
         
         return JsonResponse({
             'success': True,
@@ -681,66 +699,34 @@ def get_customers_with_grns(request):
     """AJAX endpoint to get customers who have available GRNs"""
     try:
         from customer.models import Customer
-        from grn.models import GRN, GRNItem
-        from django.db.models import Sum, Q
         
         # Get current delivery order ID if editing (from request parameters)
         current_do_id = request.GET.get('current_do_id')
         if current_do_id == 'None':
             current_do_id = None
         
-        # Get customers who have GRNs with draft or received status
-        customers_with_grns = Customer.objects.filter(
-            grn__status__in=['draft', 'received']
-        ).distinct().order_by('customer_name')
-        
-        customers_data = []
-        
-        for customer in customers_with_grns:
-            # Get all GRNs for this customer with draft or received status
-            grns = GRN.objects.filter(
-                customer=customer,
-                status__in=['draft', 'received']
-            )
-            
-            # Check if any GRN has available items
-            has_available_items = False
-            total_available_items = 0
-            
-            for grn in grns:
-                grn_items = GRNItem.objects.filter(grn=grn)
-                
-                for grn_item in grn_items:
-                    # Calculate used quantity from existing delivery orders
-                    # Exclude the current delivery order if editing
-                    used_qty_query = DeliveryOrderItem.objects.filter(
-                        item=grn_item.item,
-                        delivery_order__customer=customer
-                    )
-                    
-                    if current_do_id:
-                        # Exclude current delivery order from used quantity calculation
-                        used_qty_query = used_qty_query.exclude(delivery_order_id=current_do_id)
-                    
-                    used_qty = used_qty_query.aggregate(
-                        total_used=Sum('requested_qty')
-                    )['total_used'] or 0
-                    
-                    # Calculate available quantity
-                    available_qty = float(grn_item.received_qty or 0) - float(used_qty)
-                    
-                    if available_qty > 0:
-                        has_available_items = True
-                        total_available_items += 1
-            
-            # Only include customers who have available items
-            if has_available_items:
-                customers_data.append({
-                    'id': customer.id,
-                    'name': customer.customer_name,
-                    'code': customer.customer_code,
-                    'available_items_count': total_available_items
-                })
+        # Get customers who have GRNs with draft, received or completed status
+        customers_with_grns = list(Customer.objects.filter(
+            grn__status__in=['draft', 'received', 'completed']
+        ).distinct().order_by('customer_name'))
+        customer_ids = [customer.id for customer in customers_with_grns]
+        
+        available = _available_by_item(customer_ids, current_do_id)
+        available_items_count = {}
+        for grn_item, _ in _grn_lines_with_availability(_available_grn_items(customer_ids), available):
+            customer_id = grn_item.grn.customer_id
+            available_items_count[customer_id] = available_items_count.get(customer_id, 0) + 1
+        
+        # Only include customers who have available items
+        customers_data = [
+            {
+                'id': customer.id,
+                'name': customer.customer_name,
+                'code': customer.customer_code,
+                'available_items_count': available_items_count[customer.id]
+            }
+            for customer in customers_with_grns if customer.id in available_items_count
+        ]
         
         return JsonResponse({
             'success': True,
@@ -800,43 +786,34 @@ def send_delivery_order_email(request, pk):
         
         # Render email template
         html_content = render_to_string('delivery_order/email_template.html', context)
-        text_content = strip_tags(html_content)
         
-        # Create email message
-        email = EmailMessage(
+        # The PDF is converted and the email sent in the background
+        attachments = []
+        if include_pdf:
+            html_string = render_to_string('delivery_order/delivery_order_print.html', {
+                'delivery_order': delivery_order,
+            })
+            attachments.append((
+                f'Delivery_Order_{delivery_order.do_number}.pdf',
+                [document_part(delivery_order, 'delivery_order', html_string)]
+            ))
+        
+        email = queue_document_email(
+            delivery_order,
             subject=email_subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
+            body=html_content,
             to=[recipient_email],
-            cc=[cc_email] if cc_email else None,
+            cc=[cc_email],
+            attachments=attachments,
+            html_body=True,
+            user=request.user,
         )
-        email.content_subtype = "html"
-        
-        # Add PDF attachment if requested
-        if include_pdf:
-            try:
-                # Generate PDF (you may need to implement PDF generation)
-                pdf_path = generate_delivery_order_pdf(delivery_order)
-                if pdf_path and os.path.exists(pdf_path):
-                    with open(pdf_path, 'rb') as pdf_file:
-                        email.attach(
-                            f'Delivery_Order_{delivery_order.do_number}.pdf',
-                            pdf_file.read(),
-                            'application/pdf'
-                        )
-            except Exception as e:
-                # Log the error but continue without PDF
-                print(f"Error generating PDF: {e}")
-        
-        # Send email
-        email.send()
-        
-        # Log the email action
-        print(f"Email sent for Delivery Order {delivery_order.do_number} to {recipient_email}")
         
         return JsonResponse({
             'success': True,
-            'message': f'Email sent successfully to {recipient_email}'
+            'message': f'Email to {recipient_email} has been queued and will be sent shortly',
+            'email_id': email.pk,
+            'status_url': reverse('email_configuration:document_email_status', args=[email.pk]),
         })
         
     except Exception as e:
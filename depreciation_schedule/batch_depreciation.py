@@ -0,0 +1,362 @@
+"""
+Batch depreciation engine for depreciation schedules.
+
+Straight-line and declining-balance charges are computed for every eligible
+asset at once with vectorized pandas/NumPy arithmetic in integer cents, one
+month of the schedule at a time, so the book value rolls forward correctly
+across multi-month schedules. Entries are written with bulk inserts and one
+summarized journal entry is posted per asset category. A calculation can be
+previewed without writing anything, and a posted or calculated run can be
+rolled back.
+"""
+import logging
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.utils import timezone
+
+from asset_register.models import Asset
+from general_journal.models import JournalEntry, JournalEntryLine
+from ledger.models import Ledger
+from .models import DepreciationSchedule, DepreciationEntry
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 1000
+
+ASSET_COLUMNS = [
+    'id', 'category_id', 'category__name', 'created_at',
+    'purchase_value', 'salvage_value', 'useful_life_years',
+    'book_value', 'accumulated_depreciation',
+    'depreciation_method__method', 'depreciation_method__rate_percentage',
+]
+
+
+def to_cents(series):
+    """Convert a column of Decimals to int64 cents"""
+    return (series.fillna(Decimal('0')).map(Decimal) * 100).astype('float64').round().astype('int64')
+
+
+def from_cents(cents):
+    return (Decimal(int(cents)) / 100).quantize(Decimal('0.01'))
+
+
+class BatchDepreciationEngine:
+    """Calculates, posts and rolls back depreciation for a whole schedule"""
+
+    def __init__(self, schedule, user=None):
+        self.schedule = schedule
+        self.user = user
+
+    def get_periods(self):
+        """First day of every month covered by the schedule"""
+        periods = []
+        current = self.schedule.start_date.replace(day=1)
+        while current <= self.schedule.end_date:
+            periods.append(current)
+            current += relativedelta(months=1)
+        return periods
+
+    def load_assets(self):
+        """Eligible assets as a DataFrame, with money columns in cents"""
+        rows = Asset.objects.filter(
+            is_deleted=False,
+            disposal_date__isnull=True,
+            purchase_value__gt=0,
+            useful_life_years__gt=0
+        ).values_list(*ASSET_COLUMNS).order_by()
+        frame = pd.DataFrame.from_records(list(rows), columns=ASSET_COLUMNS)
+        if frame.empty:
+            return frame
+
+        for column in ('purchase_value', 'salvage_value', 'book_value', 'accumulated_depreciation'):
+            frame[column] = to_cents(frame[column])
+        frame['rate_percentage'] = frame['depreciation_method__rate_percentage'].fillna(0).astype('float64')
+        frame['method'] = frame['depreciation_method__method']
+        frame['acquired'] = pd.to_datetime(frame['created_at'], utc=True).dt.tz_localize(None).dt.normalize()
+        return frame
+
+    def compute(self, frame=None):
+        """
+        Return one row per (asset, period) with a positive charge.
+
+        The straight-line charge is (cost - salvage) / useful life in months,
+        the declining-balance charge is book value * annual rate / 12, and
+        neither takes the book value below salvage.
+        """
+        if frame is None:
+            frame = self.load_assets()
+        columns = ['asset_id', 'category_id', 'category_name', 'period', 'opening_value',
+                   'depreciation_amount', 'accumulated_depreciation', 'closing_value']
+        if frame.empty:
+            return pd.DataFrame(columns=columns)
+
+        straight_line = frame['method'].eq('straight_line').to_numpy()
+        declining = frame['method'].eq('declining_balance').to_numpy()
+        salvage = frame['salvage_value'].to_numpy()
+        life_months = frame['useful_life_years'].to_numpy(dtype='int64') * 12
+        straight_line_charge = np.rint(
+            (frame['purchase_value'].to_numpy() - salvage) / np.maximum(life_months, 1)
+        ).astype('int64')
+        monthly_rate = frame['rate_percentage'].to_numpy() / 100 / 12
+        acquired = frame['acquired'].to_numpy(dtype='datetime64[D]')
+
+        book = frame['book_value'].to_numpy().copy()
+        accumulated = frame['accumulated_depreciation'].to_numpy().copy()
+
+        results = []
+        for period in self.get_periods():
+            remaining = book - salvage
+            eligible = (acquired <= np.datetime64(period)) & (remaining > 0)
+            charge = np.zeros(len(frame), dtype='int64')
+            charge[straight_line] = straight_line_charge[straight_line]
+            charge[declining] = np.rint(book[declining] * monthly_rate[declining]).astype('int64')
+            charge = np.where(eligible, np.minimum(charge, remaining), 0)
+
+            charged = charge > 0
+            if charged.any():
+                results.append(pd.DataFrame({
+                    'asset_id': frame['id'].to_numpy()[charged],
+                    'category_id': frame['category_id'].to_numpy()[charged],
+                    'category_name': frame['category__name'].to_numpy()[charged],
+                    'period': period,
+                    'opening_value': book[charged],
+                    'depreciation_amount': charge[charged],
+                    'accumulated_depreciation': accumulated[charged] + charge[charged],
+                    'closing_value': book[charged] - charge[charged],
+                }))
+            book = book - charge
+            accumulated = accumulated + charge
+
+        if not results:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(results, ignore_index=True)[columns]
+
+    @staticmethod
+    def summarize(rows):
+        """Totals for the whole run and per asset category"""
+        if rows.empty:
+            return {
+                'total_assets': 0,
+                'total_entries': 0,
+                'total_depreciation': Decimal('0.00'),
+                'categories': [],
+            }
+
+        grouped = rows.groupby(['category_id', 'category_name'], sort=True).agg(
+            asset_count=('asset_id', 'nunique'),
+            depreciation=('depreciation_amount', 'sum'),
+        ).reset_index()
+        return {
+            'total_assets': int(rows['asset_id'].nunique()),
+            'total_entries': len(rows),
+            'total_depreciation': from_cents(rows['depreciation_amount'].sum()),
+            'categories': [
+                {
+                    'category_id': int(row.category_id),
+                    'category_name': row.category_name,
+                    'asset_count': int(row.asset_count),
+                    'depreciation': from_cents(row.depreciation),
+                }
+                for row in grouped.itertuples(index=False)
+            ],
+        }
+
+    def preview(self):
+        """Compute the run without writing anything"""
+        return self.summarize(self.compute())
+
+    def calculate(self):
+        """Replace the schedule's entries with a fresh batch calculation"""
+        schedule = self.schedule
+        if schedule.status == 'posted':
+            raise ValueError("Roll back the posted schedule before recalculating it")
+
+        rows = self.compute()
+        summary = self.summarize(rows)
+
+        with transaction.atomic():
+            schedule.depreciation_entries.all().delete()
+            DepreciationEntry.objects.bulk_create([
+                DepreciationEntry(
+                    schedule=schedule,
+                    asset_id=row.asset_id,
+                    period=row.period,
+                    opening_value=from_cents(row.opening_value),
+                    depreciation_amount=from_cents(row.depreciation_amount),
+                    accumulated_depreciation=from_cents(row.accumulated_depreciation),
+                    closing_value=from_cents(row.closing_value),
+                )
+                for row in rows.itertuples(index=False)
+            ], batch_size=BULK_BATCH_SIZE)
+
+            schedule.total_depreciation = summary['total_depreciation']
+            schedule.total_assets = summary['total_assets']
+            schedule.status = 'calculated'
+            schedule.updated_by = self.user or schedule.updated_by
+            schedule.save()
+
+        logger.info(
+            f'Calculated depreciation schedule {schedule.schedule_number}: '
+            f'{summary["total_entries"]} entries, {summary["total_depreciation"]} total'
+        )
+        return summary
+
+    def _lock_status(self):
+        """Lock the schedule row and return its committed status"""
+        return DepreciationSchedule.objects.select_for_update().filter(
+            pk=self.schedule.pk
+        ).values_list('status', flat=True).first()
+
+    def _category_totals(self):
+        """Per category depreciation totals from the stored entries"""
+        rows = self.schedule.depreciation_entries.values_list(
+            'asset__category_id', 'asset__category__name', 'depreciation_amount'
+        ).order_by()
+        frame = pd.DataFrame.from_records(
+            list(rows), columns=['category_id', 'category_name', 'depreciation_amount']
+        )
+        if frame.empty:
+            return []
+        frame['depreciation_amount'] = to_cents(frame['depreciation_amount'])
+        grouped = frame.groupby(['category_id', 'category_name'], sort=True)['depreciation_amount'].sum()
+        return [
+            (category_id, category_name, from_cents(cents))
+            for (category_id, category_name), cents in grouped.items()
+            if cents > 0
+        ]
+
+    def post(self):
+        """Post one summarized journal entry per asset category and update the assets"""
+        schedule = self.schedule
+        if schedule.status != 'calculated':
+            return False, "Schedule must be calculated before posting"
+        if schedule.total_depreciation <= 0:
+            return False, "No depreciation to post"
+
+        fiscal_year = schedule.get_fiscal_year()
+        if not fiscal_year:
+            return False, "No fiscal year covers the schedule period"
+
+        user = self.user or schedule.created_by
+        period_label = schedule.start_date.strftime('%B %Y')
+        with transaction.atomic():
+            # Serialize concurrent posting of the same schedule
+            if self._lock_status() != 'calculated':
+                return False, "Schedule must be calculated before posting"
+
+            journal_entries = []
+            for category_id, category_name, amount in self._category_totals():
+                # Created one at a time so JournalEntry.save assigns the journal number
+                journal_entry = JournalEntry.objects.create(
+                    date=schedule.end_date,
+                    reference=f"Depreciation Schedule {schedule.schedule_number}",
+                    description=f"Depreciation for {period_label} - {category_name}",
+                    total_debit=amount,
+                    total_credit=amount,
+                    status='draft',
+                    company=schedule.depreciation_expense_account.company,
+                    fiscal_year=fiscal_year,
+                    created_by=user
+                )
+                JournalEntryLine.objects.bulk_create([
+                    JournalEntryLine(
+                        journal_entry=journal_entry,
+                        account=schedule.depreciation_expense_account,
+                        description=f"Depreciation expense - {category_name} - {period_label}",
+                        debit_amount=amount,
+                        credit_amount=Decimal('0.00')
+                    ),
+                    JournalEntryLine(
+                        journal_entry=journal_entry,
+                        account=schedule.accumulated_depreciation_account,
+                        description=f"Accumulated depreciation - {category_name} - {period_label}",
+                        debit_amount=Decimal('0.00'),
+                        credit_amount=amount
+                    ),
+                ])
+                if not journal_entry.post(user):
+                    raise ValueError(f"Failed to post journal entry for category {category_name}")
+                journal_entries.append(journal_entry)
+
+            schedule.journal_entries.set(journal_entries)
+            schedule.journal_entry = journal_entries[0] if journal_entries else None
+            schedule.status = 'posted'
+            schedule.posted_by = user
+            schedule.posted_at = timezone.now()
+            schedule.save()
+            self.update_asset_records()
+
+        logger.info(
+            f'Posted depreciation schedule {schedule.schedule_number}: '
+            f'{len(journal_entries)} category journal entries'
+        )
+        return True, f"Depreciation posted successfully in {len(journal_entries)} journal entries"
+
+    @staticmethod
+    def _bulk_set_asset_values(values):
+        """Write {asset_id: (accumulated_depreciation, book_value)} in batches"""
+        assets = list(Asset.objects.filter(pk__in=values.keys()).only('id'))
+        for asset in assets:
+            asset.accumulated_depreciation, asset.book_value = values[asset.pk]
+        Asset.objects.bulk_update(assets, ['accumulated_depreciation', 'book_value'], batch_size=BULK_BATCH_SIZE)
+        return len(assets)
+
+    def update_asset_records(self):
+        """Carry each asset's closing position from its last period"""
+        values = {}
+        entries = self.schedule.depreciation_entries.order_by('asset_id', '-period').values_list(
+            'asset_id', 'accumulated_depreciation', 'closing_value'
+        )
+        for asset_id, accumulated, closing_value in entries:
+            values.setdefault(asset_id, (accumulated, closing_value))
+        return self._bulk_set_asset_values(values)
+
+    def _restore_asset_records(self):
+        """Put each asset back to its opening position from its first period"""
+        values = {}
+        entries = self.schedule.depreciation_entries.order_by('asset_id', 'period').values_list(
+            'asset_id', 'opening_value', 'accumulated_depreciation', 'depreciation_amount'
+        )
+        for asset_id, opening_value, accumulated, amount in entries:
+            values.setdefault(asset_id, (accumulated - amount, opening_value))
+        return self._bulk_set_asset_values(values)
+
+    def rollback(self):
+        """
+        Undo a calculated or posted run and return the schedule to draft.
+
+        For a posted schedule the category journal entries and their ledger
+        postings are removed and the assets are restored to their opening values.
+        """
+        schedule = self.schedule
+        with transaction.atomic():
+            status = self._lock_status()
+            if status not in ('calculated', 'posted'):
+                return False, "Only calculated or posted schedules can be rolled back"
+
+            if status == 'posted':
+                self._restore_asset_records()
+                journal_entries = list(schedule.journal_entries.all())
+                if not journal_entries and schedule.journal_entry:
+                    journal_entries = [schedule.journal_entry]
+                Ledger.objects.filter(
+                    reference__in=[journal_entry.journal_number for journal_entry in journal_entries]
+                ).delete()
+                JournalEntry.objects.filter(pk__in=[journal_entry.pk for journal_entry in journal_entries]).delete()
+
+            schedule.depreciation_entries.all().delete()
+            schedule.journal_entry = None
+            schedule.total_depreciation = Decimal('0.00')
+            schedule.total_assets = 0
+            schedule.status = 'draft'
+            schedule.posted_by = None
+            schedule.posted_at = None
+            schedule.updated_by = self.user or schedule.updated_by
+            schedule.save()
+
+        logger.info(f'Rolled back depreciation schedule {schedule.schedule_number}')
+        return True, "Depreciation schedule rolled back to draft"
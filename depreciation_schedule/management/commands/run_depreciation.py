@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+
+from depreciation_schedule.models import DepreciationSchedule
+from depreciation_schedule.batch_depreciation import BatchDepreciationEngine
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Calculate (and optionally post or roll back) a depreciation schedule in batch'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'schedule_number',
+            help='Schedule number of the depreciation schedule, e.g. DS-2025-01-0001',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the depreciation per asset category without writing anything',
+        )
+        parser.add_argument(
+            '--post',
+            action='store_true',
+            help='Post one journal entry per asset category after calculating',
+        )
+        parser.add_argument(
+            '--rollback',
+            action='store_true',
+            help='Roll a calculated or posted schedule back to draft',
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded on the journal entries',
+        )
+    
+    def handle(self, *args, **options):
+        try:
+            schedule = DepreciationSchedule.objects.get(schedule_number=options['schedule_number'])
+        except DepreciationSchedule.DoesNotExist:
+            raise CommandError(f'Depreciation schedule "{options["schedule_number"]}" not found')
+        
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        
+        engine = BatchDepreciationEngine(schedule, user=user)
+        
+        if options['rollback']:
+            success, message = engine.rollback()
+            if not success:
+                raise CommandError(message)
+            self.stdout.write(self.style.SUCCESS(message))
+            return
+        
+        if options['dry_run']:
+            preview = engine.preview()
+            for category in preview['categories']:
+                self.stdout.write(
+                    f'{category["category_name"]}: {category["asset_count"]} assets, '
+                    f'{category["depreciation"]:,.2f}'
+                )
+            self.stdout.write(
+                f'Total: {preview["total_assets"]} assets, {preview["total_entries"]} entries, '
+                f'{preview["total_depreciation"]:,.2f}'
+            )
+            return
+        
+        try:
+            summary = engine.calculate()
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Calculated {schedule.schedule_number}: {summary["total_assets"]} assets, '
+                f'{summary["total_entries"]} entries, {summary["total_depreciation"]:,.2f}'
+            )
+        )
+        
+        if options['post']:
+            success, message = engine.post()
+            if not success:
+                raise CommandError(message)
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.23 on 2026-10-18 21:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general_journal', '0001_initial'),
+        ('depreciation_schedule', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='depreciationschedule',
+            name='journal_entries',
+            field=models.ManyToManyField(blank=True, help_text='Summarized journal entries posted per asset category', related_name='depreciation_category_schedules', to='general_journal.journalentry'),
+        ),
+    ]
@@ -1,14 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
-from django.utils import timezone
-from decimal import Decimal
 import uuid
 from datetime import date, datetime
-from dateutil.relativedelta import relativedelta
 from asset_register.models import Asset
 from chart_of_accounts.models import ChartOfAccount
-from general_journal.models import JournalEntry, JournalEntryLine
+from general_journal.models import JournalEntry
 from fiscal_year.models import FiscalYear
 
 
@@ -57,6 +54,12 @@ class DepreciationSchedule(models.Model):
         blank=True, 
         related_name='depreciation_schedules'
     )
+    journal_entries = models.ManyToManyField(
+        JournalEntry,
+        blank=True,
+        related_name='depreciation_category_schedules',
+        help_text="Summarized journal entries posted per asset category"
+    )
     
     # Audit Fields
     created_by = models.ForeignKey(User, on_delete=models.PROTECT, related_name='created_depreciation_schedules')
@@ -100,173 +103,27 @@ class DepreciationSchedule(models.Model):
     
     def calculate_depreciation(self):
         """Calculate depreciation for all eligible assets"""
-        # Clear existing calculations
-        self.depreciation_entries.all().delete()
-        
-        # Get eligible assets
-        assets = Asset.objects.filter(
-            is_deleted=False,
-            disposal_date__isnull=True,
-            purchase_value__gt=0,
-            useful_life_years__gt=0
-        )
-        
-        total_depreciation = Decimal('0.00')
-        total_assets = 0
+        from .batch_depreciation import BatchDepreciationEngine
         
-        for asset in assets:
-            entries = self.calculate_asset_depreciation(asset)
-            if entries:
-                total_depreciation += sum(entry.depreciation_amount for entry in entries)
-                total_assets += 1
-        
-        self.total_depreciation = total_depreciation
-        self.total_assets = total_assets
-        self.status = 'calculated'
-        self.save()
-        
-        return total_depreciation
-    
-    def calculate_asset_depreciation(self, asset):
-        """Calculate depreciation for a specific asset"""
-        entries = []
-        current_date = self.start_date
-        
-        while current_date <= self.end_date:
-            # Check if asset is eligible for depreciation on this date
-            if self.is_asset_eligible_for_depreciation(asset, current_date):
-                depreciation_amount = self.calculate_monthly_depreciation(asset, current_date)
-                
-                if depreciation_amount > 0:
-                    entry = DepreciationEntry.objects.create(
-                        schedule=self,
-                        asset=asset,
-                        period=current_date.replace(day=1),
-                        opening_value=asset.book_value,
-                        depreciation_amount=depreciation_amount,
-                        accumulated_depreciation=asset.accumulated_depreciation + depreciation_amount,
-                        closing_value=asset.book_value - depreciation_amount
-                    )
-                    entries.append(entry)
-            
-            # Move to next month
-            current_date = current_date + relativedelta(months=1)
-        
-        return entries
-    
-    def is_asset_eligible_for_depreciation(self, asset, date):
-        """Check if asset is eligible for depreciation on given date"""
-        # Asset must be purchased before or on the date
-        if asset.created_at.date() > date:
-            return False
-        
-        # Asset must not be disposed
-        if asset.disposal_date and asset.disposal_date <= date:
-            return False
-        
-        # Asset must not be fully depreciated
-        if asset.book_value <= asset.salvage_value:
-            return False
-        
-        return True
-    
-    def calculate_monthly_depreciation(self, asset, date):
-        """Calculate monthly depreciation for an asset"""
-        if asset.depreciation_method.method == 'straight_line':
-            return self.calculate_straight_line_depreciation(asset, date)
-        elif asset.depreciation_method.method == 'declining_balance':
-            return self.calculate_declining_balance_depreciation(asset, date)
-        else:
-            return Decimal('0.00')
-    
-    def calculate_straight_line_depreciation(self, asset, date):
-        """Calculate straight-line depreciation"""
-        depreciable_amount = asset.purchase_value - asset.salvage_value
-        useful_life_months = asset.useful_life_years * 12
-        
-        if useful_life_months <= 0:
-            return Decimal('0.00')
-        
-        monthly_depreciation = depreciable_amount / useful_life_months
-        
-        # Check if this would exceed the remaining book value
-        remaining_value = asset.book_value - asset.salvage_value
-        if monthly_depreciation > remaining_value:
-            monthly_depreciation = remaining_value
-        
-        return monthly_depreciation.quantize(Decimal('0.01'))
-    
-    def calculate_declining_balance_depreciation(self, asset, date):
-        """Calculate declining balance depreciation"""
-        rate = asset.depreciation_method.rate_percentage / 100 / 12  # Monthly rate
-        depreciation = asset.book_value * rate
-        
-        # Ensure we don't depreciate below salvage value
-        remaining_value = asset.book_value - asset.salvage_value
-        if depreciation > remaining_value:
-            depreciation = remaining_value
-        
-        return depreciation.quantize(Decimal('0.01'))
+        return BatchDepreciationEngine(self).calculate()['total_depreciation']
     
     def post_to_general_ledger(self, user):
-        """Post depreciation to general ledger"""
-        if self.status != 'calculated':
-            return False, "Schedule must be calculated before posting"
-        
-        if self.total_depreciation <= 0:
-            return False, "No depreciation to post"
+        """Post depreciation to general ledger, one journal entry per asset category"""
+        from .batch_depreciation import BatchDepreciationEngine
         
-        # Create journal entry
-        journal_entry = JournalEntry.objects.create(
-            date=self.end_date,
-            reference=f"Depreciation Schedule {self.schedule_number}",
-            description=f"Monthly depreciation for {self.start_date.strftime('%B %Y')}",
-            status='draft',
-            company=self.depreciation_expense_account.company,
-            fiscal_year=self.get_fiscal_year(),
-            created_by=user
-        )
-        
-        # Create journal entry lines
-        JournalEntryLine.objects.create(
-            journal_entry=journal_entry,
-            account=self.depreciation_expense_account,
-            description=f"Depreciation expense for {self.start_date.strftime('%B %Y')}",
-            debit_amount=self.total_depreciation,
-            credit_amount=Decimal('0.00')
-        )
-        
-        JournalEntryLine.objects.create(
-            journal_entry=journal_entry,
-            account=self.accumulated_depreciation_account,
-            description=f"Accumulated depreciation for {self.start_date.strftime('%B %Y')}",
-            debit_amount=Decimal('0.00'),
-            credit_amount=self.total_depreciation
-        )
+        return BatchDepreciationEngine(self, user=user).post()
+    
+    def rollback(self, user=None):
+        """Undo a calculated or posted run and return the schedule to draft"""
+        from .batch_depreciation import BatchDepreciationEngine
         
-        # Post the journal entry
-        if journal_entry.post(user):
-            self.journal_entry = journal_entry
-            self.status = 'posted'
-            self.posted_by = user
-            self.posted_at = timezone.now()
-            self.save()
-            
-            # Update asset records
-            self.update_asset_records()
-            
-            return True, "Depreciation posted successfully"
-        else:
-            journal_entry.delete()
-            return False, "Failed to post journal entry"
+        return BatchDepreciationEngine(self, user=user).rollback()
     
     def update_asset_records(self):
         """Update asset accumulated depreciation and book values"""
-        for entry in self.depreciation_entries.all():
-            asset = entry.asset
-            asset.accumulated_depreciation = entry.accumulated_depreciation
-            asset.book_value = entry.closing_value
-            asset.save()
+        from .batch_depreciation import BatchDepreciationEngine
+        
+        return BatchDepreciationEngine(self).update_asset_records()
     
     def get_fiscal_year(self):
         """Get the fiscal year for the schedule period"""
@@ -1,3 +1,159 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import date, datetime, timezone
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from asset_register.models import Asset, AssetCategory, AssetDepreciation, AssetLocation, AssetStatus
+from chart_of_accounts.models import AccountType, ChartOfAccount
+from company.company_model import Company
+from fiscal_year.models import FiscalYear
+from general_journal.models import JournalEntry
+from ledger.models import Ledger
+from multi_currency.models import Currency
+from .batch_depreciation import BatchDepreciationEngine
+from .models import DepreciationEntry, DepreciationSchedule
+
+
+class BatchDepreciationTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        company = Company.objects.create(
+            name='Test Company', code='TST', address='1 Test Street', phone='1234567', email='info@example.com'
+        )
+        currency = Currency.objects.create(pk=1, code='AED', name='UAE Dirham', symbol='AED')
+        FiscalYear.objects.create(
+            name='FY2025', start_date=date(2025, 1, 1), end_date=date(2025, 12, 31), status='active'
+        )
+        expense_type = AccountType.objects.create(name='Expenses', category='EXPENSE')
+        asset_type = AccountType.objects.create(name='Assets', category='ASSET')
+        self.expense_account = ChartOfAccount.objects.create(
+            account_code='6100', name='Depreciation Expense', account_type=expense_type,
+            currency=currency, company=company
+        )
+        self.accumulated_account = ChartOfAccount.objects.create(
+            account_code='1590', name='Accumulated Depreciation', account_type=asset_type,
+            currency=currency, company=company
+        )
+        self.location = AssetLocation.objects.create(name='Head Office')
+        self.status = AssetStatus.objects.create(name='In Use')
+        self.vehicles = AssetCategory.objects.create(name='Vehicles')
+        self.equipment = AssetCategory.objects.create(name='Equipment')
+        self.straight_line = AssetDepreciation.objects.create(name='Straight line', method='straight_line')
+        self.declining = AssetDepreciation.objects.create(
+            name='Declining 12%', method='declining_balance', rate_percentage=Decimal('12.00')
+        )
+        self.schedule = DepreciationSchedule.objects.create(
+            name='Q1 2025', start_date=date(2025, 1, 1), end_date=date(2025, 3, 31),
+            depreciation_expense_account=self.expense_account,
+            accumulated_depreciation_account=self.accumulated_account,
+            created_by=self.user
+        )
+
+    def create_asset(self, code, category, method, value, salvage='0.00', accumulated='0.00',
+                     life=1, acquired=date(2024, 12, 1)):
+        asset = Asset.objects.create(
+            asset_code=code, asset_name=f'Asset {code}', category=category, location=self.location,
+            status=self.status, purchase_date=acquired, purchase_value=Decimal(value),
+            current_value=Decimal(value), salvage_value=Decimal(salvage),
+            accumulated_depreciation=Decimal(accumulated), depreciation_method=method,
+            useful_life_years=life, created_by=self.user
+        )
+        # Assets only depreciate from the month they were registered
+        Asset.objects.filter(pk=asset.pk).update(
+            created_at=datetime(acquired.year, acquired.month, acquired.day, tzinfo=timezone.utc)
+        )
+        return asset
+
+    def test_straight_line_and_declining_balance_charges(self):
+        truck = self.create_asset('AST-1', self.vehicles, self.straight_line, '12000.00')
+        press = self.create_asset('AST-2', self.equipment, self.declining, '10000.00')
+
+        rows = BatchDepreciationEngine(self.schedule).compute()
+
+        charges = {
+            (row.asset_id, row.period): row.depreciation_amount for row in rows.itertuples(index=False)
+        }
+        self.assertEqual(charges[(truck.pk, date(2025, 1, 1))], 100000)
+        self.assertEqual(charges[(truck.pk, date(2025, 3, 1))], 100000)
+        # The declining balance charge rolls forward on the reduced book value
+        self.assertEqual(charges[(press.pk, date(2025, 1, 1))], 10000)
+        self.assertEqual(charges[(press.pk, date(2025, 2, 1))], 9900)
+        self.assertEqual(charges[(press.pk, date(2025, 3, 1))], 9801)
+
+    def test_charge_stops_at_salvage_value_and_acquisition_month(self):
+        # 12.50 a month with 20.00 left above salvage
+        nearly_done = self.create_asset(
+            'AST-1', self.vehicles, self.straight_line, '1200.00', salvage='1050.00', accumulated='130.00'
+        )
+        late = self.create_asset('AST-2', self.vehicles, self.straight_line, '1200.00', acquired=date(2025, 2, 10))
+
+        rows = BatchDepreciationEngine(self.schedule).compute()
+
+        self.assertEqual(list(rows[rows.asset_id == nearly_done.pk].depreciation_amount), [1250, 750])
+        self.assertEqual(list(rows[rows.asset_id == late.pk].period), [date(2025, 3, 1)])
+
+    def test_preview_writes_nothing(self):
+        self.create_asset('AST-1', self.vehicles, self.straight_line, '12000.00')
+        self.create_asset('AST-2', self.equipment, self.declining, '10000.00')
+
+        summary = BatchDepreciationEngine(self.schedule).preview()
+
+        self.assertEqual(summary['total_assets'], 2)
+        self.assertEqual(summary['total_entries'], 6)
+        self.assertEqual(summary['total_depreciation'], Decimal('3297.01'))
+        self.assertEqual(
+            [(category['category_name'], category['depreciation']) for category in summary['categories']],
+            [('Vehicles', Decimal('3000.00')), ('Equipment', Decimal('297.01'))]
+        )
+        self.assertFalse(DepreciationEntry.objects.exists())
+
+    def test_post_and_rollback(self):
+        truck = self.create_asset('AST-1', self.vehicles, self.straight_line, '12000.00')
+        press = self.create_asset('AST-2', self.equipment, self.declining, '10000.00')
+        engine = BatchDepreciationEngine(self.schedule, user=self.user)
+        engine.calculate()
+
+        posted, message = engine.post()
+
+        self.assertTrue(posted, message)
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.status, 'posted')
+        self.assertEqual(self.schedule.journal_entries.count(), 2)
+        self.assertEqual(
+            sorted(Ledger.objects.filter(account=self.expense_account).values_list('amount', flat=True)),
+            [Decimal('297.01'), Decimal('3000.00')]
+        )
+        truck.refresh_from_db()
+        press.refresh_from_db()
+        self.assertEqual((truck.accumulated_depreciation, truck.book_value), (Decimal('3000.00'), Decimal('9000.00')))
+        self.assertEqual((press.accumulated_depreciation, press.book_value), (Decimal('297.01'), Decimal('9702.99')))
+
+        rolled_back, message = engine.rollback()
+
+        self.assertTrue(rolled_back, message)
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.status, 'draft')
+        self.assertFalse(JournalEntry.objects.exists())
+        self.assertFalse(Ledger.objects.exists())
+        self.assertFalse(DepreciationEntry.objects.exists())
+        truck.refresh_from_db()
+        self.assertEqual((truck.accumulated_depreciation, truck.book_value), (Decimal('0.00'), Decimal('12000.00')))
+
+    def test_posted_schedule_cannot_be_recalculated(self):
+        self.create_asset('AST-1', self.vehicles, self.straight_line, '12000.00')
+        engine = BatchDepreciationEngine(self.schedule, user=self.user)
+        engine.calculate()
+        engine.post()
+
+        with self.assertRaises(ValueError):
+            engine.calculate()
+        self.assertEqual(engine.post(), (False, "Schedule must be calculated before posting"))
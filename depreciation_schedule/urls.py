@@ -15,6 +15,7 @@ urlpatterns = [
     path('schedules/<uuid:pk>/delete/', views.DepreciationScheduleDeleteView.as_view(), name='schedule_delete'),
     path('schedules/<uuid:pk>/calculate/', views.calculate_depreciation, name='calculate_depreciation'),
     path('schedules/<uuid:pk>/post/', views.post_depreciation, name='post_depreciation'),
+    path('schedules/<uuid:pk>/rollback/', views.rollback_depreciation, name='rollback_depreciation'),
     path('schedules/<uuid:pk>/entries/', views.depreciation_entries, name='depreciation_entries'),
     path('schedules/<uuid:pk>/export/', views.export_depreciation, name='export_depreciation'),
     
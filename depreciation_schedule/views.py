@@ -18,6 +18,7 @@ from dateutil.relativedelta import relativedelta
 import json
 
 from .models import DepreciationSchedule, DepreciationEntry, DepreciationSettings
+from .batch_depreciation import BatchDepreciationEngine
 from .forms import (
     DepreciationScheduleForm, DepreciationScheduleFilterForm, DepreciationEntryFilterForm,
     DepreciationSettingsForm, DepreciationCalculationForm, DepreciationPostingForm,
@@ -293,6 +294,25 @@ def post_depreciation(request, pk):
     return render(request, 'depreciation_schedule/post_depreciation.html', context)
 
 
+@login_required
+def rollback_depreciation(request, pk):
+    """Roll a calculated or posted schedule back to draft"""
+    schedule = get_object_or_404(DepreciationSchedule, pk=pk)
+    
+    if request.method == 'POST':
+        try:
+            success, message = schedule.rollback(request.user)
+            
+            if success:
+                messages.success(request, message)
+            else:
+                messages.error(request, message)
+        except Exception as e:
+            messages.error(request, f'Error rolling back depreciation: {str(e)}')
+    
+    return redirect('depreciation_schedule:schedule_detail', pk=schedule.pk)
+
+
 @login_required
 def depreciation_entries(request, pk):
     """View depreciation entries for a schedule"""
@@ -522,6 +542,33 @@ def depreciation_api(request):
                     'error': str(e)
                 })
         
+        elif action == 'eligible_assets':
+            schedule_id = request.GET.get('schedule_id')
+            
+            try:
+                schedule = DepreciationSchedule.objects.get(id=schedule_id)
+                preview = BatchDepreciationEngine(schedule).preview()
+                
+                return JsonResponse({
+                    'success': True,
+                    'count': preview['total_assets'],
+                    'estimated_depreciation': f"{preview['total_depreciation']:,.2f}",
+                    'total_entries': preview['total_entries'],
+                    'categories': [
+                        {
+                            'category': category['category_name'],
+                            'asset_count': category['asset_count'],
+                            'depreciation': float(category['depreciation']),
+                        }
+                        for category in preview['categories']
+                    ],
+                })
+            except DepreciationSchedule.DoesNotExist:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Schedule not found'
+                })
+        
         elif action == 'get_schedule_summary':
             schedule_id = request.GET.get('schedule_id')
             
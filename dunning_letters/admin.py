@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import DunningLetter
+from .models import DunningLetter, DunningDigest
 
 @admin.register(DunningLetter)
 class DunningLetterAdmin(admin.ModelAdmin):
@@ -34,3 +34,20 @@ class DunningLetterAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('customer', 'invoice')
+
+
+@admin.register(DunningDigest)
+class DunningDigestAdmin(admin.ModelAdmin):
+    list_display = [
+        'run_date', 'customer', 'level', 'status', 'invoice_count',
+        'total_overdue', 'email_recipient', 'email_sent_at'
+    ]
+    list_filter = ['run_date', 'level', 'status']
+    search_fields = ['customer__customer_name', 'email_recipient', 'subject']
+    readonly_fields = [
+        'customer', 'run_date', 'level', 'status', 'subject', 'content', 'invoice_count',
+        'total_overdue', 'email_recipient', 'email_sent_at', 'error_message', 'created_at'
+    ]
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('customer')
@@ -0,0 +1,257 @@
+"""
+Batched dunning run.
+
+Overdue invoices are selected in one query with their dunning level derived
+from the days overdue, the matching existing letter and the amount still
+outstanding annotated in SQL. Invoices are grouped per customer and each
+customer gets one digest email listing all items due for a letter, at the
+tone of the highest level among them.
+
+New letters are bulk-created, digests go out through a throttled mailer on
+a reused connection, and the letters' sent state and digest link are then
+written with a single bulk update.
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import Case, When, Value, CharField, DecimalField, F, Q, Sum, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from company.company_model import Company
+from customer_payments.models import CustomerPaymentInvoice
+from email_configuration.mailer import ThrottledMailer
+from invoice.models import Invoice
+from .models import DunningLetter, DunningDigest
+
+logger = logging.getLogger(__name__)
+
+# Minimum days overdue for each level, highest first
+LEVEL_THRESHOLDS = [('final', 90), ('firm', 60), ('friendly', 30)]
+LEVEL_RANK = {'friendly': 1, 'firm': 2, 'final': 3}
+# A letter is sent again at the same level after this many days
+FOLLOW_UP_DAYS = 7
+OPEN_INVOICE_STATUSES = ['sent', 'overdue']
+DIGEST_SUBJECTS = {
+    'friendly': 'Friendly Reminder: {count} overdue invoice(s)',
+    'firm': 'URGENT: Payment Required for {count} overdue invoice(s)',
+    'final': 'FINAL NOTICE: Immediate Payment Required for {count} overdue invoice(s)',
+}
+EMAILS_PER_MINUTE = getattr(settings, 'DUNNING_EMAILS_PER_MINUTE', 30)
+
+
+@dataclass
+class DunningItem:
+    invoice: Invoice
+    level: str
+    overdue_days: int
+    amount: Decimal
+    letter_id: int = None
+
+    @property
+    def invoice_number(self):
+        return self.invoice.invoice_number
+
+    @property
+    def due_date(self):
+        return self.invoice.due_date
+
+
+@dataclass
+class CustomerDigest:
+    customer: object
+    items: list = field(default_factory=list)
+
+    @property
+    def level(self):
+        return max((item.level for item in self.items), key=LEVEL_RANK.get)
+
+    @property
+    def total(self):
+        return sum((item.amount for item in self.items), Decimal('0.00'))
+
+
+class DunningRun:
+    """Selects, renders and sends one dunning digest per customer"""
+
+    def __init__(self, today=None, level=None, rate_per_minute=EMAILS_PER_MINUTE):
+        self.today = today or date.today()
+        self.level = level
+        self.rate_per_minute = rate_per_minute
+        company = Company.objects.first()
+        self.company_name = company.name if company else "LogisEdge"
+
+    def _level_case(self):
+        return Case(
+            *[When(due_date__lte=self.today - timedelta(days=days), then=Value(level))
+              for level, days in LEVEL_THRESHOLDS],
+            default=Value(''),
+            output_field=CharField(),
+        )
+
+    def overdue_invoices(self):
+        """Invoices due for a letter, annotated with level, existing letter and settled amount"""
+        decimal = DecimalField(max_digits=12, decimal_places=2)
+        letters = DunningLetter.objects.filter(invoice=OuterRef('pk'), level=OuterRef('dunning_level'))
+        settled = CustomerPaymentInvoice.objects.filter(invoice=OuterRef('pk')).order_by().values(
+            'invoice'
+        ).annotate(total=Sum(F('amount_received') + F('discount_amount'))).values('total')
+        follow_up_before = timezone.now() - timedelta(days=FOLLOW_UP_DAYS)
+
+        invoices = Invoice.objects.filter(
+            due_date__lte=self.today - timedelta(days=LEVEL_THRESHOLDS[-1][1]),
+            status__in=OPEN_INVOICE_STATUSES,
+        ).annotate(
+            dunning_level=self._level_case(),
+            letter_id=Subquery(letters.values('pk')[:1]),
+            letter_sent_at=Subquery(letters.values('email_sent_at')[:1]),
+            settled=Coalesce(Subquery(settled, output_field=decimal), Value(Decimal('0.00')), output_field=decimal),
+        ).filter(
+            Q(letter_sent_at__isnull=True) | Q(letter_sent_at__lte=follow_up_before)
+        ).select_related('customer').only(
+            'id', 'invoice_number', 'due_date', 'invoice_items', 'customer',
+            'customer__customer_name', 'customer__email'
+        ).order_by('customer_id', 'due_date', 'pk')
+
+        if self.level:
+            invoices = invoices.filter(dunning_level=self.level)
+        return invoices
+
+    def collect(self):
+        """Group the invoices due for a letter into one digest per customer"""
+        digests = []
+        for _, invoices in groupby(self.overdue_invoices().iterator(chunk_size=2000), key=lambda inv: inv.customer_id):
+            digest = None
+            for invoice in invoices:
+                amount = invoice.total_sale - invoice.settled
+                if amount <= 0:
+                    continue
+                if digest is None:
+                    digest = CustomerDigest(customer=invoice.customer)
+                digest.items.append(DunningItem(
+                    invoice=invoice,
+                    level=invoice.dunning_level,
+                    overdue_days=(self.today - invoice.due_date).days,
+                    amount=amount,
+                    letter_id=invoice.letter_id,
+                ))
+            if digest is not None:
+                digests.append(digest)
+        return digests
+
+    def render(self, digest):
+        subject = DIGEST_SUBJECTS[digest.level].format(count=len(digest.items))
+        content = render_to_string('dunning_letters/email/digest.txt', {
+            'customer': digest.customer,
+            'level': digest.level,
+            'items': digest.items,
+            'total': digest.total,
+            'company_name': self.company_name,
+        })
+        return subject, content
+
+    def _new_letter(self, item):
+        letter = DunningLetter(
+            customer=item.invoice.customer,
+            invoice=item.invoice,
+            level=item.level,
+            overdue_amount=item.amount,
+            overdue_days=item.overdue_days,
+            due_date=item.invoice.due_date,
+        )
+        letter._company_name = self.company_name
+        letter.subject = letter.generate_subject()
+        letter.content = letter.generate_content()
+        return letter
+
+    def _persist(self, digests):
+        """Create the digest rows and any missing letters. Returns digest rows in order."""
+        with transaction.atomic():
+            rows = DunningDigest.objects.bulk_create([
+                DunningDigest(
+                    customer=digest.customer,
+                    run_date=self.today,
+                    level=digest.level,
+                    subject=subject,
+                    content=content,
+                    invoice_count=len(digest.items),
+                    total_overdue=digest.total,
+                    email_recipient=digest.customer.email or None,
+                    status='pending' if digest.customer.email else 'no_email',
+                )
+                for digest in digests
+                for subject, content in [self.render(digest)]
+            ], batch_size=1000)
+
+            new_items = [item for digest in digests for item in digest.items if item.letter_id is None]
+            letters = DunningLetter.objects.bulk_create([self._new_letter(item) for item in new_items], batch_size=1000)
+            for item, letter in zip(new_items, letters):
+                item.letter_id = letter.pk
+        return rows
+
+    def _send(self, digests, rows):
+        """Send each digest; returns the letters to mark as sent"""
+        now = timezone.now()
+        sent_letters = []
+        with ThrottledMailer(rate_per_minute=self.rate_per_minute) as mailer:
+            for digest, row in zip(digests, rows):
+                if row.status == 'no_email':
+                    continue
+                sent, error = mailer.send(EmailMessage(
+                    subject=row.subject,
+                    body=row.content,
+                    from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@logisedge.com'),
+                    to=[row.email_recipient],
+                ))
+                if sent:
+                    row.status, row.email_sent_at = 'sent', now
+                    sent_letters.extend(
+                        DunningLetter(
+                            pk=item.letter_id, digest_id=row.pk, status='sent', email_sent=True,
+                            email_sent_at=now, email_recipient=row.email_recipient,
+                            overdue_amount=item.amount, overdue_days=item.overdue_days,
+                        )
+                        for item in digest.items
+                    )
+                else:
+                    row.status, row.error_message = 'failed', error
+        return sent_letters
+
+    def run(self, dry_run=False):
+        """Run dunning. Returns a summary dict."""
+        digests = self.collect()
+        summary = {
+            'customers': len(digests),
+            'invoices': sum(len(digest.items) for digest in digests),
+            'digests': digests,
+            'sent': 0,
+            'failed': 0,
+            'no_email': 0,
+        }
+        if dry_run or not digests:
+            return summary
+
+        rows = self._persist(digests)
+        sent_letters = self._send(digests, rows)
+
+        with transaction.atomic():
+            DunningDigest.objects.bulk_update(rows, ['status', 'email_sent_at', 'error_message'], batch_size=1000)
+            # Level transitions for the whole run in one bulk update
+            DunningLetter.objects.bulk_update(sent_letters, [
+                'digest', 'status', 'email_sent', 'email_sent_at', 'email_recipient', 'overdue_amount', 'overdue_days'
+            ], batch_size=1000)
+
+        for row in rows:
+            summary[row.status] = summary.get(row.status, 0) + 1
+        logger.info(
+            f"Dunning run {self.today}: {summary['sent']} digests sent, {summary['failed']} failed, "
+            f"{summary['no_email']} without email, covering {summary['invoices']} invoices"
+        )
+        return summary
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.23 on 2026-10-18 21:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0009_fix_null_customer_codes'),
+        ('dunning_letters', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DunningDigest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_date', models.DateField()),
+                ('level', models.CharField(choices=[('friendly', 'Friendly Reminder'), ('firm', 'Firm Reminder'), ('final', 'Final Notice')], help_text='Highest level among the letters in this digest', max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed'), ('no_email', 'No Email Address')], default='pending', max_length=20)),
+                ('subject', models.CharField(max_length=255)),
+                ('content', models.TextField()),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('total_overdue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('email_recipient', models.EmailField(blank=True, max_length=254, null=True)),
+                ('email_sent_at', models.DateTimeField(blank=True, null=True)),
+                ('error_message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dunning_digests', to='customer.customer')),
+            ],
+            options={
+                'ordering': ['-run_date', 'customer'],
+            },
+        ),
+        migrations.AddField(
+            model_name='dunningletter',
+            name='digest',
+            field=models.ForeignKey(blank=True, help_text='Digest this letter was last sent in', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='letters', to='dunning_letters.dunningdigest'),
+        ),
+        migrations.AddIndex(
+            model_name='dunningdigest',
+            index=models.Index(fields=['customer', 'run_date'], name='dunning_let_custome_3e9c5b_idx'),
+        ),
+    ]
@@ -2,6 +2,46 @@ from django.db import models
 from django.utils import timezone
 from datetime import datetime, timedelta
 
+class DunningDigest(models.Model):
+    """One email per customer per dunning run listing all of their overdue invoices"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('no_email', 'No Email Address'),
+    ]
+    
+    customer = models.ForeignKey('customer.Customer', on_delete=models.CASCADE, related_name='dunning_digests')
+    run_date = models.DateField()
+    level = models.CharField(max_length=20, choices=[
+        ('friendly', 'Friendly Reminder'),
+        ('firm', 'Firm Reminder'),
+        ('final', 'Final Notice'),
+    ], help_text="Highest level among the letters in this digest")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    subject = models.CharField(max_length=255)
+    content = models.TextField()
+    
+    invoice_count = models.IntegerField(default=0)
+    total_overdue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    email_recipient = models.EmailField(blank=True, null=True)
+    email_sent_at = models.DateTimeField(null=True, blank=True)
+    error_message = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-run_date', 'customer']
+        indexes = [
+            models.Index(fields=['customer', 'run_date']),
+        ]
+    
+    def __str__(self):
+        return f"Dunning Digest {self.run_date} - {self.customer.customer_name} ({self.invoice_count} invoices)"
+
+
 class DunningLetter(models.Model):
     LEVEL_CHOICES = [
         ('friendly', 'Friendly Reminder'),
@@ -36,6 +76,8 @@ class DunningLetter(models.Model):
     email_sent = models.BooleanField(default=False)
     email_sent_at = models.DateTimeField(null=True, blank=True)
     email_recipient = models.EmailField(blank=True, null=True)
+    digest = models.ForeignKey(DunningDigest, on_delete=models.SET_NULL, null=True, blank=True, related_name='letters',
+                               help_text="Digest this letter was last sent in")
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -154,6 +196,9 @@ Days Overdue: {self.overdue_days}"""
     
     def get_company_name(self):
         """Get company name from settings or default"""
+        # Batch runs set this once instead of querying per letter
+        if getattr(self, '_company_name', None):
+            return self._company_name
         try:
             from company.company_model import Company
             company = Company.objects.first()
@@ -1,3 +1,104 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.test import TestCase, override_settings
+
+from customer.models import Customer
+from customer_payments.models import CustomerPayment, CustomerPaymentInvoice
+from invoice.models import Invoice
+from .engine import DunningRun
+from .models import DunningDigest, DunningLetter
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class DunningRunTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.today = date(2025, 6, 30)
+        self.customer = Customer.objects.create(
+            customer_code='CUST001', customer_name='Test Customer', email='accounts@example.com'
+        )
+
+    def create_invoice(self, days_overdue, total='100', customer=None, status='sent'):
+        return Invoice.objects.create(
+            invoice_date=self.today - timedelta(days=days_overdue + 30),
+            due_date=self.today - timedelta(days=days_overdue),
+            customer=customer or self.customer,
+            status=status,
+            invoice_items=[{'sale_total': total}],
+            created_by=self.user
+        )
+
+    def run_dunning(self, **kwargs):
+        return DunningRun(today=self.today, rate_per_minute=0, **kwargs).run()
+
+    def test_one_digest_per_customer_at_the_highest_level(self):
+        self.create_invoice(35, '100')
+        self.create_invoice(65, '200')
+        self.create_invoice(95, '300')
+        self.create_invoice(10, '400')
+        self.create_invoice(95, '500', status='paid')
+
+        summary = self.run_dunning()
+
+        self.assertEqual((summary['customers'], summary['invoices'], summary['sent']), (1, 3, 1))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertTrue(mail.outbox[0].subject.startswith('FINAL NOTICE'))
+        self.assertIn('Total Amount Due: AED 600', mail.outbox[0].body)
+        digest = DunningDigest.objects.get()
+        self.assertEqual((digest.level, digest.status, digest.total_overdue), ('final', 'sent', Decimal('600.00')))
+        self.assertEqual(
+            sorted(DunningLetter.objects.values_list('level', 'status', 'digest_id')),
+            [('final', 'sent', digest.pk), ('firm', 'sent', digest.pk), ('friendly', 'sent', digest.pk)]
+        )
+
+    def test_settled_amounts_are_deducted(self):
+        partly_paid = self.create_invoice(40, '500')
+        fully_paid = self.create_invoice(40, '80')
+        payment = CustomerPayment.objects.create(
+            customer=self.customer, payment_date=self.today, amount=Decimal('280.00')
+        )
+        CustomerPaymentInvoice.objects.create(payment=payment, invoice=partly_paid, amount_received=Decimal('200.00'))
+        CustomerPaymentInvoice.objects.create(
+            payment=payment, invoice=fully_paid, amount_received=Decimal('70.00'), discount_amount=Decimal('10.00')
+        )
+
+        digests = DunningRun(today=self.today).collect()
+
+        self.assertEqual([(item.invoice.pk, item.amount) for item in digests[0].items],
+                         [(partly_paid.pk, Decimal('300.00'))])
+
+    def test_letters_are_not_repeated_within_the_follow_up_period(self):
+        self.create_invoice(45)
+        self.run_dunning()
+
+        summary = self.run_dunning()
+
+        self.assertEqual(summary['invoices'], 0)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(DunningLetter.objects.count(), 1)
+
+    def test_customer_without_email(self):
+        other = Customer.objects.create(customer_code='CUST002', customer_name='No Email Customer')
+        self.create_invoice(45, customer=other)
+        self.create_invoice(45)
+
+        summary = self.run_dunning()
+
+        self.assertEqual((summary['sent'], summary['no_email']), (1, 1))
+        self.assertEqual(DunningDigest.objects.get(customer=other).status, 'no_email')
+        letter = DunningLetter.objects.get(customer=other)
+        self.assertFalse(letter.email_sent)
+
+    def test_dry_run_and_level_filter(self):
+        self.create_invoice(35)
+        self.create_invoice(65)
+
+        summary = DunningRun(today=self.today, level='firm').run(dry_run=True)
+
+        self.assertEqual([item.level for item in summary['digests'][0].items], ['firm'])
+        self.assertFalse(DunningDigest.objects.exists())
+        self.assertFalse(DunningLetter.objects.exists())
+        self.assertEqual(len(mail.outbox), 0)
@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import EmailConfiguration, EmailTestResult, EmailNotification
+from .models import EmailConfiguration, EmailTestResult, EmailNotification, DocumentEmail
+from .documents import requeue
 
 
 @admin.register(EmailConfiguration)
@@ -180,3 +181,28 @@ class EmailNotificationAdmin(admin.ModelAdmin):
         pending_notifications.update(status='cancelled')
         self.message_user(request, f'{count} pending notification(s) cancelled.')
     cancel_pending_notifications.short_description = "Cancel pending notifications"
+
+
+
+@admin.register(DocumentEmail)
+class DocumentEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'content_type', 'object_id', 'recipients_display', 'status', 'attempts', 'sent_at', 'created_by', 'created_at']
+    list_filter = ['status', 'content_type', 'created_at']
+    search_fields = ['subject', 'error_message', 'created_by__username']
+    readonly_fields = [
+        'content_type', 'object_id', 'subject', 'body', 'html_body', 'from_email', 'to', 'cc', 'attachments',
+        'status', 'attempts', 'error_message', 'sent_at', 'created_at', 'updated_at', 'created_by'
+    ]
+    actions = ['resend_failed_emails']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('content_type', 'created_by')
+    
+    def recipients_display(self, obj):
+        return ', '.join(obj.to + obj.cc)
+    recipients_display.short_description = 'Recipients'
+    
+    def resend_failed_emails(self, request, queryset):
+        count = requeue(queryset.filter(status='failed').values_list('pk', flat=True))
+        self.message_user(request, f'{count} failed document email(s) queued for sending.')
+    resend_failed_emails.short_description = "Resend failed document emails"
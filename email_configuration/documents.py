@@ -0,0 +1,274 @@
+"""
+Document emails rendered and sent in the background.
+
+Views render the print templates to HTML (cheap) and queue a DocumentEmail;
+the PDF conversion (slow) and the send happen on a Celery worker, or on a
+small in-process thread pool when no broker can be reached, so the request
+returns as soon as the email is queued. The outcome is written back to the
+DocumentEmail, which the originating record lists with its status.
+
+PDFs are cached by document version the same way invoice PDFs are: the
+storage path holds a hash of the rendered HTML, so sending an unchanged
+document again reuses the stored PDF, and any change to the record, the
+company details or the template produces a new one. Until a worker converts
+a new version, its HTML is stored next to where the PDF will go.
+"""
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.mail import EmailMessage
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from pypdf import PdfWriter
+
+from .models import DocumentEmail
+
+logger = logging.getLogger(__name__)
+
+PDF_DIRECTORY = 'document_pdfs'
+# Threads rendering and sending in the web process when no broker is reachable
+MAX_WORKERS = getattr(settings, 'DOCUMENT_EMAIL_WORKERS', 2)
+# Sends that fail for reasons other than rendering are retried this many times
+MAX_ATTEMPTS = 3
+# After a failed publish the broker is skipped for this long
+BROKER_RETRY_SECONDS = 60
+# Queued or sending emails untouched for this long were left behind by a worker that stopped
+STUCK_MINUTES = 15
+
+_pool = None
+_broker_down_until = 0.0
+
+
+class DocumentRenderError(Exception):
+    pass
+
+
+def _directory(record):
+    return f'{PDF_DIRECTORY}/{record._meta.label_lower}/{record.pk}'
+
+
+def _source_path(path):
+    return path[:-len('.pdf')] + '.html'
+
+
+def _kind(filename):
+    return filename.rsplit('-', 1)[0]
+
+
+def document_part(record, kind, html):
+    """Storage path of the PDF for this version of one of a record's documents.
+
+    kind names the document (no hyphens), e.g. 'summary'. The HTML is stored
+    for the worker when this version has not been converted yet.
+    """
+    content_hash = hashlib.sha256(html.encode('UTF-8')).hexdigest()[:32]
+    path = f'{_directory(record)}/{kind}-{content_hash}.pdf'
+    source = _source_path(path)
+    if not default_storage.exists(path) and not default_storage.exists(source):
+        default_storage.save(source, ContentFile(html.encode('UTF-8')))
+    return path
+
+
+def delete_cached_documents(record):
+    """Remove every stored PDF and pending HTML of a record"""
+    directory = _directory(record)
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        default_storage.delete(f'{directory}/{name}')
+
+
+def _read(path):
+    with default_storage.open(path, 'rb') as stored:
+        return stored.read()
+
+
+def _store(path, pdf_bytes):
+    if not default_storage.exists(path):
+        default_storage.save(path, ContentFile(pdf_bytes))
+    default_storage.delete(_source_path(path))
+    # Older PDFs of the same document are superseded; pending HTML is left for its own emails
+    directory, name = path.rsplit('/', 1)
+    _, files = default_storage.listdir(directory)
+    for other in files:
+        if other != name and other.endswith('.pdf') and _kind(other) == _kind(name):
+            default_storage.delete(f'{directory}/{other}')
+
+
+def get_pdf(path):
+    """PDF bytes of a document version, converting its stored HTML if it has not been rendered yet"""
+    if default_storage.exists(path):
+        return _read(path)
+    source = _source_path(path)
+    if not default_storage.exists(source):
+        raise DocumentRenderError(f'{path.rsplit("/", 1)[-1]} is no longer available, please send the document again')
+    html = _read(source).decode('UTF-8')
+    # Imported here so loading this module (admin, signals, commands) does not need Pango
+    import weasyprint
+    try:
+        pdf_bytes = weasyprint.HTML(string=html).write_pdf()
+    except Exception as e:
+        raise DocumentRenderError(f'Could not render {path.rsplit("/", 1)[-1]}: {str(e)}')
+    _store(path, pdf_bytes)
+    return pdf_bytes
+
+
+def build_attachment(parts):
+    """One PDF from the cached parts, merged in order when there are several"""
+    documents = [get_pdf(path) for path in parts]
+    if len(documents) == 1:
+        return documents[0]
+    writer = PdfWriter()
+    for document in documents:
+        writer.append(BytesIO(document))
+    merged = BytesIO()
+    writer.write(merged)
+    writer.close()
+    return merged.getvalue()
+
+
+# Queueing
+
+def queue_document_email(record, subject, body, to, attachments, cc=None, html_body=False, user=None):
+    """Queue an email about a record and send it once the current transaction commits.
+
+    attachments is a list of (filename, [paths from document_part]); several
+    paths are merged into one PDF. Returns the DocumentEmail.
+    """
+    email = DocumentEmail.objects.create(
+        content_type=ContentType.objects.get_for_model(record),
+        object_id=record.pk,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        cc=[address for address in (cc or []) if address],
+        attachments=[{'filename': filename, 'parts': list(parts)} for filename, parts in attachments],
+        created_by=user,
+    )
+    transaction.on_commit(lambda: dispatch(email.pk))
+    return email
+
+
+def get_pool():
+    """Thread pool used when emails cannot be handed to Celery, created on first use"""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='document-email')
+    return _pool
+
+
+def dispatch(email_id):
+    """Hand a queued email to a Celery worker, or to the in-process pool without a broker"""
+    global _broker_down_until
+    if time.monotonic() >= _broker_down_until:
+        from .tasks import send_document_email
+        try:
+            send_document_email.delay(email_id)
+            return
+        except Exception as e:
+            _broker_down_until = time.monotonic() + BROKER_RETRY_SECONDS
+            logger.warning(f'Could not queue document email {email_id}, sending in process: {str(e)}')
+    get_pool().submit(_deliver_in_thread, email_id)
+
+
+def _deliver_in_thread(email_id):
+    try:
+        deliver(email_id)
+    except Exception as e:
+        logger.error(f'Error delivering document email {email_id}: {str(e)}')
+    finally:
+        connection.close()
+
+
+def requeue(email_ids):
+    """Put failed or stuck emails back in the queue and dispatch them. Returns how many were requeued."""
+    email_ids = list(
+        DocumentEmail.objects.filter(pk__in=email_ids).exclude(status='sent').values_list('pk', flat=True)
+    )
+    DocumentEmail.objects.filter(pk__in=email_ids).update(status='queued', updated_at=timezone.now())
+    for email_id in email_ids:
+        transaction.on_commit(lambda email_id=email_id: dispatch(email_id))
+    return len(email_ids)
+
+
+# Delivery
+
+def deliver(email_id, retry=False):
+    """Render the attachments and send a queued email.
+
+    Returns the resulting status, or None when the email was not queued (another
+    worker has it or it was already sent). With retry, a failed send that is
+    not a rendering error is put back in the queue and 'retry' is returned.
+    """
+    claimed = DocumentEmail.objects.filter(pk=email_id, status='queued').update(
+        status='sending', attempts=F('attempts') + 1, updated_at=timezone.now()
+    )
+    if not claimed:
+        return None
+    email = DocumentEmail.objects.get(pk=email_id)
+
+    try:
+        message = EmailMessage(
+            subject=email.subject,
+            body=email.body,
+            from_email=email.from_email,
+            to=email.to,
+            cc=email.cc or None,
+        )
+        if email.html_body:
+            message.content_subtype = 'html'
+        for attachment in email.attachments:
+            message.attach(attachment['filename'], build_attachment(attachment['parts']), 'application/pdf')
+    except DocumentRenderError as e:
+        return _failed(email, str(e))
+    except Exception as e:
+        # Merging or reading the stored parts failed; the email must not stay 'sending'
+        return _failed(email, f'Could not build the attachments: {str(e)}')
+
+    try:
+        message.send()
+    except Exception as e:
+        if retry and email.attempts < MAX_ATTEMPTS:
+            DocumentEmail.objects.filter(pk=email_id).update(
+                status='queued', error_message=str(e), updated_at=timezone.now()
+            )
+            return 'retry'
+        return _failed(email, str(e))
+
+    DocumentEmail.objects.filter(pk=email_id).update(
+        status='sent', sent_at=timezone.now(), error_message='', updated_at=timezone.now()
+    )
+    logger.info(f'Sent "{email.subject}" to {", ".join(email.to)}')
+    return 'sent'
+
+
+def _failed(email, error):
+    logger.error(f'Failed to send "{email.subject}" to {", ".join(email.to)}: {error}')
+    DocumentEmail.objects.filter(pk=email.pk).update(status='failed', error_message=error, updated_at=timezone.now())
+    return 'failed'
+
+
+def send_stuck(minutes=STUCK_MINUTES, failed=False):
+    """Send the emails left queued or sending for `minutes`, and failed ones with failed.
+
+    Returns {email id: resulting status}.
+    """
+    stuck = Q(status__in=['queued', 'sending'], updated_at__lt=timezone.now() - timedelta(minutes=minutes))
+    if failed:
+        stuck |= Q(status='failed')
+    email_ids = list(DocumentEmail.objects.filter(stuck).order_by('pk').values_list('pk', flat=True))
+    DocumentEmail.objects.filter(pk__in=email_ids).update(status='queued', updated_at=timezone.now())
+    return {email_id: deliver(email_id) or 'skipped' for email_id in email_ids}
@@ -0,0 +1,90 @@
+"""
+Throttled bulk sending over a reused mail connection.
+
+Batch jobs (dunning runs, reminder digests) send through one connection
+instead of opening a new SMTP session per message. The connection is
+recycled after a number of messages or when the server drops it, and sends
+are spaced out to stay under a per-minute rate.
+"""
+import logging
+import smtplib
+import time
+
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_PER_MINUTE = 60
+DEFAULT_MESSAGES_PER_CONNECTION = 100
+
+
+class ThrottledMailer:
+    """Context manager sending messages one by one over a pooled connection.
+
+    send() never raises for delivery problems; it returns (sent, error) so a
+    batch can record failures per message and carry on.
+    """
+
+    def __init__(self, rate_per_minute=DEFAULT_RATE_PER_MINUTE,
+                 messages_per_connection=DEFAULT_MESSAGES_PER_CONNECTION, backend=None):
+        self.min_interval = 60.0 / rate_per_minute if rate_per_minute else 0
+        self.messages_per_connection = messages_per_connection
+        self.backend = backend
+        self.connection = None
+        self.sent_on_connection = 0
+        self.sent = 0
+        self.failed = 0
+        self._last_send = None
+
+    def __enter__(self):
+        # The connection is opened by the first send, so connection errors are reported per message
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._close()
+        return False
+
+    def _open(self):
+        self.connection = get_connection(backend=self.backend, fail_silently=False)
+        self.connection.open()
+        self.sent_on_connection = 0
+
+    def _close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception as e:
+                logger.warning(f'Error closing mail connection: {str(e)}')
+        self.connection = None
+
+    def _reopen(self):
+        self._close()
+        self._open()
+
+    def _throttle(self):
+        if self._last_send is not None and self.min_interval:
+            wait = self.min_interval - (time.monotonic() - self._last_send)
+            if wait > 0:
+                time.sleep(wait)
+        self._last_send = time.monotonic()
+
+    def send(self, message):
+        """Send one EmailMessage. Returns (sent, error message or None)."""
+        self._throttle()
+        try:
+            if self.connection is None or self.sent_on_connection >= self.messages_per_connection:
+                self._reopen()
+            try:
+                self.connection.send_messages([message])
+            except smtplib.SMTPServerDisconnected:
+                # Idle connections get dropped by the server; retry once on a fresh one
+                self._reopen()
+                self.connection.send_messages([message])
+        except Exception as e:
+            self._close()
+            self.failed += 1
+            logger.error(f'Failed to send "{message.subject}" to {", ".join(message.to)}: {str(e)}')
+            return False, str(e)
+        self.sent_on_connection += 1
+        self.sent += 1
+        return True, None
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from email_configuration.documents import STUCK_MINUTES, send_stuck
+from email_configuration.models import DocumentEmail
+
+
+class Command(BaseCommand):
+    help = 'Send document emails left queued by a worker that stopped (and optionally retry failed ones)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutes',
+            type=int,
+            default=STUCK_MINUTES,
+            help=f'Treat queued or sending emails untouched for this many minutes as stuck (default {STUCK_MINUTES})'
+        )
+        parser.add_argument(
+            '--failed',
+            action='store_true',
+            help='Also retry emails that failed'
+        )
+
+    def handle(self, *args, **options):
+        statuses = send_stuck(options['minutes'], options['failed'])
+        
+        if not statuses:
+            self.stdout.write(self.style.SUCCESS('No document emails waiting to be sent'))
+            return
+        
+        results = {}
+        for email_id, status in statuses.items():
+            results[status] = results.get(status, 0) + 1
+            if status == 'failed':
+                error = DocumentEmail.objects.filter(pk=email_id).values_list('error_message', flat=True).first()
+                self.stdout.write(self.style.WARNING(f'Document email {email_id}: {error}'))
+        
+        summary = ', '.join(f'{count} {status}' for status, count in sorted(results.items()))
+        self.stdout.write(self.style.SUCCESS(f'Processed {len(statuses)} document emails: {summary}'))
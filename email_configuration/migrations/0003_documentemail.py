@@ -0,0 +1,45 @@
+# Generated by Django 4.2.23 on 2026-10-18 22:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('email_configuration', '0002_update_notification_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('html_body', models.BooleanField(default=False)),
+                ('from_email', models.CharField(max_length=255)),
+                ('to', models.JSONField(default=list)),
+                ('cc', models.JSONField(blank=True, default=list)),
+                ('attachments', models.JSONField(blank=True, default=list)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_emails', to='contenttypes.contenttype')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='document_emails', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Document Email',
+                'verbose_name_plural': 'Document Emails',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['content_type', 'object_id'], name='email_confi_content_6e756d_idx'), models.Index(fields=['status', 'updated_at'], name='email_confi_status_ad3aa3_idx')],
+            },
+        ),
+    ]
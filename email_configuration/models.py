@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 
 
@@ -214,3 +216,58 @@ class EmailNotification(models.Model):
     def notification_type(self):
         """Property to match template expectations"""
         return self.type
+
+
+class DocumentEmail(models.Model):
+    """A document email queued from a record (GRN, delivery order, cross stuffing).
+
+    The PDFs are rendered and the message sent in the background; the status
+    is kept here and shown on the originating record.
+    """
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    # Originating record
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='document_emails')
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    
+    # Message
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    html_body = models.BooleanField(default=False)
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list, blank=True)
+    # [{"filename": ..., "parts": [cached PDF paths, merged in order]}]
+    attachments = models.JSONField(default=list, blank=True)
+    
+    # Delivery
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='document_emails')
+    
+    class Meta:
+        verbose_name = 'Document Email'
+        verbose_name_plural = 'Document Emails'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['content_type', 'object_id']),
+            models.Index(fields=['status', 'updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} - {', '.join(self.to)} ({self.status})"
+    
+    @property
+    def attachment_names(self):
+        return [attachment['filename'] for attachment in self.attachments]
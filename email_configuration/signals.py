@@ -4,6 +4,7 @@ from django.contrib.auth.models import User
 from django.core.mail import send_mail
 from django.conf import settings
 from .models import EmailConfiguration, EmailTestResult, EmailNotification
+from .documents import delete_cached_documents
 
 
 @receiver(post_save, sender=EmailConfiguration)
@@ -138,3 +139,11 @@ def email_configuration_deleted(sender, instance, **kwargs):
 
 # Import timezone for scheduled notifications
 from django.utils import timezone
+
+
+@receiver(post_delete, sender='grn.GRN')
+@receiver(post_delete, sender='delivery_order.DeliveryOrder')
+@receiver(post_delete, sender='crossstuffing.CrossStuffing')
+def remove_cached_documents(sender, instance, **kwargs):
+    """Remove the PDFs rendered for a deleted record's emails"""
+    delete_cached_documents(instance)
@@ -0,0 +1,26 @@
+import logging
+
+from celery import shared_task
+
+from .documents import deliver, send_stuck
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_document_email(self, email_id):
+    """Render the attachments of a queued document email and send it"""
+    status = deliver(email_id, retry=self.request.retries < self.max_retries)
+    if status == 'retry':
+        logger.warning(f'Document email {email_id} could not be sent, retrying')
+        raise self.retry()
+    return {'email': email_id, 'status': status}
+
+
+@shared_task
+def send_stuck_document_emails():
+    """Send document emails left queued or sending by a worker that stopped"""
+    statuses = send_stuck()
+    if statuses:
+        logger.info(f'Sent {len(statuses)} stuck document emails: {statuses}')
+    return {'emails': len(statuses)}
@@ -1,3 +1,99 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from customer.models import Customer
+from .documents import deliver, document_part, queue_document_email, send_stuck
+from .models import DocumentEmail
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class DocumentEmailTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.record = Customer.objects.create(customer_code='CUST001', customer_name='Test Customer')
+
+    def queue(self, *parts_html):
+        parts = [document_part(self.record, f'part{number}', html) for number, html in enumerate(parts_html)]
+        with patch('email_configuration.documents.dispatch') as dispatch:
+            with self.captureOnCommitCallbacks(execute=True):
+                email = queue_document_email(
+                    self.record, 'Test document', 'Please find attached', ['customer@example.com'],
+                    [('document.pdf', parts)]
+                )
+        dispatch.assert_called_once_with(email.pk)
+        return email, parts
+
+    @patch('weasyprint.HTML')
+    def test_queued_email_is_rendered_and_sent(self, html):
+        """The worker converts the stored HTML, keeps the PDF and sends it"""
+        html.return_value.write_pdf.return_value = b'%PDF-1.4 test'
+        email, parts = self.queue('<p>Document</p>')
+
+        self.assertEqual(deliver(email.pk), 'sent')
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('sent', 1))
+        self.assertEqual(mail.outbox[0].attachments, [('document.pdf', b'%PDF-1.4 test', 'application/pdf')])
+        self.assertTrue(default_storage.exists(parts[0]))
+        self.assertFalse(default_storage.exists(parts[0][:-len('.pdf')] + '.html'))
+        self.assertIsNone(deliver(email.pk))
+
+    def test_unchanged_document_reuses_the_stored_pdf(self):
+        path = document_part(self.record, 'summary', '<p>Same</p>')
+        default_storage.save(path, default_storage.open(path[:-len('.pdf')] + '.html'))
+        self.assertEqual(document_part(self.record, 'summary', '<p>Same</p>'), path)
+        self.assertNotEqual(document_part(self.record, 'summary', '<p>Changed</p>'), path)
+
+    @patch('weasyprint.HTML')
+    def test_render_error_fails_the_email(self, html):
+        html.return_value.write_pdf.side_effect = RuntimeError('bad markup')
+        email, _ = self.queue('<p>Document</p>')
+
+        self.assertEqual(deliver(email.pk), 'failed')
+        self.assertIn('bad markup', DocumentEmail.objects.get(pk=email.pk).error_message)
+
+    @patch('weasyprint.HTML')
+    def test_attachment_build_error_does_not_leave_the_email_sending(self, html):
+        """Errors other than rendering, such as merging invalid PDFs, also fail the email"""
+        html.return_value.write_pdf.return_value = b'not a pdf'
+        email, _ = self.queue('<p>First</p>', '<p>Second</p>')
+
+        self.assertEqual(deliver(email.pk), 'failed')
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'failed')
+        self.assertIn('Could not build the attachments', email.error_message)
+        self.assertEqual(mail.outbox, [])
+
+    @patch('weasyprint.HTML')
+    def test_send_error_is_retried(self, html):
+        html.return_value.write_pdf.return_value = b'%PDF-1.4 test'
+        email, _ = self.queue('<p>Document</p>')
+
+        with patch('django.core.mail.EmailMessage.send', side_effect=OSError('SMTP down')):
+            self.assertEqual(deliver(email.pk, retry=True), 'retry')
+        self.assertEqual(DocumentEmail.objects.get(pk=email.pk).status, 'queued')
+        self.assertEqual(deliver(email.pk, retry=True), 'sent')
+
+    @patch('weasyprint.HTML')
+    def test_stuck_emails_are_sent(self, html):
+        html.return_value.write_pdf.return_value = b'%PDF-1.4 test'
+        stuck, _ = self.queue('<p>Stuck</p>')
+        recent, _ = self.queue('<p>Recent</p>')
+        DocumentEmail.objects.filter(pk=stuck.pk).update(
+            status='sending', updated_at=timezone.now() - timedelta(hours=1)
+        )
+        DocumentEmail.objects.filter(pk=recent.pk).update(status='sending')
+
+        self.assertEqual(send_stuck(), {stuck.pk: 'sent'})
+        self.assertEqual(DocumentEmail.objects.get(pk=recent.pk).status, 'sending')
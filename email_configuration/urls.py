@@ -28,6 +28,10 @@ urlpatterns = [
     path('notifications/<int:pk>/edit/', views.notification_update, name='notification_update'),
     path('notifications/<int:pk>/delete/', views.notification_delete, name='notification_delete'),
     
+    # Document emails
+    path('document-emails/<int:pk>/resend/', views.document_email_resend, name='document_email_resend'),
+    path('document-emails/<int:pk>/status/', views.document_email_status, name='document_email_status'),
+    
     # API endpoints
     path('api/health/', views.configuration_health, name='configuration_health'),
     path('api/statistics/', views.configuration_statistics, name='configuration_statistics'),
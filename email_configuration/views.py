@@ -4,6 +4,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMix
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib import messages
 from django.http import HttpResponse, JsonResponse
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.core.paginator import Paginator
 from django.db.models import Q, Count
 from django.utils import timezone
@@ -19,7 +20,8 @@ import traceback
 from datetime import datetime, timedelta
 import json
 
-from .models import EmailConfiguration, EmailTestResult, EmailNotification
+from .models import EmailConfiguration, EmailTestResult, EmailNotification, DocumentEmail
+from .documents import requeue
 from .forms import (
     EmailConfigurationForm, EmailTestForm, EmailNotificationForm,
     EmailConfigurationSearchForm
@@ -730,3 +732,34 @@ def notification_delete(request, pk):
         'notification': notification,
     }
     return render(request, 'email_configuration/notification_confirm_delete.html', context)
+
+
+@login_required
+def document_email_resend(request, pk):
+    """Queue a failed document email again and return to the record it was sent from"""
+    email = get_object_or_404(DocumentEmail, pk=pk)
+    
+    if request.method == 'POST':
+        if email.status == 'failed':
+            requeue([email.pk])
+            messages.success(request, f'"{email.subject}" has been queued for sending again.')
+        else:
+            messages.info(request, f'"{email.subject}" is {email.get_status_display().lower()}.')
+    
+    next_url = request.POST.get('next') or request.META.get('HTTP_REFERER')
+    if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
+    return redirect('email_configuration:dashboard')
+
+
+@login_required
+def document_email_status(request, pk):
+    """Delivery status of a document email, polled after queueing it"""
+    email = get_object_or_404(DocumentEmail, pk=pk)
+    return JsonResponse({
+        'id': email.pk,
+        'status': email.status,
+        'status_display': email.get_status_display(),
+        'error': email.error_message,
+        'sent_at': email.sent_at.isoformat() if email.sent_at else None,
+    })
@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Facility, FacilityLocation
+from .models import Facility, FacilityLocation, LocationUtilization, FacilityUtilization
+from .utilization import refresh_current_utilization
 
 
 @admin.register(Facility)
@@ -337,8 +338,50 @@ class FacilityLocationAdmin(admin.ModelAdmin):
     def reset_utilization(self, request, queryset):
         """Action to reset utilization for selected locations"""
         updated = queryset.update(current_utilization=0, reserved_capacity=0)
+        # Locations with a capacity take their utilization from the occupancy counters
+        refresh_current_utilization(list(queryset.values_list('pk', flat=True)))
         self.message_user(
             request,
             f'Utilization was reset for {updated} location(s).'
         )
     reset_utilization.short_description = "Reset utilization for selected locations"
+
+
+@admin.register(LocationUtilization)
+class LocationUtilizationAdmin(admin.ModelAdmin):
+    """Read-only view of the occupancy counters; they change with stock and pallet movements"""
+    
+    list_display = ['location', 'occupied_volume', 'occupied_weight', 'pallet_count', 'updated_at']
+    list_filter = ['location__facility']
+    search_fields = ['location__location_code', 'location__location_name']
+    readonly_fields = ['location', 'occupied_volume', 'occupied_weight', 'pallet_count', 'updated_at']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('location__facility')
+
+
+@admin.register(FacilityUtilization)
+class FacilityUtilizationAdmin(admin.ModelAdmin):
+    """Read-only zone and facility capacity totals"""
+    
+    list_display = [
+        'facility', 'scope', 'zone', 'location_count', 'capacity', 'occupied_volume',
+        'occupied_weight', 'pallet_count', 'updated_at'
+    ]
+    list_filter = ['facility', 'scope']
+    readonly_fields = [
+        'facility', 'scope', 'zone', 'location_count', 'capacity', 'max_weight', 'occupied_volume',
+        'occupied_weight', 'pallet_count', 'updated_at'
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
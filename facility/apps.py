@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FacilityConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'facility'
+
+    def ready(self):
+        import facility.signals
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from facility.utilization import find_drift, fix_drift
+
+
+class Command(BaseCommand):
+    help = 'Report (and optionally fix) location utilization counters and zone totals that drifted from stock and pallets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Reset drifted counters and totals to their recomputed values (also builds them the first time)'
+        )
+
+    def handle(self, *args, **options):
+        location_drift, summary_drift = fix_drift() if options['fix'] else find_drift()
+        
+        if not location_drift and not summary_drift:
+            self.stdout.write(self.style.SUCCESS('Location utilization matches stock on hand and pallets'))
+            return
+        
+        for location_id, stored, expected in location_drift:
+            self.stdout.write(
+                f'location {location_id}: stored {stored[0]:,.3f} m³ / {stored[1]:,.3f} kg / {stored[2]} pallets, '
+                f'expected {expected[0]:,.3f} m³ / {expected[1]:,.3f} kg / {expected[2]} pallets'
+            )
+        for (facility_id, scope, zone), stored, expected in summary_drift:
+            label = f'zone {zone or "-"}' if scope == 'zone' else 'total'
+            self.stdout.write(
+                f'facility {facility_id} {label}: stored {stored[0]} locations / {stored[3]:,.3f} m³, '
+                f'expected {expected[0]} locations / {expected[3]:,.3f} m³'
+            )
+        
+        count = len(location_drift) + len(summary_drift)
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {count} utilization rows'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{count} utilization rows drifted; run with --fix to repair'))
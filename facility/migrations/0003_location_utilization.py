@@ -0,0 +1,55 @@
+# Generated by Django 4.2.23 on 2026-10-18 22:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facility', '0002_facilitylocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationUtilization',
+            fields=[
+                ('location', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='utilization', serialize=False, to='facility.facilitylocation')),
+                ('occupied_volume', models.DecimalField(decimal_places=5, default=0, help_text='Occupied volume in cubic meters', max_digits=18)),
+                ('occupied_weight', models.DecimalField(decimal_places=5, default=0, help_text='Occupied weight in kg', max_digits=18)),
+                ('pallet_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Location Utilization',
+                'verbose_name_plural': 'Location Utilizations',
+                'db_table': 'facility_location_utilization',
+            },
+        ),
+        migrations.CreateModel(
+            name='FacilityUtilization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('facility', 'Facility'), ('zone', 'Zone')], max_length=10)),
+                ('zone', models.CharField(blank=True, default='', help_text='Zone designation; blank for the facility total', max_length=50)),
+                ('location_count', models.IntegerField(default=0)),
+                ('capacity', models.DecimalField(decimal_places=2, default=0, help_text='Total capacity in cubic meters', max_digits=14)),
+                ('max_weight', models.DecimalField(decimal_places=2, default=0, help_text='Total maximum weight in tons', max_digits=14)),
+                ('occupied_volume', models.DecimalField(decimal_places=5, default=0, help_text='Occupied volume in cubic meters', max_digits=18)),
+                ('occupied_weight', models.DecimalField(decimal_places=5, default=0, help_text='Occupied weight in kg', max_digits=18)),
+                ('pallet_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='utilization_summaries', to='facility.facility')),
+            ],
+            options={
+                'verbose_name': 'Facility Utilization',
+                'verbose_name_plural': 'Facility Utilizations',
+                'db_table': 'facility_utilization',
+                'ordering': ['facility', 'scope', 'zone'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='facilityutilization',
+            constraint=models.UniqueConstraint(fields=('facility', 'scope', 'zone'), name='unique_facility_utilization_scope'),
+        ),
+    ]
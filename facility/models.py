@@ -366,3 +366,77 @@ class FacilityLocation(models.Model):
         if self.humidity_range:
             features['Humidity'] = self.humidity_range
         return features
+
+
+class LocationUtilization(models.Model):
+    """Occupied volume, weight and pallets per location, maintained incrementally (see facility.utilization)"""
+    
+    location = models.OneToOneField(
+        FacilityLocation,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='utilization'
+    )
+    occupied_volume = models.DecimalField(max_digits=18, decimal_places=5, default=0, help_text="Occupied volume in cubic meters")
+    occupied_weight = models.DecimalField(max_digits=18, decimal_places=5, default=0, help_text="Occupied weight in kg")
+    pallet_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Location Utilization'
+        verbose_name_plural = 'Location Utilizations'
+        db_table = 'facility_location_utilization'
+    
+    def __str__(self):
+        return f"{self.location_id} - {self.occupied_volume} m³"
+
+
+class FacilityUtilization(models.Model):
+    """Capacity and occupancy totals per zone and per facility, maintained with the location counters"""
+    
+    SCOPE_CHOICES = [
+        ('facility', 'Facility'),
+        ('zone', 'Zone'),
+    ]
+    
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='utilization_summaries')
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    zone = models.CharField(max_length=50, blank=True, default='', help_text="Zone designation; blank for the facility total")
+    
+    location_count = models.IntegerField(default=0)
+    capacity = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Total capacity in cubic meters")
+    max_weight = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Total maximum weight in tons")
+    occupied_volume = models.DecimalField(max_digits=18, decimal_places=5, default=0, help_text="Occupied volume in cubic meters")
+    occupied_weight = models.DecimalField(max_digits=18, decimal_places=5, default=0, help_text="Occupied weight in kg")
+    pallet_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['facility', 'scope', 'zone']
+        verbose_name = 'Facility Utilization'
+        verbose_name_plural = 'Facility Utilizations'
+        db_table = 'facility_utilization'
+        constraints = [
+            models.UniqueConstraint(fields=['facility', 'scope', 'zone'], name='unique_facility_utilization_scope'),
+        ]
+    
+    def __str__(self):
+        label = f"Zone {self.zone or '-'}" if self.scope == 'zone' else 'Total'
+        return f"{self.facility_id} - {label}"
+    
+    @property
+    def utilization(self):
+        """Occupied share of the capacity in percent"""
+        if self.capacity:
+            return self.occupied_volume * 100 / self.capacity
+        return 0
+    
+    @property
+    def weight_utilization(self):
+        if self.max_weight:
+            return self.occupied_weight / (self.max_weight * 10)
+        return 0
+    
+    @property
+    def available_capacity(self):
+        return max(self.capacity - self.occupied_volume, 0)
@@ -0,0 +1,98 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import FacilityLocation
+from .utilization import (
+    ZERO, apply_location_deltas, apply_summary_deltas, location_changed, location_removal,
+    refresh_current_utilization, stock_loads,
+)
+
+LOCATION_VALUES = ('id', 'facility_id', 'zone', 'capacity', 'max_weight')
+
+
+def _origin_label(origin):
+    if origin is None:
+        return None
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model._meta.label_lower
+
+
+def _location_values(location):
+    return {field: getattr(location, field) for field in LOCATION_VALUES}
+
+
+@receiver(pre_save, sender=FacilityLocation)
+def remember_location_values(sender, instance, **kwargs):
+    """Keep the stored facility, zone and capacity so post_save can move the totals"""
+    instance._utilization_previous = None
+    if instance.pk:
+        instance._utilization_previous = sender.objects.filter(pk=instance.pk).values(*LOCATION_VALUES).first()
+
+
+@receiver(post_save, sender=FacilityLocation)
+def update_totals_on_location_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_utilization_previous', None)
+    instance._utilization_previous = None
+    current = _location_values(instance)
+    if created or previous != current:
+        location_changed(previous, current)
+    elif current['capacity']:
+        # A form save writes back the current_utilization it loaded
+        refresh_current_utilization([instance.pk])
+
+
+@receiver(pre_delete, sender=FacilityLocation)
+def remember_deleted_location(sender, instance, origin=None, **kwargs):
+    # Deleting the facility deletes its totals as well
+    instance._utilization_removal = None
+    if _origin_label(origin) != 'facility.facility':
+        instance._utilization_removal = location_removal(_location_values(instance))
+
+
+@receiver(post_delete, sender=FacilityLocation)
+def update_totals_on_location_delete(sender, instance, **kwargs):
+    if getattr(instance, '_utilization_removal', None):
+        apply_summary_deltas(instance._utilization_removal)
+
+
+def _pallet_location(pallet):
+    """Location a pallet counts towards, None when it is not an active pallet in a location"""
+    if pallet is None or pallet['status'] != 'active':
+        return None
+    return pallet['current_location_id']
+
+
+@receiver(pre_save, sender='location_transfer.Pallet')
+def remember_pallet_location(sender, instance, **kwargs):
+    instance._utilization_previous = None
+    if instance.pk:
+        instance._utilization_previous = sender.objects.filter(pk=instance.pk).values('status', 'current_location_id').first()
+
+
+@receiver(post_save, sender='location_transfer.Pallet')
+def update_pallet_count_on_save(sender, instance, **kwargs):
+    previous = _pallet_location(getattr(instance, '_utilization_previous', None))
+    instance._utilization_previous = None
+    current = _pallet_location({'status': instance.status, 'current_location_id': instance.current_location_id})
+    if previous != current:
+        deltas = {}
+        if previous:
+            deltas[previous] = [ZERO, ZERO, -1]
+        if current:
+            deltas[current] = [ZERO, ZERO, 1]
+        apply_location_deltas(deltas)
+
+
+@receiver(post_delete, sender='location_transfer.Pallet')
+def update_pallet_count_on_delete(sender, instance, origin=None, **kwargs):
+    location_id = _pallet_location({'status': instance.status, 'current_location_id': instance.current_location_id})
+    if location_id and _origin_label(origin) not in ('facility.facility', 'facility.facilitylocation'):
+        apply_location_deltas({location_id: [ZERO, ZERO, -1]})
+
+
+@receiver(post_delete, sender='stock_transfer.StockOnHand')
+def update_occupancy_on_stock_delete(sender, instance, origin=None, **kwargs):
+    """Stock removed with its item or customer; a deleted location takes its counters along"""
+    if instance.location_id and _origin_label(origin) not in ('facility.facility', 'facility.facilitylocation'):
+        apply_location_deltas(stock_loads([(instance.location_id, instance.item_id, -instance.quantity)]))
@@ -1,3 +1,105 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from items.models import Item
+from location_transfer.models import Pallet
+from .models import Facility, FacilityLocation, FacilityUtilization, LocationUtilization
+from .utilization import apply_location_deltas, find_drift, fix_drift, stock_loads
+
+
+class LocationUtilizationTest(TestCase):
+    def setUp(self):
+        self.facility = Facility.objects.create(
+            facility_code='WH01', facility_name='Main Warehouse', address='1 Dock Road',
+            city='Dubai', state='Dubai', postal_code='00000'
+        )
+        self.item = Item.objects.create(
+            item_code='SKU-001', item_name='Test Item', barcode='1000000001',
+            cbm=Decimal('0.500'), gross_weight=Decimal('12.000'), weight=Decimal('10.000')
+        )
+
+    def create_location(self, code, zone='A', capacity='10.00', max_weight='5.00'):
+        return FacilityLocation.objects.create(
+            facility=self.facility, location_code=code, location_name=f'Location {code}', zone=zone,
+            capacity=Decimal(capacity), max_weight=Decimal(max_weight)
+        )
+
+    def totals(self, scope='facility', zone=''):
+        return FacilityUtilization.objects.filter(facility=self.facility, scope=scope, zone=zone).values(
+            'location_count', 'capacity', 'occupied_volume', 'pallet_count'
+        ).first()
+
+    def test_location_edits_move_zone_and_facility_totals(self):
+        """Creating, editing and deleting a location moves its capacity between the totals"""
+        first = self.create_location('A-01')
+        self.create_location('A-02', capacity='5.00')
+        self.assertEqual(self.totals(), {
+            'location_count': 2, 'capacity': Decimal('15.00'), 'occupied_volume': Decimal('0'), 'pallet_count': 0
+        })
+
+        first.zone = 'B'
+        first.capacity = Decimal('20.00')
+        first.save()
+        self.assertEqual(self.totals('zone', 'A')['capacity'], Decimal('5.00'))
+        self.assertEqual(self.totals('zone', 'B')['capacity'], Decimal('20.00'))
+        self.assertEqual(self.totals()['capacity'], Decimal('25.00'))
+
+        first.delete()
+        self.assertEqual(self.totals('zone', 'B')['location_count'], 0)
+        self.assertEqual(self.totals()['location_count'], 1)
+        self.assertEqual(find_drift(), ([], []))
+
+    def test_pallets_count_towards_their_location(self):
+        first = self.create_location('A-01')
+        second = self.create_location('A-02', zone='B')
+        pallet = Pallet.objects.create(pallet_id='PLT-001', current_location=first)
+        self.assertEqual(LocationUtilization.objects.get(location=first).pallet_count, 1)
+
+        pallet.current_location = second
+        pallet.save()
+        self.assertEqual(LocationUtilization.objects.get(location=first).pallet_count, 0)
+        self.assertEqual(self.totals('zone', 'B')['pallet_count'], 1)
+
+        pallet.status = 'inactive'
+        pallet.save()
+        self.assertEqual(self.totals()['pallet_count'], 0)
+        self.assertEqual(find_drift()[1], [])
+
+    def test_stock_loads_use_item_dimensions(self):
+        """Volume comes from the item CBM and weight from the gross weight, updating current_utilization"""
+        location = self.create_location('A-01')
+        apply_location_deltas(stock_loads([(location.pk, self.item.pk, Decimal('4'))]))
+
+        counters = LocationUtilization.objects.get(location=location)
+        self.assertEqual(counters.occupied_volume, Decimal('2.000'))
+        self.assertEqual(counters.occupied_weight, Decimal('48.000'))
+        location.refresh_from_db()
+        self.assertEqual(location.current_utilization, Decimal('20.00'))
+        self.assertEqual(self.totals()['occupied_volume'], Decimal('2.000'))
+
+        apply_location_deltas(stock_loads([(location.pk, self.item.pk, Decimal('-4'))]))
+        location.refresh_from_db()
+        self.assertEqual(location.current_utilization, Decimal('0.00'))
+
+    def test_utilization_is_capped(self):
+        location = self.create_location('A-01', capacity='0.10')
+        apply_location_deltas(stock_loads([(location.pk, self.item.pk, Decimal('10'))]))
+        location.refresh_from_db()
+        self.assertEqual(location.current_utilization, Decimal('999.99'))
+
+    def test_fix_drift_repairs_bulk_updates(self):
+        """Queryset updates skip the signals; fix_drift recomputes the counters"""
+        location = self.create_location('A-01')
+        Pallet.objects.create(pallet_id='PLT-001', current_location=location)
+        FacilityLocation.objects.filter(pk=location.pk).update(capacity=Decimal('40.00'))
+        LocationUtilization.objects.filter(location=location).update(pallet_count=3)
+
+        location_drift, summary_drift = find_drift()
+        self.assertEqual(len(location_drift), 1)
+        self.assertTrue(summary_drift)
+
+        fix_drift()
+        self.assertEqual(find_drift(), ([], []))
+        self.assertEqual(LocationUtilization.objects.get(location=location).pallet_count, 1)
+        self.assertEqual(self.totals()['capacity'], Decimal('40.00'))
@@ -14,6 +14,7 @@ urlpatterns = [
     path('<int:pk>/toggle-status/', views.facility_status_toggle, name='facility_status_toggle'),
     path('<int:facility_pk>/locations/', views.facility_locations, name='facility_locations'),
     path('export/', views.facility_export, name='facility_export'),
+    path('utilization/', views.facility_utilization, name='facility_utilization'),
     
     # Location URLs
     path('locations/', views.location_list, name='location_list'),
@@ -0,0 +1,271 @@
+"""
+Location utilization counters.
+
+LocationUtilization holds the volume, weight and pallet count occupying each
+location and FacilityUtilization rolls them up, together with the location
+count and capacity, per zone and per facility. Both are changed only through
+F() expression deltas:
+
+  - stock on hand changes (putaway, transfers, dispatch and every other stock
+    posting) add quantity x item CBM / gross weight to the location
+  - pallets moving into or out of a location change its pallet count
+  - creating, editing or deleting a location moves its capacity and
+    occupancy between zone totals
+
+so location pickers and capacity heatmaps read stored totals instead of
+summing stock per request. FacilityLocation.current_utilization is kept in
+step for locations with a capacity.
+
+Bulk queryset operations and item dimension changes skip the deltas, so
+find_drift / fix_drift compare the counters with a full recomputation and
+repair them.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+
+from .models import FacilityLocation, LocationUtilization, FacilityUtilization
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 1000
+KEY_CHUNK_SIZE = 200
+ZERO = Decimal('0')
+# Highest value FacilityLocation.current_utilization can store
+MAX_UTILIZATION = Decimal('999.99')
+
+LOCATION_FIELDS = ('occupied_volume', 'occupied_weight', 'pallet_count')
+SUMMARY_FIELDS = ('location_count', 'capacity', 'max_weight', 'occupied_volume', 'occupied_weight', 'pallet_count')
+
+
+def _chunks(values, size=KEY_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _add(totals, key, values):
+    current = totals.get(key)
+    totals[key] = list(values) if current is None else [a + b for a, b in zip(current, values)]
+
+
+def _update_by_pk(model, deltas, fields):
+    """Add {pk: [delta per field]} to existing rows, one CASE update per chunk"""
+    now = timezone.now()
+    for chunk in _chunks(deltas.items()):
+        model.objects.filter(pk__in=[pk for pk, _ in chunk]).update(
+            **{
+                field: F(field) + Case(
+                    *[When(pk=pk, then=Value(values[position])) for pk, values in chunk],
+                    default=Value(0),
+                    output_field=model._meta.get_field(field),
+                )
+                for position, field in enumerate(fields)
+            },
+            updated_at=now,
+        )
+
+
+def item_dimensions(item_ids):
+    """{item_id: (cbm, weight in kg)} per unit; gross weight is preferred over the item weight"""
+    Item = apps.get_model('items', 'Item')
+    return {
+        item_id: (cbm or ZERO, gross_weight or weight or ZERO)
+        for item_id, cbm, gross_weight, weight in Item.objects.filter(pk__in=set(item_ids)).values_list(
+            'id', 'cbm', 'gross_weight', 'weight'
+        )
+    }
+
+
+def stock_loads(movements):
+    """{location_id: [volume, weight, 0]} for (location_id, item_id, quantity) stock changes"""
+    movements = [(location_id, item_id, quantity) for location_id, item_id, quantity in movements if location_id and quantity]
+    dimensions = item_dimensions(item_id for _, item_id, _ in movements)
+    loads = {}
+    for location_id, item_id, quantity in movements:
+        cbm, weight = dimensions.get(item_id, (ZERO, ZERO))
+        _add(loads, location_id, [quantity * cbm, quantity * weight, 0])
+    return loads
+
+
+def apply_location_deltas(deltas):
+    """Add {location_id: [volume, weight, pallets]} to the location counters and their zone and facility totals"""
+    deltas = {location_id: values for location_id, values in deltas.items() if any(values)}
+    if not deltas:
+        return
+    with transaction.atomic():
+        LocationUtilization.objects.bulk_create(
+            [LocationUtilization(location_id=location_id) for location_id in deltas],
+            batch_size=BULK_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        _update_by_pk(LocationUtilization, deltas, LOCATION_FIELDS)
+        refresh_current_utilization(deltas)
+
+        summary = {}
+        for location_id, facility_id, zone in FacilityLocation.objects.filter(pk__in=deltas).values_list(
+            'id', 'facility_id', 'zone'
+        ):
+            volume, weight, pallets = deltas[location_id]
+            for key in summary_keys(facility_id, zone):
+                _add(summary, key, [0, ZERO, ZERO, volume, weight, pallets])
+        apply_summary_deltas(summary)
+
+
+def summary_keys(facility_id, zone):
+    """The zone and facility total rows a location counts towards"""
+    return [(facility_id, 'zone', zone or ''), (facility_id, 'facility', '')]
+
+
+def apply_summary_deltas(deltas):
+    """Add {(facility_id, scope, zone): [count, capacity, max_weight, volume, weight, pallets]} to the totals"""
+    deltas = {key: values for key, values in deltas.items() if any(values)}
+    if not deltas:
+        return
+    with transaction.atomic():
+        FacilityUtilization.objects.bulk_create(
+            [FacilityUtilization(facility_id=facility_id, scope=scope, zone=zone) for facility_id, scope, zone in deltas],
+            batch_size=BULK_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        rows = {
+            (facility_id, scope, zone): pk
+            for pk, facility_id, scope, zone in FacilityUtilization.objects.filter(
+                facility_id__in={facility_id for facility_id, _, _ in deltas}
+            ).values_list('pk', 'facility_id', 'scope', 'zone')
+        }
+        _update_by_pk(FacilityUtilization, {rows[key]: values for key, values in deltas.items()}, SUMMARY_FIELDS)
+
+
+def refresh_current_utilization(location_ids=None):
+    """Set FacilityLocation.current_utilization from the occupied volume of locations with a capacity"""
+    occupied = LocationUtilization.objects.filter(location=OuterRef('pk')).values('occupied_volume')
+    percentage = ExpressionWrapper(
+        Least(Coalesce(Subquery(occupied), Value(ZERO)) * 100 / F('capacity'), Value(MAX_UTILIZATION)),
+        output_field=DecimalField(max_digits=5, decimal_places=2),
+    )
+    locations = FacilityLocation.objects.filter(capacity__gt=0)
+    if location_ids is None:
+        return locations.update(current_utilization=percentage)
+    updated = 0
+    for chunk in _chunks(location_ids):
+        updated += locations.filter(pk__in=chunk).update(current_utilization=percentage)
+    return updated
+
+
+def location_contribution(location):
+    """Summary deltas a location adds to its zone and facility totals, from its stored values"""
+    counters = LocationUtilization.objects.filter(location_id=location['id']).values_list(*LOCATION_FIELDS).first()
+    volume, weight, pallets = counters or (ZERO, ZERO, 0)
+    values = [1, location['capacity'] or ZERO, location['max_weight'] or ZERO, volume, weight, pallets]
+    return {key: values for key in summary_keys(location['facility_id'], location['zone'])}
+
+
+def location_removal(location):
+    """Summary deltas that take a location out of its totals; read before its counters are deleted"""
+    return {key: [-value for value in values] for key, values in location_contribution(location).items()}
+
+
+def location_changed(previous, current):
+    """Move a location's totals when it is created or edited.
+
+    previous / current are dicts of id, facility_id, zone, capacity and
+    max_weight; previous is None for a created location.
+    """
+    deltas = {}
+    if previous:
+        for key, values in location_removal(previous).items():
+            _add(deltas, key, values)
+    if current:
+        for key, values in location_contribution(current).items():
+            _add(deltas, key, values)
+    apply_summary_deltas(deltas)
+    if current and current['capacity'] and (not previous or previous['capacity'] != current['capacity']):
+        refresh_current_utilization([current['id']])
+
+
+def expected_location_counters():
+    """{location_id: [volume, weight, pallets]} recomputed from stock on hand and pallets"""
+    StockOnHand = apps.get_model('stock_transfer', 'StockOnHand')
+    Pallet = apps.get_model('location_transfer', 'Pallet')
+    expected = defaultdict(lambda: [ZERO, ZERO, 0])
+    amount = DecimalField(max_digits=18, decimal_places=5)
+    stock = StockOnHand.objects.filter(location__isnull=False).exclude(quantity=0).values('location_id').annotate(
+        volume=Sum(ExpressionWrapper(F('quantity') * Coalesce(F('item__cbm'), Value(ZERO)), output_field=amount)),
+        weight=Sum(ExpressionWrapper(
+            F('quantity') * Coalesce(F('item__gross_weight'), F('item__weight'), Value(ZERO)), output_field=amount
+        )),
+    ).order_by().values_list('location_id', 'volume', 'weight')
+    for location_id, volume, weight in stock:
+        expected[location_id][0] += volume or ZERO
+        expected[location_id][1] += weight or ZERO
+    pallets = Pallet.objects.filter(status='active', current_location__isnull=False).values(
+        'current_location_id'
+    ).annotate(count=Count('id')).order_by().values_list('current_location_id', 'count')
+    for location_id, count in pallets:
+        expected[location_id][2] += count
+    return expected
+
+
+def expected_summaries(location_counters):
+    """{(facility_id, scope, zone): totals} recomputed from the locations and the given location counters"""
+    expected = {}
+    for location in FacilityLocation.objects.values('id', 'facility_id', 'zone', 'capacity', 'max_weight').iterator(
+        chunk_size=2000
+    ):
+        volume, weight, pallets = location_counters.get(location['id'], [ZERO, ZERO, 0])
+        values = [1, location['capacity'] or ZERO, location['max_weight'] or ZERO, volume, weight, pallets]
+        for key in summary_keys(location['facility_id'], location['zone']):
+            _add(expected, key, values)
+    return expected
+
+
+def _drift(stored, expected, empty):
+    return [
+        (key, stored.get(key, empty), expected.get(key, empty))
+        for key in sorted(set(stored) | set(expected), key=str)
+        if list(stored.get(key, empty)) != list(expected.get(key, empty))
+    ]
+
+
+def find_drift():
+    """Return (location drift, summary drift) as lists of (key, stored, expected)"""
+    expected = expected_location_counters()
+    stored = {
+        location_id: list(values)
+        for location_id, *values in LocationUtilization.objects.values_list('location_id', *LOCATION_FIELDS)
+    }
+    location_drift = _drift(stored, expected, [ZERO, ZERO, 0])
+
+    summaries = {
+        (facility_id, scope, zone): list(values)
+        for facility_id, scope, zone, *values in FacilityUtilization.objects.values_list(
+            'facility_id', 'scope', 'zone', *SUMMARY_FIELDS
+        )
+    }
+    summary_drift = _drift(summaries, expected_summaries(expected), [0, ZERO, ZERO, ZERO, ZERO, 0])
+    return location_drift, summary_drift
+
+
+def fix_drift():
+    """Bring drifted counters back to their recomputed values. Returns the drift fixed."""
+    location_drift, _ = find_drift()
+    with transaction.atomic():
+        # Applied as deltas so movements made since the check are kept; rolls up into the totals too
+        apply_location_deltas({
+            location_id: [e - s for s, e in zip(stored, expected)] for location_id, stored, expected in location_drift
+        })
+        _, summary_drift = find_drift()
+        apply_summary_deltas({
+            key: [e - s for s, e in zip(stored, expected)] for key, stored, expected in summary_drift
+        })
+        refresh_current_utilization()
+    if location_drift or summary_drift:
+        logger.info(f'Fixed utilization drift on {len(location_drift)} locations and {len(summary_drift)} totals')
+    return location_drift, summary_drift
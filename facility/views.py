@@ -9,7 +9,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
-from .models import Facility, FacilityLocation
+from .models import Facility, FacilityLocation, FacilityUtilization
 from .forms import FacilityForm, FacilityLocationForm, FacilitySearchForm, FacilityLocationSearchForm
 
 
@@ -139,10 +139,15 @@ def facility_detail(request, pk):
     # Get locations for this facility
     locations = facility.locations.all()
     
+    # Maintained zone and facility totals
+    summaries = list(facility.utilization_summaries.order_by('zone'))
+    
     context = {
         'facility': facility,
         'locations': locations,
         'features': facility.get_facility_features(),
+        'utilization_total': next((row for row in summaries if row.scope == 'facility'), None),
+        'zone_utilization': [row for row in summaries if row.scope == 'zone'],
     }
     
     return render(request, 'facility/facility_detail.html', context)
@@ -409,6 +414,26 @@ def facility_locations(request, facility_pk):
     return render(request, 'facility/facility_locations.html', context)
 
 
+@login_required
+def facility_utilization(request):
+    """Capacity heatmap of every facility by zone, read from the maintained totals"""
+    rows = FacilityUtilization.objects.select_related('facility').order_by('facility__facility_name', 'scope', 'zone')
+    
+    facilities = {}
+    for row in rows:
+        entry = facilities.setdefault(row.facility_id, {'facility': row.facility, 'total': None, 'zones': []})
+        if row.scope == 'facility':
+            entry['total'] = row
+        else:
+            entry['zones'].append(row)
+    
+    context = {
+        'facilities': list(facilities.values()),
+    }
+    
+    return render(request, 'facility/facility_utilization.html', context)
+
+
 # Class-based views for additional functionality
 class FacilityListView(LoginRequiredMixin, ListView):
     """Class-based view for facility list"""
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FiscalYear, FiscalPeriod, FiscalSettings
+from .models import FiscalYear, FiscalPeriod, FiscalSettings, FiscalYearClosing
 
 
 @admin.register(FiscalYear)
@@ -61,6 +61,9 @@ class FiscalSettingsAdmin(admin.ModelAdmin):
         ('Automation', {
             'fields': ('auto_create_periods', 'allow_overlapping_periods', 'require_period_approval')
         }),
+        ('Year-End Closing', {
+            'fields': ('retained_earnings_account',)
+        }),
         ('Naming Conventions', {
             'fields': ('fiscal_year_naming_convention', 'period_naming_convention')
         }),
@@ -73,3 +76,15 @@ class FiscalSettingsAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         # Don't allow deletion of settings
         return False
+
+
+@admin.register(FiscalYearClosing)
+class FiscalYearClosingAdmin(admin.ModelAdmin):
+    list_display = ['fiscal_year', 'next_fiscal_year', 'company', 'net_income', 'closing_entry_count', 'status', 'closed_at']
+    list_filter = ['status', 'closed_at']
+    search_fields = ['fiscal_year__name', 'reference']
+    readonly_fields = [f.name for f in FiscalYearClosing._meta.fields]
+    
+    def has_add_permission(self, request):
+        # Closings are created by the year-end closing process only
+        return False
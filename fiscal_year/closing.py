@@ -0,0 +1,297 @@
+"""
+Year-end closing for fiscal years.
+
+Account balances for the year are computed with one grouped query over the
+ledger, the profit and loss accounts are zeroed against retained earnings with
+a single batch of closing entries, and balance sheet accounts are carried into
+the next fiscal year as materialized opening balances. Closing is idempotent
+and can be reversed.
+"""
+import logging
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Sum, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from chart_of_accounts.models import ChartOfAccount
+from company.company_model import Company
+from ledger.models import Ledger
+from opening_balance.models import OpeningBalance, OpeningBalanceEntry
+from .models import FiscalYear, FiscalYearClosing, FiscalSettings
+
+logger = logging.getLogger(__name__)
+
+PROFIT_AND_LOSS_CATEGORIES = ['REVENUE', 'EXPENSE']
+BALANCE_SHEET_CATEGORIES = ['ASSET', 'LIABILITY', 'EQUITY']
+
+
+class FiscalYearCloser:
+    """Computes, posts and reverses year-end closing entries"""
+
+    def __init__(self, fiscal_year, company=None, retained_earnings_account=None, user=None):
+        self.fiscal_year = fiscal_year
+        self.company = company or Company.objects.filter(is_active=True).first()
+        self.retained_earnings_account = (
+            retained_earnings_account or FiscalSettings.get_settings().retained_earnings_account
+        )
+        self.user = user
+
+    @property
+    def reference(self):
+        return f"YEC-{self.fiscal_year.pk}"
+
+    def get_active_closing(self):
+        return FiscalYearClosing.objects.filter(
+            fiscal_year=self.fiscal_year,
+            company=self.company,
+            status='closed'
+        ).first()
+
+    def compute_account_balances(self):
+        """
+        Return {account_id: {'category', 'debit', 'credit', 'balance'}} for the year.
+
+        Debits and credits are summed per account in the database; balance is
+        debit minus credit. Earlier closing entries for this year are excluded.
+        """
+        zero = Decimal('0.00')
+        rows = Ledger.objects.filter(
+            company=self.company,
+            fiscal_year=self.fiscal_year,
+            status='POSTED'
+        ).exclude(
+            voucher_number=self.reference
+        ).values(
+            'account', 'account__account_type__category'
+        ).annotate(
+            debit=Coalesce(Sum('amount', filter=Q(entry_type='DR')), zero),
+            credit=Coalesce(Sum('amount', filter=Q(entry_type='CR')), zero),
+        ).order_by()
+
+        return {
+            row['account']: {
+                'category': row['account__account_type__category'],
+                'debit': row['debit'],
+                'credit': row['credit'],
+                'balance': row['debit'] - row['credit'],
+            }
+            for row in rows
+        }
+
+    def get_opening_balances(self):
+        """Return {account_id: signed opening balance} materialized for this year"""
+        balances = {}
+        entries = OpeningBalanceEntry.objects.filter(
+            opening_balance__financial_year=self.fiscal_year,
+            account__isnull=False
+        ).values_list('account', 'balance_type', 'amount')
+        for account_id, balance_type, amount in entries:
+            amount = amount or Decimal('0.00')
+            signed = amount if balance_type == 'debit' else -amount
+            balances[account_id] = balances.get(account_id, Decimal('0.00')) + signed
+        return balances
+
+    def preview(self):
+        """Compute closing figures without writing anything"""
+        balances = self.compute_account_balances()
+        profit_and_loss = {
+            account_id: data['balance']
+            for account_id, data in balances.items()
+            if data['category'] in PROFIT_AND_LOSS_CATEGORIES and data['balance']
+        }
+        # P&L accounts net to a debit balance on a loss and a credit balance on a profit
+        net_income = -sum(profit_and_loss.values(), Decimal('0.00'))
+
+        closing_balances = self.get_opening_balances()
+        for account_id, data in balances.items():
+            if data['category'] in BALANCE_SHEET_CATEGORIES:
+                closing_balances[account_id] = closing_balances.get(account_id, Decimal('0.00')) + data['balance']
+        if self.retained_earnings_account:
+            re_id = self.retained_earnings_account.pk
+            closing_balances[re_id] = closing_balances.get(re_id, Decimal('0.00')) - net_income
+
+        return {
+            'balances': balances,
+            'profit_and_loss': profit_and_loss,
+            'net_income': net_income,
+            'closing_balances': {k: v for k, v in closing_balances.items() if v},
+        }
+
+    def _validate(self, next_fiscal_year):
+        if not self.company:
+            raise ValidationError("No active company found for year-end closing.")
+        if not self.retained_earnings_account:
+            raise ValidationError("Set a retained earnings account in fiscal settings before closing the year.")
+        if self.retained_earnings_account.account_type.category != 'EQUITY':
+            raise ValidationError("The retained earnings account must be an equity account.")
+        if not next_fiscal_year:
+            raise ValidationError(f'Create the fiscal year following "{self.fiscal_year.name}" before closing it.')
+        if next_fiscal_year.is_closed:
+            raise ValidationError(f'The next fiscal year "{next_fiscal_year.name}" is already closed.')
+        if OpeningBalance.objects.filter(financial_year=next_fiscal_year).exists():
+            raise ValidationError(
+                f'Opening balances already exist for "{next_fiscal_year.name}". '
+                'Remove them before closing so they can be materialized from this year.'
+            )
+
+    def _next_ledger_numbers(self, count):
+        """Reserve ledger numbers following Ledger.generate_ledger_number"""
+        year = self.fiscal_year.start_date.year if self.fiscal_year.start_date else self.fiscal_year.name
+        prefix = f"LED-{year}-"
+        last_entry = Ledger.objects.filter(
+            ledger_number__startswith=prefix,
+            company=self.company
+        ).order_by('-ledger_number').values_list('ledger_number', flat=True).first()
+
+        try:
+            last_number = int(last_entry.split('-')[-1]) if last_entry else 0
+        except (ValueError, IndexError):
+            last_number = 0
+        return [f"{prefix}{last_number + i:06d}" for i in range(1, count + 1)]
+
+    def close(self):
+        """Close the fiscal year. Returns the (possibly pre-existing) closing record."""
+        existing = self.get_active_closing()
+        if existing:
+            return existing
+
+        next_fiscal_year = self.fiscal_year.get_next_fiscal_year()
+        self._validate(next_fiscal_year)
+
+        with transaction.atomic():
+            # Serialize concurrent closings of the same year
+            fiscal_year = FiscalYear.objects.select_for_update().get(pk=self.fiscal_year.pk)
+            existing = self.get_active_closing()
+            if existing:
+                return existing
+
+            figures = self.preview()
+            net_income = figures['net_income']
+            re_account = self.retained_earnings_account
+            description = f"Year-end closing - {fiscal_year.name}"
+
+            # Closing entries: reverse each P&L balance and book the net to retained earnings
+            postings = [
+                (account_id, 'CR' if balance > 0 else 'DR', abs(balance), Decimal('0.00'))
+                for account_id, balance in figures['profit_and_loss'].items()
+            ]
+            if net_income:
+                re_year_balance = figures['balances'].get(re_account.pk, {}).get('balance', Decimal('0.00'))
+                postings.append((
+                    re_account.pk,
+                    'CR' if net_income > 0 else 'DR',
+                    abs(net_income),
+                    re_year_balance - net_income,
+                ))
+
+            ledger_numbers = self._next_ledger_numbers(len(postings))
+            Ledger.objects.bulk_create([
+                Ledger(
+                    ledger_number=ledger_number,
+                    entry_date=fiscal_year.end_date,
+                    reference=self.reference,
+                    description=description,
+                    account_id=account_id,
+                    entry_type=entry_type,
+                    amount=amount,
+                    running_balance=running_balance,
+                    status='POSTED',
+                    created_by=self.user,
+                    updated_by=self.user,
+                    company=self.company,
+                    fiscal_year=fiscal_year,
+                    voucher_number=self.reference,
+                )
+                for ledger_number, (account_id, entry_type, amount, running_balance) in zip(ledger_numbers, postings)
+            ], batch_size=1000)
+
+            # Keep current balances in line with what the ledger signals would compute
+            ChartOfAccount.objects.filter(pk__in=figures['profit_and_loss'].keys()).update(current_balance=Decimal('0.00'))
+            if net_income:
+                ChartOfAccount.objects.filter(pk=re_account.pk).update(
+                    current_balance=postings[-1][3]
+                )
+
+            # Materialize opening balances for the next year
+            opening_balance = OpeningBalance.objects.create(
+                financial_year=next_fiscal_year,
+                created_by=self.user
+            )
+            opening_entries = [
+                OpeningBalanceEntry(
+                    opening_balance=opening_balance,
+                    account_id=account_id,
+                    amount=abs(balance),
+                    balance_type='debit' if balance > 0 else 'credit',
+                    remarks=f"Carried forward from {fiscal_year.name}"
+                )
+                for account_id, balance in figures['closing_balances'].items()
+            ]
+            OpeningBalanceEntry.objects.bulk_create(opening_entries, batch_size=1000)
+
+            # Lock the closed year against posting
+            periods = dict(fiscal_year.periods.values_list('pk', 'status'))
+            closing = FiscalYearClosing.objects.create(
+                fiscal_year=fiscal_year,
+                next_fiscal_year=next_fiscal_year,
+                company=self.company,
+                retained_earnings_account=re_account,
+                opening_balance=opening_balance,
+                reference=self.reference,
+                net_income=net_income,
+                closing_entry_count=len(postings),
+                opening_entry_count=len(opening_entries),
+                previous_status=fiscal_year.status,
+                previous_period_statuses={str(pk): status for pk, status in periods.items()},
+                closed_by=self.user,
+            )
+            fiscal_year.periods.update(status='locked')
+            FiscalYear.objects.filter(pk=fiscal_year.pk).update(status='closed')
+            self.fiscal_year.status = 'closed'
+
+        logger.info(
+            f'Closed fiscal year {fiscal_year.name}: {len(postings)} closing entries, '
+            f'net income {net_income}'
+        )
+        return closing
+
+    def reverse(self):
+        """Reverse the active closing. Returns the reversed closing, or None if the year is open."""
+        closing = self.get_active_closing()
+        if not closing:
+            return None
+
+        if closing.next_fiscal_year.is_closed:
+            raise ValidationError(
+                f'Reverse the closing of "{closing.next_fiscal_year.name}" before reopening "{self.fiscal_year.name}".'
+            )
+
+        with transaction.atomic():
+            fiscal_year = FiscalYear.objects.select_for_update().get(pk=self.fiscal_year.pk)
+
+            # Reopen first so the ledger lock does not block removing the closing entries
+            FiscalYear.objects.filter(pk=fiscal_year.pk).update(status=closing.previous_status or 'active')
+            for period_id, status in closing.previous_period_statuses.items():
+                fiscal_year.periods.filter(pk=period_id).update(status=status)
+            self.fiscal_year.status = closing.previous_status or 'active'
+
+            Ledger.objects.filter(
+                company=closing.company,
+                fiscal_year=fiscal_year,
+                voucher_number=closing.reference
+            ).delete()
+
+            if closing.opening_balance_id:
+                OpeningBalance.objects.filter(pk=closing.opening_balance_id).delete()
+                closing.opening_balance = None
+
+            closing.status = 'reversed'
+            closing.reversed_by = self.user
+            closing.reversed_at = timezone.now()
+            closing.save(update_fields=['status', 'reversed_by', 'reversed_at', 'opening_balance'])
+
+        logger.info(f'Reversed year-end closing of fiscal year {fiscal_year.name}')
+        return closing
@@ -130,12 +130,14 @@ class FiscalSettingsForm(forms.ModelForm):
             'auto_create_periods',
             'allow_overlapping_periods',
             'require_period_approval',
+            'retained_earnings_account',
             'fiscal_year_naming_convention',
             'period_naming_convention'
         ]
         widgets = {
             'default_fiscal_year_start_month': forms.Select(attrs={'class': 'form-control'}),
             'default_period_type': forms.Select(attrs={'class': 'form-control'}),
+            'retained_earnings_account': forms.Select(attrs={'class': 'form-control'}),
             'fiscal_year_naming_convention': forms.TextInput(attrs={
                 'class': 'form-control',
                 'placeholder': 'e.g., FY {start_year}-{end_year}'
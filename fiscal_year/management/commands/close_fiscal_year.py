@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.exceptions import ValidationError
+from django.contrib.auth import get_user_model
+
+from fiscal_year.models import FiscalYear
+from fiscal_year.closing import FiscalYearCloser
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Run (or reverse) the year-end closing of a fiscal year'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'fiscal_year',
+            help='ID or name of the fiscal year to close',
+        )
+        parser.add_argument(
+            '--reverse',
+            action='store_true',
+            help='Reverse the year-end closing and reopen the fiscal year',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the closing figures without posting anything',
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded on the closing entries',
+        )
+    
+    def handle(self, *args, **options):
+        value = options['fiscal_year']
+        lookup = {'pk': value} if value.isdigit() else {'name': value}
+        try:
+            fiscal_year = FiscalYear.objects.get(**lookup)
+        except FiscalYear.DoesNotExist:
+            raise CommandError(f'Fiscal year "{value}" not found')
+        
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        
+        closer = FiscalYearCloser(fiscal_year, user=user)
+        
+        try:
+            if options['reverse']:
+                closing = closer.reverse()
+                if closing:
+                    self.stdout.write(self.style.SUCCESS(f'Reversed year-end closing of {fiscal_year.name}'))
+                else:
+                    self.stdout.write(self.style.WARNING(f'{fiscal_year.name} is not closed'))
+                return
+            
+            if options['dry_run']:
+                figures = closer.preview()
+                self.stdout.write(f'Profit and loss accounts to close: {len(figures["profit_and_loss"])}')
+                self.stdout.write(f'Opening balances to carry forward: {len(figures["closing_balances"])}')
+                self.stdout.write(f'Net income: {figures["net_income"]:,.2f}')
+                return
+            
+            closing = closer.close()
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Closed {fiscal_year.name}: {closing.closing_entry_count} closing entries, '
+                f'{closing.opening_entry_count} opening balances for {closing.next_fiscal_year.name}, '
+                f'net income {closing.net_income:,.2f}'
+            )
+        )
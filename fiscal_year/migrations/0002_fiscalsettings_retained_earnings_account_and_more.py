@@ -0,0 +1,51 @@
+# Generated by Django 4.2.23 on 2026-10-18 21:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0005_company_logo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chart_of_accounts', '0003_alter_chartofaccount_account_code'),
+        ('opening_balance', '0002_alter_openingbalanceentry_account_and_more'),
+        ('fiscal_year', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fiscalsettings',
+            name='retained_earnings_account',
+            field=models.ForeignKey(blank=True, help_text='Equity account that receives the net profit or loss at year-end closing', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chart_of_accounts.chartofaccount'),
+        ),
+        migrations.CreateModel(
+            name='FiscalYearClosing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(help_text='Voucher number stamped on the closing ledger entries', max_length=50)),
+                ('status', models.CharField(choices=[('closed', 'Closed'), ('reversed', 'Reversed')], default='closed', max_length=20)),
+                ('net_income', models.DecimalField(decimal_places=2, default=0, help_text='Net profit (positive) or loss (negative) for the year', max_digits=15)),
+                ('closing_entry_count', models.IntegerField(default=0)),
+                ('opening_entry_count', models.IntegerField(default=0)),
+                ('previous_status', models.CharField(blank=True, help_text='Fiscal year status before closing', max_length=20)),
+                ('previous_period_statuses', models.JSONField(blank=True, default=dict, help_text='Period statuses before closing, keyed by period ID')),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('reversed_at', models.DateTimeField(blank=True, null=True)),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fiscal_year_closings', to=settings.AUTH_USER_MODEL)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fiscal_year_closings', to='company.company')),
+                ('fiscal_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closings', to='fiscal_year.fiscalyear')),
+                ('next_fiscal_year', models.ForeignKey(help_text='Fiscal year that receives the materialized opening balances', on_delete=django.db.models.deletion.PROTECT, related_name='opening_closings', to='fiscal_year.fiscalyear')),
+                ('opening_balance', models.ForeignKey(blank=True, help_text='Opening balance created for the next fiscal year by this closing', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fiscal_year_closings', to='opening_balance.openingbalance')),
+                ('retained_earnings_account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='fiscal_year_closings', to='chart_of_accounts.chartofaccount')),
+                ('reversed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reversed_fiscal_year_closings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Fiscal Year Closing',
+                'verbose_name_plural': 'Fiscal Year Closings',
+                'ordering': ['-closed_at'],
+            },
+        ),
+    ]
@@ -49,6 +49,15 @@ class FiscalYear(models.Model):
         if self.is_current:
             FiscalYear.objects.exclude(pk=self.pk).update(is_current=False)
         super().save(*args, **kwargs)
+    
+    @property
+    def is_closed(self):
+        """Closed fiscal years are locked against posting"""
+        return self.status == 'closed'
+    
+    def get_next_fiscal_year(self):
+        """Return the fiscal year that follows this one, if any"""
+        return FiscalYear.objects.filter(start_date__gt=self.end_date).order_by('start_date').first()
 
 
 class FiscalPeriod(models.Model):
@@ -162,6 +171,14 @@ class FiscalSettings(models.Model):
         default=False,
         help_text="Require approval before closing periods"
     )
+    retained_earnings_account = models.ForeignKey(
+        'chart_of_accounts.ChartOfAccount',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Equity account that receives the net profit or loss at year-end closing"
+    )
     fiscal_year_naming_convention = models.CharField(
         max_length=100,
         default="FY {start_year}-{end_year}",
@@ -193,3 +210,46 @@ class FiscalSettings(models.Model):
         """Get or create the fiscal settings instance"""
         settings, created = cls.objects.get_or_create()
         return settings
+
+
+class FiscalYearClosing(models.Model):
+    """Model for year-end closing runs of a fiscal year"""
+    
+    STATUS_CHOICES = [
+        ('closed', 'Closed'),
+        ('reversed', 'Reversed'),
+    ]
+    
+    fiscal_year = models.ForeignKey(FiscalYear, on_delete=models.CASCADE, related_name='closings')
+    next_fiscal_year = models.ForeignKey(
+        FiscalYear, on_delete=models.PROTECT, related_name='opening_closings',
+        help_text="Fiscal year that receives the materialized opening balances"
+    )
+    company = models.ForeignKey('company.Company', on_delete=models.CASCADE, related_name='fiscal_year_closings')
+    retained_earnings_account = models.ForeignKey(
+        'chart_of_accounts.ChartOfAccount', on_delete=models.PROTECT, related_name='fiscal_year_closings'
+    )
+    opening_balance = models.ForeignKey(
+        'opening_balance.OpeningBalance', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='fiscal_year_closings',
+        help_text="Opening balance created for the next fiscal year by this closing"
+    )
+    reference = models.CharField(max_length=50, help_text="Voucher number stamped on the closing ledger entries")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='closed')
+    net_income = models.DecimalField(max_digits=15, decimal_places=2, default=0, help_text="Net profit (positive) or loss (negative) for the year")
+    closing_entry_count = models.IntegerField(default=0)
+    opening_entry_count = models.IntegerField(default=0)
+    previous_status = models.CharField(max_length=20, blank=True, help_text="Fiscal year status before closing")
+    previous_period_statuses = models.JSONField(default=dict, blank=True, help_text="Period statuses before closing, keyed by period ID")
+    closed_by = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='fiscal_year_closings')
+    closed_at = models.DateTimeField(auto_now_add=True)
+    reversed_by = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='reversed_fiscal_year_closings')
+    reversed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-closed_at']
+        verbose_name = 'Fiscal Year Closing'
+        verbose_name_plural = 'Fiscal Year Closings'
+    
+    def __str__(self):
+        return f"{self.fiscal_year.name} closing ({self.get_status_display()})"
@@ -1,3 +1,126 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.test import TestCase
 
-# Create your tests here.
+from chart_of_accounts.models import AccountType, ChartOfAccount
+from company.company_model import Company
+from ledger.models import Ledger
+from multi_currency.models import Currency
+from opening_balance.models import OpeningBalance
+from .closing import FiscalYearCloser
+from .models import FiscalSettings, FiscalYear
+
+
+class FiscalYearClosingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.company = Company.objects.create(
+            name='Test Company', code='TST', address='1 Test Street', phone='1234567', email='info@example.com'
+        )
+        currency = Currency.objects.create(code='AED', name='UAE Dirham', symbol='AED')
+        self.year = FiscalYear.objects.create(
+            name='FY2024', start_date=date(2024, 1, 1), end_date=date(2024, 12, 31), status='active'
+        )
+        self.next_year = FiscalYear.objects.create(
+            name='FY2025', start_date=date(2025, 1, 1), end_date=date(2025, 12, 31), status='active'
+        )
+        self.accounts = {}
+        for code, category in (('1000', 'ASSET'), ('2000', 'LIABILITY'), ('3000', 'EQUITY'),
+                               ('4000', 'REVENUE'), ('5000', 'EXPENSE')):
+            account_type = AccountType.objects.create(name=f'{category.title()} accounts', category=category)
+            self.accounts[code] = ChartOfAccount.objects.create(
+                account_code=code, name=f'Account {code}', account_type=account_type,
+                currency=currency, company=self.company
+            )
+        settings = FiscalSettings.get_settings()
+        settings.retained_earnings_account = self.accounts['3000']
+        settings.save()
+
+    def post(self, code, entry_type, amount, fiscal_year=None):
+        return Ledger.objects.create(
+            entry_date=date(2024, 6, 30), description='Test entry', account=self.accounts[code],
+            entry_type=entry_type, amount=Decimal(amount), status='POSTED', company=self.company,
+            fiscal_year=fiscal_year or self.year, created_by=self.user
+        )
+
+    def book_year(self):
+        # Sales of 1000 in cash, expenses of 300 on credit
+        self.post('1000', 'DR', '1000')
+        self.post('4000', 'CR', '1000')
+        self.post('5000', 'DR', '300')
+        self.post('2000', 'CR', '300')
+
+    def opening_balances(self, closing):
+        return {
+            entry.account.account_code: (entry.balance_type, entry.amount)
+            for entry in closing.opening_balance.entries.select_related('account')
+        }
+
+    def test_close_zeroes_profit_and_loss_and_carries_balances_forward(self):
+        self.book_year()
+        closer = FiscalYearCloser(self.year, company=self.company, user=self.user)
+
+        self.assertEqual(closer.preview()['net_income'], Decimal('700'))
+        closing = closer.close()
+
+        self.assertEqual(closing.net_income, Decimal('700'))
+        self.assertEqual(closing.closing_entry_count, 3)
+        self.assertEqual(closer.compute_account_balances().keys(), {
+            account.pk for account in self.accounts.values() if account.account_code != '3000'
+        })
+        closing_entries = Ledger.objects.filter(voucher_number=closer.reference)
+        self.assertEqual(
+            {(entry.account.account_code, entry.entry_type, entry.amount) for entry in closing_entries},
+            {('4000', 'DR', Decimal('1000')), ('5000', 'CR', Decimal('300')), ('3000', 'CR', Decimal('700'))}
+        )
+        self.assertEqual(self.opening_balances(closing), {
+            '1000': ('debit', Decimal('1000')),
+            '2000': ('credit', Decimal('300')),
+            '3000': ('credit', Decimal('700')),
+        })
+        self.year.refresh_from_db()
+        self.assertTrue(self.year.is_closed)
+
+    def test_close_is_idempotent(self):
+        self.book_year()
+        closer = FiscalYearCloser(self.year, company=self.company, user=self.user)
+        closing = closer.close()
+
+        self.assertEqual(FiscalYearCloser(self.year, company=self.company).close().pk, closing.pk)
+        self.assertEqual(Ledger.objects.filter(voucher_number=closer.reference).count(), 3)
+
+    def test_closed_year_is_locked_against_posting(self):
+        self.book_year()
+        FiscalYearCloser(self.year, company=self.company, user=self.user).close()
+        self.year.refresh_from_db()
+
+        with self.assertRaises(ValidationError):
+            self.post('1000', 'DR', '50')
+
+    def test_reverse_restores_the_open_year(self):
+        self.book_year()
+        closer = FiscalYearCloser(self.year, company=self.company, user=self.user)
+        closer.close()
+
+        closing = closer.reverse()
+
+        self.assertEqual(closing.status, 'reversed')
+        self.assertFalse(Ledger.objects.filter(voucher_number=closer.reference).exists())
+        self.assertFalse(OpeningBalance.objects.filter(financial_year=self.next_year).exists())
+        self.year.refresh_from_db()
+        self.assertEqual(self.year.status, 'active')
+        # Posting works again and the year can be closed with the new figures
+        self.post('4000', 'CR', '100')
+        self.post('1000', 'DR', '100')
+        self.assertEqual(closer.close().net_income, Decimal('800'))
+
+    def test_close_requires_next_year_without_opening_balances(self):
+        OpeningBalance.objects.create(financial_year=self.next_year, created_by=self.user)
+        with self.assertRaises(ValidationError):
+            FiscalYearCloser(self.year, company=self.company).close()
+
+        with self.assertRaises(ValidationError):
+            FiscalYearCloser(self.next_year, company=self.company).close()
@@ -14,6 +14,8 @@ urlpatterns = [
     path('fiscal-years/<int:pk>/edit/', views.fiscal_year_update, name='fiscal_year_update'),
     path('fiscal-years/<int:pk>/delete/', views.fiscal_year_delete, name='fiscal_year_delete'),
     path('fiscal-years/<int:pk>/toggle-status/', views.toggle_fiscal_year_status, name='toggle_fiscal_year_status'),
+    path('fiscal-years/<int:pk>/close/', views.fiscal_year_close, name='fiscal_year_close'),
+    path('fiscal-years/<int:pk>/reopen/', views.fiscal_year_reopen, name='fiscal_year_reopen'),
     
     # Fiscal Periods
     path('periods/', views.fiscal_period_list, name='fiscal_period_list'),
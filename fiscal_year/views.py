@@ -1,11 +1,13 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
 from django.db.models import Q
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from .models import FiscalYear, FiscalPeriod, FiscalSettings
+from .closing import FiscalYearCloser
 from .forms import (
     FiscalYearForm, FiscalPeriodForm, FiscalSettingsForm,
     FiscalYearSearchForm, FiscalPeriodSearchForm
@@ -106,6 +108,43 @@ def fiscal_year_detail(request, pk):
     return render(request, 'fiscal_year/fiscal_year_detail.html', context)
 
 
+@login_required
+@require_POST
+def fiscal_year_close(request, pk):
+    """Run the year-end closing for a fiscal year"""
+    fiscal_year = get_object_or_404(FiscalYear, pk=pk)
+    
+    try:
+        closing = FiscalYearCloser(fiscal_year, user=request.user).close()
+    except ValidationError as e:
+        messages.error(request, ' '.join(e.messages))
+    else:
+        messages.success(
+            request,
+            f'Fiscal year "{fiscal_year.name}" closed. Net income of {closing.net_income:,.2f} '
+            f'posted to retained earnings and opening balances created for "{closing.next_fiscal_year.name}".'
+        )
+    return redirect('fiscal_year:fiscal_year_detail', pk=fiscal_year.pk)
+
+
+@login_required
+@require_POST
+def fiscal_year_reopen(request, pk):
+    """Reverse the year-end closing of a fiscal year"""
+    fiscal_year = get_object_or_404(FiscalYear, pk=pk)
+    
+    try:
+        closing = FiscalYearCloser(fiscal_year, user=request.user).reverse()
+    except ValidationError as e:
+        messages.error(request, ' '.join(e.messages))
+    else:
+        if closing:
+            messages.success(request, f'Year-end closing of "{fiscal_year.name}" reversed.')
+        else:
+            messages.info(request, f'Fiscal year "{fiscal_year.name}" is not closed.')
+    return redirect('fiscal_year:fiscal_year_detail', pk=fiscal_year.pk)
+
+
 @login_required
 def fiscal_year_update(request, pk):
     """Update fiscal year"""
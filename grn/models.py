@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator
@@ -101,6 +102,9 @@ class GRN(models.Model):
     created_at = models.DateTimeField(default=timezone.now, verbose_name="Created At")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
     
+    # Queued emails and their delivery status
+    document_emails = GenericRelation('email_configuration.DocumentEmail')
+    
     class Meta:
         verbose_name = "Goods Received Note"
         verbose_name_plural = "Goods Received Notes"
@@ -11,13 +11,7 @@ from django.forms import inlineformset_factory
 from django.utils import timezone
 from django.views.decorators.http import require_http_methods
 from django.template.loader import render_to_string
-from django.core.mail import EmailMessage
-from django.conf import settings
 import weasyprint
-from io import BytesIO
-from PyPDF2 import PdfMerger
-import tempfile
-import os
 
 from .models import GRN, GRNItem, GRNPallet
 from .forms import GRNForm, GRNItemForm, GRNItemFormSet
@@ -27,6 +21,7 @@ from items.models import Item
 from job.models import Job
 from salesman.models import Salesman
 from company.company_model import Company
+from email_configuration.documents import document_part, queue_document_email
 
 
 class GRNListView(LoginRequiredMixin, ListView):
@@ -340,6 +335,7 @@ class GRNDetailView(LoginRequiredMixin, DetailView):
         context = super().get_context_data(**kwargs)
         context['grn_items'] = self.object.items.all()
         context['grn_pallets'] = self.object.pallets.all()
+        context['document_emails'] = self.object.document_emails.select_related('created_by')[:10]
         return context
 
 
@@ -631,85 +627,48 @@ def grn_email(request, pk):
                 messages.error(request, 'Email address is required.')
                 return redirect('grn:grn_detail', pk=pk)
             
-            # Create email
-            email = EmailMessage(
-                subject=email_subject,
-                body=email_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[email_to]
-            )
-            
-            # Attach PDFs based on selection
+            # Render the selected documents; the PDFs are converted and sent in the background
+            documents = []
             if attach_summary:
-                html_summary = render_to_string('grn/print/grn_summary.html', {
+                documents.append(('summary', render_to_string('grn/print/grn_summary.html', {
                     'grn': grn,
                     'company': company,
                     'grn_items': grn.items.all(),
                     'grn_pallets': grn.pallets.all()
-                })
-                pdf_summary = weasyprint.HTML(string=html_summary).write_pdf()
-                email.attach(f'GRN_Summary_{grn.grn_number}.pdf', pdf_summary, 'application/pdf')
+                }), f'GRN_Summary_{grn.grn_number}.pdf'))
             
             if attach_detailed:
-                html_detailed = render_to_string('grn/print/grn_detailed.html', {
+                documents.append(('detailed', render_to_string('grn/print/grn_detailed.html', {
                     'grn': grn,
                     'company': company,
                     'grn_items': grn.items.all(),
                     'grn_pallets': grn.pallets.all()
-                })
-                pdf_detailed = weasyprint.HTML(string=html_detailed).write_pdf()
-                email.attach(f'GRN_Detailed_{grn.grn_number}.pdf', pdf_detailed, 'application/pdf')
+                }), f'GRN_Detailed_{grn.grn_number}.pdf'))
             
             if attach_putaways:
-                html_putaways = render_to_string('grn/print/grn_putaways.html', {
+                documents.append(('putaways', render_to_string('grn/print/grn_putaways.html', {
                     'grn': grn,
                     'company': company,
                     'grn_pallets': grn.pallets.all()
-                })
-                pdf_putaways = weasyprint.HTML(string=html_putaways).write_pdf()
-                email.attach(f'GRN_Putaways_{grn.grn_number}.pdf', pdf_putaways, 'application/pdf')
+                }), f'GRN_Putaways_{grn.grn_number}.pdf'))
             
-            # If multiple are selected, create a combined PDF
-            selected_attachments = []
-            if attach_summary:
-                selected_attachments.append(('summary', pdf_summary))
-            if attach_detailed:
-                selected_attachments.append(('detailed', pdf_detailed))
-            if attach_putaways:
-                selected_attachments.append(('putaways', pdf_putaways))
-            
-            if len(selected_attachments) > 1:
-                merger = PdfMerger()
-                pdf_files = []
-                
-                # Add all selected PDFs
-                for attachment_type, pdf_content in selected_attachments:
-                    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-                    temp_file.write(pdf_content)
-                    temp_file.close()
-                    pdf_files.append(temp_file.name)
-                    merger.append(temp_file.name)
-                
-                # Create combined PDF
-                output_buffer = BytesIO()
-                merger.write(output_buffer)
-                merger.close()
-                output_buffer.seek(0)
-                
-                # Clean up temporary files
-                for temp_file in pdf_files:
-                    try:
-                        os.unlink(temp_file)
-                    except:
-                        pass
-                
-                # Remove individual attachments and add combined
-                email.attachments = []
-                email.attach(f'GRN_Complete_{grn.grn_number}.pdf', output_buffer.getvalue(), 'application/pdf')
+            parts = [(document_part(grn, kind, html), filename) for kind, html, filename in documents]
+            if len(parts) > 1:
+                # Several documents go out as one combined PDF
+                attachments = [(f'GRN_Complete_{grn.grn_number}.pdf', [path for path, _ in parts])]
+            else:
+                attachments = [(filename, [path]) for path, filename in parts]
             
-            email.send()
+            queue_document_email(
+                grn,
+                subject=email_subject,
+                body=email_message,
+                to=[email_to],
+                attachments=attachments,
+                user=request.user,
+            )
             
-            messages.success(request, f'GRN {grn.grn_number} has been sent via email.')
+            messages.success(request, f'GRN {grn.grn_number} has been queued for email to {email_to}.')
             return redirect('grn:grn_detail', pk=pk)
         else:
             messages.error(request, 'Invalid request method.')
@@ -0,0 +1,22 @@
+"""
+HTML to PDF conversion run inside the rendering pool's worker processes.
+
+Kept free of Django imports so spawned workers can import it without
+setting up the project.
+"""
+from io import BytesIO
+
+from xhtml2pdf import pisa
+
+
+class PDFConversionError(Exception):
+    pass
+
+
+def html_to_pdf(html_string):
+    """Convert an HTML document to PDF bytes"""
+    result = BytesIO()
+    pdf = pisa.pisaDocument(BytesIO(html_string.encode("UTF-8")), result)
+    if pdf.err:
+        raise PDFConversionError(f'xhtml2pdf reported {pdf.err} errors')
+    return result.getvalue()
@@ -0,0 +1,193 @@
+"""
+Cached invoice PDF rendering.
+
+The print template is rendered to HTML (cheap) and hashed; the PDF conversion
+(slow) only runs when no PDF is stored for that invoice and hash yet, so an
+unchanged invoice is served from storage and any change to the invoice, its
+jobs, the company details or the template produces a new PDF. Older versions
+are removed when a new one is stored.
+
+Batches render their cache misses on a pool of worker processes and can be
+merged into a single document for printing.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.loader import render_to_string
+from pypdf import PdfWriter
+
+from company.company_model import Company
+from .models import Invoice
+from .pdf_worker import html_to_pdf, PDFConversionError
+
+logger = logging.getLogger(__name__)
+
+PDF_DIRECTORY = 'invoice_pdfs'
+TEMPLATES = {
+    'invoice': 'invoice/print/invoice.html',
+    'cost_sale': 'invoice/print/cost_sale.html',
+}
+MAX_WORKERS = getattr(settings, 'INVOICE_PDF_WORKERS', min(4, os.cpu_count() or 1))
+# Invoices accepted by one batch print
+MAX_BATCH_SIZE = 500
+# Merged documents are spooled in memory up to this size, then to disk
+SPOOL_MAX_SIZE = 10 * 1024 * 1024
+
+_pool = None
+
+
+class InvoiceRenderError(Exception):
+    pass
+
+
+def get_pool():
+    """Process pool shared by batch renders in this process, created on first use"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+def delete_cached_pdfs(invoice_id):
+    """Remove every stored PDF of an invoice"""
+    directory = f'{PDF_DIRECTORY}/{invoice_id}'
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        default_storage.delete(f'{directory}/{name}')
+
+
+class InvoiceRenderer:
+    """Renders invoice PDFs through a content-hash keyed cache"""
+
+    def __init__(self, kind='invoice'):
+        if kind not in TEMPLATES:
+            raise ValueError(f'Unknown invoice print layout: {kind}')
+        self.kind = kind
+        self.company = Company.objects.filter(is_active=True).first()
+
+    @staticmethod
+    def queryset():
+        return Invoice.objects.select_related('customer', 'payment_source').prefetch_related(
+            'jobs',
+            'jobs__cargo_items',
+            'jobs__cargo_items__item'
+        )
+
+    def render_html(self, invoice):
+        return render_to_string(TEMPLATES[self.kind], {
+            'invoice': invoice,
+            'company': self.company
+        })
+
+    def cache_path(self, invoice_id, html):
+        content_hash = hashlib.sha256(html.encode('UTF-8')).hexdigest()[:32]
+        return f'{PDF_DIRECTORY}/{invoice_id}/{self.kind}-{content_hash}.pdf'
+
+    def _store(self, invoice_id, path, pdf_bytes):
+        if not default_storage.exists(path):
+            default_storage.save(path, ContentFile(pdf_bytes))
+        self._prune(invoice_id, keep=path)
+
+    def _prune(self, invoice_id, keep):
+        directory = f'{PDF_DIRECTORY}/{invoice_id}'
+        try:
+            _, files = default_storage.listdir(directory)
+        except FileNotFoundError:
+            return
+        for name in files:
+            path = f'{directory}/{name}'
+            if name.startswith(f'{self.kind}-') and path != keep:
+                default_storage.delete(path)
+
+    def _read(self, path):
+        with default_storage.open(path, 'rb') as stored:
+            return stored.read()
+
+    def get_pdf(self, invoice):
+        """PDF bytes for one invoice, rendering only when it changed"""
+        html = self.render_html(invoice)
+        path = self.cache_path(invoice.pk, html)
+        if default_storage.exists(path):
+            return self._read(path)
+        try:
+            pdf_bytes = html_to_pdf(html)
+        except PDFConversionError as e:
+            raise InvoiceRenderError(f'Could not render invoice {invoice.invoice_number}: {e}')
+        self._store(invoice.pk, path, pdf_bytes)
+        return pdf_bytes
+
+    def ensure_rendered(self, invoices):
+        """Make sure a current PDF is stored for every invoice. Returns the storage paths in order."""
+        paths = []
+        missing = []
+        for invoice in invoices:
+            html = self.render_html(invoice)
+            path = self.cache_path(invoice.pk, html)
+            paths.append(path)
+            if not default_storage.exists(path):
+                missing.append((invoice, path, html))
+
+        if missing:
+            logger.info(f'Rendering {len(missing)} of {len(paths)} invoice PDFs ({self.kind})')
+            for (invoice, path, _), pdf_bytes in zip(missing, self._convert([html for _, _, html in missing])):
+                if pdf_bytes is None:
+                    raise InvoiceRenderError(f'Could not render invoice {invoice.invoice_number}')
+                self._store(invoice.pk, path, pdf_bytes)
+        return paths
+
+    def _convert(self, html_documents):
+        if len(html_documents) == 1 or MAX_WORKERS <= 1:
+            return [self._convert_one(html) for html in html_documents]
+        try:
+            futures = [get_pool().submit(html_to_pdf, html) for html in html_documents]
+            return [self._result(future) for future in futures]
+        except (BrokenProcessPool, OSError) as e:
+            logger.warning(f'Invoice PDF pool unavailable, rendering in process: {str(e)}')
+            _reset_pool()
+            return [self._convert_one(html) for html in html_documents]
+
+    @staticmethod
+    def _result(future):
+        try:
+            return future.result()
+        except PDFConversionError:
+            return None
+
+    @staticmethod
+    def _convert_one(html):
+        try:
+            return html_to_pdf(html)
+        except PDFConversionError:
+            return None
+
+    def merge(self, invoices):
+        """Render what is missing and merge all PDFs into one file object positioned at the start"""
+        paths = self.ensure_rendered(invoices)
+        writer = PdfWriter()
+        for path in paths:
+            # pypdf reads pages lazily, so hand it a stream that stays open
+            writer.append(BytesIO(self._read(path)))
+        merged = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        writer.write(merged)
+        writer.close()
+        merged.seek(0)
+        return merged
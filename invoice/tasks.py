@@ -0,0 +1,35 @@
+import logging
+
+from celery import shared_task
+from django.db import transaction
+
+from .rendering import InvoiceRenderer, InvoiceRenderError
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def render_invoice_pdfs(self, invoice_ids, kind='invoice'):
+    """Render and cache PDFs for invoices that changed since they were last rendered"""
+    try:
+        renderer = InvoiceRenderer(kind)
+        invoices = list(renderer.queryset().filter(pk__in=invoice_ids))
+        renderer.ensure_rendered(invoices)
+        return {'invoices': len(invoices), 'kind': kind}
+    except InvoiceRenderError as exc:
+        logger.error(str(exc))
+        return {'invoices': 0, 'kind': kind}
+    except Exception as exc:
+        logger.error(f'Error rendering invoice PDFs {invoice_ids}: {str(exc)}')
+        raise self.retry(exc=exc)
+
+
+def queue_invoice_render(invoice_id):
+    """Pre-render an invoice's PDF in the background once the current transaction commits"""
+    def enqueue():
+        try:
+            render_invoice_pdfs.delay([invoice_id])
+        except Exception as e:
+            # Without a broker the PDF is rendered on the first print instead
+            logger.warning(f'Could not queue PDF render for invoice {invoice_id}: {str(e)}')
+    transaction.on_commit(enqueue)
@@ -1,3 +1,106 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import date
+from io import BytesIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from pypdf import PdfReader, PdfWriter
+
+from customer.models import Customer
+from .models import Invoice
+from .pdf_worker import PDFConversionError
+from .rendering import InvoiceRenderer, InvoiceRenderError, PDF_DIRECTORY, delete_cached_pdfs
+
+
+def blank_pdf(html):
+    writer = PdfWriter()
+    writer.add_blank_page(width=72, height=72)
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+@patch('invoice.rendering.MAX_WORKERS', 1)
+@patch('invoice.rendering.html_to_pdf', side_effect=blank_pdf)
+class InvoiceRendererTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.customer = Customer.objects.create(customer_code='CUST001', customer_name='Test Customer')
+
+    def create_invoice(self, total='100'):
+        return Invoice.objects.create(
+            invoice_date=date(2025, 1, 15), customer=self.customer, status='draft',
+            invoice_items=[{'sale_total': total}], created_by=self.user
+        )
+
+    def stored_files(self, invoice):
+        try:
+            return default_storage.listdir(f'{PDF_DIRECTORY}/{invoice.pk}')[1]
+        except FileNotFoundError:
+            return []
+
+    def test_unchanged_invoice_is_served_from_storage(self, html_to_pdf):
+        invoice = self.create_invoice()
+        renderer = InvoiceRenderer()
+
+        first = renderer.get_pdf(invoice)
+        second = renderer.get_pdf(invoice)
+
+        self.assertEqual(first, second)
+        self.assertEqual(html_to_pdf.call_count, 1)
+        self.assertEqual(len(self.stored_files(invoice)), 1)
+
+    def test_changed_invoice_replaces_its_pdf(self, html_to_pdf):
+        invoice = self.create_invoice()
+        renderer = InvoiceRenderer()
+        renderer.get_pdf(invoice)
+        old_files = self.stored_files(invoice)
+
+        invoice.notes = 'Payment due on receipt'
+        invoice.save()
+        renderer.get_pdf(invoice)
+
+        self.assertEqual(html_to_pdf.call_count, 2)
+        new_files = self.stored_files(invoice)
+        self.assertEqual(len(new_files), 1)
+        self.assertNotEqual(new_files, old_files)
+
+    def test_layouts_are_cached_separately(self, html_to_pdf):
+        invoice = self.create_invoice()
+        InvoiceRenderer('invoice').get_pdf(invoice)
+        InvoiceRenderer('cost_sale').get_pdf(invoice)
+
+        self.assertEqual(sorted(name.split('-')[0] for name in self.stored_files(invoice)), ['cost_sale', 'invoice'])
+        delete_cached_pdfs(invoice.pk)
+        self.assertEqual(self.stored_files(invoice), [])
+        with self.assertRaises(ValueError):
+            InvoiceRenderer('statement')
+
+    def test_batch_renders_only_missing_pdfs_and_merges(self, html_to_pdf):
+        invoices = [self.create_invoice(total) for total in ('100', '200', '300')]
+        renderer = InvoiceRenderer()
+        renderer.get_pdf(invoices[0])
+
+        merged = renderer.merge(invoices)
+
+        self.assertEqual(html_to_pdf.call_count, 3)
+        self.assertEqual(len(PdfReader(merged).pages), 3)
+
+    def test_conversion_failure_raises_render_error(self, html_to_pdf):
+        html_to_pdf.side_effect = PDFConversionError('xhtml2pdf reported 1 errors')
+        invoice = self.create_invoice()
+
+        with self.assertRaises(InvoiceRenderError):
+            InvoiceRenderer().get_pdf(invoice)
+        with self.assertRaises(InvoiceRenderError):
+            InvoiceRenderer().ensure_rendered([invoice])
+        self.assertEqual(self.stored_files(invoice), [])
@@ -15,6 +15,7 @@ urlpatterns = [
     path('<int:pk>/print/', views.invoice_print, name='invoice_print'),
     path('<int:pk>/print/cost-sale/', views.invoice_cost_sale_print, name='invoice_cost_sale_print'),
     path('<int:pk>/pdf/', views.invoice_pdf, name='invoice_pdf'),
+    path('print/batch/', views.invoice_batch_print, name='invoice_batch_print'),
     
     # AJAX endpoints
     path('ajax/get-customer-details/', views.get_customer_details, name='get_customer_details'),
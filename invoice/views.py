@@ -1,13 +1,16 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
-from django.template.loader import render_to_string
+from django.http import JsonResponse, HttpResponse, FileResponse
 from django.urls import reverse
+from django.utils.dateparse import parse_date
 from django.core.paginator import Paginator
 from django.db.models import Q
 from .models import Invoice
 from .forms import InvoiceForm
+from .rendering import InvoiceRenderer, InvoiceRenderError, TEMPLATES, MAX_BATCH_SIZE, delete_cached_pdfs
+from .tasks import queue_invoice_render
+from customer.credit import enforce_credit_limit
 from customer.models import Customer, CustomerType
 from job.models import Job
 from delivery_order.models import DeliveryOrder
@@ -15,8 +18,6 @@ from company.company_model import Company
 from service.models import Service
 import json
 from decimal import Decimal
-from xhtml2pdf import pisa
-from io import BytesIO
 
 @login_required
 def invoice_list(request):
@@ -72,6 +73,9 @@ def invoice_create(request):
                 except json.JSONDecodeError:
                     invoice.invoice_items = []
                 
+                if not enforce_credit_limit(request, invoice.customer, invoice.total_sale):
+                    return render(request, 'invoice/invoice_form.html', {'form': form, 'title': 'Create New Invoice'})
+                
                 invoice.save()
                 
                 # Handle jobs linking manually since we're using a custom field
@@ -85,6 +89,9 @@ def invoice_create(request):
                 # Save many-to-many relationships
                 form.save_m2m()
                 
+                # Render the print PDF ahead of the first print
+                queue_invoice_render(invoice.pk)
+                
                 messages.success(request, f'Invoice {invoice.invoice_number} created successfully.')
                 return redirect('invoice:invoice_detail', pk=invoice.pk)
             except Exception as e:
@@ -159,6 +166,9 @@ def invoice_edit(request, pk):
                 # Save many-to-many relationships
                 form.save_m2m()
                 
+                # Render the print PDF ahead of the first print
+                queue_invoice_render(invoice.pk)
+                
                 messages.success(request, f'Invoice {invoice.invoice_number} updated successfully.')
                 return redirect('invoice:invoice_detail', pk=invoice.pk)
             except Exception as e:
@@ -187,7 +197,9 @@ def invoice_delete(request, pk):
     
     if request.method == 'POST':
         invoice_number = invoice.invoice_number
+        invoice_id = invoice.pk
         invoice.delete()
+        delete_cached_pdfs(invoice_id)
         messages.success(request, f'Invoice {invoice_number} deleted successfully.')
         return redirect('invoice:invoice_list')
     
@@ -196,77 +208,70 @@ def invoice_delete(request, pk):
     }
     return render(request, 'invoice/invoice_confirm_delete.html', context)
 
-@login_required
-def invoice_print(request, pk):
-    """Print invoice as PDF"""
-    invoice = get_object_or_404(
-        Invoice.objects.select_related('customer', 'payment_source')
-        .prefetch_related(
-            'jobs',
-            'jobs__cargo_items',
-            'jobs__cargo_items__item'
-        ), 
-        pk=pk
-    )
+def _cached_pdf_response(pk, kind, filename_prefix):
+    renderer = InvoiceRenderer(kind)
+    invoice = get_object_or_404(renderer.queryset(), pk=pk)
     
-    # Get company details (assuming first active company)
     try:
-        company = Company.objects.filter(is_active=True).first()
-    except:
-        company = None
+        pdf_bytes = renderer.get_pdf(invoice)
+    except InvoiceRenderError:
+        return HttpResponse('Error generating PDF', status=500)
     
-    # Generate PDF
-    html_string = render_to_string('invoice/print/invoice.html', {
-        'invoice': invoice,
-        'company': company
-    })
-    
-    # Create PDF
-    result = BytesIO()
-    pdf = pisa.pisaDocument(BytesIO(html_string.encode("UTF-8")), result)
-    
-    if not pdf.err:
-        response = HttpResponse(result.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="invoice_{invoice.invoice_number}.pdf"'
-        return response
-    
-    return HttpResponse('Error generating PDF', status=500)
+    response = HttpResponse(pdf_bytes, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{filename_prefix}_{invoice.invoice_number}.pdf"'
+    return response
+
+@login_required
+def invoice_print(request, pk):
+    """Print invoice as PDF (cached until the invoice changes)"""
+    return _cached_pdf_response(pk, 'invoice', 'invoice')
 
 @login_required
 def invoice_cost_sale_print(request, pk):
-    """Print invoice cost & sale breakdown as PDF"""
-    invoice = get_object_or_404(
-        Invoice.objects.select_related('customer', 'payment_source')
-        .prefetch_related(
-            'jobs',
-            'jobs__cargo_items',
-            'jobs__cargo_items__item'
-        ), 
-        pk=pk
-    )
+    """Print invoice cost & sale breakdown as PDF (cached until the invoice changes)"""
+    return _cached_pdf_response(pk, 'cost_sale', 'invoice_cost_sale')
+
+@login_required
+def invoice_batch_print(request):
+    """Merge many invoice PDFs into one document, e.g. all invoices of a day"""
+    layout = request.GET.get('layout', 'invoice')
+    renderer = InvoiceRenderer(layout if layout in TEMPLATES else 'invoice')
+    invoices = renderer.queryset().order_by('invoice_number')
     
-    # Get company details (assuming first active company)
+    invoice_ids = [int(value) for value in request.GET.get('ids', '').split(',') if value.strip().isdigit()]
     try:
-        company = Company.objects.filter(is_active=True).first()
-    except:
-        company = None
+        invoice_date = parse_date(request.GET.get('date', ''))
+    except ValueError:
+        invoice_date = None
+    if invoice_ids:
+        invoices = invoices.filter(pk__in=invoice_ids)
+        filename = 'invoices_selected'
+    elif invoice_date:
+        invoices = invoices.filter(invoice_date=invoice_date)
+        filename = f'invoices_{invoice_date}'
+    else:
+        messages.error(request, 'Select invoices or a date to print.')
+        return redirect('invoice:invoice_list')
     
-    # Generate PDF
-    html_string = render_to_string('invoice/print/cost_sale.html', {
-        'invoice': invoice,
-        'company': company
-    })
+    status_filter = request.GET.get('status', '')
+    if status_filter:
+        invoices = invoices.filter(status=status_filter)
     
-    # Create PDF
-    result = BytesIO()
-    pdf = pisa.pisaDocument(BytesIO(html_string.encode("UTF-8")), result)
+    invoices = list(invoices[:MAX_BATCH_SIZE + 1])
+    if not invoices:
+        messages.error(request, 'No invoices found to print.')
+        return redirect('invoice:invoice_list')
+    if len(invoices) > MAX_BATCH_SIZE:
+        messages.error(request, f'Batch printing is limited to {MAX_BATCH_SIZE} invoices at a time.')
+        return redirect('invoice:invoice_list')
     
-    if not pdf.err:
-        response = HttpResponse(result.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="invoice_cost_sale_{invoice.invoice_number}.pdf"'
-        return response
+    try:
+        merged = renderer.merge(invoices)
+    except InvoiceRenderError as e:
+        messages.error(request, str(e))
+        return redirect('invoice:invoice_list')
     
-    return HttpResponse('Error generating PDF', status=500)
+    return FileResponse(merged, as_attachment=True, filename=f'{filename}.pdf', content_type='application/pdf')
 
 @login_required
 def invoice_pdf(request, pk):
@@ -13,6 +13,7 @@ from datetime import datetime, timedelta
 from .models import Job, JobStatus, JobPriority
 from .forms import JobForm, JobSearchForm, JobCargoFormSet, CustomJobCargoFormSet, CustomJobContainerFormSet
 from customer.models import Customer
+from customer.credit import enforce_credit_limit
 from items.models import Item
 from company.company_model import Company
 
@@ -182,6 +183,8 @@ class JobCreateView(LoginRequiredMixin, CreateView):
             return self.form_invalid(form, cargo_formset, container_formset)
 
     def form_valid(self, form, cargo_formset, container_formset):
+        if not enforce_credit_limit(self.request, form.cleaned_data.get('customer_name')):
+            return self.form_invalid(form, cargo_formset, container_formset)
         self.object = form.save()
         cargo_formset.instance = self.object
         cargo_formset.save()
@@ -1,11 +1,22 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
+from django.core.exceptions import ValidationError
 from .models import Ledger, LedgerBatch
 from chart_of_accounts.models import ChartOfAccount as Account
 from decimal import Decimal
 from django.db.models import Sum, Q
 
 
+@receiver(pre_save, sender=Ledger)
+@receiver(pre_delete, sender=Ledger)
+def prevent_posting_to_closed_year(sender, instance, **kwargs):
+    """Closed fiscal years are locked against posting; reverse the year-end closing first"""
+    if instance.fiscal_year_id and instance.fiscal_year.is_closed:
+        raise ValidationError(
+            f'Fiscal year "{instance.fiscal_year.name}" is closed. Reverse the year-end closing to post to it.'
+        )
+
+
 @receiver(post_save, sender=Ledger)
 def update_account_balance(sender, instance, created, **kwargs):
     """Update account current balance when ledger entry is saved"""
@@ -85,7 +85,7 @@ class LGPAdmin(admin.ModelAdmin):
 class LGPItemAdmin(admin.ModelAdmin):
     list_display = [
         'lgp', 'line_number', 'hs_code', 'good_description',
-        'get_package_type_display', 'quantity', 'weight', 'volume', 'value'
+        'get_package_type_display', 'quantity', 'dispatched_quantity', 'weight', 'volume', 'value'
     ]
     list_filter = ['package_type_new', 'package_type', 'lgp__status']
     search_fields = ['lgp__lgp_number', 'hs_code', 'good_description']
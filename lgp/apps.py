@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LgpConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lgp'
+
+    def ready(self):
+        import lgp.signals
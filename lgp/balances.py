@@ -0,0 +1,143 @@
+"""
+Dispatched quantities of LGP lines.
+
+LGPItem.dispatched_quantity holds what the LGPDispatchItem rows drawn from
+the line add up to, so the remaining quantity of a line is read from the
+line itself instead of re-summing every earlier partial dispatch. The
+counter only changes by F() deltas: the dispatch item signals apply them on
+edit and delete (including the cascade when a dispatch is cancelled), and a
+new dispatch, whose rows are bulk inserted, applies its own after locking
+the lines it draws from and checking their counters, so two dispatches
+cannot both take the last units of a line.
+
+Saving an LGP line through a form writes back the counter it loaded, so an
+edited line is recounted from its dispatch rows. Bulk queryset operations
+skip the signals; find_drift / fix_drift compare the counters with the
+dispatch history and repair them.
+"""
+import logging
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import LGP, LGPDispatchItem, LGPItem
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+QUANTITY_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+class DispatchError(ValueError):
+    """A dispatch asks for more than its LGP lines have left"""
+
+
+def apply_dispatch_deltas(deltas):
+    """Add {lgp_item_id: quantity} to the dispatched counters with one UPDATE"""
+    deltas = {pk: Decimal(delta) for pk, delta in deltas.items() if pk and delta}
+    if not deltas:
+        return
+    LGPItem.objects.filter(pk__in=deltas).update(
+        dispatched_quantity=F('dispatched_quantity') + Case(
+            *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+            default=Value(ZERO), output_field=QUANTITY_FIELD,
+        )
+    )
+
+
+def lock_lines(item_ids):
+    """{pk: LGPItem} locked until the end of the transaction"""
+    return {
+        item.pk: item
+        for item in LGPItem.objects.select_for_update().select_related('lgp').filter(pk__in=item_ids).order_by('pk')
+    }
+
+
+def check_available(requested, lines):
+    """Raise DispatchError for the lines asked for more than they have left.
+
+    requested is {lgp_item_id: quantity} and lines the locked LGPItems.
+    """
+    errors = []
+    for pk, quantity in requested.items():
+        line = lines.get(pk)
+        if line is None:
+            errors.append(f'LGP line {pk} does not exist')
+        elif quantity <= 0:
+            errors.append(f'{line.lgp.lgp_number} line {line.line_number}: quantity must be positive')
+        elif quantity > line.remaining_quantity:
+            errors.append(
+                f'{line.lgp.lgp_number} line {line.line_number}: {quantity} requested, '
+                f'{line.remaining_quantity} remaining'
+            )
+    if errors:
+        raise DispatchError('; '.join(errors))
+
+
+def update_lgp_statuses(lgp_ids, user=None):
+    """Mark LGPs with nothing left to dispatch as dispatched and reopen dispatched ones with quantity left.
+
+    Returns the ids of the LGPs marked dispatched.
+    """
+    lgp_ids = set(lgp_ids)
+    if not lgp_ids:
+        return []
+    open_ids = set(
+        LGPItem.objects.filter(lgp_id__in=lgp_ids, quantity__gt=F('dispatched_quantity')).values_list('lgp_id', flat=True)
+    )
+    completed = list(
+        LGP.objects.filter(pk__in=lgp_ids - open_ids, status='draft', items__isnull=False)
+        .distinct().values_list('pk', flat=True)
+    )
+    if completed:
+        LGP.objects.filter(pk__in=completed).update(
+            status='dispatched', dispatch_date=timezone.now(), dispatched_by=user, updated_at=timezone.now()
+        )
+    reopened = LGP.objects.filter(pk__in=open_ids, status='dispatched').update(
+        status='draft', dispatch_date=None, dispatched_by=None, updated_at=timezone.now()
+    )
+    if reopened:
+        logger.info(f'Reopened {reopened} LGPs with quantity left to dispatch')
+    return completed
+
+
+def dispatched_totals():
+    """{lgp_item_id: quantity} summed from the dispatch rows"""
+    rows = LGPDispatchItem.objects.filter(lgp_item__isnull=False).values('lgp_item_id').annotate(
+        total=Sum('quantity')
+    ).order_by()
+    return {row['lgp_item_id']: row['total'] for row in rows}
+
+
+def recount(item_ids):
+    """Set the counters of these lines from their dispatch rows"""
+    totals = LGPDispatchItem.objects.filter(lgp_item=OuterRef('pk')).values('lgp_item').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    LGPItem.objects.filter(pk__in=item_ids).update(
+        dispatched_quantity=Coalesce(Subquery(totals, output_field=QUANTITY_FIELD), Value(ZERO))
+    )
+
+
+# Repair
+
+def find_drift():
+    """Return (lgp_item_id, stored, expected) for every line whose counter differs from its dispatches"""
+    expected = dispatched_totals()
+    return [
+        (pk, stored, expected.get(pk, ZERO))
+        for pk, stored in LGPItem.objects.values_list('pk', 'dispatched_quantity').iterator()
+        if stored != expected.get(pk, ZERO)
+    ]
+
+
+def fix_drift():
+    """Bring drifted counters back to their dispatch totals. Returns the drift rows fixed."""
+    drift = find_drift()
+    # Applied as deltas so dispatches saved since the check are kept
+    apply_dispatch_deltas({pk: expected - stored for pk, stored, expected in drift})
+    if drift:
+        logger.info(f'Fixed dispatched quantity drift on {len(drift)} LGP lines')
+    return drift
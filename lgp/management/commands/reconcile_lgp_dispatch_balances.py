@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from lgp.balances import find_drift, fix_drift
+from lgp.models import LGPItem
+
+
+class Command(BaseCommand):
+    help = 'Report (and optionally fix) LGP line dispatched quantities that drifted from their dispatches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Reset drifted counters to the quantities of their dispatch rows'
+        )
+
+    def handle(self, *args, **options):
+        drift = fix_drift() if options['fix'] else find_drift()
+        
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('All LGP line dispatched quantities match their dispatches'))
+            return
+        
+        lines = LGPItem.objects.select_related('lgp').in_bulk([row[0] for row in drift])
+        for pk, stored, expected in drift:
+            line = lines.get(pk)
+            label = f'{line.lgp.lgp_number} line {line.line_number}' if line else f'LGP line {pk}'
+            self.stdout.write(f'{label}: stored {stored:,.2f}, expected {expected:,.2f}')
+        
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(drift)} LGP line dispatched quantities'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} LGP line dispatched quantities drifted; run with --fix to repair'))
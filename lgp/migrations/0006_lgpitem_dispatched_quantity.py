@@ -0,0 +1,34 @@
+# Generated by Django 4.2.23 on 2026-10-18 22:46
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def count_dispatched(apps, schema_editor):
+    LGPItem = apps.get_model('lgp', 'LGPItem')
+    LGPDispatchItem = apps.get_model('lgp', 'LGPDispatchItem')
+    totals = LGPDispatchItem.objects.filter(lgp_item=OuterRef('pk')).values('lgp_item').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    LGPItem.objects.update(dispatched_quantity=Coalesce(
+        Subquery(totals, output_field=models.DecimalField(max_digits=12, decimal_places=2)), Value(Decimal('0.00'))
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lgp', '0005_alter_lgpitem_marks_and_nos_alter_lgpitem_volume'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lgpitem',
+            name='dispatched_quantity',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(count_dispatched, migrations.RunPython.noop),
+    ]
@@ -163,6 +163,8 @@ class LGPItem(models.Model):
     value = models.DecimalField(max_digits=15, decimal_places=2, help_text='Value in currency')
     customs_declaration = models.TextField(blank=True)
     remarks = models.TextField(blank=True)
+    # Sum of the dispatch rows drawn from this line, maintained by lgp.balances
+    dispatched_quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
     
     # Ordering
     line_number = models.PositiveIntegerField(default=1)
@@ -175,6 +177,10 @@ class LGPItem(models.Model):
     def __str__(self):
         return f"{self.lgp.lgp_number} - Line {self.line_number}: {self.good_description[:50]}"
     
+    @property
+    def remaining_quantity(self):
+        return self.quantity - self.dispatched_quantity
+    
     @property
     def get_package_type_display(self):
         """Get package type display name, prioritizing new field over legacy"""
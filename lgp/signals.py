@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .balances import apply_dispatch_deltas, recount
+from .models import LGPDispatchItem, LGPItem
+
+
+@receiver(pre_save, sender=LGPDispatchItem)
+def remember_dispatched_quantity(sender, instance, **kwargs):
+    """Keep the stored line and quantity so post_save can apply the difference"""
+    instance._balance_previous = None
+    if instance.pk:
+        instance._balance_previous = sender.objects.filter(pk=instance.pk).values_list('lgp_item_id', 'quantity').first()
+
+
+@receiver(post_save, sender=LGPDispatchItem)
+def update_balance_on_dispatch_save(sender, instance, **kwargs):
+    previous = getattr(instance, '_balance_previous', None)
+    instance._balance_previous = None
+    deltas = {instance.lgp_item_id: instance.quantity or 0}
+    if previous:
+        deltas[previous[0]] = deltas.get(previous[0], 0) - previous[1]
+    apply_dispatch_deltas(deltas)
+
+
+@receiver(post_delete, sender=LGPDispatchItem)
+def update_balance_on_dispatch_delete(sender, instance, **kwargs):
+    apply_dispatch_deltas({instance.lgp_item_id: -(instance.quantity or 0)})
+
+
+@receiver(post_save, sender=LGPItem)
+def recount_edited_line(sender, instance, created, **kwargs):
+    # A form save writes back the counter it loaded
+    if not created:
+        recount([instance.pk])
@@ -1,3 +1,118 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+
+from customer.models import Customer
+from facility.models import Facility
+from .balances import find_drift, fix_drift
+from .models import LGP, LGPDispatch, LGPDispatchItem, LGPItem
+
+
+class LGPDispatchBalanceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.customer = Customer.objects.create(customer_code='CUST001', customer_name='Test Customer')
+        facility = Facility.objects.create(
+            facility_code='WH01', facility_name='Main Warehouse', address='1 Dock Road',
+            city='Dubai', state='Dubai', postal_code='00000'
+        )
+        self.lgp = LGP.objects.create(
+            created_by=self.user, customer=self.customer, dpw_ref_no='DPW-1', document_date=date(2025, 1, 10),
+            document_validity_date=date(2025, 3, 10), warehouse=facility, free_zone_company_name='FZ Co',
+            local_company_name='Local Co', goods_coming_from='Jebel Ali', purpose_of_entry='storage'
+        )
+        self.lines = [
+            LGPItem.objects.create(
+                lgp=self.lgp, line_number=number, hs_code='8471', good_description=f'Goods {number}',
+                quantity=quantity, weight=Decimal('10'), value=Decimal('100')
+            )
+            for number, quantity in ((1, Decimal('10')), (2, Decimal('5')))
+        ]
+
+    def dispatch(self, *quantities):
+        items = [
+            {'lgp_id': self.lgp.pk, 'item_id': line.pk, 'qty': str(quantity)}
+            for line, quantity in zip(self.lines, quantities) if quantity
+        ]
+        return self.client.post(
+            reverse('lgp:lgp_dispatch_save'),
+            json.dumps({'customer': self.customer.pk, 'items': items}),
+            content_type='application/json'
+        )
+
+    def dispatched(self):
+        return [line.dispatched_quantity for line in LGPItem.objects.filter(lgp=self.lgp).order_by('line_number')]
+
+    def test_dispatch_save_updates_counters_and_completes_lgp(self):
+        """Partial dispatches add up on the lines; the last one marks the LGP dispatched"""
+        self.assertEqual(self.dispatch(Decimal('4'), Decimal('5')).status_code, 200)
+        self.assertEqual(self.dispatched(), [Decimal('4'), Decimal('5')])
+        self.lgp.refresh_from_db()
+        self.assertEqual(self.lgp.status, 'draft')
+
+        response = self.dispatch(Decimal('6'))
+        self.assertEqual(response.json()['dispatched_lgp_ids'], [self.lgp.pk])
+        self.assertEqual(self.dispatched(), [Decimal('10'), Decimal('5')])
+        self.lgp.refresh_from_db()
+        self.assertEqual(self.lgp.status, 'dispatched')
+
+    def test_over_dispatch_is_rejected(self):
+        self.dispatch(Decimal('8'))
+
+        response = self.dispatch(Decimal('3'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('3 requested, 2.00 remaining', response.json()['error'])
+        self.assertEqual(self.dispatched(), [Decimal('8'), Decimal('0')])
+        self.assertEqual(LGPDispatch.objects.count(), 1)
+
+    def test_editing_dispatch_rows_moves_the_counters(self):
+        self.dispatch(Decimal('4'), Decimal('2'))
+        row = LGPDispatchItem.objects.get(lgp_item=self.lines[0])
+
+        row.quantity = Decimal('7')
+        row.save()
+        self.assertEqual(self.dispatched(), [Decimal('7'), Decimal('2')])
+
+        row.lgp_item = self.lines[1]
+        row.quantity = Decimal('1')
+        row.save()
+        self.assertEqual(self.dispatched(), [Decimal('0'), Decimal('3')])
+        self.assertEqual(find_drift(), [])
+
+    def test_edited_line_keeps_its_counter(self):
+        """A line saved with a stale counter is recounted from its dispatches"""
+        line = LGPItem.objects.get(pk=self.lines[0].pk)
+        self.dispatch(Decimal('4'))
+
+        line.good_description = 'Edited goods'
+        line.save()
+
+        self.assertEqual(self.dispatched(), [Decimal('4'), Decimal('0')])
+
+    def test_deleting_dispatch_gives_quantity_back_and_reopens_lgp(self):
+        self.dispatch(Decimal('10'), Decimal('5'))
+        self.lgp.refresh_from_db()
+        self.assertEqual(self.lgp.status, 'dispatched')
+
+        response = self.client.post(reverse('lgp:lgp_dispatch_delete', args=[LGPDispatch.objects.get().pk]))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.dispatched(), [Decimal('0'), Decimal('0')])
+        self.lgp.refresh_from_db()
+        self.assertEqual((self.lgp.status, self.lgp.dispatch_date), ('draft', None))
+
+    def test_fix_drift_restores_counters(self):
+        self.dispatch(Decimal('4'), Decimal('1'))
+        LGPItem.objects.filter(pk=self.lines[0].pk).update(dispatched_quantity=Decimal('9'))
+        self.assertEqual(find_drift(), [(self.lines[0].pk, Decimal('9'), Decimal('4'))])
+
+        fix_drift()
 
-# Create your tests here.
+        self.assertEqual(find_drift(), [])
+        self.assertEqual(self.dispatched(), [Decimal('4'), Decimal('1')])
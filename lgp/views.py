@@ -4,13 +4,14 @@ from django.contrib import messages
 from django.db import transaction
 from django.http import JsonResponse
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import F, Prefetch, Q
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from datetime import date
+from decimal import Decimal, InvalidOperation
 import json
+from .balances import DispatchError, apply_dispatch_deltas, check_available, lock_lines, update_lgp_statuses
 from .models import LGP, LGPItem, LGPDispatch, LGPDispatchItem, PackageType
-from django.db.models import Sum
 from .forms import LGPForm, LGPItemFormSet, LGPDispatchForm, LGPSearchForm
 from customer.models import Customer
 
@@ -56,34 +57,14 @@ def lgp_list(request):
         if date_to:
             lgps = lgps.filter(document_date__lte=date_to)
     
-    # Calculate remaining quantities for each LGP item
-    lgps_with_remaining = []
-    for lgp in lgps:
-        lgp_items_with_remaining = []
-        for item in lgp.items.all().order_by('line_number'):
-            # Calculate dispatched quantity for this item
-            dispatched_qty = (
-                LGPDispatchItem.objects.filter(lgp_item=item)
-                .aggregate(total=Sum('quantity'))['total'] or 0
-            )
-            
-            # Calculate remaining quantity
-            remaining_qty = float(item.quantity) - float(dispatched_qty)
-            
-            # Only include items with remaining quantity > 0
-            if remaining_qty > 0:
-                # Add remaining quantity as an attribute to the item
-                item.remaining_quantity = remaining_qty
-                item.dispatched_quantity = dispatched_qty
-                lgp_items_with_remaining.append(item)
-        
-        # Only include LGPs that have items with remaining quantities
-        if lgp_items_with_remaining:
-            lgp.items_with_remaining = lgp_items_with_remaining
-            lgps_with_remaining.append(lgp)
+    # Only LGPs with quantity left to dispatch, each with the lines that have some left
+    open_items = LGPItem.objects.filter(quantity__gt=F('dispatched_quantity')).order_by('line_number')
+    lgps = lgps.filter(pk__in=open_items.values('lgp_id')).prefetch_related(
+        Prefetch('items', queryset=open_items, to_attr='items_with_remaining')
+    )
     
     # Pagination
-    paginator = Paginator(lgps_with_remaining, 25)  # Show 25 LGPs per page
+    paginator = Paginator(lgps, 25)  # Show 25 LGPs per page
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
@@ -94,7 +75,7 @@ def lgp_list(request):
     context = {
         'page_obj': page_obj,
         'form': form,
-        'total_count': len(lgps_with_remaining),
+        'total_count': paginator.count,
         'default_currency': default_currency,
     }
     
@@ -306,6 +287,8 @@ def lgp_dispatch(request, pk):
 @login_required
 def lgp_dispatch_blank(request):
     """Open dispatch page without a preselected LGP."""
+    from multi_currency.models import CurrencySettings
+    
     form = LGPDispatchForm()
     selected_customer_id = request.GET.get('customer')
     # Include customers with at least one draft LGP; per-item availability is computed below
@@ -329,36 +312,33 @@ def lgp_dispatch_blank(request):
     # Build per-item availability with remaining quantities
     available_items = []
     if selected_customer_id and available_lgps:
-        for lgp in available_lgps:
-            for item in lgp.items.all().order_by('line_number'):
-                dispatched_qty = (
-                    LGPDispatchItem.objects.filter(lgp_item=item)
-                    .aggregate(total=Sum('quantity'))['total'] or 0
-                )
-                try:
-                    remaining_qty = float(item.quantity) - float(dispatched_qty)
-                except Exception:
-                    remaining_qty = 0
-                if remaining_qty > 0:
-                    # Compute per-unit weight/value to scale with quantity edits
-                    base_qty = float(item.quantity) if float(item.quantity) != 0 else 1.0
-                    weight_per_unit = float(item.weight) / base_qty
-                    value_per_unit = float(item.value) / base_qty
-                    default_weight = remaining_qty * weight_per_unit
-                    default_value = remaining_qty * value_per_unit
-                    available_items.append({
-                        'lgp_id': lgp.id,
-                        'lgp_number': lgp.lgp_number,
-                        'dpw_ref_no': lgp.dpw_ref_no,
-                        'item_id': item.id,
-                        'line_number': item.line_number,
-                        'hs_code': item.hs_code,
-                        'good_description': item.good_description,
-                        'package_type': item.get_package_type_display,
-                        'remaining_qty': remaining_qty,
-                        'default_weight': default_weight,
-                        'default_value': default_value,
-                    })
+        open_items = (
+            LGPItem.objects.filter(lgp__in=available_lgps, quantity__gt=F('dispatched_quantity'))
+            .select_related('lgp', 'package_type_new')
+            .order_by('-lgp__created_at', 'lgp_id', 'line_number')
+        )
+        for item in open_items:
+            lgp = item.lgp
+            remaining_qty = float(item.remaining_quantity)
+            # Compute per-unit weight/value to scale with quantity edits
+            base_qty = float(item.quantity) if float(item.quantity) != 0 else 1.0
+            weight_per_unit = float(item.weight) / base_qty
+            value_per_unit = float(item.value) / base_qty
+            default_weight = remaining_qty * weight_per_unit
+            default_value = remaining_qty * value_per_unit
+            available_items.append({
+                'lgp_id': lgp.id,
+                'lgp_number': lgp.lgp_number,
+                'dpw_ref_no': lgp.dpw_ref_no,
+                'item_id': item.id,
+                'line_number': item.line_number,
+                'hs_code': item.hs_code,
+                'good_description': item.good_description,
+                'package_type': item.get_package_type_display,
+                'remaining_qty': remaining_qty,
+                'default_weight': default_weight,
+                'default_value': default_value,
+            })
 
     # Get default currency
     currency_settings = CurrencySettings.objects.first()
@@ -409,57 +389,57 @@ def lgp_dispatch_save(request):
             return JsonResponse({'success': False, 'error': 'Required fields missing: customer'}, status=400)
 
         customer = get_object_or_404(Customer, pk=customer_id)
-        dispatch = LGPDispatch.objects.create(
-            customer=customer,
-            dispatch_date=dispatch_date,
-            note=note,
-            driver_name=driver_name,
-            vehicle_no=vehicle_no,
-            mobile_no=mobile_no,
-            created_by=request.user,
-        )
-
-        # Create items and track affected LGPs
-        affected_lgps = set()
-        for idx, it in enumerate(items, start=1):
-            lgp_id = it.get('lgp_id')
-            lgp = get_object_or_404(LGP, pk=lgp_id) if lgp_id else None
-            lgp_item = LGPItem.objects.filter(pk=it.get('item_id')).first()
-            LGPDispatchItem.objects.create(
-                dispatch=dispatch,
-                lgp=lgp or (lgp_item.lgp if lgp_item else None),
-                lgp_item=lgp_item,
-                line_number=it.get('line') or (lgp_item.line_number if lgp_item else idx),
-                hs_code=it.get('hs') or (lgp_item.hs_code if lgp_item else ''),
-                good_description=it.get('description') or (lgp_item.good_description if lgp_item else ''),
-                package_type=it.get('pkg') or (lgp_item.get_package_type_display() if lgp_item else ''),
-                quantity=it.get('qty') or (lgp_item.quantity if lgp_item else 0),
-                weight=it.get('weight') or (lgp_item.weight if lgp_item else 0),
-                value=it.get('value') or (lgp_item.value if lgp_item else 0),
+        with transaction.atomic():
+            # Locked so concurrent dispatches of the same lines are checked one after the other
+            lines = lock_lines([it.get('item_id') for it in items if it.get('item_id')])
+            lgps = LGP.objects.in_bulk({it.get('lgp_id') for it in items if it.get('lgp_id')})
+            rows = []
+            requested = {}
+            for idx, it in enumerate(items, start=1):
+                lgp_item = lines.get(int(it['item_id'])) if it.get('item_id') else None
+                lgp = lgps.get(int(it['lgp_id'])) if it.get('lgp_id') else None
+                if it.get('lgp_id') and lgp is None:
+                    raise DispatchError(f'LGP {it["lgp_id"]} does not exist')
+                try:
+                    if it.get('qty'):
+                        quantity = Decimal(str(it['qty']))
+                    else:
+                        # Defaults to what is left of the line
+                        quantity = lgp_item.remaining_quantity if lgp_item else Decimal('0')
+                except InvalidOperation:
+                    raise DispatchError(f'Invalid quantity {it.get("qty")!r} on line {idx}')
+                if lgp_item:
+                    requested[lgp_item.pk] = requested.get(lgp_item.pk, 0) + quantity
+                rows.append(LGPDispatchItem(
+                    lgp=lgp or (lgp_item.lgp if lgp_item else None),
+                    lgp_item=lgp_item,
+                    line_number=it.get('line') or (lgp_item.line_number if lgp_item else idx),
+                    hs_code=it.get('hs') or (lgp_item.hs_code if lgp_item else ''),
+                    good_description=it.get('description') or (lgp_item.good_description if lgp_item else ''),
+                    package_type=it.get('pkg') or (lgp_item.get_package_type_display if lgp_item else ''),
+                    quantity=quantity,
+                    weight=it.get('weight') or (lgp_item.weight if lgp_item else 0),
+                    value=it.get('value') or (lgp_item.value if lgp_item else 0),
+                ))
+            check_available(requested, lines)
+            
+            dispatch = LGPDispatch.objects.create(
+                customer=customer,
+                dispatch_date=dispatch_date,
+                note=note,
+                driver_name=driver_name,
+                vehicle_no=vehicle_no,
+                mobile_no=mobile_no,
+                created_by=request.user,
             )
-            if lgp:
-                affected_lgps.add(lgp)
-        
-        # Update LGP status to 'dispatched' for fully dispatched LGPs
-        dispatched_lgp_ids = []
-        for lgp in affected_lgps:
-            # Check if all items in this LGP are fully dispatched
-            all_items_dispatched = True
-            for item in lgp.items.all():
-                dispatched_qty = (
-                    LGPDispatchItem.objects.filter(lgp_item=item)
-                    .aggregate(total=Sum('quantity'))['total'] or 0
-                )
-                if float(dispatched_qty) < float(item.quantity):
-                    all_items_dispatched = False
-                    break
+            for row in rows:
+                row.dispatch = dispatch
+            # Bulk inserted rows send no signals; the counters take the same quantities
+            LGPDispatchItem.objects.bulk_create(rows)
+            apply_dispatch_deltas(requested)
             
-            if all_items_dispatched:
-                lgp.status = 'dispatched'
-                lgp.dispatch_date = timezone.now()
-                lgp.dispatched_by = request.user
-                lgp.save()
-                dispatched_lgp_ids.append(lgp.id)
+            # Update LGP status to 'dispatched' for fully dispatched LGPs
+            dispatched_lgp_ids = update_lgp_statuses({row.lgp_id for row in rows}, request.user)
 
         return JsonResponse({
             'success': True, 
@@ -467,6 +447,8 @@ def lgp_dispatch_save(request):
             'url': request.build_absolute_uri(f"/lgp/dispatch/{dispatch.pk}/"),
             'dispatched_lgp_ids': dispatched_lgp_ids
         })
+    except DispatchError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
@@ -502,7 +484,11 @@ def lgp_dispatch_delete(request, pk):
     if request.method != 'POST':
         return redirect('lgp:lgp_dispatch_list')
     dispatch = get_object_or_404(LGPDispatch, pk=pk)
-    dispatch.delete()
+    with transaction.atomic():
+        lgp_ids = set(dispatch.items.values_list('lgp_id', flat=True))
+        # Deleting the rows gives their quantities back to the LGP lines
+        dispatch.delete()
+        update_lgp_statuses(lgp_ids)
     messages.success(request, f'Dispatch {pk} deleted successfully.')
     return redirect('lgp:lgp_dispatch_list')
 
@@ -0,0 +1,529 @@
+"""
+Bulk pallet moves and pallet consolidation.
+
+A bulk move is planned before anything is written. Pallets come from an
+explicit list, with or without a destination each, or from every active
+pallet in a source zone (optionally one aisle). Pallets without a
+destination are placed by a TargetRule: the target facility, zones and
+location types, at most so many pallets per location, and whether the
+nearest location to the dock or the tightest fit wins. Capacity is checked
+in one pass against the putaway slotting snapshot of each destination
+facility (stock on hand plus open putaways), taking each planned pallet's
+volume and weight off its destination and giving it back to its source, so
+a plan never overfills a location, not even with its own moves.
+
+Applying a plan runs in one transaction. It bulk-creates completed
+LocationTransfer records with their history, moves the pallets with one
+bulk update and posts the stock movements of every transfer together. The
+location pallet counts are moved with the same deltas the pallet signals
+would apply.
+
+Merging moves the items of partial pallets onto a target pallet. Lines
+with the same item, batch and serial number are added together. The
+emptied pallets are deactivated. Stock on a source pallet in another
+location moves to the target's location under one pallet_merge ledger
+source.
+"""
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import numpy as np
+from django.apps import apps
+from django.db import transaction
+from django.utils import timezone
+
+from facility.utilization import apply_location_deltas, item_dimensions
+from putaways.slotting import CapacitySnapshot
+from stock_transfer.inventory import (
+    ANY, DocumentMovements, StockKey, StockLine, location_transfer_movements, post_documents,
+)
+from .models import Pallet, PalletItem, LocationTransfer, LocationTransferHistory
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 1000
+# Float slack when comparing loads with remaining capacity
+CAPACITY_TOLERANCE = 1e-6
+CENT = Decimal('0.01')
+STRATEGIES = [
+    ('nearest', 'Nearest to the dock'),
+    ('best_fit', 'Tightest fit'),
+]
+
+
+class BulkMoveError(Exception):
+    """A plan can no longer be applied as planned"""
+
+
+@dataclass
+class TargetRule:
+    """Where pallets without an explicit destination may go"""
+    facility_id: int
+    zones: tuple = ()
+    location_types: tuple = ()
+    max_pallets: int = None
+    strategy: str = 'nearest'
+    exclude_location_ids: frozenset = frozenset()
+
+
+@dataclass
+class PalletMove:
+    pallet: object
+    source: object
+    destination: object
+    volume: float
+    weight: float
+
+
+@dataclass
+class MovePlan:
+    moves: list = field(default_factory=list)
+    # (pallet_id, message)
+    errors: list = field(default_factory=list)
+
+    @property
+    def volume(self):
+        return sum(move.volume for move in self.moves)
+
+    @property
+    def weight(self):
+        return sum(move.weight for move in self.moves)
+
+
+@dataclass
+class MergePlan:
+    target: object
+    sources: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    volume: float = 0.0
+    weight: float = 0.0
+
+
+def load_pallets(pallet_ids):
+    """{pallet_id: Pallet} with location, source GRN and items loaded"""
+    return {
+        pallet.pallet_id: pallet
+        for pallet in Pallet.objects.filter(pallet_id__in=set(pallet_ids)).select_related(
+            'current_location', 'grn_pallet__grn'
+        ).prefetch_related('pallet_items')
+    }
+
+
+def pallet_loads(pallets):
+    """{pallet pk: (volume in CBM, weight in kg)}; stated pallet values win over the sum of the items"""
+    dimensions = item_dimensions(item.item_id for pallet in pallets for item in pallet.pallet_items.all())
+    loads = {}
+    for pallet in pallets:
+        volume = weight = 0.0
+        for item in pallet.pallet_items.all():
+            cbm, unit_weight = dimensions.get(item.item_id, (0, 0))
+            volume += float(item.quantity * cbm)
+            weight += float(item.quantity * unit_weight)
+        loads[pallet.pk] = (
+            float(pallet.volume) if pallet.volume is not None else volume,
+            float(pallet.weight) if pallet.weight is not None else weight,
+        )
+    return loads
+
+
+def zone_pallet_ids(facility_id, zone, aisle=''):
+    """Active pallets stored in a zone, optionally a single aisle of it"""
+    pallets = Pallet.objects.filter(
+        status='active', current_location__facility_id=facility_id, current_location__zone=zone
+    )
+    if aisle:
+        pallets = pallets.filter(current_location__aisle_number=aisle)
+    return list(pallets.order_by('current_location__location_code', 'pallet_id').values_list('pallet_id', flat=True))
+
+
+class _Planner:
+    """Capacity snapshots and pallet counts of the destination facilities, drawn down as moves are planned"""
+
+    def __init__(self):
+        self.snapshots = {}
+        self.pallet_counts = {}
+        self.masks = {}
+
+    def snapshot(self, facility_id):
+        if facility_id not in self.snapshots:
+            LocationUtilization = apps.get_model('facility', 'LocationUtilization')
+            snapshot = CapacitySnapshot(facility_id)
+            counts = dict(LocationUtilization.objects.filter(location_id__in=snapshot.index).values_list(
+                'location_id', 'pallet_count'
+            ))
+            self.pallet_counts[facility_id] = np.array(
+                [counts.get(location['id'], 0) for location in snapshot.locations], dtype=np.int64
+            )
+            self.snapshots[facility_id] = snapshot
+        return self.snapshots[facility_id]
+
+    def fits(self, facility_id, position, volume, weight):
+        snapshot = self.snapshot(facility_id)
+        return (
+            snapshot.remaining_volume[position] + CAPACITY_TOLERANCE >= volume
+            and snapshot.remaining_weight[position] + CAPACITY_TOLERANCE >= weight
+        )
+
+    def move(self, source, destination_facility_id, position, volume, weight):
+        self.snapshot(destination_facility_id).take(position, volume, weight)
+        self.pallet_counts[destination_facility_id][position] += 1
+        if source.facility_id in self.snapshots:
+            snapshot = self.snapshots[source.facility_id]
+            source_position = snapshot.index.get(source.pk)
+            if source_position is not None:
+                snapshot.take(source_position, -volume, -weight)
+                self.pallet_counts[source.facility_id][source_position] -= 1
+
+    def rule_mask(self, rule):
+        """Locations of the rule's facility that its zones, types and exclusions allow"""
+        if id(rule) not in self.masks:
+            self.masks[id(rule)] = np.array([
+                location['id'] not in rule.exclude_location_ids
+                and (not rule.zones or location['zone'] in rule.zones)
+                and (not rule.location_types or location['location_type'] in rule.location_types)
+                for location in self.snapshot(rule.facility_id).locations
+            ], dtype=bool)
+        return self.masks[id(rule)]
+
+    def choose(self, rule, source, volume, weight):
+        """Position of the best location for a pallet under a rule, or None"""
+        snapshot = self.snapshot(rule.facility_id)
+        if not len(snapshot):
+            return None
+        eligible = self.rule_mask(rule).copy()
+        if source.pk in snapshot.index:
+            eligible[snapshot.index[source.pk]] = False
+        eligible &= snapshot.remaining_volume + CAPACITY_TOLERANCE >= volume
+        eligible &= snapshot.remaining_weight + CAPACITY_TOLERANCE >= weight
+        if rule.max_pallets:
+            eligible &= self.pallet_counts[rule.facility_id] < rule.max_pallets
+        if not eligible.any():
+            return None
+        if rule.strategy == 'best_fit':
+            # Unconstrained locations only when nothing with a capacity fits
+            score = np.where(np.isfinite(snapshot.remaining_volume), snapshot.remaining_volume - volume, 1e12)
+        else:
+            score = snapshot.distance
+        return int(np.argmin(np.where(eligible, score, np.inf)))
+
+
+def plan_moves(requests, rule=None):
+    """Plan bulk moves.
+
+    requests is a list of (pallet_id, destination location id or None);
+    pallets without a destination are placed by rule. Returns a MovePlan
+    with the valid moves and an error per pallet that cannot move.
+    """
+    FacilityLocation = apps.get_model('facility', 'FacilityLocation')
+    plan = MovePlan()
+    pallets = load_pallets(pallet_id for pallet_id, _ in requests)
+    destinations = FacilityLocation.objects.in_bulk({location_id for _, location_id in requests if location_id})
+    loads = pallet_loads(pallets.values())
+    planner = _Planner()
+
+    seen = set()
+    valid = []
+    for pallet_id, location_id in requests:
+        pallet = pallets.get(pallet_id)
+        if pallet_id in seen:
+            plan.errors.append((pallet_id, 'Listed more than once'))
+        elif pallet is None:
+            plan.errors.append((pallet_id, 'Pallet not found'))
+        elif pallet.status != 'active':
+            plan.errors.append((pallet_id, f'Pallet is {pallet.get_status_display().lower()}'))
+        elif pallet.current_location is None:
+            plan.errors.append((pallet_id, 'Pallet is not in a location'))
+        elif location_id and location_id not in destinations:
+            plan.errors.append((pallet_id, 'Destination location not found'))
+        elif not location_id and rule is None:
+            plan.errors.append((pallet_id, 'No destination given'))
+        elif location_id == pallet.current_location_id:
+            plan.errors.append((pallet_id, 'Pallet is already in the destination location'))
+        else:
+            valid.append((pallet, destinations.get(location_id)))
+        seen.add(pallet_id)
+
+    # Explicit destinations first, in the order given; then the largest pallets get the first pick
+    explicit = [(pallet, destination) for pallet, destination in valid if destination is not None]
+    ruled = sorted(
+        (pallet for pallet, destination in valid if destination is None),
+        key=lambda pallet: (-loads[pallet.pk][0], -loads[pallet.pk][1], pallet.pallet_id),
+    )
+
+    for pallet, destination in explicit:
+        volume, weight = loads[pallet.pk]
+        position = planner.snapshot(destination.facility_id).index.get(destination.pk)
+        if position is None:
+            plan.errors.append((pallet.pallet_id, f'{destination.location_code} is not an active storage location'))
+        elif not planner.fits(destination.facility_id, position, volume, weight):
+            plan.errors.append((
+                pallet.pallet_id, f'{destination.location_code} cannot hold {volume:,.2f} CBM / {weight:,.0f} kg'
+            ))
+        else:
+            planner.move(pallet.current_location, destination.facility_id, position, volume, weight)
+            plan.moves.append(PalletMove(pallet, pallet.current_location, destination, volume, weight))
+
+    if ruled:
+        snapshot = planner.snapshot(rule.facility_id)
+        chosen = {}
+        for pallet in ruled:
+            volume, weight = loads[pallet.pk]
+            position = planner.choose(rule, pallet.current_location, volume, weight)
+            if position is None:
+                plan.errors.append((pallet.pallet_id, 'No location matching the target rules has room'))
+                continue
+            planner.move(pallet.current_location, rule.facility_id, position, volume, weight)
+            chosen[pallet.pk] = snapshot.locations[position]['id']
+        targets = FacilityLocation.objects.in_bulk(set(chosen.values()))
+        for pallet in ruled:
+            if pallet.pk in chosen:
+                volume, weight = loads[pallet.pk]
+                plan.moves.append(PalletMove(pallet, pallet.current_location, targets[chosen[pallet.pk]], volume, weight))
+    return plan
+
+
+def plan_zone_move(facility_id, zone, rule, aisle=''):
+    """Plan moving every active pallet out of a zone (or one of its aisles) by rule"""
+    FacilityLocation = apps.get_model('facility', 'FacilityLocation')
+    sources = FacilityLocation.objects.filter(facility_id=facility_id, zone=zone)
+    if aisle:
+        sources = sources.filter(aisle_number=aisle)
+    rule.exclude_location_ids = frozenset(rule.exclude_location_ids) | set(sources.values_list('pk', flat=True))
+    return plan_moves([(pallet_id, None) for pallet_id in zone_pallet_ids(facility_id, zone, aisle)], rule)
+
+
+def next_transfer_numbers(count):
+    """Transfer numbers continuing the LT-###### sequence LocationTransfer.save uses"""
+    last = LocationTransfer.objects.order_by('-id').values_list('transfer_number', flat=True).first()
+    try:
+        start = int(last.split('-')[1]) + 1 if last else 1
+    except (IndexError, ValueError):
+        start = LocationTransfer.objects.count() + 1
+    return [f"LT-{number:06d}" for number in range(start, start + count)]
+
+
+def _location_label(location):
+    return location.location_code if location else '-'
+
+
+def apply_moves(plan, user, notes='', priority='normal'):
+    """Apply a move plan in one transaction. Returns a summary dict.
+
+    Raises BulkMoveError when a planned pallet moved or was deactivated
+    since the plan was made.
+    """
+    if not plan.moves:
+        return {'reference': '', 'transfers': 0, 'ledger_entries': 0}
+    now = timezone.now()
+    reference = f"BULK-{now:%Y%m%d%H%M%S}"
+    performer = user.get_full_name() or user.username
+
+    with transaction.atomic():
+        current = dict(Pallet.objects.select_for_update().filter(
+            pk__in=[move.pallet.pk for move in plan.moves], status='active'
+        ).values_list('pk', 'current_location_id'))
+        stale = [move.pallet.pallet_id for move in plan.moves if current.get(move.pallet.pk) != move.source.pk]
+        if stale:
+            raise BulkMoveError(f"Pallets changed since the plan was made: {', '.join(stale[:10])}")
+
+        # Locked so concurrent transfers do not take the same numbers
+        list(LocationTransfer.objects.select_for_update().order_by('-id').values_list('id', flat=True)[:1])
+        transfers = []
+        for number, move in zip(next_transfer_numbers(len(plan.moves)), plan.moves):
+            cross_facility = move.source.facility_id != move.destination.facility_id
+            transfers.append(LocationTransfer(
+                transfer_number=number,
+                transfer_type='cross_facility' if cross_facility else 'internal',
+                status='completed',
+                pallet=move.pallet,
+                source_location=move.source,
+                destination_location=move.destination,
+                transfer_date=now,
+                completed_date=now,
+                priority=priority,
+                notes=notes or f'Bulk move {reference}',
+                approved_by=user,
+                approved_at=now,
+                processed_by=user,
+                processed_at=now,
+                created_by=user,
+            ))
+        LocationTransfer.objects.bulk_create(transfers, batch_size=BULK_BATCH_SIZE)
+        LocationTransferHistory.objects.bulk_create([
+            LocationTransferHistory(
+                transfer=transfer,
+                action='completed',
+                description=f'Transfer completed in bulk move {reference} by {performer}',
+                performed_by=user,
+                additional_data={
+                    'bulk_move': reference,
+                    'source_location': _location_label(transfer.source_location),
+                    'destination_location': _location_label(transfer.destination_location),
+                },
+            )
+            for transfer in transfers
+        ], batch_size=BULK_BATCH_SIZE)
+
+        pallet_deltas = defaultdict(lambda: [0, 0, 0])
+        for move in plan.moves:
+            move.pallet.current_location = move.destination
+            move.pallet.updated_by = user
+            move.pallet.updated_at = now
+            pallet_deltas[move.source.pk][2] -= 1
+            pallet_deltas[move.destination.pk][2] += 1
+        # Bulk updates skip the pallet signals, so the location pallet counts are moved here
+        Pallet.objects.bulk_update(
+            [move.pallet for move in plan.moves], ['current_location', 'updated_by', 'updated_at'],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        apply_location_deltas(pallet_deltas)
+        entries = post_documents([location_transfer_movements(transfer) for transfer in transfers])
+
+    logger.info(f'Bulk move {reference}: {len(transfers)} pallets, {len(entries)} stock movements')
+    return {'reference': reference, 'transfers': len(transfers), 'ledger_entries': len(entries)}
+
+
+def plan_merge(target_pallet_id, source_pallet_ids):
+    """Check merging source pallets onto a target pallet. Returns a MergePlan."""
+    pallets = load_pallets([target_pallet_id, *source_pallet_ids])
+    target = pallets.get(target_pallet_id)
+    plan = MergePlan(target=target)
+    if target is None:
+        plan.errors.append((target_pallet_id, 'Target pallet not found'))
+        return plan
+    if target.status != 'active' or target.current_location is None:
+        plan.errors.append((target_pallet_id, 'Target pallet must be active and in a location'))
+        return plan
+
+    for pallet_id in dict.fromkeys(source_pallet_ids):
+        pallet = pallets.get(pallet_id)
+        if pallet_id == target_pallet_id:
+            plan.errors.append((pallet_id, 'Cannot merge a pallet into itself'))
+        elif pallet is None:
+            plan.errors.append((pallet_id, 'Pallet not found'))
+        elif pallet.status != 'active':
+            plan.errors.append((pallet_id, f'Pallet is {pallet.get_status_display().lower()}'))
+        elif not pallet.pallet_items.all():
+            plan.errors.append((pallet_id, 'Pallet has no items'))
+        else:
+            plan.sources.append(pallet)
+    if not plan.sources:
+        return plan
+
+    loads = pallet_loads(plan.sources)
+    incoming = [pallet for pallet in plan.sources if pallet.current_location_id != target.current_location_id]
+    plan.volume = sum(loads[pallet.pk][0] for pallet in incoming)
+    plan.weight = sum(loads[pallet.pk][1] for pallet in incoming)
+    if incoming:
+        location = target.current_location
+        planner = _Planner()
+        position = planner.snapshot(location.facility_id).index.get(location.pk)
+        if position is not None and not planner.fits(location.facility_id, position, plan.volume, plan.weight):
+            plan.errors.append((
+                target.pallet_id,
+                f'{location.location_code} cannot take another {plan.volume:,.2f} CBM / {plan.weight:,.0f} kg',
+            ))
+    return plan
+
+
+def _merge_movements(plan, user, reference):
+    """Move the stock of source pallets in other locations to the target's location"""
+    destination = plan.target.current_location
+    lines = []
+    for pallet in plan.sources:
+        source = pallet.current_location
+        if source is None or source.pk == destination.pk:
+            continue
+        customer_id = pallet.grn_pallet.grn.customer_id if pallet.grn_pallet else ANY
+        for item in pallet.pallet_items.all():
+            lines.append(StockLine('move', StockKey(
+                customer_id, item.item_id, source.facility_id, source.pk, item.batch_number or ANY
+            ), item.quantity, to_facility_id=destination.facility_id, to_location_id=destination.pk))
+    return DocumentMovements(
+        source=f'pallet_merge:{plan.target.pk}:{reference}', lines=lines, reference_number=plan.target.pallet_id,
+        in_type='transfer_in', out_type='transfer_out', user=user,
+    )
+
+
+def apply_merge(plan, user):
+    """Merge a checked plan's source pallets into its target in one transaction. Returns a summary dict."""
+    if plan.errors or not plan.sources:
+        raise BulkMoveError('The merge has errors or nothing to merge')
+    now = timezone.now()
+    reference = f"{now:%Y%m%d%H%M%S}"
+    target = plan.target
+
+    with transaction.atomic():
+        locked = dict(Pallet.objects.select_for_update().filter(
+            pk__in=[target.pk, *(pallet.pk for pallet in plan.sources)], status='active'
+        ).values_list('pk', 'current_location_id'))
+        changed = [
+            pallet.pallet_id for pallet in [target, *plan.sources]
+            if pallet.pk not in locked or locked[pallet.pk] != pallet.current_location_id
+        ]
+        if changed:
+            raise BulkMoveError(f"Pallets changed since the merge was checked: {', '.join(changed)}")
+
+        lines = {(item.item_id, item.batch_number, item.serial_number): item for item in target.pallet_items.all()}
+        increased, moved, emptied = {}, [], []
+        for pallet in plan.sources:
+            for item in pallet.pallet_items.all():
+                key = (item.item_id, item.batch_number, item.serial_number)
+                existing = lines.get(key)
+                if existing is None:
+                    item.pallet = target
+                    item.updated_at = now
+                    lines[key] = item
+                    moved.append(item)
+                    continue
+                existing.quantity += item.quantity
+                if existing.unit_cost:
+                    existing.total_value = existing.unit_cost * existing.quantity
+                existing.updated_at = now
+                increased[existing.pk] = existing
+                emptied.append(item.pk)
+
+        PalletItem.objects.filter(pk__in=emptied).delete()
+        PalletItem.objects.bulk_update(moved, ['pallet', 'updated_at'], batch_size=BULK_BATCH_SIZE)
+        PalletItem.objects.bulk_update(
+            list(increased.values()), ['quantity', 'total_value', 'updated_at'], batch_size=BULK_BATCH_SIZE
+        )
+
+        merged_ids = ', '.join(pallet.pallet_id for pallet in plan.sources)
+        loads = pallet_loads(plan.sources)
+        if target.volume is not None:
+            target.volume += Decimal(str(sum(loads[pallet.pk][0] for pallet in plan.sources))).quantize(CENT)
+        if target.weight is not None:
+            target.weight += Decimal(str(sum(loads[pallet.pk][1] for pallet in plan.sources))).quantize(CENT)
+        target.notes = '\n'.join(filter(None, [target.notes, f'{now:%Y-%m-%d %H:%M} merged {merged_ids}']))
+        target.updated_by = user
+        target.updated_at = now
+
+        # Built while the source pallets still have their locations
+        stock = _merge_movements(plan, user, reference)
+        pallet_deltas = defaultdict(lambda: [0, 0, 0])
+        for pallet in plan.sources:
+            if pallet.current_location_id:
+                pallet_deltas[pallet.current_location_id][2] -= 1
+            pallet.notes = '\n'.join(filter(None, [pallet.notes, f'{now:%Y-%m-%d %H:%M} merged into {target.pallet_id}']))
+            pallet.status = 'inactive'
+            pallet.current_location = None
+            pallet.updated_by = user
+            pallet.updated_at = now
+        Pallet.objects.bulk_update(
+            [target, *plan.sources],
+            ['status', 'current_location', 'volume', 'weight', 'notes', 'updated_by', 'updated_at'],
+        )
+        apply_location_deltas(pallet_deltas)
+        entries = post_documents([stock])
+
+    logger.info(f'Merged {merged_ids} into {target.pallet_id}: {len(moved)} lines moved, {len(emptied)} combined')
+    return {
+        'target': target.pallet_id,
+        'merged': len(plan.sources),
+        'lines_moved': len(moved),
+        'lines_combined': len(emptied),
+        'ledger_entries': len(entries),
+    }
@@ -1,8 +1,10 @@
 from django import forms
 from django.forms import inlineformset_factory
 from .models import Pallet, PalletItem, LocationTransfer, LocationTransferHistory
-from facility.models import FacilityLocation
+from .bulk import STRATEGIES, TargetRule
+from facility.models import Facility, FacilityLocation
 from items.models import Item
+from putaways.slotting import NON_STORAGE_TYPES
 
 class PalletSearchForm(forms.Form):
     """Form for searching pallets"""
@@ -351,4 +353,189 @@ class QuickTransferForm(forms.Form):
                 raise forms.ValidationError("This pallet is not currently located anywhere.")
         except Pallet.DoesNotExist:
             raise forms.ValidationError("Pallet not found or not active.")
-        return pallet_id 
\ No newline at end of file
+        return pallet_id 
+
+def _split_ids(value):
+    return [part.strip().upper() for part in value.replace(',', '\n').split() if part.strip()]
+
+
+class BulkMoveForm(forms.Form):
+    """Form for moving many pallets at once"""
+    
+    MODE_CHOICES = [
+        ('pallets', 'Pallet list'),
+        ('zone', 'Empty a zone or aisle'),
+    ]
+    
+    mode = forms.ChoiceField(
+        choices=MODE_CHOICES,
+        initial='pallets',
+        widget=forms.RadioSelect(attrs={'class': 'form-check-input'}),
+        label="Select Pallets By"
+    )
+    
+    pallet_lines = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={
+            'class': 'form-control font-monospace',
+            'rows': 8,
+            'placeholder': 'PLT-0001\nPLT-0002 A-01-02'
+        }),
+        label="Pallets",
+        help_text="One pallet per line, optionally followed by its destination location code"
+    )
+    
+    source_facility = forms.ModelChoiceField(
+        queryset=Facility.objects.all(),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label="Source Facility"
+    )
+    
+    source_zone = forms.CharField(
+        max_length=50,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control'}),
+        label="Source Zone"
+    )
+    
+    source_aisle = forms.CharField(
+        max_length=20,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control'}),
+        label="Source Aisle",
+        help_text="Leave blank to empty the whole zone"
+    )
+    
+    target_facility = forms.ModelChoiceField(
+        queryset=Facility.objects.all(),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label="Target Facility",
+        help_text="Where pallets without a destination go"
+    )
+    
+    target_zones = forms.CharField(
+        max_length=200,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'B, C'}),
+        label="Target Zones",
+        help_text="Comma separated; blank allows any zone"
+    )
+    
+    location_types = forms.MultipleChoiceField(
+        choices=[
+            choice for choice in FacilityLocation.LOCATION_TYPES if choice[0] not in NON_STORAGE_TYPES
+        ],
+        required=False,
+        widget=forms.SelectMultiple(attrs={'class': 'form-select', 'size': 5}),
+        label="Target Location Types"
+    )
+    
+    max_pallets = forms.IntegerField(
+        min_value=1,
+        required=False,
+        initial=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+        label="Max Pallets per Location",
+        help_text="Counts the pallets already in the location; blank for no limit"
+    )
+    
+    strategy = forms.ChoiceField(
+        choices=STRATEGIES,
+        initial='nearest',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label="Placement"
+    )
+    
+    notes = forms.CharField(
+        max_length=500,
+        required=False,
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
+        label="Notes"
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        self.requests = []
+        if cleaned_data.get('mode') == 'zone':
+            if not cleaned_data.get('source_facility') or not cleaned_data.get('source_zone'):
+                raise forms.ValidationError("Select the source facility and zone to empty.")
+            if not cleaned_data.get('target_facility'):
+                raise forms.ValidationError("Select the target facility for the zone's pallets.")
+            return cleaned_data
+        
+        lines = [line.split() for line in (cleaned_data.get('pallet_lines') or '').splitlines() if line.strip()]
+        if not lines:
+            raise forms.ValidationError("Enter at least one pallet.")
+        codes = {parts[1] for parts in lines if len(parts) > 1}
+        locations = FacilityLocation.objects.filter(location_code__in=codes)
+        if cleaned_data.get('target_facility'):
+            locations = locations.filter(facility=cleaned_data['target_facility'])
+        found = {}
+        for location_id, code in locations.values_list('id', 'location_code'):
+            found.setdefault(code, []).append(location_id)
+        
+        errors = []
+        for parts in lines:
+            pallet_id = parts[0].upper()
+            if len(parts) > 2:
+                errors.append(f"{pallet_id}: expected a pallet ID and at most one location code")
+            elif len(parts) == 1:
+                if not cleaned_data.get('target_facility'):
+                    errors.append(f"{pallet_id}: no destination; give one or select a target facility")
+                self.requests.append((pallet_id, None))
+            elif parts[1] not in found:
+                errors.append(f"{pallet_id}: location {parts[1]} not found")
+            elif len(found[parts[1]]) > 1:
+                errors.append(f"{pallet_id}: location {parts[1]} exists in several facilities; select the target facility")
+            else:
+                self.requests.append((pallet_id, found[parts[1]][0]))
+        if errors:
+            raise forms.ValidationError(errors)
+        return cleaned_data
+    
+    def target_rule(self):
+        """TargetRule for pallets without a destination, or None"""
+        data = self.cleaned_data
+        if not data.get('target_facility'):
+            return None
+        return TargetRule(
+            facility_id=data['target_facility'].pk,
+            zones=tuple(zone.strip() for zone in data.get('target_zones', '').split(',') if zone.strip()),
+            location_types=tuple(data.get('location_types') or ()),
+            max_pallets=data.get('max_pallets'),
+            strategy=data.get('strategy') or 'nearest',
+        )
+
+
+class PalletMergeForm(forms.Form):
+    """Form for consolidating partial pallets onto one pallet"""
+    
+    target_pallet_id = forms.CharField(
+        max_length=100,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Pallet to keep...'
+        }),
+        label="Target Pallet"
+    )
+    
+    source_pallet_ids = forms.CharField(
+        widget=forms.Textarea(attrs={
+            'class': 'form-control font-monospace',
+            'rows': 5,
+            'placeholder': 'PLT-0003\nPLT-0004'
+        }),
+        label="Pallets to Merge",
+        help_text="Their items move onto the target pallet and they are deactivated"
+    )
+    
+    def clean_target_pallet_id(self):
+        return self.cleaned_data['target_pallet_id'].strip().upper()
+    
+    def clean_source_pallet_ids(self):
+        pallet_ids = _split_ids(self.cleaned_data['source_pallet_ids'])
+        if not pallet_ids:
+            raise forms.ValidationError("Enter at least one pallet to merge.")
+        return pallet_ids
@@ -1,3 +1,145 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from facility.models import Facility, FacilityLocation, LocationUtilization
+from facility.utilization import find_drift
+from items.models import Item
+from .bulk import BulkMoveError, TargetRule, apply_merge, apply_moves, plan_merge, plan_moves, plan_zone_move
+from .models import LocationTransfer, Pallet, PalletItem
+
+
+class BulkPalletMoveTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.facility = Facility.objects.create(
+            facility_code='WH01', facility_name='Main Warehouse', address='1 Dock Road',
+            city='Dubai', state='Dubai', postal_code='00000'
+        )
+        self.source = self.create_location('A-01', 'A', x=0)
+        self.near = self.create_location('B-01', 'B', x=1)
+        self.far = self.create_location('B-02', 'B', x=2, capacity='3.00')
+
+    def create_location(self, code, zone, x, capacity='10.00'):
+        return FacilityLocation.objects.create(
+            facility=self.facility, location_code=code, location_name=f'Rack {code}', zone=zone,
+            capacity=Decimal(capacity), x_coordinate=Decimal(x), y_coordinate=Decimal('0')
+        )
+
+    def create_pallet(self, pallet_id, volume='1.00', location=None):
+        return Pallet.objects.create(
+            pallet_id=pallet_id, current_location=location or self.source, volume=Decimal(volume), weight=Decimal('0')
+        )
+
+    def pallet_count(self, location):
+        return LocationUtilization.objects.filter(location=location).values_list('pallet_count', flat=True).first() or 0
+
+    def placements(self, plan):
+        return {move.pallet.pallet_id: move.destination.location_code for move in plan.moves}
+
+    def test_explicit_moves_respect_capacity(self):
+        self.create_pallet('PLT-001', volume='2.00')
+        self.create_pallet('PLT-002', volume='2.00')
+
+        plan = plan_moves([('PLT-001', self.far.pk), ('PLT-002', self.far.pk)])
+
+        self.assertEqual(self.placements(plan), {'PLT-001': 'B-02'})
+        self.assertEqual([pallet_id for pallet_id, _ in plan.errors], ['PLT-002'])
+
+    def test_apply_moves_transfers_and_counts(self):
+        """Applied moves create completed transfers and move the location pallet counts"""
+        self.create_pallet('PLT-001')
+        self.create_pallet('PLT-002')
+        plan = plan_moves([('PLT-001', self.near.pk), ('PLT-002', self.far.pk)])
+
+        summary = apply_moves(plan, self.user)
+
+        self.assertEqual(summary['transfers'], 2)
+        self.assertEqual(
+            list(LocationTransfer.objects.order_by('transfer_number').values_list('transfer_number', 'status')),
+            [('LT-000001', 'completed'), ('LT-000002', 'completed')]
+        )
+        self.assertEqual(Pallet.objects.get(pallet_id='PLT-002').current_location, self.far)
+        self.assertEqual(
+            [self.pallet_count(location) for location in (self.source, self.near, self.far)], [0, 1, 1]
+        )
+        self.assertEqual(find_drift(), ([], []))
+
+    def test_rule_places_largest_pallets_first(self):
+        self.create_pallet('PLT-001', volume='1.00')
+        self.create_pallet('PLT-002', volume='2.00')
+        self.create_pallet('PLT-003', volume='1.00')
+
+        nearest = plan_moves(
+            [('PLT-001', None), ('PLT-002', None), ('PLT-003', None)],
+            TargetRule(self.facility.pk, zones=('B',), max_pallets=2),
+        )
+        self.assertEqual(nearest.errors, [])
+        self.assertEqual(self.placements(nearest), {'PLT-002': 'B-01', 'PLT-001': 'B-01', 'PLT-003': 'B-02'})
+
+        best_fit = plan_moves([('PLT-002', None)], TargetRule(self.facility.pk, zones=('B',), strategy='best_fit'))
+        self.assertEqual(self.placements(best_fit), {'PLT-002': 'B-02'})
+
+    def test_zone_move_empties_the_zone(self):
+        self.create_pallet('PLT-001', volume='4.00')
+        self.create_pallet('PLT-002', volume='4.00')
+        self.create_pallet('PLT-003', volume='4.00')
+
+        plan = plan_zone_move(self.facility.pk, 'A', TargetRule(self.facility.pk))
+
+        self.assertEqual(sorted(self.placements(plan).values()), ['B-01', 'B-01'])
+        self.assertEqual(plan.errors, [('PLT-003', 'No location matching the target rules has room')])
+
+    def test_invalid_requests(self):
+        self.create_pallet('PLT-001')
+        inactive = self.create_pallet('PLT-002')
+        inactive.status = 'inactive'
+        inactive.save()
+
+        plan = plan_moves([
+            ('PLT-001', self.source.pk), ('PLT-001', self.near.pk), ('PLT-002', self.near.pk),
+            ('PLT-404', self.near.pk), ('PLT-001', None),
+        ])
+
+        self.assertEqual(plan.moves, [])
+        self.assertEqual([message for _, message in plan.errors], [
+            'Pallet is already in the destination location', 'Listed more than once', 'Pallet is inactive',
+            'Pallet not found', 'Listed more than once',
+        ])
+
+    def test_stale_plan_is_refused(self):
+        pallet = self.create_pallet('PLT-001')
+        plan = plan_moves([('PLT-001', self.near.pk)])
+        pallet.current_location = self.far
+        pallet.save()
+
+        with self.assertRaises(BulkMoveError):
+            apply_moves(plan, self.user)
+        self.assertFalse(LocationTransfer.objects.exists())
+
+    def test_merge_combines_matching_lines(self):
+        """Lines of the same item and batch are added together, the emptied pallet is deactivated"""
+        first_item = Item.objects.create(item_code='SKU-001', item_name='First Item', barcode='1000000001')
+        second_item = Item.objects.create(item_code='SKU-002', item_name='Second Item', barcode='1000000002')
+        target = self.create_pallet('PLT-001')
+        partial = self.create_pallet('PLT-002')
+        PalletItem.objects.create(pallet=target, item=first_item, quantity=Decimal('5'), batch_number='B1')
+        PalletItem.objects.create(pallet=partial, item=first_item, quantity=Decimal('3'), batch_number='B1')
+        PalletItem.objects.create(pallet=partial, item=second_item, quantity=Decimal('2'))
+
+        self.assertEqual(plan_merge('PLT-001', ['PLT-001']).errors, [('PLT-001', 'Cannot merge a pallet into itself')])
+        plan = plan_merge('PLT-001', ['PLT-002'])
+        self.assertEqual(plan.errors, [])
+
+        summary = apply_merge(plan, self.user)
+
+        self.assertEqual((summary['lines_moved'], summary['lines_combined']), (1, 1))
+        self.assertEqual(
+            sorted(target.pallet_items.values_list('item__item_code', 'quantity')),
+            [('SKU-001', Decimal('8.00')), ('SKU-002', Decimal('2.00'))]
+        )
+        partial.refresh_from_db()
+        self.assertEqual((partial.status, partial.current_location), ('inactive', None))
+        self.assertEqual(Pallet.objects.get(pk=target.pk).volume, Decimal('2.00'))
+        self.assertEqual(self.pallet_count(self.source), 1)
@@ -23,6 +23,10 @@ urlpatterns = [
     # Quick Transfer
     path('quick-transfer/', views.quick_transfer, name='quick_transfer'),
     
+    # Bulk Operations
+    path('bulk-move/', views.bulk_move, name='bulk_move'),
+    path('pallets/merge/', views.merge_pallets, name='merge_pallets'),
+    
     # AJAX endpoints
     path('ajax/get-pallet-details/', views.get_pallet_details, name='get_pallet_details'),
     path('ajax/search-pallets/', views.search_pallets, name='search_pallets'),
@@ -12,8 +12,10 @@ import json
 from .models import Pallet, PalletItem, LocationTransfer, LocationTransferHistory
 from .forms import (
     PalletSearchForm, LocationTransferForm, LocationTransferApprovalForm,
-    LocationTransferProcessingForm, LocationTransferSearchForm, QuickTransferForm
+    LocationTransferProcessingForm, LocationTransferSearchForm, QuickTransferForm,
+    BulkMoveForm, PalletMergeForm
 )
+from .bulk import BulkMoveError, apply_merge, apply_moves, plan_merge, plan_moves, plan_zone_move
 from facility.models import FacilityLocation
 from items.models import Item
 
@@ -407,6 +409,79 @@ def quick_transfer(request):
     
     return render(request, 'location_transfer/quick_transfer.html', context)
 
+@login_required
+def bulk_move(request):
+    """Plan and apply moves of many pallets in one transaction"""
+    
+    plan = None
+    if request.method == 'POST':
+        form = BulkMoveForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            if data['mode'] == 'zone':
+                plan = plan_zone_move(
+                    data['source_facility'].pk, data['source_zone'], form.target_rule(), aisle=data.get('source_aisle', '')
+                )
+            else:
+                plan = plan_moves(form.requests, form.target_rule())
+            
+            if request.POST.get('action') == 'apply':
+                if not plan.moves:
+                    messages.error(request, 'There are no pallets that can be moved.')
+                else:
+                    try:
+                        summary = apply_moves(plan, request.user, notes=data.get('notes', ''))
+                        messages.success(
+                            request,
+                            f"Moved {summary['transfers']} pallets in {summary['reference']}."
+                            + (f" {len(plan.errors)} pallets were skipped." if plan.errors else '')
+                        )
+                        return redirect('location_transfer:location_transfer_list')
+                    except BulkMoveError as e:
+                        messages.error(request, str(e))
+    else:
+        form = BulkMoveForm()
+    
+    context = {
+        'form': form,
+        'plan': plan,
+        'title': 'Bulk Move',
+    }
+    
+    return render(request, 'location_transfer/bulk_move.html', context)
+
+@login_required
+def merge_pallets(request):
+    """Consolidate partial pallets onto one pallet"""
+    
+    plan = None
+    if request.method == 'POST':
+        form = PalletMergeForm(request.POST)
+        if form.is_valid():
+            plan = plan_merge(form.cleaned_data['target_pallet_id'], form.cleaned_data['source_pallet_ids'])
+            
+            if request.POST.get('action') == 'apply' and not plan.errors:
+                try:
+                    summary = apply_merge(plan, request.user)
+                    messages.success(
+                        request,
+                        f"Merged {summary['merged']} pallets into {summary['target']}: "
+                        f"{summary['lines_moved']} lines moved, {summary['lines_combined']} combined."
+                    )
+                    return redirect('location_transfer:pallet_detail', pk=plan.target.pk)
+                except BulkMoveError as e:
+                    messages.error(request, str(e))
+    else:
+        form = PalletMergeForm(initial={'target_pallet_id': request.GET.get('pallet_id', '')})
+    
+    context = {
+        'form': form,
+        'plan': plan,
+        'title': 'Merge Pallets',
+    }
+    
+    return render(request, 'location_transfer/merge_pallets.html', context)
+
 # AJAX endpoints
 @login_required
 @csrf_exempt
@@ -518,21 +593,34 @@ def get_available_locations(request):
             data = json.loads(request.body)
             source_location_id = data.get('source_location_id')
             
-            # Get all active locations except the source
+            # Get all active locations except the source, with their maintained occupancy
             locations = FacilityLocation.objects.filter(status='active')
             if source_location_id:
                 locations = locations.exclude(id=source_location_id)
+            locations = locations.values(
+                'id', 'location_code', 'location_name', 'location_type', 'capacity', 'max_weight',
+                'current_utilization', 'reserved_capacity', 'utilization__occupied_volume',
+                'utilization__occupied_weight', 'utilization__pallet_count',
+            )
             
             locations_data = []
             for location in locations:
+                capacity = location['capacity']
+                available = None
+                if capacity:
+                    available = capacity * (100 - location['current_utilization'] - location['reserved_capacity']) / 100
                 locations_data.append({
-                    'id': location.id,
-                    'name': location.display_name,
-                    'code': location.location_code,
-                    'type': location.location_type,
-                    'utilization': float(location.current_utilization),
-                    'capacity': str(location.capacity) if location.capacity else None,
-                    'is_available': location.is_available,
+                    'id': location['id'],
+                    'name': f"{location['location_code']} - {location['location_name']}",
+                    'code': location['location_code'],
+                    'type': location['location_type'],
+                    'utilization': float(location['current_utilization']),
+                    'capacity': str(capacity) if capacity else None,
+                    'available_capacity': float(max(available, 0)) if available is not None else None,
+                    'occupied_weight': float(location['utilization__occupied_weight'] or 0),
+                    'max_weight': str(location['max_weight']) if location['max_weight'] else None,
+                    'pallet_count': location['utilization__pallet_count'] or 0,
+                    'is_available': location['current_utilization'] < 100,
                 })
             
             return JsonResponse({'locations': locations_data})
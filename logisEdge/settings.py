@@ -340,6 +340,9 @@ CELERY_TASK_ROUTES = {
     'billing_payable_tracking.tasks.send_daily_summary_report': {'queue': 'email'},
     'billing_payable_tracking.tasks.mark_overdue_bills': {'queue': 'billing'},
     'billing_payable_tracking.tasks.cleanup_old_reminders': {'queue': 'billing'},
+    # Document emails (GRN, delivery order, cross stuffing)
+    'email_configuration.tasks.send_document_email': {'queue': 'email'},
+    'email_configuration.tasks.send_stuck_document_emails': {'queue': 'email'},
 }
 
 # Celery Worker Concurrency
@@ -353,6 +356,20 @@ REDIS_PORT = int(os.getenv('REDIS_PORT', '6379'))
 REDIS_DB = int(os.getenv('REDIS_DB', '0'))
 REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', None)
 
+# Cache shared by every web and worker process (e.g. the RF scanner barcode cache versions).
+# Without REDIS_URL each process gets its own memory cache, which only suits a single process.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+            'KEY_PREFIX': 'logisedge',
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+
 # Task Execution Settings
 TASK_EXECUTION_TIMEOUT = 3600  # 1 hour
 TASK_MAX_RETRIES = 3
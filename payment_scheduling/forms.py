@@ -16,8 +16,8 @@ class PaymentScheduleForm(ModelForm):
         model = apps.get_model('payment_scheduling', 'PaymentSchedule')
         fields = [
             'customer', 'vendor', 'payment_type', 'total_amount', 'currency',
-            'vat_rate', 'due_date', 'installment_count', 'installment_amount',
-            'invoice_reference', 'po_reference', 'description'
+            'vat_rate', 'due_date', 'installment_count', 'installment_frequency',
+            'installment_interval_days', 'installment_amount', 'invoice_reference', 'po_reference', 'description'
         ]
         widgets = {
             'customer': forms.Select(attrs={'class': 'form-select'}),
@@ -28,6 +28,8 @@ class PaymentScheduleForm(ModelForm):
             'vat_rate': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'due_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
             'installment_count': forms.NumberInput(attrs={'class': 'form-control', 'min': '1'}),
+            'installment_frequency': forms.Select(attrs={'class': 'form-select'}),
+            'installment_interval_days': forms.NumberInput(attrs={'class': 'form-control', 'min': '1'}),
             'installment_amount': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'invoice_reference': forms.TextInput(attrs={'class': 'form-control'}),
             'po_reference': forms.TextInput(attrs={'class': 'form-control'}),
@@ -73,6 +75,9 @@ class PaymentScheduleForm(ModelForm):
         if installment_count and installment_count <= 0:
             raise ValidationError('Installment count must be greater than zero.')
 
+        if cleaned_data.get('installment_frequency') == 'custom' and not cleaned_data.get('installment_interval_days'):
+            raise ValidationError('Days between installments are required for a custom plan.')
+
         # Calculate and validate installment amount
         if total_amount and installment_count:
             calculated_installment = total_amount / Decimal(installment_count)
@@ -0,0 +1,241 @@
+"""
+Installment plans, status refresh and cash projection for payment schedules.
+
+A schedule's plan (monthly, quarterly or a custom day interval) is expanded
+into installment rows that are written with bulk inserts; the amounts are
+split in whole cents with the remainder on the last installment so they add
+up to the schedule total.
+
+Due and overdue states are evaluated in the database: each refresh issues a
+single UPDATE per table driven by a CASE expression, touching only the rows
+whose status actually changes. The forward cash requirement is aggregated
+per week directly in SQL.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal, ROUND_DOWN
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import (
+    Case, When, Value, CharField, DecimalField, DateField, F, Q, Sum, Exists, OuterRef
+)
+from django.db.models.functions import Greatest, TruncWeek
+from django.utils import timezone
+
+from .models import PaymentSchedule, PaymentInstallment, PaymentReminder, PaymentScheduleHistory
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 1000
+CENT = Decimal('0.01')
+FREQUENCY_MONTHS = {'monthly': 1, 'quarterly': 3}
+DEFAULT_INTERVAL_DAYS = 30
+# Schedules whose status follows their payments and due dates
+REFRESHED_STATUSES = ['pending', 'partially_paid', 'overdue', 'paid']
+OPEN_STATUSES = ['pending', 'partially_paid', 'overdue']
+CLOSED_STATUSES = ['paid', 'cancelled']
+
+
+def installment_dates(schedule):
+    """Due date of every installment of a schedule's plan, starting at the schedule due date"""
+    count = max(schedule.installment_count or 1, 1)
+    if schedule.installment_frequency == 'custom':
+        interval = schedule.installment_interval_days or DEFAULT_INTERVAL_DAYS
+        return [schedule.due_date + timedelta(days=interval * i) for i in range(count)]
+    # Offsets are taken from the first due date so month ends do not drift (Jan 31, Feb 28, Mar 31)
+    months = FREQUENCY_MONTHS.get(schedule.installment_frequency, 1)
+    return [schedule.due_date + relativedelta(months=months * i) for i in range(count)]
+
+
+def split_amount(total, count):
+    """Split an amount into count parts in whole cents, the remainder going to the last part"""
+    part = (total / count).quantize(CENT, rounding=ROUND_DOWN)
+    return [part] * (count - 1) + [total - part * (count - 1)]
+
+
+def build_installments(schedule, today=None):
+    """Unsaved installments for a schedule's plan"""
+    today = today or timezone.now().date()
+    dates = installment_dates(schedule)
+    amounts = split_amount(Decimal(schedule.total_with_vat).quantize(CENT), len(dates))
+    return [
+        PaymentInstallment(
+            payment_schedule=schedule,
+            installment_number=number,
+            amount=amount,
+            due_date=due_date,
+            # bulk_create skips save(), so the initial status is set here
+            status='overdue' if due_date < today else 'pending',
+        )
+        for number, (due_date, amount) in enumerate(zip(dates, amounts), start=1)
+    ]
+
+
+def generate_installments(schedules, replace=False):
+    """Create the installments of many schedules with bulk inserts.
+
+    Schedules that already have installments are skipped, unless replace is
+    set, in which case installments of schedules without any payment are
+    rebuilt. Returns the number of installments created.
+    """
+    schedules = list(schedules)
+    if not schedules:
+        return 0
+    ids = [schedule.pk for schedule in schedules]
+
+    with transaction.atomic():
+        paid = set(PaymentInstallment.objects.filter(
+            payment_schedule_id__in=ids, paid_amount__gt=0
+        ).values_list('payment_schedule_id', flat=True))
+        if replace:
+            targets = [schedule for schedule in schedules if schedule.pk not in paid]
+            PaymentInstallment.objects.filter(payment_schedule_id__in=[s.pk for s in targets]).delete()
+        else:
+            existing = set(PaymentInstallment.objects.filter(
+                payment_schedule_id__in=ids
+            ).values_list('payment_schedule_id', flat=True).distinct())
+            targets = [schedule for schedule in schedules if schedule.pk not in existing]
+
+        today = timezone.now().date()
+        installments = [installment for schedule in targets for installment in build_installments(schedule, today)]
+        PaymentInstallment.objects.bulk_create(installments, batch_size=BULK_BATCH_SIZE)
+
+    if replace and paid:
+        logger.info(f'Kept the installments of {len(paid)} schedules that already have payments')
+    return len(installments)
+
+
+def installment_status_case(today):
+    return Case(
+        When(paid_amount__gte=F('amount'), then=Value('paid')),
+        When(paid_amount__gt=0, then=Value('partially_paid')),
+        When(due_date__lt=today, then=Value('overdue')),
+        default=Value('pending'),
+        output_field=CharField(),
+    )
+
+
+def schedule_status_case(today):
+    """Same precedence as PaymentSchedule.save(), with overdue taken from the installments"""
+    installments = PaymentInstallment.objects.filter(payment_schedule=OuterRef('pk'))
+    overdue_installment = installments.filter(due_date__lt=today, paid_amount__lt=F('amount'))
+    return Case(
+        When(outstanding_amount__lte=0, then=Value('paid')),
+        When(paid_amount__gt=0, then=Value('partially_paid')),
+        When(Exists(overdue_installment), then=Value('overdue')),
+        When(~Exists(installments) & Q(due_date__lt=today), then=Value('overdue')),
+        default=Value('pending'),
+        output_field=CharField(),
+    )
+
+
+def refresh_statuses(today=None):
+    """Bring installment, schedule and reminder states up to date for a day.
+
+    Each table gets one UPDATE covering every row whose state changed.
+    Schedule changes are recorded in the history. Returns a summary dict.
+    """
+    today = today or timezone.now().date()
+    now = timezone.now()
+
+    with transaction.atomic():
+        installment_status = installment_status_case(today)
+        installments_updated = PaymentInstallment.objects.alias(
+            new_status=installment_status
+        ).exclude(status=F('new_status')).update(status=installment_status, updated_at=now)
+
+        schedule_status = schedule_status_case(today)
+        changed = PaymentSchedule.objects.filter(status__in=REFRESHED_STATUSES).alias(
+            new_status=schedule_status
+        ).exclude(status=F('new_status'))
+        changes = list(changed.annotate(target_status=schedule_status).values_list('pk', 'status', 'target_status'))
+        if changes:
+            changed.update(status=schedule_status, updated_at=now)
+            PaymentScheduleHistory.objects.bulk_create([
+                PaymentScheduleHistory(
+                    payment_schedule_id=schedule_id,
+                    action='status_changed',
+                    description=f'Status changed from {old_status} to {new_status} by the scheduled refresh',
+                    old_values={'status': old_status},
+                    new_values={'status': new_status},
+                )
+                for schedule_id, old_status, new_status in changes
+            ], batch_size=BULK_BATCH_SIZE)
+
+        # Reminders for settled or cancelled schedules are no longer needed
+        reminders_cancelled = PaymentReminder.objects.filter(
+            status='pending', payment_schedule__status__in=CLOSED_STATUSES
+        ).update(status='cancelled', updated_at=now)
+
+    reminders_due = PaymentReminder.objects.filter(status='pending', scheduled_date__lte=now).count()
+    summary = {
+        'installments_updated': installments_updated,
+        'schedules_updated': len(changes),
+        'schedules_overdue': sum(1 for _, _, status in changes if status == 'overdue'),
+        'reminders_cancelled': reminders_cancelled,
+        'reminders_due': reminders_due,
+    }
+    logger.info(f'Payment schedule refresh for {today}: {summary}')
+    return summary
+
+
+def weekly_cash_projection(weeks=12, today=None, currency=None):
+    """Open installment amounts per week and currency for the coming weeks.
+
+    Customer schedules are receivable, vendor schedules payable. Amounts
+    already overdue are carried in the current week and also reported on
+    their own. Returns one row per week and currency, oldest first, with
+    weeks without installments included as zero rows.
+    """
+    today = today or timezone.now().date()
+    week_start = today - timedelta(days=today.weekday())
+    end = week_start + timedelta(weeks=weeks)
+    amount = DecimalField(max_digits=15, decimal_places=2)
+    open_amount = F('amount') - F('paid_amount')
+
+    def total(condition):
+        return Sum(Case(When(condition, then=open_amount), default=Value(Decimal('0.00')), output_field=amount))
+
+    installments = PaymentInstallment.objects.filter(
+        due_date__lt=end,
+        paid_amount__lt=F('amount'),
+        payment_schedule__status__in=OPEN_STATUSES,
+    )
+    if currency:
+        installments = installments.filter(payment_schedule__currency=currency)
+
+    rows = installments.annotate(
+        week=TruncWeek(Greatest('due_date', Value(week_start), output_field=DateField()), output_field=DateField()),
+        schedule_currency=F('payment_schedule__currency'),
+    ).values('week', 'schedule_currency').annotate(
+        receivable=total(Q(payment_schedule__payment_type='customer')),
+        payable=total(Q(payment_schedule__payment_type='vendor')),
+        overdue=total(Q(due_date__lt=today)),
+    ).order_by('week', 'schedule_currency')
+
+    by_week = {}
+    for row in rows:
+        by_week.setdefault(row['week'], []).append(row)
+    currencies = sorted({row['schedule_currency'] for week_rows in by_week.values() for row in week_rows})
+    if currency:
+        currencies = [currency]
+
+    projection = []
+    for offset in range(weeks):
+        start = week_start + timedelta(weeks=offset)
+        found = {row['schedule_currency']: row for row in by_week.get(start, [])}
+        for code in currencies:
+            row = found.get(code, {})
+            receivable = Decimal(row.get('receivable') or 0).quantize(CENT)
+            payable = Decimal(row.get('payable') or 0).quantize(CENT)
+            projection.append({
+                'week_start': start,
+                'week_end': start + timedelta(days=6),
+                'currency': code,
+                'receivable': receivable,
+                'payable': payable,
+                'overdue': Decimal(row.get('overdue') or 0).quantize(CENT),
+                'net': receivable - payable,
+            })
+    return projection
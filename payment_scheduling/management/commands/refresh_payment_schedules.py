@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from payment_scheduling.installments import generate_installments, refresh_statuses
+from payment_scheduling.models import PaymentSchedule
+
+
+class Command(BaseCommand):
+    help = 'Update installment, schedule and reminder statuses for today (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='First generate installments for schedules that have none'
+        )
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            schedules = PaymentSchedule.objects.filter(installments__isnull=True).exclude(status='cancelled')
+            created = generate_installments(schedules)
+            self.stdout.write(f'Created {created} installments')
+        
+        summary = refresh_statuses()
+        
+        self.stdout.write(f'Installments updated: {summary["installments_updated"]}')
+        self.stdout.write(f'Schedules updated: {summary["schedules_updated"]} ({summary["schedules_overdue"]} now overdue)')
+        self.stdout.write(f'Reminders cancelled: {summary["reminders_cancelled"]}')
+        if summary['reminders_due']:
+            self.stdout.write(self.style.WARNING(f'{summary["reminders_due"]} reminders are due to be sent'))
+        self.stdout.write(self.style.SUCCESS('Payment schedules refreshed'))
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.23 on 2026-10-18 21:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment_scheduling', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentschedule',
+            name='installment_frequency',
+            field=models.CharField(choices=[('monthly', 'Monthly'), ('quarterly', 'Quarterly'), ('custom', 'Custom Interval')], default='monthly', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='paymentschedule',
+            name='installment_interval_days',
+            field=models.PositiveIntegerField(blank=True, help_text='Days between installments for custom plans', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='paymentinstallment',
+            index=models.Index(fields=['status', 'due_date'], name='payment_sch_status_5a6674_idx'),
+        ),
+    ]
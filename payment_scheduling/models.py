@@ -92,6 +92,12 @@ class PaymentSchedule(models.Model):
         ('OMR', 'Omani Rial (OMR)'),
     ]
     
+    FREQUENCY_CHOICES = [
+        ('monthly', 'Monthly'),
+        ('quarterly', 'Quarterly'),
+        ('custom', 'Custom Interval'),
+    ]
+    
     # Basic Information
     schedule_number = models.CharField(max_length=50, unique=True, blank=True)
     customer = models.ForeignKey(
@@ -119,6 +125,12 @@ class PaymentSchedule(models.Model):
     # Payment Details
     due_date = models.DateField()
     installment_count = models.PositiveIntegerField(default=1)
+    installment_frequency = models.CharField(max_length=20, choices=FREQUENCY_CHOICES, default='monthly')
+    installment_interval_days = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Days between installments for custom plans"
+    )
     installment_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
     paid_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
     outstanding_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
@@ -239,6 +251,9 @@ class PaymentInstallment(models.Model):
         verbose_name_plural = 'Payment Installments'
         unique_together = ['payment_schedule', 'installment_number']
         ordering = ['installment_number']
+        indexes = [
+            models.Index(fields=['status', 'due_date']),
+        ]
     
     def __str__(self):
         return f"{self.payment_schedule.schedule_number} - Installment {self.installment_number}"
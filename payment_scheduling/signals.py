@@ -8,26 +8,15 @@ from django.db.models import Sum
 @receiver(post_save, sender=PaymentSchedule)
 def create_payment_installments(sender, instance, created, **kwargs):
     """Create installments when a payment schedule is created"""
-    if created and instance.installment_count > 1:
-        # Calculate installment amounts
-        installment_amount = instance.total_amount / instance.installment_count
-        due_date = instance.due_date
-        
-        for i in range(1, instance.installment_count + 1):
-            PaymentInstallment.objects.create(
-                payment_schedule=instance,
-                installment_number=i,
-                amount=installment_amount,
-                due_date=due_date
-            )
+    if created:
+        from .installments import build_installments
+        PaymentInstallment.objects.bulk_create(build_installments(instance))
 
 
 @receiver(pre_save, sender=PaymentSchedule)
 def update_schedule_status(sender, instance, **kwargs):
     """Update schedule status based on payments"""
     if instance.pk:  # Only for existing instances
-        old_instance = PaymentSchedule.objects.get(pk=instance.pk)
-        
         # Check if status needs to be updated
         if instance.paid_amount >= instance.total_with_vat:
             instance.status = 'paid'
@@ -0,0 +1,20 @@
+import logging
+
+from celery import shared_task
+
+from .installments import refresh_statuses
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=300)
+def refresh_payment_schedules(self):
+    """
+    Update due and overdue states of installments and schedules
+    This task should be scheduled to run daily
+    """
+    try:
+        return refresh_statuses()
+    except Exception as exc:
+        logger.error(f'Error refreshing payment schedules: {str(exc)}')
+        raise self.retry(exc=exc)
@@ -0,0 +1,112 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from .installments import (
+    generate_installments, installment_dates, refresh_statuses, split_amount, weekly_cash_projection
+)
+from .models import PaymentInstallment, PaymentReminder, PaymentSchedule, PaymentScheduleHistory
+
+
+class InstallmentPlanTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        # Schedules are created relative to the real date, which decides their initial status
+        self.start = timezone.now().date() + timedelta(days=10)
+
+    def create_schedule(self, total='1000.00', count=3, payment_type='customer', **kwargs):
+        fields = {
+            'payment_type': payment_type,
+            'vendor': 'Test Vendor' if payment_type == 'vendor' else None,
+            'total_amount': Decimal(total),
+            'vat_rate': Decimal('5.00'),
+            'due_date': self.start,
+            'installment_count': count,
+            'created_by': self.user,
+        }
+        fields.update(kwargs)
+        return PaymentSchedule.objects.create(**fields)
+
+    def test_installment_dates_keep_month_ends(self):
+        schedule = PaymentSchedule(due_date=date(2025, 1, 31), installment_count=4, installment_frequency='monthly')
+        self.assertEqual(installment_dates(schedule), [
+            date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)
+        ])
+        schedule.installment_frequency = 'custom'
+        schedule.installment_interval_days = 14
+        self.assertEqual(installment_dates(schedule)[1:3], [date(2025, 2, 14), date(2025, 2, 28)])
+
+    def test_split_amount_puts_the_remainder_last(self):
+        self.assertEqual(split_amount(Decimal('100.00'), 3), [Decimal('33.33'), Decimal('33.33'), Decimal('33.34')])
+        self.assertEqual(split_amount(Decimal('50.00'), 1), [Decimal('50.00')])
+
+    def test_new_schedule_gets_its_installments(self):
+        schedule = self.create_schedule(total='1000.00', count=3, installment_frequency='quarterly')
+
+        installments = list(schedule.installments.order_by('installment_number'))
+        self.assertEqual([installment.amount for installment in installments],
+                         [Decimal('350.00'), Decimal('350.00'), Decimal('350.00')])
+        self.assertEqual(installments[1].due_date, installment_dates(schedule)[1])
+        self.assertTrue(all(installment.status == 'pending' for installment in installments))
+
+    def test_generate_installments_skips_or_replaces(self):
+        unpaid = self.create_schedule()
+        paid = self.create_schedule()
+        first = paid.installments.get(installment_number=1)
+        first.paid_amount = first.amount
+        first.save()
+
+        self.assertEqual(generate_installments([unpaid, paid]), 0)
+
+        PaymentSchedule.objects.filter(pk=unpaid.pk).update(installment_count=2)
+        unpaid.refresh_from_db()
+        self.assertEqual(generate_installments([unpaid, paid], replace=True), 2)
+        self.assertEqual(unpaid.installments.count(), 2)
+        self.assertEqual(paid.installments.filter(paid_amount__gt=0).count(), 1)
+
+    def test_refresh_marks_overdue_installments_and_schedules(self):
+        schedule = self.create_schedule()
+        settled = self.create_schedule(count=1)
+        installment = settled.installments.get()
+        installment.paid_amount = installment.amount
+        installment.save()
+        reminder = PaymentReminder.objects.create(
+            payment_schedule=settled, reminder_type='email', recipient='accounts@example.com',
+            scheduled_date=timezone.now() + timedelta(days=5)
+        )
+
+        summary = refresh_statuses(today=self.start + timedelta(days=1))
+
+        self.assertEqual(summary['installments_updated'], 1)
+        self.assertEqual((summary['schedules_updated'], summary['schedules_overdue']), (1, 1))
+        self.assertEqual(summary['reminders_cancelled'], 1)
+        schedule.refresh_from_db()
+        reminder.refresh_from_db()
+        self.assertEqual(schedule.status, 'overdue')
+        self.assertEqual(reminder.status, 'cancelled')
+        self.assertEqual(
+            list(schedule.installments.order_by('installment_number').values_list('status', flat=True)),
+            ['overdue', 'pending', 'pending']
+        )
+        self.assertTrue(PaymentScheduleHistory.objects.filter(payment_schedule=schedule, action='status_changed').exists())
+
+        summary = refresh_statuses(today=self.start + timedelta(days=1))
+        self.assertEqual((summary['installments_updated'], summary['schedules_updated']), (0, 0))
+
+    def test_weekly_cash_projection(self):
+        self.create_schedule(total='400.00', count=2, installment_frequency='custom', installment_interval_days=7)
+        self.create_schedule(total='100.00', count=1, payment_type='vendor')
+        week_start = self.start - timedelta(days=self.start.weekday())
+
+        projection = weekly_cash_projection(weeks=3, today=self.start)
+
+        self.assertEqual([row['week_start'] for row in projection], [week_start + timedelta(weeks=i) for i in range(3)])
+        self.assertEqual(
+            [(row['receivable'], row['payable'], row['net']) for row in projection],
+            [(Decimal('210.00'), Decimal('105.00'), Decimal('105.00')),
+             (Decimal('210.00'), Decimal('0.00'), Decimal('210.00')),
+             (Decimal('0.00'), Decimal('0.00'), Decimal('0.00'))]
+        )
@@ -17,6 +17,14 @@ from decimal import Decimal
 from django.apps import apps
 import json
 
+from .installments import generate_installments, weekly_cash_projection
+
+# Schedule fields that define the installment plan
+PLAN_FIELDS = {
+    'total_amount', 'vat_rate', 'due_date', 'installment_count',
+    'installment_frequency', 'installment_interval_days',
+}
+
 # Get models dynamically
 def get_payment_schedule_model():
     return apps.get_model('payment_scheduling', 'PaymentSchedule')
@@ -208,26 +216,15 @@ def schedule_create(request):
         if form.is_valid():
             schedule = form.save(commit=False)
             schedule.created_by = request.user
+            # Installments are generated from the plan when the schedule is first saved
             schedule.save()
             
-            # Create installments
-            installment_count = form.cleaned_data['installment_count']
-            installment_amount = schedule.total_amount / Decimal(installment_count)
-            
-            for i in range(1, installment_count + 1):
-                PaymentInstallment.objects.create(
-                    payment_schedule=schedule,
-                    installment_number=i,
-                    amount=installment_amount,
-                    due_date=schedule.due_date
-                )
-            
             # Create history entry
             PaymentScheduleHistory.objects.create(
                 payment_schedule=schedule,
                 action='created',
                 user=request.user,
-                description=f'Payment schedule created with {installment_count} installments'
+                description=f'Payment schedule created with {schedule.installment_count} installments'
             )
             
             messages.success(request, f'Payment schedule {schedule.schedule_number} created successfully.')
@@ -262,6 +259,10 @@ def schedule_update(request, schedule_id):
             schedule.updated_by = request.user
             schedule.save()
             
+            # Rebuild the installments when the plan changed and nothing has been paid on them yet
+            if PLAN_FIELDS.intersection(form.changed_data):
+                generate_installments([schedule], replace=True)
+            
             # Create history entry
             if old_status != schedule.status:
                 PaymentScheduleHistory.objects.create(
@@ -473,6 +474,14 @@ def report_list(request):
             total_overdue=Sum('outstanding_amount'),
             count=Count('id')
         )
+    elif report_type == 'cash_projection':
+        try:
+            weeks = min(max(int(request.GET.get('weeks', 12)), 1), 52)
+        except ValueError:
+            weeks = 12
+        report_data = weekly_cash_projection(weeks=weeks, currency=request.GET.get('currency') or None)
+    else:
+        report_data = None
     
     context = {
         'report_type': report_type,
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PettyCashDay, PettyCashEntry, PettyCashBalance, PettyCashAudit
+from .models import PettyCashDay, PettyCashEntry, PettyCashBalance, PettyCashDailyBalance, PettyCashAudit
 
 class PettyCashEntryInline(admin.TabularInline):
     model = PettyCashEntry
@@ -76,6 +76,15 @@ class PettyCashBalanceAdmin(admin.ModelAdmin):
     search_fields = ['location']
     readonly_fields = ['last_updated']
 
+@admin.register(PettyCashDailyBalance)
+class PettyCashDailyBalanceAdmin(admin.ModelAdmin):
+    list_display = ['balance_date', 'total_debit', 'total_credit', 'closing_balance', 'updated_at']
+    date_hierarchy = 'balance_date'
+    readonly_fields = ['balance_date', 'total_debit', 'total_credit', 'closing_balance', 'updated_at']
+    
+    def has_add_permission(self, request):
+        return False  # Checkpoints are maintained from ledger postings
+
 @admin.register(PettyCashAudit)
 class PettyCashAuditAdmin(admin.ModelAdmin):
     list_display = ['petty_cash_day', 'action', 'user', 'timestamp']
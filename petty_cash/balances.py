@@ -0,0 +1,222 @@
+"""
+Balance maintenance for petty cash.
+
+Two balances are kept up to date with F() expression deltas in the same
+database transaction as the document that changes them:
+
+- The petty cash ledger balance (posted DR - CR on account 1000), stored as
+  PettyCashBalance.current_balance plus one PettyCashDailyBalance checkpoint
+  per posting date holding that day's closing balance. The balance on any
+  date is a single indexed lookup of the latest checkpoint on or before it.
+- PettyCashDay.total_expenses / closing_balance, moved by each entry's amount.
+
+Ledger bulk operations (queryset .update()/.delete()) skip signals, so the
+stored figures can drift; find_drift / fix_drift rebuild them from source.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum, Q, Value, DecimalField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from ledger.models import Ledger
+from multi_currency.models import Currency
+from .models import PettyCashBalance, PettyCashDailyBalance, PettyCashDay, PettyCashEntry
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+PETTY_CASH_ACCOUNT_CODE = '1000'
+DEFAULT_LOCATION = 'Main Office'
+
+
+def ledger_contribution(account_code, status, entry_type, amount):
+    """(debit, credit) a ledger entry adds to the petty cash balance"""
+    if account_code != PETTY_CASH_ACCOUNT_CODE or status != 'POSTED' or not amount:
+        return ZERO, ZERO
+    return (amount, ZERO) if entry_type == 'DR' else (ZERO, amount)
+
+
+def _apply_current_balance(delta):
+    """Move the location balance; the row lock serializes petty cash postings"""
+    updated = PettyCashBalance.objects.filter(location=DEFAULT_LOCATION).update(
+        current_balance=F('current_balance') + delta
+    )
+    if updated:
+        return
+    currency_id = Currency.objects.filter(is_base_currency=True).values_list('pk', flat=True).first() or \
+        Currency.objects.filter(is_active=True).values_list('pk', flat=True).first()
+    if currency_id is None:
+        logger.warning('No currency configured, petty cash balance row not created')
+        return
+    balance, created = PettyCashBalance.objects.get_or_create(
+        location=DEFAULT_LOCATION,
+        currency_id=currency_id,
+        defaults={'current_balance': delta}
+    )
+    if not created:
+        PettyCashBalance.objects.filter(pk=balance.pk).update(current_balance=F('current_balance') + delta)
+
+
+def apply_ledger_delta(entry_date, debit, credit):
+    """Apply a change in posted petty cash debits/credits on entry_date"""
+    delta = debit - credit
+    if not debit and not credit:
+        return
+    with transaction.atomic():
+        _apply_current_balance(delta)
+
+        updated = PettyCashDailyBalance.objects.filter(balance_date=entry_date).update(
+            total_debit=F('total_debit') + debit,
+            total_credit=F('total_credit') + credit,
+        )
+        if not updated:
+            # The new checkpoint opens at the previous one's closing balance, locked so it cannot move meanwhile
+            opening = PettyCashDailyBalance.objects.select_for_update().filter(
+                balance_date__lt=entry_date
+            ).order_by('-balance_date').values_list('closing_balance', flat=True).first() or ZERO
+            # A concurrent posting may insert the same date first; its row is then used as is
+            PettyCashDailyBalance.objects.bulk_create([PettyCashDailyBalance(
+                balance_date=entry_date,
+                total_debit=ZERO,
+                total_credit=ZERO,
+                # The delta itself is added by the range update below
+                closing_balance=opening,
+            )], ignore_conflicts=True)
+            PettyCashDailyBalance.objects.filter(balance_date=entry_date).update(
+                total_debit=F('total_debit') + debit,
+                total_credit=F('total_credit') + credit,
+            )
+        # A backdated posting moves the closing balance of every later checkpoint
+        PettyCashDailyBalance.objects.filter(balance_date__gte=entry_date).update(
+            closing_balance=F('closing_balance') + delta
+        )
+        # Drop a checkpoint once all postings on its date are gone
+        PettyCashDailyBalance.objects.filter(balance_date=entry_date, total_debit=0, total_credit=0).delete()
+
+
+def balance_as_of(as_of=None):
+    """Petty cash ledger balance at the end of as_of (or including all postings)"""
+    checkpoints = PettyCashDailyBalance.objects.order_by('-balance_date')
+    if as_of is not None:
+        checkpoints = checkpoints.filter(balance_date__lte=as_of)
+    return checkpoints.values_list('closing_balance', flat=True).first() or ZERO
+
+
+def apply_day_expense_delta(petty_cash_day_id, delta):
+    """Move a day's expense total and closing balance by delta"""
+    if not delta:
+        return
+    PettyCashDay.objects.filter(pk=petty_cash_day_id).update(
+        total_expenses=F('total_expenses') + delta,
+        closing_balance=F('closing_balance') - delta,
+    )
+
+
+def _ledger_daily_totals():
+    decimal = DecimalField(max_digits=15, decimal_places=2)
+    return (
+        Ledger.objects.filter(account__account_code=PETTY_CASH_ACCOUNT_CODE, status='POSTED')
+        .order_by('entry_date')
+        .values('entry_date')
+        .annotate(
+            debit=Coalesce(Sum('amount', filter=Q(entry_type='DR')), Value(ZERO), output_field=decimal),
+            credit=Coalesce(Sum('amount', filter=Q(entry_type='CR')), Value(ZERO), output_field=decimal),
+        )
+    )
+
+
+def expected_checkpoints():
+    """Checkpoints recomputed from posted ledger entries, keyed by date"""
+    expected = {}
+    closing = ZERO
+    for row in _ledger_daily_totals():
+        closing += row['debit'] - row['credit']
+        expected[row['entry_date']] = (row['debit'], row['credit'], closing)
+    return expected
+
+
+def _day_drift():
+    decimal = DecimalField(max_digits=15, decimal_places=2)
+    entry_totals = PettyCashEntry.objects.filter(
+        petty_cash_day=OuterRef('pk')
+    ).order_by().values('petty_cash_day').annotate(total=Sum('amount')).values('total')
+    days = PettyCashDay.objects.annotate(
+        expected_expenses=Coalesce(Subquery(entry_totals, output_field=decimal), Value(ZERO), output_field=decimal)
+    ).order_by('entry_date')
+    return [
+        (day, day.total_expenses, day.expected_expenses)
+        for day in days
+        if day.total_expenses != day.expected_expenses or
+        day.closing_balance != day.opening_balance - day.expected_expenses
+    ]
+
+
+def find_drift():
+    """Compare stored balances with source documents.
+
+    Returns a dict with 'checkpoints' [(date, stored closing or None, expected
+    closing or None)], 'balance' (stored, expected) or None, and 'days'
+    [(day, stored expenses, expected expenses)].
+    """
+    expected = expected_checkpoints()
+    stored = {
+        row.balance_date: (row.total_debit, row.total_credit, row.closing_balance)
+        for row in PettyCashDailyBalance.objects.all()
+    }
+    checkpoints = [
+        (balance_date,
+         stored[balance_date][2] if balance_date in stored else None,
+         expected[balance_date][2] if balance_date in expected else None)
+        for balance_date in sorted(set(expected) | set(stored))
+        if stored.get(balance_date) != expected.get(balance_date)
+    ]
+
+    expected_balance = list(expected.values())[-1][2] if expected else ZERO
+    stored_balance = PettyCashBalance.objects.filter(location=DEFAULT_LOCATION).aggregate(
+        total=Sum('current_balance')
+    )['total'] or ZERO
+    balance = (stored_balance, expected_balance) if stored_balance != expected_balance else None
+
+    return {'checkpoints': checkpoints, 'balance': balance, 'days': _day_drift()}
+
+
+def fix_drift():
+    """Rebuild drifted checkpoints, the location balance and day totals. Returns the drift fixed."""
+    drift = find_drift()
+    with transaction.atomic():
+        if drift['balance']:
+            stored, expected = drift['balance']
+            _apply_current_balance(expected - stored)
+
+        if drift['checkpoints']:
+            expected = expected_checkpoints()
+            PettyCashDailyBalance.objects.exclude(balance_date__in=list(expected)).delete()
+            existing = {row.balance_date: row for row in PettyCashDailyBalance.objects.all()}
+            to_create, to_update = [], []
+            for balance_date, (debit, credit, closing) in expected.items():
+                row = existing.get(balance_date)
+                if row is None:
+                    to_create.append(PettyCashDailyBalance(
+                        balance_date=balance_date, total_debit=debit, total_credit=credit, closing_balance=closing
+                    ))
+                elif (row.total_debit, row.total_credit, row.closing_balance) != (debit, credit, closing):
+                    row.total_debit, row.total_credit, row.closing_balance = debit, credit, closing
+                    to_update.append(row)
+            PettyCashDailyBalance.objects.bulk_create(to_create, batch_size=1000)
+            PettyCashDailyBalance.objects.bulk_update(
+                to_update, ['total_debit', 'total_credit', 'closing_balance'], batch_size=1000
+            )
+
+        for day, stored, expected in drift['days']:
+            PettyCashDay.objects.filter(pk=day.pk).update(
+                total_expenses=expected,
+                closing_balance=F('opening_balance') - expected,
+            )
+
+    logger.info(
+        f"Fixed petty cash drift: {len(drift['checkpoints'])} checkpoints, "
+        f"{len(drift['days'])} days, balance {'reset' if drift['balance'] else 'ok'}"
+    )
+    return drift
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from petty_cash.balances import find_drift, fix_drift
+
+
+class Command(BaseCommand):
+    help = 'Report (and optionally fix) petty cash balances and checkpoints that drifted from the ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rebuild drifted checkpoints, the petty cash balance and day totals'
+        )
+
+    def handle(self, *args, **options):
+        drift = fix_drift() if options['fix'] else find_drift()
+        issues = len(drift['checkpoints']) + len(drift['days']) + (1 if drift['balance'] else 0)
+        
+        if not issues:
+            self.stdout.write(self.style.SUCCESS('Petty cash balances match the ledger and entries'))
+            return
+        
+        for balance_date, stored, expected in drift['checkpoints']:
+            self.stdout.write(f'Checkpoint {balance_date}: stored {stored}, expected {expected}')
+        if drift['balance']:
+            stored, expected = drift['balance']
+            self.stdout.write(f'Current balance: stored {stored:,.2f}, expected {expected:,.2f}')
+        for day, stored, expected in drift['days']:
+            self.stdout.write(f'Day {day.entry_date}: stored expenses {stored:,.2f}, expected {expected:,.2f}')
+        
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {issues} petty cash balance issues'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{issues} petty cash balance issues found; run with --fix to repair'))
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-18 21:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('petty_cash', '0003_merge_20250825_1147'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PettyCashDailyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance_date', models.DateField(unique=True)),
+                ('total_debit', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('total_credit', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('closing_balance', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Petty Cash Daily Balance',
+                'verbose_name_plural': 'Petty Cash Daily Balances',
+                'ordering': ['-balance_date'],
+            },
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from django.utils import timezone
@@ -45,6 +45,20 @@ class PettyCashDay(models.Model):
         return f"Petty Cash - {self.entry_date.strftime('%Y-%m-%d')} - {self.get_status_display()}"
     
     def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('update_fields'):
+            # total_expenses is maintained by entry deltas (see balances.py), so
+            # don't write back a stale copy; derive the closing balance in SQL
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('total_expenses', 'closing_balance')
+            ]
+            super().save(*args, **kwargs)
+            PettyCashDay.objects.filter(pk=self.pk).update(
+                closing_balance=models.F('opening_balance') - models.F('total_expenses')
+            )
+            self.refresh_from_db(fields=['total_expenses', 'closing_balance'])
+            return
+        
         # Auto-calculate closing balance
         # Ensure both values are Decimal to prevent type errors
         opening_balance = Decimal(str(self.opening_balance)) if self.opening_balance is not None else Decimal('0.00')
@@ -65,11 +79,12 @@ class PettyCashDay(models.Model):
         return self.status == 'approved' and not self.is_locked
     
     def update_totals(self):
-        """Update total expenses from entries"""
+        """Recompute total expenses from entries (entry saves apply deltas instead)"""
         total = self.entries.aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
         # Ensure total is always a Decimal to prevent type errors
         self.total_expenses = Decimal(str(total)) if total is not None else Decimal('0.00')
-        self.save()
+        self.closing_balance = Decimal(str(self.opening_balance or 0)) - self.total_expenses
+        self.save(update_fields=['total_expenses', 'closing_balance', 'updated_at'])
     
     def get_previous_day_balance(self):
         """Get closing balance from previous day"""
@@ -113,10 +128,35 @@ class PettyCashEntry(models.Model):
     def __str__(self):
         return f"{self.petty_cash_day.entry_date} - {self.description} - {self.amount}"
     
+    # Stored amount and day, so save() moves the day totals by the change
+    _original_amount = None
+    _original_day_id = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Deferred fields are left unset rather than loaded here
+        instance._original_amount = instance.__dict__.get('amount')
+        instance._original_day_id = instance.__dict__.get('petty_cash_day_id')
+        return instance
+    
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update day totals
-        self.petty_cash_day.update_totals()
+        from .balances import apply_day_expense_delta
+        with transaction.atomic():
+            if not self._state.adding and (self._original_amount is None or self._original_day_id is None):
+                self._original_amount, self._original_day_id = PettyCashEntry.objects.filter(
+                    pk=self.pk
+                ).values_list('amount', 'petty_cash_day_id').first() or (None, None)
+            super().save(*args, **kwargs)
+            # Update day totals by the change in this entry
+            if self._original_day_id and self._original_day_id != self.petty_cash_day_id:
+                apply_day_expense_delta(self._original_day_id, -self._original_amount)
+                apply_day_expense_delta(self.petty_cash_day_id, self.amount)
+            else:
+                apply_day_expense_delta(self.petty_cash_day_id, self.amount - (self._original_amount or 0))
+        self._original_amount = self.amount
+        self._original_day_id = self.petty_cash_day_id
+        self.petty_cash_day.refresh_from_db(fields=['total_expenses', 'closing_balance'])
 
 
 class PettyCashBalance(models.Model):
@@ -144,6 +184,24 @@ class PettyCashBalance(models.Model):
         self.save()
 
 
+class PettyCashDailyBalance(models.Model):
+    """Daily closing checkpoint of the petty cash ledger balance"""
+    
+    balance_date = models.DateField(unique=True)
+    total_debit = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    total_credit = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    closing_balance = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-balance_date']
+        verbose_name = 'Petty Cash Daily Balance'
+        verbose_name_plural = 'Petty Cash Daily Balances'
+    
+    def __str__(self):
+        return f"{self.balance_date.strftime('%Y-%m-%d')} - {self.closing_balance}"
+
+
 class PettyCashAudit(models.Model):
     """Audit trail for petty cash operations"""
     
@@ -1,3 +1,112 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from chart_of_accounts.models import AccountType, ChartOfAccount
+from company.company_model import Company
+from fiscal_year.models import FiscalYear
+from ledger.models import Ledger
+from multi_currency.models import Currency
+from .balances import balance_as_of, find_drift, fix_drift
+from .models import PettyCashBalance, PettyCashDailyBalance, PettyCashDay, PettyCashEntry
+
+
+class PettyCashBalanceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.company = Company.objects.create(
+            name='Test Company', code='TST', address='1 Test Street', phone='1234567', email='info@example.com'
+        )
+        currency = Currency.objects.create(code='AED', name='UAE Dirham', symbol='AED', is_base_currency=True)
+        self.fiscal_year = FiscalYear.objects.create(
+            name='FY2025', start_date=date(2025, 1, 1), end_date=date(2025, 12, 31), status='active'
+        )
+        asset_type = AccountType.objects.create(name='Assets', category='ASSET')
+        self.petty_cash = ChartOfAccount.objects.create(
+            account_code='1000', name='Petty Cash', account_type=asset_type, currency=currency, company=self.company
+        )
+        self.bank = ChartOfAccount.objects.create(
+            account_code='1100', name='Bank', account_type=asset_type, currency=currency, company=self.company
+        )
+
+    def post(self, day, entry_type, amount, account=None):
+        return Ledger.objects.create(
+            entry_date=date(2025, 1, day), description='Petty cash', account=account or self.petty_cash,
+            entry_type=entry_type, amount=Decimal(amount), status='POSTED', company=self.company,
+            fiscal_year=self.fiscal_year, created_by=self.user
+        )
+
+    def current_balance(self):
+        return PettyCashBalance.objects.get(location='Main Office').current_balance
+
+    def test_balance_as_of_any_date(self):
+        self.post(5, 'DR', '1000.00')
+        self.post(8, 'CR', '150.00')
+        self.post(8, 'CR', '50.00')
+        self.post(8, 'DR', '999.00', account=self.bank)
+
+        self.assertEqual(balance_as_of(date(2025, 1, 4)), Decimal('0.00'))
+        self.assertEqual(balance_as_of(date(2025, 1, 6)), Decimal('1000.00'))
+        self.assertEqual(balance_as_of(date(2025, 1, 31)), Decimal('800.00'))
+        self.assertEqual(self.current_balance(), Decimal('800.00'))
+
+    def test_backdated_edit_and_delete_move_later_checkpoints(self):
+        self.post(5, 'DR', '1000.00')
+        expense = self.post(10, 'CR', '100.00')
+        refill = self.post(3, 'DR', '200.00')
+
+        self.assertEqual(balance_as_of(date(2025, 1, 10)), Decimal('1100.00'))
+
+        expense.entry_date = date(2025, 1, 4)
+        expense.save()
+        self.assertEqual(balance_as_of(date(2025, 1, 4)), Decimal('100.00'))
+        self.assertFalse(PettyCashDailyBalance.objects.filter(balance_date=date(2025, 1, 10)).exists())
+
+        refill.delete()
+        self.assertEqual(balance_as_of(date(2025, 1, 31)), Decimal('900.00'))
+        self.assertEqual(self.current_balance(), Decimal('900.00'))
+        drift = find_drift()
+        self.assertEqual((drift['checkpoints'], drift['balance'], drift['days']), ([], None, []))
+
+    def test_day_totals_follow_entries(self):
+        day = PettyCashDay.objects.create(entry_date=date(2025, 1, 6), opening_balance=Decimal('500.00'),
+                                          created_by=self.user)
+        taxi = PettyCashEntry.objects.create(petty_cash_day=day, description='Taxi', amount=Decimal('40.00'),
+                                             created_by=self.user)
+        PettyCashEntry.objects.create(petty_cash_day=day, description='Stationery', amount=Decimal('60.00'),
+                                      created_by=self.user)
+
+        taxi.amount = Decimal('45.00')
+        taxi.save()
+        day.refresh_from_db()
+        self.assertEqual((day.total_expenses, day.closing_balance), (Decimal('105.00'), Decimal('395.00')))
+
+        taxi.delete()
+        day.refresh_from_db()
+        self.assertEqual((day.total_expenses, day.closing_balance), (Decimal('60.00'), Decimal('440.00')))
+
+    def test_fix_drift_rebuilds_from_the_ledger(self):
+        self.post(5, 'DR', '1000.00')
+        self.post(9, 'CR', '300.00')
+        day = PettyCashDay.objects.create(entry_date=date(2025, 1, 9), opening_balance=Decimal('1000.00'),
+                                          created_by=self.user)
+        PettyCashEntry.objects.create(petty_cash_day=day, description='Courier', amount=Decimal('300.00'),
+                                      created_by=self.user)
+        # Bulk operations skip the signals
+        Ledger.objects.filter(entry_type='CR').update(amount=Decimal('350.00'))
+        PettyCashDay.objects.filter(pk=day.pk).update(total_expenses=0)
+
+        drift = find_drift()
+        self.assertEqual(drift['checkpoints'], [(date(2025, 1, 9), Decimal('700.00'), Decimal('650.00'))])
+        self.assertEqual(drift['balance'], (Decimal('700.00'), Decimal('650.00')))
+        self.assertEqual(len(drift['days']), 1)
+
+        fix_drift()
+        self.assertEqual(balance_as_of(), Decimal('650.00'))
+        self.assertEqual(self.current_balance(), Decimal('650.00'))
+        day.refresh_from_db()
+        self.assertEqual(day.closing_balance, Decimal('700.00'))
+        drift = find_drift()
+        self.assertEqual((drift['checkpoints'], drift['balance'], drift['days']), ([], None, []))
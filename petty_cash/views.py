@@ -10,11 +10,11 @@ from django.forms import formset_factory
 from django.db import transaction
 from django.template.loader import get_template
 from .models import PettyCashDay, PettyCashEntry, PettyCashBalance, PettyCashAudit
+from .balances import balance_as_of
 from .forms import PettyCashDayForm, PettyCashEntryForm, PettyCashEntryFormSet, PettyCashFilterForm, QuickEntryForm
 from multi_currency.models import Currency
 from general_journal.models import JournalEntry, JournalEntryLine
 from chart_of_accounts.models import ChartOfAccount
-from ledger.models import Ledger
 from decimal import Decimal
 from django.db.models import Q, Sum
 import openpyxl
@@ -30,30 +30,9 @@ except ImportError:
     WEASYPRINT_AVAILABLE = False
 
 
-def get_petty_cash_ledger_balance():
-    """Calculate actual petty cash balance from ledger entries"""
-    # Get the main petty cash account (1000)
-    try:
-        petty_cash_account = ChartOfAccount.objects.get(account_code='1000')
-        
-        # Calculate balance for the main petty cash account (Debits - Credits for asset accounts)
-        debits = Ledger.objects.filter(
-            account=petty_cash_account,
-            status='POSTED',
-            entry_type='DR'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        
-        credits = Ledger.objects.filter(
-            account=petty_cash_account,
-            status='POSTED',
-            entry_type='CR'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        
-        balance = debits - credits
-        return balance
-        
-    except ChartOfAccount.DoesNotExist:
-        return Decimal('0.00')
+def get_petty_cash_ledger_balance(as_of=None):
+    """Petty cash balance from the ledger, read from the daily checkpoints"""
+    return balance_as_of(as_of)
 
 @login_required
 def petty_cash_register(request):
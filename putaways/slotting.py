@@ -0,0 +1,499 @@
+"""
+Putaway slotting engine.
+
+Suggests storage locations for every open line of a GRN in one pass. The
+facility's storable locations are loaded once into an in-memory capacity
+snapshot (remaining volume and weight, the customers and SKUs already stored
+there, and a travel distance from the dock), and every candidate location is
+scored for a line with vectorized NumPy arithmetic. The snapshot is updated
+after each placement, so later lines see the space taken by earlier ones and
+a 500-line GRN costs the same handful of queries as a single line.
+
+A location is scored on:
+  - capacity fit: it must hold the line's volume and weight; tighter fits
+    are preferred to keep large locations free for large loads
+  - affinity: the same SKU in the location or its aisle, and the same
+    customer in its zone
+  - velocity: fast movers (class A by recent outbound picks) go close to the
+    dock and slow movers (class C) further away
+  - mixing: locations holding another customer's stock are avoided
+
+Lines that fit in no single location are split across the best locations
+with space left; whatever still does not fit is reported as unplaced.
+"""
+import logging
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal, ROUND_DOWN
+
+import numpy as np
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import Putaway
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 1000
+ZERO = Decimal('0.00')
+
+# Location types that never hold stock
+NON_STORAGE_TYPES = ('loading_dock', 'office_area', 'parking_area', 'maintenance_area', 'security_area')
+# Putaways that still occupy their target location before they post stock
+OPEN_PUTAWAY_STATUSES = ('pending', 'in_progress')
+
+VELOCITY_WINDOW_DAYS = 90
+# Cumulative share of outbound picks covered by class A and by classes A + B
+VELOCITY_A_SHARE = 0.8
+VELOCITY_B_SHARE = 0.95
+
+WEIGHT_SKU_HERE = 4.0
+WEIGHT_SKU_NEAR = 2.0
+WEIGHT_CUSTOMER_NEAR = 1.5
+WEIGHT_VELOCITY = 2.0
+WEIGHT_FIT = 1.0
+WEIGHT_OTHER_CUSTOMER = 2.0
+
+
+def _number(value, default=0):
+    """First integer in a location path component ('A-12' -> 12)"""
+    match = re.search(r'\d+', value or '')
+    return int(match.group()) if match else default
+
+
+def _floor_number(value):
+    """Floors away from the ground: G -> 0, 2 -> 2, B1 -> 1"""
+    value = (value or '').strip().upper()
+    if not value or value in ('G', 'GF', 'GROUND'):
+        return 0
+    return _number(value)
+
+
+def _path_distance(location):
+    """Travel estimate from the location hierarchy when there are no coordinates.
+
+    Changing floor dominates, then walking down aisles and bays; higher rack
+    levels add reach-truck time.
+    """
+    return (
+        _floor_number(location['floor_level']) * 100
+        + _number(location['aisle_number'] or location['rack_number']) * 4
+        + _number(location['bay_number'])
+        + _number(location['level_number']) * 2
+    )
+
+
+def _rank(values):
+    """Percentile rank of each value in [0, 1], ties sharing the lowest rank"""
+    if len(values) < 2:
+        return np.zeros(len(values))
+    order = np.unique(values, return_inverse=True)[1]
+    return order / max(order.max(), 1)
+
+
+@dataclass
+class SlotLine:
+    """A GRN line still waiting to be put away"""
+    grn_item_id: int
+    item_id: int
+    item_code: str
+    item_name: str
+    quantity: Decimal
+    unit_volume: float
+    unit_weight: float
+    velocity: str = 'C'
+
+    @property
+    def volume(self):
+        return float(self.quantity) * self.unit_volume
+
+    @property
+    def weight(self):
+        return float(self.quantity) * self.unit_weight
+
+
+@dataclass
+class SlotSuggestion:
+    line: SlotLine
+    location_id: int
+    location_code: str
+    location_path: str
+    quantity: Decimal
+    score: float
+    reasons: list = field(default_factory=list)
+
+    @property
+    def volume(self):
+        return float(self.quantity) * self.line.unit_volume
+
+    @property
+    def weight(self):
+        return float(self.quantity) * self.line.unit_weight
+
+
+@dataclass
+class SlottingResult:
+    grn: object
+    suggestions: list
+    unplaced: list
+
+    @property
+    def placed_quantity(self):
+        return sum((s.quantity for s in self.suggestions), ZERO)
+
+    @property
+    def unplaced_quantity(self):
+        return sum((quantity for _, quantity in self.unplaced), ZERO)
+
+
+class CapacitySnapshot:
+    """Remaining capacity, contents and distance of a facility's storable locations.
+
+    Locations without a capacity or maximum weight are treated as
+    unconstrained on that dimension.
+    """
+
+    LOCATION_FIELDS = [
+        'id', 'location_code', 'location_name', 'location_type', 'capacity', 'max_weight',
+        'current_utilization', 'reserved_capacity', 'floor_level', 'section', 'zone',
+        'rack_number', 'aisle_number', 'bay_number', 'level_number', 'x_coordinate', 'y_coordinate',
+    ]
+
+    def __init__(self, facility_id):
+        FacilityLocation = apps.get_model('facility', 'FacilityLocation')
+        self.facility_id = facility_id
+        locations = list(
+            FacilityLocation.objects.filter(facility_id=facility_id, status='active')
+            .exclude(location_type__in=NON_STORAGE_TYPES)
+            .order_by('location_code')
+            .values(*self.LOCATION_FIELDS)
+        )
+        self.locations = locations
+        self.index = {location['id']: position for position, location in enumerate(locations)}
+        size = len(locations)
+
+        capacity = np.array([float(l['capacity']) if l['capacity'] else np.inf for l in locations])
+        max_weight = np.array([float(l['max_weight']) * 1000 if l['max_weight'] else np.inf for l in locations])
+        utilization = np.array([float(l['current_utilization'] or 0) for l in locations])
+        reserved = np.array([float(l['reserved_capacity'] or 0) for l in locations])
+        used_volume, used_weight = self._stored_load(size)
+        with np.errstate(invalid='ignore'):
+            stated_volume = np.where(np.isfinite(capacity), capacity * utilization / 100, 0)
+            usable = np.where(np.isfinite(capacity), capacity * (100 - reserved) / 100, np.inf)
+        self.remaining_volume = np.maximum(usable - np.maximum(stated_volume, used_volume), 0)
+        self.remaining_weight = np.maximum(max_weight - used_weight, 0)
+
+        self.distance = self._distances(FacilityLocation)
+        aisle_keys = [(l['floor_level'], l['section'], l['zone'], l['aisle_number'] or l['rack_number']) for l in locations]
+        zone_keys = [(l['floor_level'], l['section'], l['zone']) for l in locations]
+        self.aisle_group = np.array(self._group_ids(aisle_keys), dtype=np.int64).reshape(size)
+        self.zone_group = np.array(self._group_ids(zone_keys), dtype=np.int64).reshape(size)
+
+        self.item_locations = defaultdict(set)
+        self.customer_locations = defaultdict(set)
+        self.customer_count = np.zeros(size, dtype=np.int64)
+        self._load_contents()
+
+    @staticmethod
+    def _group_ids(keys):
+        ids = {}
+        return [ids.setdefault(key, len(ids)) for key in keys]
+
+    def _stored_load(self, size):
+        """Volume and weight (kg) per location held as stock on hand or by open putaways"""
+        StockOnHand = apps.get_model('stock_transfer', 'StockOnHand')
+        used_volume = np.zeros(size)
+        used_weight = np.zeros(size)
+        loads = [
+            StockOnHand.objects.filter(location__in=self.index, quantity__gt=0).values('location_id').annotate(
+                volume=Sum(F('quantity') * F('item__cbm')), weight=Sum(F('quantity') * F('item__gross_weight'))
+            ).order_by().values_list('location_id', 'volume', 'weight'),
+            Putaway.objects.filter(location__in=self.index, status__in=OPEN_PUTAWAY_STATUSES).values('location_id').annotate(
+                volume=Sum(F('quantity') * F('item__cbm')), weight=Sum(F('quantity') * F('item__gross_weight'))
+            ).order_by().values_list('location_id', 'volume', 'weight'),
+        ]
+        for rows in loads:
+            for location_id, volume, weight in rows:
+                used_volume[self.index[location_id]] += float(volume or 0)
+                used_weight[self.index[location_id]] += float(weight or 0)
+        return used_volume, used_weight
+
+    def _distances(self, FacilityLocation):
+        """Normalized travel distance from the dock, 0 nearest and 1 furthest"""
+        locations = self.locations
+        if not locations:
+            return np.zeros(0)
+        if all(l['x_coordinate'] is not None and l['y_coordinate'] is not None for l in locations):
+            docks = FacilityLocation.objects.filter(
+                facility_id=self.facility_id, location_type='loading_dock',
+                x_coordinate__isnull=False, y_coordinate__isnull=False,
+            ).values_list('x_coordinate', 'y_coordinate')
+            docks = np.array([[float(x), float(y)] for x, y in docks]).reshape(-1, 2)
+            points = np.array([[float(l['x_coordinate']), float(l['y_coordinate'])] for l in locations])
+            if len(docks):
+                # Manhattan distance along the aisles to the closest dock
+                raw = np.abs(points[:, None, :] - docks[None, :, :]).sum(axis=2).min(axis=1)
+            else:
+                raw = np.abs(points).sum(axis=1)
+        else:
+            raw = np.array([_path_distance(l) for l in locations], dtype=float)
+        return _rank(raw)
+
+    def _load_contents(self):
+        """Which customers and SKUs are already in which locations"""
+        StockOnHand = apps.get_model('stock_transfer', 'StockOnHand')
+        contents = set(
+            StockOnHand.objects.filter(location__in=self.index, quantity__gt=0)
+            .values_list('location_id', 'item_id', 'customer_id').distinct()
+        )
+        contents |= set(
+            Putaway.objects.filter(location__in=self.index, status__in=OPEN_PUTAWAY_STATUSES)
+            .values_list('location_id', 'item_id', 'grn__customer_id').distinct()
+        )
+        for location_id, item_id, customer_id in contents:
+            self.add_contents(self.index[location_id], item_id, customer_id)
+
+    def add_contents(self, position, item_id, customer_id):
+        self.item_locations[item_id].add(position)
+        if customer_id is not None and position not in self.customer_locations[customer_id]:
+            self.customer_locations[customer_id].add(position)
+            self.customer_count[position] += 1
+
+    def take(self, position, volume, weight):
+        self.remaining_volume[position] = max(self.remaining_volume[position] - volume, 0)
+        self.remaining_weight[position] = max(self.remaining_weight[position] - weight, 0)
+
+    def __len__(self):
+        return len(self.locations)
+
+
+def velocity_classes(item_ids, facility_id, days=VELOCITY_WINDOW_DAYS):
+    """ABC class per item id from outbound picks in the facility over the last `days` days"""
+    StockLedger = apps.get_model('stock_transfer', 'StockLedger')
+    since = timezone.now().date() - timedelta(days=days)
+    picks = sorted(
+        StockLedger.objects.filter(
+            facility_id=facility_id, movement_type='out', movement_date__gte=since, quantity_out__gt=0
+        ).values('item_id').annotate(picks=Count('id')).order_by().values_list('picks', 'item_id'),
+        reverse=True,
+    )
+    classes = dict.fromkeys(item_ids, 'C')
+    total = sum(count for count, _ in picks)
+    running = 0
+    for count, item_id in picks:
+        # Classified by the share of picks covered before this item
+        share = running / total
+        running += count
+        if item_id in classes:
+            classes[item_id] = 'A' if share < VELOCITY_A_SHARE else 'B' if share < VELOCITY_B_SHARE else 'C'
+    return classes
+
+
+def open_lines(grn):
+    """GRN lines with the quantity not yet covered by a putaway, largest volume first"""
+    GRNItem = apps.get_model('grn', 'GRNItem')
+    covered = defaultdict(lambda: ZERO, Putaway.objects.filter(grn=grn).exclude(status='cancelled').values(
+        'item_id'
+    ).annotate(total=Sum('quantity')).order_by().values_list('item_id', 'total'))
+
+    lines = []
+    grn_items = GRNItem.objects.filter(grn=grn, item__isnull=False).select_related('item').order_by('id')
+    for grn_item in grn_items:
+        received = grn_item.received_qty or ZERO
+        # Existing putaways of an item are set against its GRN lines in order
+        used = min(covered[grn_item.item_id], received)
+        covered[grn_item.item_id] -= used
+        quantity = received - used
+        if quantity <= 0:
+            continue
+        item = grn_item.item
+        unit_volume = float(item.cbm) if item.cbm else float(grn_item.volume or 0) / float(received)
+        unit_weight = float(item.gross_weight or item.weight or 0) or float(grn_item.gross_weight or 0) / float(received)
+        lines.append(SlotLine(
+            grn_item_id=grn_item.pk,
+            item_id=item.pk,
+            item_code=item.item_code,
+            item_name=item.item_name,
+            quantity=quantity,
+            unit_volume=unit_volume,
+            unit_weight=unit_weight,
+        ))
+    lines.sort(key=lambda line: line.volume, reverse=True)
+    return lines
+
+
+def _score(snapshot, line, customer_id, fits_volume):
+    """Score of every location for a line and the reasons behind the main terms"""
+    size = len(snapshot)
+    sku_here = np.zeros(size, dtype=bool)
+    sku_here[list(snapshot.item_locations[line.item_id])] = True
+    sku_aisles = np.unique(snapshot.aisle_group[sku_here])
+    sku_near = np.isin(snapshot.aisle_group, sku_aisles) & ~sku_here
+
+    customer_here = np.zeros(size, dtype=bool)
+    customer_here[list(snapshot.customer_locations[customer_id])] = True
+    customer_zones = np.unique(snapshot.zone_group[customer_here])
+    customer_near = np.isin(snapshot.zone_group, customer_zones)
+    other_customer = (snapshot.customer_count - customer_here) > 0
+
+    if line.velocity == 'A':
+        velocity = 1 - snapshot.distance
+    elif line.velocity == 'C':
+        velocity = snapshot.distance
+    else:
+        velocity = 1 - np.abs(snapshot.distance - 0.5) * 2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fit = np.where(np.isfinite(snapshot.remaining_volume) & (snapshot.remaining_volume > 0),
+                       np.minimum(fits_volume / snapshot.remaining_volume, 1), 0)
+
+    score = (
+        WEIGHT_SKU_HERE * sku_here
+        + WEIGHT_SKU_NEAR * sku_near
+        + WEIGHT_CUSTOMER_NEAR * customer_near
+        + WEIGHT_VELOCITY * velocity
+        + WEIGHT_FIT * fit
+        - WEIGHT_OTHER_CUSTOMER * other_customer
+    )
+    return score, sku_here, sku_near, customer_near
+
+
+def _reasons(position, line, sku_here, sku_near, customer_near):
+    reasons = []
+    if sku_here[position]:
+        reasons.append('same SKU in location')
+    elif sku_near[position]:
+        reasons.append('same SKU in aisle')
+    if customer_near[position]:
+        reasons.append('customer stock in zone')
+    reasons.append(f'velocity {line.velocity}')
+    return reasons
+
+
+def _units(line, position, snapshot):
+    """Largest quantity of the line the location can still take"""
+    limits = [float(line.quantity)]
+    if line.unit_volume:
+        limits.append(snapshot.remaining_volume[position] / line.unit_volume)
+    if line.unit_weight:
+        limits.append(snapshot.remaining_weight[position] / line.unit_weight)
+    quantity = Decimal(str(min(limits))).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+    if _smallest_part(line) == 1:
+        quantity = quantity.to_integral_value(rounding=ROUND_DOWN)
+    return min(quantity, line.quantity)
+
+
+def _smallest_part(line):
+    """Whole-unit lines are only split into whole units"""
+    return Decimal('1') if line.quantity == line.quantity.to_integral_value() else Decimal('0.01')
+
+
+def _location_path(location):
+    """FacilityLocation.location_path for a snapshot row"""
+    parts = [
+        ('Floor', location['floor_level']), ('Section', location['section']), ('Zone', location['zone']),
+        ('Rack', location['rack_number']), ('Aisle', location['aisle_number']),
+        ('Bay', location['bay_number']), ('Level', location['level_number']),
+    ]
+    return " > ".join(f"{label} {value}" for label, value in parts if value) or "Main Area"
+
+
+def suggest_putaway(grn):
+    """Slot every open line of a GRN. Returns a SlottingResult; nothing is written."""
+    if not grn.facility_id:
+        raise ValueError(f'GRN {grn.grn_number} has no facility to slot into')
+
+    lines = open_lines(grn)
+    snapshot = CapacitySnapshot(grn.facility_id)
+    classes = velocity_classes({line.item_id for line in lines}, grn.facility_id)
+    for line in lines:
+        line.velocity = classes[line.item_id]
+
+    suggestions, unplaced = [], []
+    for line in lines:
+        remaining = line.quantity
+        while remaining > 0 and len(snapshot):
+            part = SlotLine(**{**line.__dict__, 'quantity': remaining})
+            score, sku_here, sku_near, customer_near = _score(snapshot, part, grn.customer_id, part.volume)
+            fits = (snapshot.remaining_volume >= part.volume) & (snapshot.remaining_weight >= part.weight)
+            if not fits.any():
+                # Split: place what the best location with room for part of the line can take
+                smallest = float(_smallest_part(part))
+                fits = (
+                    (snapshot.remaining_volume >= part.unit_volume * smallest)
+                    & (snapshot.remaining_weight >= part.unit_weight * smallest)
+                )
+            if not fits.any():
+                break
+            position = int(np.argmax(np.where(fits, score, -np.inf)))
+            quantity = _units(part, position, snapshot)
+            if quantity <= 0:
+                break
+
+            location = snapshot.locations[position]
+            suggestions.append(SlotSuggestion(
+                line=line,
+                location_id=location['id'],
+                location_code=location['location_code'],
+                location_path=_location_path(location),
+                quantity=quantity,
+                score=round(float(score[position]), 2),
+                reasons=_reasons(position, part, sku_here, sku_near, customer_near),
+            ))
+            snapshot.take(position, float(quantity) * line.unit_volume, float(quantity) * line.unit_weight)
+            snapshot.add_contents(position, line.item_id, grn.customer_id)
+            remaining -= quantity
+        if remaining > 0:
+            unplaced.append((line, remaining))
+
+    logger.info(
+        f'Slotted GRN {grn.grn_number}: {len(lines)} lines into {len(suggestions)} placements, '
+        f'{len(unplaced)} lines with unplaced quantity'
+    )
+    return SlottingResult(grn=grn, suggestions=suggestions, unplaced=unplaced)
+
+
+def _next_putaway_numbers(count):
+    """Putaway numbers continuing the PTW-000001 sequence Putaway.save uses"""
+    last = Putaway.objects.order_by('-id').values_list('putaway_number', flat=True).first()
+    start = int(last.split('-')[1]) + 1 if last else 1
+    return [f"PTW-{number:06d}" for number in range(start, start + count)]
+
+
+def create_putaways(result, user):
+    """Create pending putaways for a slotting result's suggestions. Returns the putaways created."""
+    GRNPallet = apps.get_model('grn', 'GRNPallet')
+    if not result.suggestions:
+        return []
+    pallets = {}
+    for item_id, pallet_no in GRNPallet.objects.filter(grn=result.grn, item__isnull=False).order_by(
+        'id'
+    ).values_list('item_id', 'pallet_no'):
+        pallets.setdefault(item_id, pallet_no)
+
+    with transaction.atomic():
+        # Locked so concurrent creates do not hand out the same numbers
+        list(Putaway.objects.select_for_update().order_by('-id').values_list('id', flat=True)[:1])
+        numbers = _next_putaway_numbers(len(result.suggestions))
+        putaways = [
+            Putaway(
+                putaway_number=number,
+                grn=result.grn,
+                item_id=suggestion.line.item_id,
+                quantity=suggestion.quantity,
+                pallet_id=pallets.get(suggestion.line.item_id, result.grn.grn_number),
+                location_id=suggestion.location_id,
+                status='pending',
+                notes=f"Slotted: {', '.join(suggestion.reasons)}",
+                created_by=user,
+            )
+            for number, suggestion in zip(numbers, result.suggestions)
+        ]
+        # Pending putaways post no stock movements, so skipping save() and signals is safe
+        Putaway.objects.bulk_create(putaways, batch_size=BULK_BATCH_SIZE)
+    logger.info(f'Created {len(putaways)} slotted putaways for GRN {result.grn.grn_number}')
+    return putaways
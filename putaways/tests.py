@@ -0,0 +1,93 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from customer.models import Customer
+from facility.models import Facility, FacilityLocation
+from grn.models import GRN, GRNItem
+from items.models import Item
+from .models import Putaway
+from .slotting import create_putaways, open_lines, suggest_putaway
+
+
+class PutawaySlottingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.customer = Customer.objects.create(customer_code='CUST001', customer_name='Test Customer')
+        self.facility = Facility.objects.create(
+            facility_code='WH01', facility_name='Main Warehouse', address='1 Dock Road',
+            city='Dubai', state='Dubai', postal_code='00000'
+        )
+        # 1 CBM and 10 kg per unit
+        self.item = Item.objects.create(
+            item_code='SKU-001', item_name='Test Item', barcode='1000000001',
+            cbm=Decimal('1.000'), gross_weight=Decimal('10.000')
+        )
+        self.grn = GRN.objects.create(
+            customer=self.customer, facility=self.facility, status='draft', created_by=self.user
+        )
+
+    def location(self, code, capacity, aisle='1'):
+        return FacilityLocation.objects.create(
+            facility=self.facility, location_code=code, location_name=code,
+            capacity=Decimal(capacity), aisle_number=aisle
+        )
+
+    def receive(self, quantity):
+        return GRNItem.objects.create(
+            grn=self.grn, item=self.item, item_code=self.item.item_code, received_qty=Decimal(quantity)
+        )
+
+    def test_line_goes_to_a_location_that_holds_it(self):
+        """Locations too small for the whole line are passed over while one fits"""
+        self.location('A-01', '5')
+        roomy = self.location('A-02', '50')
+        self.receive('20')
+
+        result = suggest_putaway(self.grn)
+
+        self.assertEqual([(s.location_id, s.quantity) for s in result.suggestions], [(roomy.pk, Decimal('20'))])
+        self.assertEqual(result.unplaced, [])
+
+    def test_line_is_split_and_remainder_reported(self):
+        self.location('A-01', '8')
+        self.location('A-02', '5')
+        self.receive('20')
+
+        result = suggest_putaway(self.grn)
+
+        self.assertEqual(sorted(s.quantity for s in result.suggestions), [Decimal('5'), Decimal('8')])
+        self.assertEqual(result.unplaced_quantity, Decimal('7'))
+
+    def test_open_putaways_take_space_and_cover_the_line(self):
+        location = self.location('A-01', '30')
+        self.receive('20')
+        Putaway.objects.create(
+            grn=self.grn, item=self.item, quantity=Decimal('12'), pallet_id='P1',
+            location=location, created_by=self.user
+        )
+
+        self.assertEqual([line.quantity for line in open_lines(self.grn)], [Decimal('8')])
+        result = suggest_putaway(self.grn)
+        self.assertEqual([s.quantity for s in result.suggestions], [Decimal('8')])
+        self.assertEqual(result.unplaced, [])
+
+    def test_create_putaways_continues_the_numbering(self):
+        self.location('A-01', '50')
+        self.receive('20')
+        Putaway.objects.create(
+            putaway_number='PTW-000007', grn=self.grn, item=self.item, quantity=Decimal('0'),
+            pallet_id='P1', location=FacilityLocation.objects.get(), status='cancelled', created_by=self.user
+        )
+
+        putaways = create_putaways(suggest_putaway(self.grn), self.user)
+
+        self.assertEqual([putaway.putaway_number for putaway in putaways], ['PTW-000008'])
+        self.assertEqual(Putaway.objects.filter(status='pending').count(), 1)
+        self.assertEqual(open_lines(self.grn), [])
+
+    def test_grn_without_facility_is_rejected(self):
+        self.grn.facility = None
+        with self.assertRaises(ValueError):
+            suggest_putaway(self.grn)
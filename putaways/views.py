@@ -1,4 +1,5 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
@@ -220,4 +221,72 @@ def putaway_status_update(request, pk):
         else:
             messages.error(request, 'Invalid status')
     
-    return redirect('putaways:putaway_detail', pk=putaway.pk) 
\ No newline at end of file
+    return redirect('putaways:putaway_detail', pk=putaway.pk)
+
+
+@login_required
+def putaway_slotting(request):
+    """Suggest locations for every open line of a GRN and create the putaways"""
+    from .slotting import suggest_putaway, create_putaways
+    
+    grn_id = request.POST.get('grn') or request.GET.get('grn')
+    grn = get_object_or_404(GRN, pk=grn_id) if grn_id else None
+    result = None
+    
+    if grn:
+        try:
+            result = suggest_putaway(grn)
+        except ValueError as e:
+            messages.error(request, str(e))
+    
+    if request.method == 'POST' and result:
+        putaways = create_putaways(result, request.user)
+        if putaways:
+            messages.success(request, f'Created {len(putaways)} putaways for GRN {grn.grn_number}.')
+        else:
+            messages.warning(request, f'GRN {grn.grn_number} has no lines that could be slotted.')
+        if result.unplaced:
+            messages.warning(request, f'{len(result.unplaced)} lines could not be fully placed: not enough location capacity.')
+        return redirect(f"{reverse('putaways:putaway_list')}?search={grn.grn_number}")
+    
+    context = {
+        'grn': grn,
+        'result': result,
+        'grns': GRN.objects.filter(status__in=['received', 'completed'], facility__isnull=False).order_by('-grn_date')[:200],
+    }
+    
+    return render(request, 'putaways/putaway_slotting.html', context)
+
+@login_required
+def suggest_locations(request, grn_id):
+    """AJAX endpoint to get slotting suggestions for a GRN"""
+    from .slotting import suggest_putaway
+    
+    grn = get_object_or_404(GRN, pk=grn_id)
+    try:
+        result = suggest_putaway(grn)
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+    
+    return JsonResponse({
+        'success': True,
+        'suggestions': [{
+            'item_id': suggestion.line.item_id,
+            'item_code': suggestion.line.item_code,
+            'quantity': float(suggestion.quantity),
+            'location_id': suggestion.location_id,
+            'location_code': suggestion.location_code,
+            'location_path': suggestion.location_path,
+            'velocity': suggestion.line.velocity,
+            'score': suggestion.score,
+            'reasons': suggestion.reasons,
+        } for suggestion in result.suggestions],
+        'unplaced': [{
+            'item_id': line.item_id,
+            'item_code': line.item_code,
+            'quantity': float(quantity),
+        } for line, quantity in result.unplaced],
+    })
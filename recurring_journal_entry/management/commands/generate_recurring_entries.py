@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.contrib.auth.models import User
 from recurring_journal_entry.models import RecurringEntry
+from recurring_journal_entry.runner import RecurringEntryRunner
 from datetime import date
 import logging
 
@@ -27,11 +28,24 @@ class Command(BaseCommand):
             type=int,
             help='User ID to use for generating entries (defaults to first superuser)',
         )
+        parser.add_argument(
+            '--as-of',
+            type=date.fromisoformat,
+            help='Generate occurrences due up to this date (YYYY-MM-DD, defaults to today)',
+        )
+        parser.add_argument(
+            '--async',
+            action='store_true',
+            dest='run_async',
+            help='Queue one Celery task per template instead of generating inline',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
         template_id = options.get('template_id')
         user_id = options.get('user_id')
+        as_of = options.get('as_of')
         
         # Get user
         if user_id:
@@ -69,6 +83,18 @@ class Command(BaseCommand):
             )
             return
         
+        if options['run_async'] and not dry_run:
+            from recurring_journal_entry.tasks import generate_recurring_entries_for_template
+            
+            for recurring_entry in recurring_entries:
+                generate_recurring_entries_for_template.delay(
+                    recurring_entry.id, as_of.isoformat() if as_of else None, user.id
+                )
+            self.stdout.write(
+                self.style.SUCCESS(f'Queued {len(recurring_entries)} recurring entry(ies) for generation')
+            )
+            return
+        
         self.stdout.write(
             self.style.SUCCESS(f'Processing {len(recurring_entries)} recurring entry(ies)')
         )
@@ -79,7 +105,7 @@ class Command(BaseCommand):
         for recurring_entry in recurring_entries:
             try:
                 generated_count = self.process_recurring_entry(
-                    recurring_entry, user, dry_run
+                    recurring_entry, user, dry_run, as_of
                 )
                 total_generated += generated_count
                 
@@ -122,50 +148,15 @@ class Command(BaseCommand):
                 self.style.ERROR(f'Encountered {total_errors} error(s)')
             )
 
-    def process_recurring_entry(self, recurring_entry, user, dry_run=False):
-        """Process a single recurring entry and generate due entries"""
-        generated_count = 0
-        today = date.today()
-        
-        # Check if entry is balanced
-        if not recurring_entry.is_balanced:
-            raise ValueError("Recurring entry is not balanced")
-        
-        # Get next posting date
-        next_date = recurring_entry.get_next_posting_date()
+    def process_recurring_entry(self, recurring_entry, user, dry_run=False, as_of=None):
+        """Generate every due occurrence of a recurring entry, including missed ones"""
+        runner = RecurringEntryRunner(recurring_entry, user=user, as_of=as_of)
+        posting_dates = runner.run(dry_run=dry_run)
         
-        # Generate entries for all due dates
-        while next_date and next_date <= today:
-            # Check if entry already exists for this date
-            if recurring_entry.generated_entries.filter(posting_date=next_date).exists():
-                self.stdout.write(
-                    f'  Entry for {next_date} already exists, skipping'
-                )
-                next_date = recurring_entry.get_next_posting_date(next_date)
-                continue
-            
+        for posting_date in posting_dates:
             if dry_run:
-                self.stdout.write(
-                    f'  Would generate entry for {next_date}'
-                )
-                generated_count += 1
-            else:
-                try:
-                    # Generate the journal entry
-                    journal_entry = recurring_entry.generate_journal_entry(next_date, user)
-                    
-                    self.stdout.write(
-                        f'  Generated entry {journal_entry.voucher_number} for {next_date}'
-                    )
-                    generated_count += 1
-                    
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f'  Failed to generate entry for {next_date}: {str(e)}')
-                    )
-                    raise
-            
-            # Get next date
-            next_date = recurring_entry.get_next_posting_date(next_date)
+                self.stdout.write(f'  Would generate entry for {posting_date}')
+            elif self.verbosity > 1:
+                self.stdout.write(f'  Generated entry for {posting_date}')
         
-        return generated_count 
\ No newline at end of file
+        return len(posting_dates)
@@ -0,0 +1,187 @@
+"""
+Catch-up runner for recurring journal entries.
+
+All due occurrences of a template (including ones missed during downtime) are
+computed up front and generated in chunked transactions with bulk inserts.
+Each chunk takes a row lock on the template, and the (template, posting date)
+pair is the idempotency key: it is enforced by GeneratedEntry's unique
+constraint and the deterministic voucher number, so an occurrence is never
+generated twice even when several workers run the same template.
+"""
+import logging
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from manual_journal_entry.models import JournalEntry, JournalEntryLine
+from .models import RecurringEntry, GeneratedEntry
+
+logger = logging.getLogger(__name__)
+
+# Occurrences generated per transaction
+CHUNK_SIZE = 100
+
+
+def get_voucher_number(recurring_entry, posting_date):
+    """Deterministic voucher number, matching RecurringEntry.generate_journal_entry"""
+    return f"RE{posting_date.strftime('%Y%m%d')}{recurring_entry.id:04d}"
+
+
+class RecurringEntryRunner:
+    """Generates all due occurrences of a recurring entry template"""
+
+    def __init__(self, recurring_entry, user=None, as_of=None):
+        self.recurring_entry = recurring_entry
+        self.user = user
+        self.as_of = as_of or date.today()
+
+    def _advance(self, from_date):
+        """Next schedule date strictly after from_date, or None"""
+        entry = self.recurring_entry
+        if entry.frequency == 'DAILY':
+            return from_date + timedelta(days=1)
+        if entry.frequency == 'WEEKLY':
+            return from_date + timedelta(weeks=1)
+
+        step = {
+            'MONTHLY': entry._get_monthly_date,
+            'QUARTERLY': entry._get_quarterly_date,
+            'ANNUALLY': entry._get_yearly_date,
+        }.get(entry.frequency)
+        if step is None:
+            return None
+
+        next_date = step(from_date)
+        # Some posting days (e.g. LAST) can land on from_date itself
+        probe = from_date
+        while next_date is not None and next_date <= from_date:
+            probe += timedelta(days=1)
+            next_date = step(probe)
+        return next_date
+
+    def _first_occurrence(self):
+        """Earliest schedule date on or after the template start date"""
+        entry = self.recurring_entry
+        start_date = entry.start_date
+        if entry.frequency in ('DAILY', 'WEEKLY'):
+            return start_date
+
+        # Posting day within the start month, if it has not passed yet
+        candidate = None
+        if entry.posting_day == '1ST':
+            candidate = start_date.replace(day=1)
+        elif entry.posting_day == '15TH':
+            candidate = start_date.replace(day=15)
+        elif entry.posting_day == 'LAST':
+            candidate = (start_date.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        elif entry.posting_day == 'CUSTOM' and entry.custom_day:
+            try:
+                candidate = start_date.replace(day=entry.custom_day)
+            except ValueError:
+                candidate = None
+        if candidate and candidate >= start_date:
+            return candidate
+        return self._advance(start_date)
+
+    def compute_due_dates(self):
+        """Return every due posting date up to as_of that has not been generated yet"""
+        entry = self.recurring_entry
+        generated_dates = set(entry.generated_entries.values_list('posting_date', flat=True))
+
+        remaining = None
+        if entry.number_of_occurrences:
+            remaining = entry.number_of_occurrences - len(generated_dates)
+            if remaining <= 0:
+                return []
+
+        due_dates = []
+        next_date = self._first_occurrence()
+        while next_date and next_date <= self.as_of:
+            if entry.end_date and next_date > entry.end_date:
+                break
+            if next_date not in generated_dates:
+                due_dates.append(next_date)
+                if remaining is not None and len(due_dates) >= remaining:
+                    break
+            next_date = self._advance(next_date)
+        return due_dates
+
+    def _generate_chunk(self, posting_dates, lines):
+        entry = self.recurring_entry
+        status = 'POSTED' if entry.auto_post else 'DRAFT'
+        now = timezone.now()
+
+        # Re-check under the lock: another worker may have generated some of these
+        already_generated = set(GeneratedEntry.objects.filter(
+            recurring_entry=entry,
+            posting_date__in=posting_dates
+        ).values_list('posting_date', flat=True))
+        posting_dates = [d for d in posting_dates if d not in already_generated]
+        if not posting_dates:
+            return []
+
+        journal_entries = JournalEntry.objects.bulk_create([
+            JournalEntry(
+                voucher_number=get_voucher_number(entry, posting_date),
+                date=posting_date,
+                reference_number=f"Recurring: {entry.template_name}",
+                narration=entry.narration,
+                total_debit=entry.total_debit,
+                total_credit=entry.total_credit,
+                currency_id=entry.currency_id,
+                fiscal_year_id=entry.fiscal_year_id,
+                company_id=entry.company_id,
+                status=status,
+                created_by=self.user,
+                posted_by=self.user if entry.auto_post else None,
+                posted_at=now if entry.auto_post else None,
+            )
+            for posting_date in posting_dates
+        ])
+
+        JournalEntryLine.objects.bulk_create([
+            JournalEntryLine(
+                journal_entry=journal_entry,
+                account_id=line.account_id,
+                description=line.description,
+                debit=line.debit,
+                credit=line.credit,
+                order=line.order,
+            )
+            for journal_entry in journal_entries
+            for line in lines
+        ], batch_size=1000)
+
+        GeneratedEntry.objects.bulk_create([
+            GeneratedEntry(
+                recurring_entry=entry,
+                journal_entry=journal_entry,
+                posting_date=journal_entry.date,
+                generated_by=self.user,
+            )
+            for journal_entry in journal_entries
+        ])
+        return posting_dates
+
+    def run(self, dry_run=False):
+        """Generate all due occurrences. Returns the posting dates generated (or due, on a dry run)."""
+        entry = self.recurring_entry
+        if not entry.is_balanced:
+            raise ValueError("Recurring entry must be balanced before generating journal entries")
+
+        due_dates = self.compute_due_dates()
+        if dry_run or not due_dates:
+            return due_dates
+
+        lines = list(entry.lines.all())
+        generated = []
+        for start in range(0, len(due_dates), CHUNK_SIZE):
+            chunk = due_dates[start:start + CHUNK_SIZE]
+            with transaction.atomic():
+                # Per-template lock serializes workers generating the same template
+                RecurringEntry.objects.select_for_update().filter(pk=entry.pk).first()
+                generated.extend(self._generate_chunk(chunk, lines))
+
+        logger.info(f'Generated {len(generated)} recurring entries for template {entry.pk}')
+        return generated
@@ -0,0 +1,43 @@
+import logging
+from datetime import date
+
+from celery import shared_task, group
+from django.contrib.auth.models import User
+
+from .models import RecurringEntry
+from .runner import RecurringEntryRunner
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def generate_recurring_entries_for_template(self, template_id, as_of=None, user_id=None):
+    """Generate all due occurrences of a single recurring entry template"""
+    try:
+        recurring_entry = RecurringEntry.objects.get(id=template_id)
+        user = User.objects.filter(id=user_id).first() if user_id else None
+        as_of_date = date.fromisoformat(as_of) if as_of else None
+        
+        generated = RecurringEntryRunner(recurring_entry, user=user, as_of=as_of_date).run()
+        return {
+            'template_id': template_id,
+            'generated': len(generated),
+        }
+    except RecurringEntry.DoesNotExist:
+        logger.warning(f'Recurring entry {template_id} no longer exists')
+        return {'template_id': template_id, 'generated': 0}
+    except Exception as exc:
+        logger.error(f'Error generating recurring entries for template {template_id}: {str(exc)}')
+        raise self.retry(exc=exc)
+
+
+@shared_task
+def generate_recurring_entries(as_of=None, user_id=None):
+    """Fan out catch-up generation across workers, one task per active template"""
+    template_ids = list(RecurringEntry.objects.filter(status='ACTIVE').values_list('id', flat=True))
+    if template_ids:
+        group(
+            generate_recurring_entries_for_template.s(template_id, as_of, user_id)
+            for template_id in template_ids
+        ).apply_async()
+    return {'templates': len(template_ids)}
@@ -1,3 +1,110 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from chart_of_accounts.models import AccountType, ChartOfAccount
+from company.company_model import Company
+from fiscal_year.models import FiscalYear
+from manual_journal_entry.models import JournalEntry
+from multi_currency.models import Currency
+from .models import GeneratedEntry, RecurringEntry, RecurringEntryLine
+from .runner import RecurringEntryRunner, get_voucher_number
+
+
+class RecurringEntryRunnerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.company = Company.objects.create(
+            name='Test Company', code='TST', address='1 Test Street', phone='1234567', email='info@example.com'
+        )
+        self.currency = Currency.objects.create(pk=1, code='AED', name='UAE Dirham', symbol='AED')
+        self.fiscal_year = FiscalYear.objects.create(
+            name='FY2025', start_date=date(2025, 1, 1), end_date=date(2025, 12, 31), status='active'
+        )
+        expense_type = AccountType.objects.create(name='Expenses', category='EXPENSE')
+        asset_type = AccountType.objects.create(name='Assets', category='ASSET')
+        self.rent = ChartOfAccount.objects.create(
+            account_code='5100', name='Rent', account_type=expense_type, currency=self.currency, company=self.company
+        )
+        self.bank = ChartOfAccount.objects.create(
+            account_code='1100', name='Bank', account_type=asset_type, currency=self.currency, company=self.company
+        )
+
+    def create_entry(self, **kwargs):
+        fields = {
+            'template_name': 'Office rent',
+            'narration': 'Monthly office rent',
+            'start_date': date(2025, 1, 1),
+            'frequency': 'MONTHLY',
+            'posting_day': '1ST',
+            'auto_post': True,
+            'company': self.company,
+            'fiscal_year': self.fiscal_year,
+            'created_by': self.user,
+        }
+        fields.update(kwargs)
+        entry = RecurringEntry.objects.create(**fields)
+        RecurringEntryLine.objects.create(recurring_entry=entry, account=self.rent, debit=Decimal('500.00'))
+        RecurringEntryLine.objects.create(recurring_entry=entry, account=self.bank, credit=Decimal('500.00'))
+        entry.save()
+        return entry
+
+    def test_missed_occurrences_are_caught_up(self):
+        """Every posting date up to as_of is generated, with its lines and deterministic voucher"""
+        entry = self.create_entry()
+        generated = RecurringEntryRunner(entry, user=self.user, as_of=date(2025, 4, 10)).run()
+
+        self.assertEqual(generated, [date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1), date(2025, 4, 1)])
+        journal_entry = JournalEntry.objects.get(voucher_number=get_voucher_number(entry, date(2025, 3, 1)))
+        self.assertEqual(journal_entry.status, 'POSTED')
+        self.assertEqual(journal_entry.total_debit, Decimal('500.00'))
+        self.assertEqual(journal_entry.entries.count(), 2)
+        self.assertEqual(GeneratedEntry.objects.filter(recurring_entry=entry).count(), 4)
+
+    def test_run_is_idempotent(self):
+        entry = self.create_entry()
+        RecurringEntryRunner(entry, as_of=date(2025, 3, 15)).run()
+
+        self.assertEqual(RecurringEntryRunner(entry, as_of=date(2025, 3, 15)).run(), [])
+        self.assertEqual(RecurringEntryRunner(entry, as_of=date(2025, 4, 15)).run(), [date(2025, 4, 1)])
+        self.assertEqual(JournalEntry.objects.count(), 4)
+
+    def test_dry_run_generates_nothing(self):
+        entry = self.create_entry(auto_post=False)
+        due = RecurringEntryRunner(entry, as_of=date(2025, 2, 20)).run(dry_run=True)
+
+        self.assertEqual(due, [date(2025, 1, 1), date(2025, 2, 1)])
+        self.assertFalse(JournalEntry.objects.exists())
+
+    def test_schedule_stops_at_end_date_and_occurrence_limit(self):
+        ends = self.create_entry(end_date=date(2025, 2, 28))
+        self.assertEqual(
+            RecurringEntryRunner(ends, as_of=date(2025, 6, 1)).compute_due_dates(),
+            [date(2025, 1, 1), date(2025, 2, 1)]
+        )
+
+        limited = self.create_entry(template_name='Insurance', number_of_occurrences=3, frequency='WEEKLY',
+                                    start_date=date(2025, 1, 6))
+        RecurringEntryRunner(limited, as_of=date(2025, 1, 10)).run()
+        self.assertEqual(
+            RecurringEntryRunner(limited, as_of=date(2025, 3, 1)).compute_due_dates(),
+            [date(2025, 1, 13), date(2025, 1, 20)]
+        )
+
+    def test_last_day_of_month_schedule(self):
+        entry = self.create_entry(posting_day='LAST', start_date=date(2025, 1, 15))
+        self.assertEqual(
+            RecurringEntryRunner(entry, as_of=date(2025, 4, 30)).compute_due_dates(),
+            [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)]
+        )
+
+    def test_unbalanced_entry_is_rejected(self):
+        entry = self.create_entry()
+        RecurringEntryLine.objects.create(recurring_entry=entry, account=self.rent, debit=Decimal('10.00'))
+        entry.save()
+
+        with self.assertRaises(ValueError):
+            RecurringEntryRunner(entry, as_of=date(2025, 2, 1)).run()
+        self.assertFalse(JournalEntry.objects.exists())
@@ -21,11 +21,11 @@ class ScanSessionAdmin(admin.ModelAdmin):
 
 @admin.register(ScanRecord)
 class ScanRecordAdmin(admin.ModelAdmin):
-    list_display = ['barcode', 'session', 'item_name', 'quantity', 'location', 'scan_time']
+    list_display = ['barcode', 'session', 'item_name', 'quantity', 'location', 'device_id', 'sequence', 'scan_time']
     list_filter = ['session__session_type', 'scan_time', 'status']
-    search_fields = ['barcode', 'item_name', 'item_code']
+    search_fields = ['barcode', 'item_name', 'item_code', 'device_id']
     ordering = ['-scan_time']
-    readonly_fields = ['scan_time']
+    readonly_fields = ['scan_time', 'device_id', 'sequence', 'scanned_at']
 
 
 @admin.register(Location)
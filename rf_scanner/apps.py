@@ -5,3 +5,6 @@ class RfScannerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rf_scanner'
     verbose_name = 'RF Scanner'
+
+    def ready(self):
+        import rf_scanner.signals
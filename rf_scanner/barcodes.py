@@ -0,0 +1,185 @@
+"""
+Barcode resolution cache for scanning endpoints.
+
+Scans are resolved against several kinds of entity: RF scanner items and
+locations, inventory items, pallets and fixed assets. Each worker process
+keeps a compact map per kind of code -> (pk, code, display code, name), including codes
+that did not match, so repeated scans are answered from memory and only
+codes not seen before reach the database, one query per kind for a whole
+batch.
+
+Saving or deleting any of the source models bumps that kind's version in
+the Django cache once the transaction commits, so no worker can cache the
+old rows again after the bump. Kinds left pending by a rolled back
+transaction are bumped with the next commit, which costs a reload at
+most. The version is only seen by every worker when the cache is shared
+between processes (Redis, configured from REDIS_URL in settings).
+Workers compare their versions with the shared ones at most every
+VERSION_CHECK_SECONDS and drop only the kinds that changed, so a pallet
+move does not throw away the item map. Bulk queryset updates send no
+signals; MAX_AGE_SECONDS bounds how long such a change can go unnoticed.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from contextvars import ContextVar
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'rf_scanner:barcode_version:{}'
+VERSION_CHECK_SECONDS = 1
+MAX_AGE_SECONDS = 600
+# Per kind; a full map is dropped and rebuilt from scans rather than evicted entry by entry
+MAX_ENTRIES = 50000
+QUERY_CHUNK_SIZE = 500
+# Asset QR codes encode "Asset: <code>\nName: ...\nLocation: ..."
+ASSET_QR_PREFIX = 'Asset:'
+
+# code is the scanned code; display_code is the code the record is known by (an item's item_code)
+ScanTarget = namedtuple('ScanTarget', ['kind', 'pk', 'code', 'display_code', 'name'])
+BarcodeSource = namedtuple('BarcodeSource', ['kind', 'model', 'code_field', 'display_field', 'name_field', 'filters'])
+
+# In resolution order: a code that exists in several sources resolves to the first
+SOURCES = [
+    BarcodeSource('item', 'rf_scanner.Item', 'barcode', 'item_code', 'item_name', {'is_active': True}),
+    BarcodeSource(
+        'location', 'rf_scanner.Location', 'location_code', 'location_code', 'location_name', {'is_active': True}
+    ),
+    BarcodeSource('stock_item', 'items.Item', 'barcode', 'item_code', 'item_name', {'status': 'active'}),
+    BarcodeSource('pallet', 'location_transfer.Pallet', 'pallet_id', 'pallet_id', 'description', {}),
+    BarcodeSource('asset', 'asset_register.Asset', 'asset_code', 'asset_code', 'asset_name', {'is_deleted': False}),
+]
+SOURCES_BY_KIND = {source.kind: source for source in SOURCES}
+KINDS = tuple(SOURCES_BY_KIND)
+
+
+def normalize_code(value):
+    """Scanned text to the code it stands for"""
+    code = str(value or '').strip()
+    if code.startswith(ASSET_QR_PREFIX):
+        code = code.splitlines()[0][len(ASSET_QR_PREFIX):].strip()
+    return code
+
+
+class BarcodeCache:
+    """code -> ScanTarget maps per kind for this process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {kind: {} for kind in KINDS}
+        self.versions = {}
+        self.checked_at = 0
+        self.loaded_at = time.monotonic()
+
+    def clear(self, kinds=KINDS):
+        with self.lock:
+            for kind in kinds:
+                self.entries[kind] = {}
+
+    def sync(self):
+        """Drop the kinds whose shared version moved since the last check"""
+        now = time.monotonic()
+        if now - self.checked_at < VERSION_CHECK_SECONDS:
+            return
+        if now - self.loaded_at > MAX_AGE_SECONDS:
+            self.clear()
+            self.loaded_at = now
+        shared = cache.get_many([VERSION_KEY.format(kind) for kind in KINDS])
+        versions = {kind: shared.get(VERSION_KEY.format(kind), 0) for kind in KINDS}
+        changed = [kind for kind in KINDS if self.versions.get(kind) != versions[kind]]
+        if changed and self.versions:
+            logger.debug(f'Barcode cache dropped {", ".join(changed)}')
+            self.clear(changed)
+        self.versions = versions
+        self.checked_at = now
+
+    def resolve_many(self, codes, kinds=KINDS):
+        """{code: ScanTarget or None} for normalized codes, first matching kind wins"""
+        self.sync()
+        codes = {code for code in codes if code}
+        resolved = {}
+        for kind in kinds:
+            entries = self.entries[kind]
+            pending = codes - set(resolved)
+            missing = [code for code in pending if code not in entries]
+            if missing:
+                found = load_targets(kind, missing)
+                with self.lock:
+                    if len(entries) + len(missing) > MAX_ENTRIES:
+                        entries = self.entries[kind] = {}
+                    for code in missing:
+                        entries[code] = found.get(code)
+            for code in pending:
+                target = entries.get(code)
+                if target is not None:
+                    resolved[code] = target
+        return {code: resolved.get(code) for code in codes}
+
+
+def load_targets(kind, codes):
+    """{code: ScanTarget} for the codes of one kind that exist, one query per chunk"""
+    source = SOURCES_BY_KIND[kind]
+    model = apps.get_model(source.model)
+    found = {}
+    codes = list(codes)
+    for start in range(0, len(codes), QUERY_CHUNK_SIZE):
+        rows = model.objects.filter(
+            **{f'{source.code_field}__in': codes[start:start + QUERY_CHUNK_SIZE]}, **source.filters
+        ).values_list('pk', source.code_field, source.display_field, source.name_field)
+        for pk, code, display_code, name in rows:
+            found[code] = ScanTarget(kind, pk, code, display_code or '', name or '')
+    return found
+
+
+_cache = BarcodeCache()
+# Kinds changed by the current transaction, invalidated once it commits
+_pending_kinds = ContextVar('pending_barcode_kinds', default=None)
+
+
+def resolve(value, kinds=KINDS):
+    """ScanTarget for one scanned code, or None"""
+    code = normalize_code(value)
+    return _cache.resolve_many([code], kinds).get(code) if code else None
+
+
+def resolve_many(values, kinds=KINDS):
+    """{scanned value: ScanTarget or None} for a batch of scans"""
+    codes = {value: normalize_code(value) for value in values}
+    resolved = _cache.resolve_many(codes.values(), kinds)
+    return {value: resolved.get(code) for value, code in codes.items()}
+
+
+def invalidate(kind):
+    """Tell every worker that codes of this kind changed"""
+    key = VERSION_KEY.format(kind)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(key, 1, timeout=None)
+    _cache.clear([kind])
+
+
+def _flush_invalidations():
+    kinds = _pending_kinds.get()
+    _pending_kinds.set(None)
+    for kind in sorted(kinds or ()):
+        invalidate(kind)
+
+
+def invalidate_on_commit(kind):
+    """Invalidate a kind once the current transaction commits, at most once per transaction"""
+    pending = _pending_kinds.get()
+    if pending is None:
+        pending = set()
+        _pending_kinds.set(pending)
+    pending.add(kind)
+    # Registered on every call so a rolled back block cannot drop the only callback; the
+    # first one to run invalidates every pending kind and leaves the others nothing to do
+    transaction.on_commit(_flush_invalidations)
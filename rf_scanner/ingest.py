@@ -0,0 +1,235 @@
+"""
+Batched scan ingestion for RF handhelds.
+
+Handhelds buffer scans while they are offline and send them in batches.
+Every scan carries the device's own sequence number and the time it was
+taken; (device_id, sequence) is unique on ScanRecord, so a batch that is
+resent after a dropped connection stores nothing twice and reports the
+earlier records instead.
+
+A batch costs a fixed number of queries whatever its size: sessions and
+already stored sequences are each looked up once, item barcodes and
+location codes come from the barcode cache (which queries only codes it
+has not seen) and the new records are written with one bulk insert. Each scan
+gets its own result so the handheld knows which entries to drop from its
+queue (accepted and duplicate) and which to show to the operator (rejected).
+"""
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .barcodes import resolve_many
+from .models import ScanSession, ScanRecord
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 1000
+BULK_BATCH_SIZE = 500
+# ScanRecord.quantity is a DecimalField(max_digits=10, decimal_places=2)
+MAX_QUANTITY = Decimal('99999999.99')
+CENT = Decimal('0.01')
+BARCODE_MAX_LENGTH = ScanRecord._meta.get_field('barcode').max_length
+LOCATION_MAX_LENGTH = ScanRecord._meta.get_field('location').max_length
+DEVICE_MAX_LENGTH = ScanRecord._meta.get_field('device_id').max_length
+
+
+class BatchError(ValueError):
+    """The batch as a whole cannot be processed"""
+
+
+def _parse_id(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number >= 0 and str(number) == str(value).strip() else None
+
+
+def _parse_quantity(value):
+    try:
+        quantity = Decimal(str(value)).quantize(CENT)
+    except (InvalidOperation, ValueError):
+        return None
+    return quantity if 0 < quantity <= MAX_QUANTITY else None
+
+
+def _parse_scanned_at(value, received_at):
+    if value in (None, ''):
+        return received_at
+    try:
+        moment = parse_datetime(str(value))
+    except ValueError:
+        return None
+    if moment is None:
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def validate_scan(raw, sessions, default_session_id, received_at):
+    """Clean one scan of a batch. Returns (values, errors)."""
+    if not isinstance(raw, dict):
+        return None, ['Scan must be an object']
+
+    errors = []
+    sequence = _parse_id(raw.get('sequence'))
+    if sequence is None:
+        errors.append('Missing or invalid sequence')
+
+    barcode = str(raw.get('barcode') or '').strip()
+    if not barcode:
+        errors.append('Missing barcode')
+    elif len(barcode) > BARCODE_MAX_LENGTH:
+        errors.append(f'Barcode longer than {BARCODE_MAX_LENGTH} characters')
+
+    quantity = _parse_quantity(raw.get('quantity', 1))
+    if quantity is None:
+        errors.append('Quantity must be a positive number')
+
+    location = str(raw.get('location') or '').strip()
+    if len(location) > LOCATION_MAX_LENGTH:
+        errors.append(f'Location longer than {LOCATION_MAX_LENGTH} characters')
+
+    scanned_at = _parse_scanned_at(raw.get('scanned_at'), received_at)
+    if scanned_at is None:
+        errors.append('Invalid scanned_at timestamp')
+
+    session = sessions.get(_parse_id(raw.get('session_id', default_session_id)))
+    if session is None:
+        errors.append('Unknown session')
+    elif not session.is_active and scanned_at and session.end_time and scanned_at > session.end_time:
+        # Scans buffered before the session ended are still accepted
+        errors.append('Session ended before the scan')
+
+    values = {
+        'sequence': sequence,
+        'barcode': barcode,
+        'quantity': quantity,
+        'location': location,
+        'scanned_at': scanned_at,
+        'session': session,
+        'notes': str(raw.get('notes') or ''),
+    }
+    return values, errors
+
+
+def _scan_result(sequence, status, record=None, errors=None, warnings=None):
+    result = {'sequence': sequence, 'status': status}
+    if record is not None:
+        result.update(
+            scan_id=record['id'],
+            barcode=record['barcode'],
+            item_code=record['item_code'],
+            item_name=record['item_name'] or 'Unknown Item',
+        )
+    if errors:
+        result['errors'] = errors
+    if warnings:
+        result['warnings'] = warnings
+    return result
+
+
+def ingest_batch(rf_user, device_id, scans, session_id=None):
+    """Store a batch of scans from one handheld.
+
+    scans is a list of dicts with sequence, barcode and optionally quantity,
+    location, scanned_at, session_id and notes; session_id is the default
+    session for scans without one. Returns a summary dict with a result per
+    scan in the order they were sent.
+    """
+    device_id = str(device_id or '').strip()
+    if not device_id:
+        raise BatchError('device_id is required')
+    if len(device_id) > DEVICE_MAX_LENGTH:
+        raise BatchError(f'device_id longer than {DEVICE_MAX_LENGTH} characters')
+    if not isinstance(scans, list):
+        raise BatchError('scans must be a list')
+    if len(scans) > MAX_BATCH_SIZE:
+        raise BatchError(f'A batch holds at most {MAX_BATCH_SIZE} scans')
+
+    received_at = timezone.now()
+    session_ids = {_parse_id(session_id)} | {
+        _parse_id(scan.get('session_id')) for scan in scans if isinstance(scan, dict)
+    }
+    sessions = {session.pk: session for session in ScanSession.objects.filter(user=rf_user, pk__in=session_ids - {None})}
+
+    cleaned = [validate_scan(raw, sessions, session_id, received_at) for raw in scans]
+    sequences = {values['sequence'] for values, _ in cleaned if values and values['sequence'] is not None}
+    record_fields = ('sequence', 'id', 'barcode', 'item_code', 'item_name')
+    stored = {
+        row['sequence']: row
+        for row in ScanRecord.objects.filter(device_id=device_id, sequence__in=sequences).values(*record_fields)
+    }
+
+    items = resolve_many({values['barcode'] for values, errors in cleaned if values and not errors}, kinds=('item',))
+    locations = resolve_many(
+        {values['location'] for values, errors in cleaned if values and not errors and values['location']},
+        kinds=('location',),
+    )
+
+    pending = {}
+    warnings = {}
+    for values, errors in cleaned:
+        sequence = values and values['sequence']
+        if errors or sequence in stored or sequence in pending:
+            continue
+        item = items.get(values['barcode'])
+        warnings[sequence] = []
+        if not item:
+            warnings[sequence].append('Unknown barcode')
+        if values['location'] and not locations.get(values['location']):
+            warnings[sequence].append('Unknown location')
+        pending[sequence] = ScanRecord(
+            session=values['session'],
+            barcode=values['barcode'],
+            item_code=item.display_code if item else '',
+            item_name=item.name if item else '',
+            quantity=values['quantity'],
+            location=values['location'],
+            notes=values['notes'],
+            device_id=device_id,
+            sequence=sequence,
+            scanned_at=values['scanned_at'],
+        )
+
+    with transaction.atomic():
+        # A concurrent resend of the same batch may insert first; its rows are reported below
+        ScanRecord.objects.bulk_create(pending.values(), batch_size=BULK_BATCH_SIZE, ignore_conflicts=True)
+        created = {
+            row['sequence']: row
+            for row in ScanRecord.objects.filter(device_id=device_id, sequence__in=list(pending)).values(*record_fields)
+        }
+
+    results = []
+    reported = set()
+    for values, errors in cleaned:
+        sequence = values['sequence'] if values else None
+        if errors:
+            results.append(_scan_result(sequence, 'rejected', errors=errors))
+        elif sequence in stored or sequence in reported:
+            results.append(_scan_result(sequence, 'duplicate', stored.get(sequence) or created.get(sequence)))
+        else:
+            reported.add(sequence)
+            results.append(_scan_result(sequence, 'accepted', created.get(sequence), warnings=warnings.get(sequence)))
+
+    counts = {status: 0 for status in ('accepted', 'duplicate', 'rejected')}
+    for result in results:
+        counts[result['status']] += 1
+    last_sequence = ScanRecord.objects.filter(device_id=device_id, sequence__isnull=False).aggregate(
+        last=Max('sequence')
+    )['last']
+    logger.info(f'RF batch from {device_id}: {counts}')
+    return {
+        'device_id': device_id,
+        **counts,
+        'last_sequence': last_sequence,
+        'received_at': received_at.isoformat(),
+        'results': results,
+    }
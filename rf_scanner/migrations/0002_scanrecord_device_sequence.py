@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-18 22:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rf_scanner', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scanrecord',
+            name='device_id',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='scanrecord',
+            name='scanned_at',
+            field=models.DateTimeField(blank=True, help_text='Time of the scan on the handheld', null=True),
+        ),
+        migrations.AddField(
+            model_name='scanrecord',
+            name='sequence',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='scanrecord',
+            constraint=models.UniqueConstraint(condition=models.Q(('sequence__isnull', False)), fields=('device_id', 'sequence'), name='unique_scan_device_sequence'),
+        ),
+    ]
@@ -47,6 +47,19 @@ class ScanRecord(models.Model):
     scan_time = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=50, default='scanned')
     notes = models.TextField(blank=True)
+    # Set by handhelds syncing through the batch API; (device_id, sequence) identifies a scan across retries
+    device_id = models.CharField(max_length=100, blank=True)
+    sequence = models.PositiveBigIntegerField(null=True, blank=True)
+    scanned_at = models.DateTimeField(null=True, blank=True, help_text="Time of the scan on the handheld")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['device_id', 'sequence'],
+                condition=models.Q(sequence__isnull=False),
+                name='unique_scan_device_sequence',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.barcode} - {self.scan_time}"
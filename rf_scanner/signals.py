@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .barcodes import SOURCES, invalidate_on_commit
+
+
+def _connect(source):
+    @receiver(post_save, sender=source.model, weak=False, dispatch_uid=f'barcode_cache_save_{source.kind}')
+    @receiver(post_delete, sender=source.model, weak=False, dispatch_uid=f'barcode_cache_delete_{source.kind}')
+    def invalidate_barcodes(sender, **kwargs):
+        invalidate_on_commit(source.kind)
+
+
+# Every barcode source drops its cached codes in all workers when a row changes
+for barcode_source in SOURCES:
+    _connect(barcode_source)
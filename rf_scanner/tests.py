@@ -1,3 +1,157 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .barcodes import VERSION_KEY, BarcodeCache, _cache, resolve
+from .ingest import MAX_BATCH_SIZE, BatchError, ingest_batch
+from .models import Item, Location, RFUser, ScanRecord, ScanSession
+
+
+class BarcodeCacheTest(TransactionTestCase):
+    """Runs real commits, which is when the cached codes are invalidated"""
+
+    def setUp(self):
+        cache.clear()
+        _cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.rf_user = RFUser.objects.create(user=self.user, employee_id='EMP001', department='Warehouse')
+        self.session = ScanSession.objects.create(user=self.rf_user, session_type='inbound')
+        self.item = Item.objects.create(item_code='SKU-123', item_name='Test Item', barcode='0123456789')
+
+    def test_scans_record_the_item_code(self):
+        """The scanned barcode resolves to the item, and the record keeps the item's own code"""
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.post(
+            reverse('rf_scanner:api_scan'),
+            json.dumps({'barcode': '0123456789', 'session_id': self.session.pk}),
+            content_type='application/json'
+        )
+        self.assertTrue(response.json()['success'])
+
+        result = ingest_batch(self.rf_user, 'HH-01', [{'sequence': 1, 'barcode': '0123456789'}], self.session.pk)
+        self.assertEqual(result['accepted'], 1)
+
+        self.assertEqual(
+            list(ScanRecord.objects.values_list('barcode', 'item_code')),
+            [('0123456789', 'SKU-123'), ('0123456789', 'SKU-123')]
+        )
+
+    def test_new_barcode_reaches_other_workers_after_commit(self):
+        other_worker = BarcodeCache()
+        self.assertEqual(other_worker.resolve_many(['555000111']), {'555000111': None})
+
+        version = cache.get(VERSION_KEY.format('item'))
+        with transaction.atomic():
+            Item.objects.create(item_code='SKU-555', item_name='New Item', barcode='555000111')
+            # Not bumped before commit, so no worker re-caches the old rows after the bump
+            self.assertEqual(cache.get(VERSION_KEY.format('item')), version)
+        self.assertEqual(cache.get(VERSION_KEY.format('item')), version + 1)
+
+        other_worker.checked_at = 0
+        target = other_worker.resolve_many(['555000111'])['555000111']
+        self.assertEqual((target.kind, target.code, target.display_code), ('item', '555000111', 'SKU-555'))
+
+    def test_invalidation_runs_once_per_transaction(self):
+        version = cache.get(VERSION_KEY.format('item'))
+        with transaction.atomic():
+            self.item.item_name = 'Renamed Item'
+            self.item.save()
+            Item.objects.create(item_code='SKU-124', item_name='Second Item', barcode='0123456790')
+        self.assertEqual(cache.get(VERSION_KEY.format('item')), version + 1)
+
+    def test_rolled_back_changes_do_not_invalidate(self):
+        version = cache.get(VERSION_KEY.format('item'))
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Item.objects.create(item_code='SKU-125', item_name='Third Item', barcode='0123456791')
+                raise RuntimeError('rolled back')
+        self.assertEqual(cache.get(VERSION_KEY.format('item')), version)
+
+        # The next commit still invalidates, once
+        Item.objects.create(item_code='SKU-126', item_name='Fourth Item', barcode='0123456792')
+        self.assertEqual(cache.get(VERSION_KEY.format('item')), version + 1)
+
+    def test_asset_qr_payload_resolves_to_its_code(self):
+        self.assertIsNone(resolve('Asset: AST-404\nName: Forklift', kinds=('asset',)))
+
+
+class ScanIngestTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        _cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.rf_user = RFUser.objects.create(user=self.user, employee_id='EMP001', department='Warehouse')
+        self.session = ScanSession.objects.create(user=self.rf_user, session_type='inbound')
+        Item.objects.create(item_code='SKU-123', item_name='Test Item', barcode='0123456789')
+        Location.objects.create(location_code='A-01-01', location_name='Rack A-01', location_type='Rack')
+
+    def ingest(self, scans, device_id='HH-01'):
+        return ingest_batch(self.rf_user, device_id, scans, self.session.pk)
+
+    def test_resent_batch_is_stored_once(self):
+        """Scans already stored for the device come back as duplicates of the earlier records"""
+        scans = [
+            {'sequence': 1, 'barcode': '0123456789', 'quantity': '2', 'location': 'A-01-01'},
+            {'sequence': 2, 'barcode': '0123456789'},
+        ]
+        first = self.ingest(scans)
+        self.assertEqual((first['accepted'], first['duplicate']), (2, 0))
+        self.assertEqual(first['last_sequence'], 2)
+        self.assertEqual(first['results'][0]['item_code'], 'SKU-123')
+        self.assertNotIn('warnings', first['results'][0])
+
+        second = self.ingest(scans + [{'sequence': 3, 'barcode': '0123456789'}])
+        self.assertEqual((second['accepted'], second['duplicate']), (1, 2))
+        self.assertEqual(second['results'][0]['scan_id'], first['results'][0]['scan_id'])
+        self.assertEqual(ScanRecord.objects.count(), 3)
+
+        # Sequences are per device
+        self.assertEqual(self.ingest(scans, device_id='HH-02')['accepted'], 2)
+
+    def test_repeated_sequence_within_a_batch(self):
+        result = self.ingest([{'sequence': 5, 'barcode': '0123456789'}, {'sequence': 5, 'barcode': '0123456789'}])
+        self.assertEqual([scan['status'] for scan in result['results']], ['accepted', 'duplicate'])
+        self.assertEqual(ScanRecord.objects.count(), 1)
+
+    def test_invalid_scans_are_rejected_individually(self):
+        result = self.ingest([
+            {'sequence': 1, 'barcode': ''},
+            {'sequence': 'x', 'barcode': '0123456789'},
+            {'sequence': 3, 'barcode': '0123456789', 'quantity': '0'},
+            {'sequence': 4, 'barcode': '0123456789', 'scanned_at': 'yesterday'},
+            {'sequence': 5, 'barcode': '0123456789', 'session_id': self.session.pk + 100},
+            'not a scan',
+            {'sequence': 7, 'barcode': '999', 'location': 'Z-99'},
+        ])
+        self.assertEqual((result['accepted'], result['rejected']), (1, 6))
+        self.assertEqual(result['results'][0]['errors'], ['Missing barcode'])
+        self.assertEqual(result['results'][4]['errors'], ['Unknown session'])
+        self.assertEqual(result['results'][6]['warnings'], ['Unknown barcode', 'Unknown location'])
+        self.assertEqual(result['results'][6]['item_name'], 'Unknown Item')
+
+    def test_buffered_scans_outlive_their_session(self):
+        """A closed session still takes scans taken before it ended"""
+        ended = timezone.now()
+        self.session.is_active = False
+        self.session.end_time = ended
+        self.session.save()
+        result = self.ingest([
+            {'sequence': 1, 'barcode': '0123456789', 'scanned_at': (ended - timedelta(minutes=5)).isoformat()},
+            {'sequence': 2, 'barcode': '0123456789', 'scanned_at': (ended + timedelta(minutes=5)).isoformat()},
+        ])
+        self.assertEqual([scan['status'] for scan in result['results']], ['accepted', 'rejected'])
+        self.assertEqual(result['results'][1]['errors'], ['Session ended before the scan'])
+
+    def test_invalid_batches(self):
+        with self.assertRaises(BatchError):
+            self.ingest([], device_id=' ')
+        with self.assertRaises(BatchError):
+            self.ingest({'sequence': 1})
+        with self.assertRaises(BatchError):
+            self.ingest([{'sequence': n, 'barcode': '0123456789'} for n in range(MAX_BATCH_SIZE + 1)])
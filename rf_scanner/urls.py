@@ -16,6 +16,8 @@ urlpatterns = [
     
     # API endpoints
     path('api/scan/', views.api_scan, name='api_scan'),
+    path('api/scan/batch/', views.api_scan_batch, name='api_scan_batch'),
+    path('api/lookup/', views.api_lookup, name='api_lookup'),
     
     # History and details
     path('history/', views.session_history, name='session_history'),
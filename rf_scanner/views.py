@@ -10,6 +10,10 @@ import json
 
 from .models import RFUser, ScanSession, ScanRecord, Location, Item
 from .forms import RFLoginForm, ScanForm, SessionForm
+from .ingest import ingest_batch, BatchError
+from .barcodes import KINDS, resolve, resolve_many
+
+MAX_LOOKUP_BARCODES = 1000
 
 
 def rf_login(request):
@@ -150,12 +154,10 @@ def scan(request, session_id):
             scan_record.session = session
             
             # Try to get item details from barcode
-            try:
-                item = Item.objects.get(barcode=scan_record.barcode, is_active=True)
-                scan_record.item_code = item.item_code
-                scan_record.item_name = item.item_name
-            except Item.DoesNotExist:
-                pass
+            item = resolve(scan_record.barcode, kinds=('item',))
+            if item:
+                scan_record.item_code = item.display_code
+                scan_record.item_name = item.name
             
             scan_record.save()
             
@@ -193,22 +195,18 @@ def api_scan(request):
             if not session.is_active:
                 return JsonResponse({'error': 'Session ended'}, status=400)
             
+            # Try to get item details
+            item = resolve(barcode, kinds=('item',))
+            
             scan_record = ScanRecord.objects.create(
                 session=session,
                 barcode=barcode,
+                item_code=item.display_code if item else '',
+                item_name=item.name if item else '',
                 quantity=quantity,
                 location=location
             )
             
-            # Try to get item details
-            try:
-                item = Item.objects.get(barcode=barcode, is_active=True)
-                scan_record.item_code = item.item_code
-                scan_record.item_name = item.item_name
-                scan_record.save()
-            except Item.DoesNotExist:
-                pass
-            
             return JsonResponse({
                 'success': True,
                 'scan_id': scan_record.id,
@@ -225,6 +223,73 @@ def api_scan(request):
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 
+@csrf_exempt
+@login_required
+def api_scan_batch(request):
+    """API endpoint for handhelds syncing buffered scans in batches"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        rf_user = request.user.rf_profile
+    except RFUser.DoesNotExist:
+        return JsonResponse({'error': 'Not authorized'}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise BatchError('Batch must be a JSON object')
+        summary = ingest_batch(
+            rf_user,
+            device_id=data.get('device_id'),
+            scans=data.get('scans'),
+            session_id=data.get('session_id'),
+        )
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    except BatchError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({'success': True, **summary})
+
+
+@csrf_exempt
+@login_required
+def api_lookup(request):
+    """API endpoint resolving one or many barcodes to items, locations, pallets or assets"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        barcodes = data.get('barcodes') if isinstance(data, dict) else None
+        kinds = data.get('kinds') if isinstance(data, dict) else None
+    else:
+        barcodes = request.GET.getlist('barcode')
+        kinds = request.GET.getlist('kind')
+    
+    if not isinstance(barcodes, list) or not barcodes:
+        return JsonResponse({'error': 'No barcodes given'}, status=400)
+    if len(barcodes) > MAX_LOOKUP_BARCODES:
+        return JsonResponse({'error': f'At most {MAX_LOOKUP_BARCODES} barcodes per lookup'}, status=400)
+    kinds = tuple(kind for kind in KINDS if kind in kinds) if kinds else KINDS
+    
+    resolved = resolve_many([str(barcode) for barcode in barcodes], kinds=kinds)
+    results = []
+    for barcode in barcodes:
+        target = resolved.get(str(barcode))
+        results.append({
+            'barcode': barcode,
+            'found': target is not None,
+            **({
+                'kind': target.kind, 'id': target.pk, 'code': target.code,
+                'display_code': target.display_code, 'name': target.name,
+            } if target else {}),
+        })
+    
+    return JsonResponse({'results': results})
+
+
 @login_required
 def session_history(request):
     """View session history"""
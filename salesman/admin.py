@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import Salesman
+from .models import Salesman, CommissionTier, CommissionStatement
+
+
+class CommissionTierInline(admin.TabularInline):
+    model = CommissionTier
+    extra = 0
+
 
 @admin.register(Salesman)
 class SalesmanAdmin(admin.ModelAdmin):
@@ -8,6 +14,7 @@ class SalesmanAdmin(admin.ModelAdmin):
     search_fields = ['salesman_code', 'first_name', 'last_name', 'email', 'phone']
     ordering = ['first_name', 'last_name']
     readonly_fields = ['created_at', 'updated_at', 'created_by', 'updated_by']
+    inlines = [CommissionTierInline]
     
     fieldsets = (
         ('Basic Information', {
@@ -40,3 +47,19 @@ class SalesmanAdmin(admin.ModelAdmin):
             obj.created_by = request.user
         obj.updated_by = request.user
         super().save_model(request, obj, form, change)
+
+
+@admin.register(CommissionStatement)
+class CommissionStatementAdmin(admin.ModelAdmin):
+    list_display = ['period', 'salesman', 'invoice_count', 'paid_sales', 'credit_notes', 'clawback', 'commission_amount', 'status']
+    list_filter = ['status', 'period']
+    search_fields = ['salesman__salesman_code', 'salesman__first_name', 'salesman__last_name']
+    readonly_fields = [
+        'salesman', 'period', 'invoice_count', 'paid_sales', 'credit_note_count', 'credit_notes',
+        'gross_commission', 'clawback', 'commission_amount', 'status', 'journal_entry',
+        'calculated_at', 'approved_at', 'approved_by',
+    ]
+    date_hierarchy = 'period'
+    
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,265 @@
+"""
+Salesman commission engine.
+
+Commission is earned on cash collected: an invoice counts in the month of
+the payment that settled it, for the amount received against it. Paid sales
+and credit notes are aggregated per salesman and month in one grouped query
+each, so recalculating any number of months costs the same handful of
+queries. Credit notes are matched to the salesman through the customer they
+were issued to and clawed back in the month they were issued.
+
+Rates are progressive: sales up to the lowest tier threshold earn the
+salesman's commission_rate and each CommissionTier rate applies to the part
+of the month's sales above its threshold. Statements are rebuilt with bulk
+inserts; approved statements are never recalculated. Approving a batch of
+statements posts one journal entry that debits commission expense and
+credits commission payable per salesman.
+"""
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+
+from dateutil.relativedelta import relativedelta
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Count, DateField, DecimalField, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Salesman, CommissionTier, CommissionStatement
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 1000
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+DEFAULT_RECALCULATION_MONTHS = 12
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def period_range(months, end=None):
+    """First day of each of the last `months` months, up to and including the month of end"""
+    last = month_start(end or timezone.now().date())
+    return [last - relativedelta(months=offset) for offset in range(months - 1, -1, -1)]
+
+
+@dataclass
+class RatePlan:
+    """Base rate plus (threshold, rate) tiers, rates in percent"""
+    base_rate: Decimal
+    tiers: list
+
+    def bands(self):
+        return [(ZERO, self.base_rate)] + sorted(self.tiers)
+
+    def commission(self, amount):
+        """Progressive commission on an amount; a negative amount is reversed at the base rate"""
+        if amount <= 0:
+            return (amount * self.base_rate / 100).quantize(CENT, rounding=ROUND_HALF_UP)
+        bands = self.bands()
+        total = ZERO
+        for index, (threshold, rate) in enumerate(bands):
+            if amount <= threshold:
+                break
+            upper = bands[index + 1][0] if index + 1 < len(bands) else amount
+            total += (min(amount, upper) - threshold) * rate / 100
+        return total.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def load_rate_plans(salesman_ids):
+    """RatePlan per salesman id in two queries"""
+    plans = {
+        salesman_id: RatePlan(base_rate=Decimal(rate or 0), tiers=[])
+        for salesman_id, rate in Salesman.objects.filter(pk__in=salesman_ids).values_list('id', 'commission_rate')
+    }
+    tiers = CommissionTier.objects.filter(salesman_id__in=salesman_ids).values_list('salesman_id', 'threshold', 'rate')
+    for salesman_id, threshold, rate in tiers:
+        plans[salesman_id].tiers.append((threshold, rate))
+    return plans
+
+
+def paid_sales_by_month(start, end):
+    """{(salesman_id, month): (invoice_count, amount)} for invoices settled in [start, end)"""
+    Invoice = apps.get_model('invoice', 'Invoice')
+    CustomerPaymentInvoice = apps.get_model('customer_payments', 'CustomerPaymentInvoice')
+    allocations = CustomerPaymentInvoice.objects.filter(invoice=OuterRef('pk')).order_by().values('invoice')
+    rows = Invoice.objects.filter(
+        status='paid', customer__salesman__isnull=False
+    ).annotate(
+        paid_on=Subquery(allocations.annotate(last=Max('payment__payment_date')).values('last'), output_field=DateField()),
+        collected=Subquery(
+            allocations.annotate(total=Sum('amount_received')).values('total'),
+            output_field=DecimalField(max_digits=15, decimal_places=2),
+        ),
+    ).filter(
+        paid_on__gte=start, paid_on__lt=end
+    ).values(
+        'customer__salesman_id', month=TruncMonth('paid_on', output_field=DateField())
+    ).annotate(
+        invoices=Count('id'), amount=Sum('collected')
+    ).order_by().values_list('customer__salesman_id', 'month', 'invoices', 'amount')
+    return {(salesman_id, month): (count, amount or ZERO) for salesman_id, month, count, amount in rows}
+
+
+def credit_notes_by_month(start, end):
+    """{(salesman_id, month): (count, amount)} for credit notes dated in [start, end)"""
+    CreditNote = apps.get_model('credit_note', 'CreditNote')
+    Customer = apps.get_model('customer', 'Customer')
+    # Credit notes store the customer name rather than a foreign key
+    salesman = Customer.objects.filter(customer_name=OuterRef('customer')).values('salesman_id')[:1]
+    rows = CreditNote.objects.filter(
+        date__gte=start, date__lt=end
+    ).annotate(
+        salesman_id=Subquery(salesman)
+    ).filter(
+        salesman_id__isnull=False
+    ).values(
+        'salesman_id', month=TruncMonth('date')
+    ).annotate(
+        notes=Count('id'), amount=Sum('amount')
+    ).order_by().values_list('salesman_id', 'month', 'notes', 'amount')
+    return {(salesman_id, month): (count, amount or ZERO) for salesman_id, month, count, amount in rows}
+
+
+def build_statements(start, end):
+    """Unsaved statements for every salesman with sales or credit notes in [start, end)"""
+    sales = paid_sales_by_month(start, end)
+    credits = credit_notes_by_month(start, end)
+    keys = sorted(set(sales) | set(credits), key=lambda key: (key[1], key[0]))
+    plans = load_rate_plans({salesman_id for salesman_id, _ in keys})
+    now = timezone.now()
+
+    statements = []
+    for salesman_id, month in keys:
+        invoice_count, paid = sales.get((salesman_id, month), (0, ZERO))
+        note_count, credited = credits.get((salesman_id, month), (0, ZERO))
+        plan = plans[salesman_id]
+        gross = plan.commission(paid)
+        net = plan.commission(paid - credited)
+        statements.append(CommissionStatement(
+            salesman_id=salesman_id,
+            period=month,
+            invoice_count=invoice_count,
+            paid_sales=paid,
+            credit_note_count=note_count,
+            credit_notes=credited,
+            gross_commission=gross,
+            clawback=gross - net,
+            commission_amount=net,
+            calculated_at=now,
+        ))
+    return statements
+
+
+def recalculate(months=DEFAULT_RECALCULATION_MONTHS, end=None):
+    """Rebuild the draft statements of the last `months` months.
+
+    Months already approved for a salesman are left untouched. Returns a
+    summary dict.
+    """
+    periods = period_range(months, end)
+    start, stop = periods[0], periods[-1] + relativedelta(months=1)
+    statements = build_statements(start, stop)
+
+    with transaction.atomic():
+        approved = set(CommissionStatement.objects.filter(
+            period__gte=start, period__lt=stop, status='approved'
+        ).values_list('salesman_id', 'period'))
+        deleted, _ = CommissionStatement.objects.filter(
+            period__gte=start, period__lt=stop, status='draft'
+        ).delete()
+        statements = [s for s in statements if (s.salesman_id, s.period) not in approved]
+        CommissionStatement.objects.bulk_create(statements, batch_size=BULK_BATCH_SIZE)
+
+    summary = {
+        'start': start,
+        'end': periods[-1],
+        'statements': len(statements),
+        'replaced': deleted,
+        'skipped_approved': len(approved),
+        'commission': sum((s.commission_amount for s in statements), ZERO),
+    }
+    logger.info(f'Recalculated commissions {start:%b %Y} - {periods[-1]:%b %Y}: {summary}')
+    return summary
+
+
+def approve_statements(statements, expense_account, payable_account, user, date=None):
+    """Approve draft statements and post their commission to one journal entry.
+
+    Returns (success, message).
+    """
+    JournalEntry = apps.get_model('general_journal', 'JournalEntry')
+    JournalEntryLine = apps.get_model('general_journal', 'JournalEntryLine')
+    FiscalYear = apps.get_model('fiscal_year', 'FiscalYear')
+
+    with transaction.atomic():
+        statements = list(
+            statements.select_for_update().filter(status='draft').select_related('salesman').order_by('period', 'salesman_id')
+        )
+        if not statements:
+            return False, "No draft commission statements to approve"
+
+        date = date or max(s.period for s in statements) + relativedelta(months=1, days=-1)
+        fiscal_year = FiscalYear.objects.filter(start_date__lte=date, end_date__gte=date).first()
+        if not fiscal_year:
+            return False, f"No fiscal year covers {date:%d %b %Y}"
+
+        per_salesman = defaultdict(lambda: ZERO)
+        for statement in statements:
+            per_salesman[statement.salesman] += statement.commission_amount
+        total = sum(per_salesman.values(), ZERO)
+        if not any(per_salesman.values()):
+            return False, "The selected statements have no commission to post"
+
+        periods = sorted({s.period for s in statements})
+        period_label = f"{periods[0]:%b %Y}" + (f" - {periods[-1]:%b %Y}" if len(periods) > 1 else "")
+        # Net clawbacks reverse expense and payable
+        debit = max(total, ZERO) + sum((-amount for amount in per_salesman.values() if amount < 0), ZERO)
+        # Created one at a time so JournalEntry.save assigns the journal number
+        journal_entry = JournalEntry.objects.create(
+            date=date,
+            reference=f"Commission {period_label}",
+            description=f"Salesman commission for {period_label}",
+            total_debit=debit,
+            total_credit=debit,
+            status='draft',
+            company=expense_account.company,
+            fiscal_year=fiscal_year,
+            created_by=user,
+        )
+        lines = []
+        if total:
+            # Earnings and clawbacks that net to zero leave no expense to post
+            lines.append(JournalEntryLine(
+                journal_entry=journal_entry,
+                account=expense_account,
+                description=f"Commission expense - {period_label}",
+                debit_amount=max(total, ZERO),
+                credit_amount=max(-total, ZERO),
+            ))
+        for salesman, amount in sorted(per_salesman.items(), key=lambda item: item[0].salesman_code):
+            if not amount:
+                continue
+            # A salesman whose clawbacks exceed earnings reduces the payable
+            lines.append(JournalEntryLine(
+                journal_entry=journal_entry,
+                account=payable_account,
+                description=f"Commission payable - {salesman.display_name} - {period_label}",
+                reference=salesman.salesman_code,
+                debit_amount=-amount if amount < 0 else ZERO,
+                credit_amount=amount if amount > 0 else ZERO,
+            ))
+        JournalEntryLine.objects.bulk_create(lines)
+        if not journal_entry.post(user):
+            raise ValueError("Failed to post the commission journal entry")
+
+        CommissionStatement.objects.filter(pk__in=[s.pk for s in statements]).update(
+            status='approved', journal_entry=journal_entry, approved_by=user, approved_at=timezone.now()
+        )
+
+    logger.info(f'Approved {len(statements)} commission statements in {journal_entry.journal_number}: {total}')
+    return True, f"Approved {len(statements)} statements; commission of {total:,.2f} posted in {journal_entry.journal_number}"
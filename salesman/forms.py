@@ -1,4 +1,5 @@
 from django import forms
+from chart_of_accounts.models import ChartOfAccount
 from .models import Salesman
 
 COUNTRY_CHOICES = [
@@ -113,4 +114,15 @@ class SalesmanForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         # Filter manager choices to only active salesmen
         self.fields['manager'].queryset = Salesman.objects.filter(status='active')
-        self.fields['manager'].empty_label = "Select manager (optional)" 
\ No newline at end of file
+        self.fields['manager'].empty_label = "Select manager (optional)" 
+
+class CommissionApprovalForm(forms.Form):
+    """Accounts the approved commission is posted to"""
+    expense_account = forms.ModelChoiceField(
+        queryset=ChartOfAccount.objects.filter(is_active=True, account_type__category='EXPENSE').order_by('account_code'),
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    payable_account = forms.ModelChoiceField(
+        queryset=ChartOfAccount.objects.filter(is_active=True, account_type__category='LIABILITY').order_by('account_code'),
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
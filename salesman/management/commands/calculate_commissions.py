@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from salesman.commissions import DEFAULT_RECALCULATION_MONTHS, recalculate
+
+
+class Command(BaseCommand):
+    help = 'Recalculate draft salesman commission statements for recent months'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=DEFAULT_RECALCULATION_MONTHS,
+            help=f'Number of months to recalculate, ending with --end (default: {DEFAULT_RECALCULATION_MONTHS})'
+        )
+        parser.add_argument(
+            '--end',
+            type=str,
+            help='Last month to recalculate (YYYY-MM, default: current month)'
+        )
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months must be at least 1')
+        end = None
+        if options['end']:
+            try:
+                end = datetime.strptime(options['end'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('Invalid --end month. Use YYYY-MM format.')
+        
+        summary = recalculate(months=options['months'], end=end)
+        
+        self.stdout.write(
+            f"{summary['start']:%b %Y} - {summary['end']:%b %Y}: {summary['statements']} statements, "
+            f"commission {summary['commission']:,.2f} ({summary['replaced']} drafts replaced)"
+        )
+        if summary['skipped_approved']:
+            self.stdout.write(self.style.WARNING(
+                f"{summary['skipped_approved']} approved statements were left unchanged"
+            ))
+        self.stdout.write(self.style.SUCCESS('Commission statements recalculated'))
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.23 on 2026-10-18 22:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('general_journal', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('salesman', '0002_alter_salesman_phone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommissionTier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('threshold', models.DecimalField(decimal_places=2, help_text='Monthly sales above this amount earn the tier rate', max_digits=12)),
+                ('rate', models.DecimalField(decimal_places=2, help_text='Commission rate as percentage (e.g., 7.50 for 7.5%)', max_digits=5)),
+                ('salesman', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='commission_tiers', to='salesman.salesman')),
+            ],
+            options={
+                'verbose_name': 'Commission Tier',
+                'verbose_name_plural': 'Commission Tiers',
+                'db_table': 'salesman_commission_tier',
+                'ordering': ['salesman', 'threshold'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CommissionStatement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='First day of the commission month')),
+                ('invoice_count', models.PositiveIntegerField(default=0)),
+                ('paid_sales', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('credit_note_count', models.PositiveIntegerField(default=0)),
+                ('credit_notes', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('gross_commission', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('clawback', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('commission_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('approved', 'Approved')], default='draft', max_length=20)),
+                ('calculated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('approved_at', models.DateTimeField(blank=True, null=True)),
+                ('approved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='approved_commission_statements', to=settings.AUTH_USER_MODEL)),
+                ('journal_entry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='commission_statements', to='general_journal.journalentry')),
+                ('salesman', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='commission_statements', to='salesman.salesman')),
+            ],
+            options={
+                'verbose_name': 'Commission Statement',
+                'verbose_name_plural': 'Commission Statements',
+                'db_table': 'salesman_commission_statement',
+                'ordering': ['-period', 'salesman__first_name', 'salesman__last_name'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='commissiontier',
+            constraint=models.UniqueConstraint(fields=('salesman', 'threshold'), name='unique_salesman_commission_threshold'),
+        ),
+        migrations.AddIndex(
+            model_name='commissionstatement',
+            index=models.Index(fields=['period', 'status'], name='salesman_co_period_f8dcd6_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='commissionstatement',
+            constraint=models.UniqueConstraint(fields=('salesman', 'period'), name='unique_salesman_commission_period'),
+        ),
+    ]
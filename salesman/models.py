@@ -133,3 +133,94 @@ class Salesman(models.Model):
             today = timezone.now().date()
             return (today - self.hire_date).days // 365
         return 0
+
+
+class CommissionTier(models.Model):
+    """Accelerated commission rate on monthly sales above a threshold.
+
+    Sales up to the lowest threshold earn the salesman's base commission_rate;
+    each tier's rate applies to the part of the month's sales above its threshold.
+    """
+    
+    salesman = models.ForeignKey(Salesman, on_delete=models.CASCADE, related_name='commission_tiers')
+    threshold = models.DecimalField(
+        max_digits=12, 
+        decimal_places=2,
+        help_text="Monthly sales above this amount earn the tier rate"
+    )
+    rate = models.DecimalField(
+        max_digits=5, 
+        decimal_places=2,
+        help_text="Commission rate as percentage (e.g., 7.50 for 7.5%)"
+    )
+    
+    class Meta:
+        ordering = ['salesman', 'threshold']
+        verbose_name = 'Commission Tier'
+        verbose_name_plural = 'Commission Tiers'
+        db_table = 'salesman_commission_tier'
+        constraints = [
+            models.UniqueConstraint(fields=['salesman', 'threshold'], name='unique_salesman_commission_threshold'),
+        ]
+    
+    def __str__(self):
+        return f"{self.salesman.salesman_code} - {self.rate}% above {self.threshold}"
+
+
+class CommissionStatement(models.Model):
+    """Commission earned by a salesman for one calendar month"""
+    
+    STATUS_CHOICES = [
+        ('draft', 'Draft'),
+        ('approved', 'Approved'),
+    ]
+    
+    salesman = models.ForeignKey(Salesman, on_delete=models.PROTECT, related_name='commission_statements')
+    period = models.DateField(help_text="First day of the commission month")
+    
+    # Sales collected on invoices that were fully paid in the month
+    invoice_count = models.PositiveIntegerField(default=0)
+    paid_sales = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    # Credit notes issued in the month, clawed back at the salesman's rates
+    credit_note_count = models.PositiveIntegerField(default=0)
+    credit_notes = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    gross_commission = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    clawback = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    commission_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
+    journal_entry = models.ForeignKey(
+        'general_journal.JournalEntry',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='commission_statements'
+    )
+    calculated_at = models.DateTimeField(default=timezone.now)
+    approved_at = models.DateTimeField(null=True, blank=True)
+    approved_by = models.ForeignKey(
+        'auth.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='approved_commission_statements'
+    )
+    
+    class Meta:
+        ordering = ['-period', 'salesman__first_name', 'salesman__last_name']
+        verbose_name = 'Commission Statement'
+        verbose_name_plural = 'Commission Statements'
+        db_table = 'salesman_commission_statement'
+        constraints = [
+            models.UniqueConstraint(fields=['salesman', 'period'], name='unique_salesman_commission_period'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.salesman.salesman_code} - {self.period:%b %Y} - {self.commission_amount}"
+    
+    @property
+    def net_sales(self):
+        return self.paid_sales - self.credit_notes
@@ -1,3 +1,156 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from chart_of_accounts.models import AccountType, ChartOfAccount
+from company.company_model import Company
+from credit_note.models import CreditNote
+from customer.models import Customer
+from customer_payments.models import CustomerPayment, CustomerPaymentInvoice
+from fiscal_year.models import FiscalYear
+from invoice.models import Invoice
+from ledger.models import Ledger
+from multi_currency.models import Currency
+from .commissions import RatePlan, approve_statements, recalculate
+from .models import CommissionStatement, CommissionTier, Salesman
+
+
+class RatePlanTest(TestCase):
+    def test_progressive_tiers(self):
+        plan = RatePlan(base_rate=Decimal('2'), tiers=[(Decimal('20000'), Decimal('8')), (Decimal('10000'), Decimal('5'))])
+        self.assertEqual(plan.commission(Decimal('5000')), Decimal('100.00'))
+        self.assertEqual(plan.commission(Decimal('25000')), Decimal('1100.00'))
+        # Clawbacks are reversed at the base rate
+        self.assertEqual(plan.commission(Decimal('-1000')), Decimal('-20.00'))
+
+
+class CommissionStatementTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.salesman = self.create_salesman('SAL001', 'sam@example.com', '5.00')
+        self.customer = Customer.objects.create(
+            customer_code='CUST001', customer_name='Test Customer', salesman=self.salesman
+        )
+
+    def create_salesman(self, code, email, rate):
+        return Salesman.objects.create(
+            salesman_code=code, first_name='Sales', last_name=code, email=email, phone='0500000000',
+            hire_date=date(2020, 1, 1), commission_rate=Decimal(rate)
+        )
+
+    def paid_invoice(self, total, *payments, customer=None):
+        """An invoice settled by (payment date, amount) payments"""
+        customer = customer or self.customer
+        invoice = Invoice.objects.create(
+            invoice_date=date(2025, 1, 5), customer=customer, status='paid',
+            invoice_items=[{'sale_total': total}], created_by=self.user
+        )
+        for payment_date, amount in payments:
+            payment = CustomerPayment.objects.create(customer=customer, payment_date=payment_date, amount=Decimal(amount))
+            CustomerPaymentInvoice.objects.create(payment=payment, invoice=invoice, amount_received=Decimal(amount))
+        return invoice
+
+    def statements(self):
+        return {
+            (statement.salesman.salesman_code, statement.period): statement
+            for statement in CommissionStatement.objects.select_related('salesman')
+        }
+
+    def test_commission_follows_the_settling_payment(self):
+        self.paid_invoice('1000', (date(2025, 1, 20), '400'), (date(2025, 2, 5), '600'))
+        self.paid_invoice('500', (date(2025, 1, 25), '500'))
+        CommissionTier.objects.create(salesman=self.salesman, threshold=Decimal('800'), rate=Decimal('10'))
+
+        summary = recalculate(months=2, end=date(2025, 2, 28))
+
+        self.assertEqual(summary['statements'], 2)
+        statements = self.statements()
+        january = statements[('SAL001', date(2025, 1, 1))]
+        self.assertEqual((january.invoice_count, january.paid_sales, january.commission_amount),
+                         (1, Decimal('500.00'), Decimal('25.00')))
+        february = statements[('SAL001', date(2025, 2, 1))]
+        self.assertEqual((february.invoice_count, february.paid_sales), (1, Decimal('1000.00')))
+        self.assertEqual(february.commission_amount, Decimal('60.00'))
+
+    def test_credit_notes_are_clawed_back(self):
+        self.paid_invoice('2000', (date(2025, 3, 10), '2000'))
+        CreditNote.objects.create(date=date(2025, 3, 15), customer='Test Customer', amount=Decimal('300.00'))
+        CreditNote.objects.create(date=date(2025, 3, 15), customer='Unknown Customer', amount=Decimal('900.00'))
+
+        recalculate(months=1, end=date(2025, 3, 31))
+
+        statement = self.statements()[('SAL001', date(2025, 3, 1))]
+        self.assertEqual(statement.credit_notes, Decimal('300.00'))
+        self.assertEqual((statement.gross_commission, statement.clawback, statement.commission_amount),
+                         (Decimal('100.00'), Decimal('15.00'), Decimal('85.00')))
+
+    def test_approved_statements_are_kept(self):
+        self.paid_invoice('1000', (date(2025, 4, 10), '1000'))
+        recalculate(months=1, end=date(2025, 4, 30))
+        CommissionStatement.objects.update(status='approved')
+        self.paid_invoice('3000', (date(2025, 4, 12), '3000'))
+
+        summary = recalculate(months=1, end=date(2025, 4, 30))
+
+        self.assertEqual((summary['statements'], summary['skipped_approved']), (0, 1))
+        self.assertEqual(CommissionStatement.objects.get().paid_sales, Decimal('1000.00'))
+
+    def create_accounts(self):
+        """Commission expense and payable accounts, with a fiscal year covering 2025"""
+        company = Company.objects.create(
+            name='Test Company', code='TST', address='1 Test Street', phone='1234567', email='info@example.com'
+        )
+        currency = Currency.objects.create(code='AED', name='UAE Dirham', symbol='AED')
+        FiscalYear.objects.create(name='FY2025', start_date=date(2025, 1, 1), end_date=date(2025, 12, 31), status='active')
+        expense = ChartOfAccount.objects.create(
+            account_code='6200', name='Commission Expense', company=company, currency=currency,
+            account_type=AccountType.objects.create(name='Expenses', category='EXPENSE')
+        )
+        payable = ChartOfAccount.objects.create(
+            account_code='2200', name='Commission Payable', company=company, currency=currency,
+            account_type=AccountType.objects.create(name='Liabilities', category='LIABILITY')
+        )
+        return expense, payable
+
+    def test_approval_posts_one_journal_entry(self):
+        expense, payable = self.create_accounts()
+        other = self.create_salesman('SAL002', 'alex@example.com', '10.00')
+        other_customer = Customer.objects.create(customer_code='CUST002', customer_name='Other Customer', salesman=other)
+        self.paid_invoice('1000', (date(2025, 5, 10), '1000'))
+        self.paid_invoice('400', (date(2025, 5, 11), '400'), customer=other_customer)
+        recalculate(months=1, end=date(2025, 5, 31))
+
+        approved, message = approve_statements(CommissionStatement.objects.all(), expense, payable, self.user)
+
+        self.assertTrue(approved, message)
+        self.assertEqual(set(CommissionStatement.objects.values_list('status', flat=True)), {'approved'})
+        journal_entry = CommissionStatement.objects.first().journal_entry
+        self.assertEqual((journal_entry.date, journal_entry.status), (date(2025, 5, 31), 'posted'))
+        self.assertEqual(
+            sorted(Ledger.objects.filter(account=payable).values_list('amount', flat=True)),
+            [Decimal('40.00'), Decimal('50.00')]
+        )
+        self.assertEqual(Ledger.objects.get(account=expense).amount, Decimal('90.00'))
+        self.assertEqual(
+            approve_statements(CommissionStatement.objects.all(), expense, payable, self.user),
+            (False, "No draft commission statements to approve")
+        )
+
+    def test_netted_commission_posts_no_expense_line(self):
+        """Earnings and clawbacks that cancel out only move the payable between salesmen"""
+        expense, payable = self.create_accounts()
+        other = self.create_salesman('SAL002', 'alex@example.com', '10.00')
+        CommissionStatement.objects.create(salesman=self.salesman, period=date(2025, 6, 1), commission_amount=Decimal('50.00'))
+        CommissionStatement.objects.create(salesman=other, period=date(2025, 6, 1), commission_amount=Decimal('-50.00'))
+
+        approved, message = approve_statements(CommissionStatement.objects.all(), expense, payable, self.user)
+
+        self.assertTrue(approved, message)
+        journal_entry = CommissionStatement.objects.first().journal_entry
+        self.assertEqual(
+            sorted(journal_entry.lines.values_list('account__account_code', 'debit_amount', 'credit_amount')),
+            [('2200', Decimal('0.00'), Decimal('50.00')), ('2200', Decimal('50.00'), Decimal('0.00'))]
+        )
+        self.assertFalse(Ledger.objects.filter(account=expense).exists())
@@ -9,4 +9,7 @@ urlpatterns = [
     path('<int:pk>/', views.salesman_detail, name='salesman_detail'),
     path('<int:pk>/update/', views.salesman_update, name='salesman_update'),
     path('<int:pk>/delete/', views.salesman_delete, name='salesman_delete'),
+    path('commissions/', views.commission_statements, name='commission_statements'),
+    path('commissions/recalculate/', views.commission_recalculate, name='commission_recalculate'),
+    path('commissions/approve/', views.commission_approve, name='commission_approve'),
 ] 
\ No newline at end of file
@@ -1,9 +1,15 @@
+from datetime import datetime
+
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib import messages
+from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Q
-from .models import Salesman
-from .forms import SalesmanForm
+from django.db.models import Q, Sum
+from django.views.decorators.http import require_POST
+from .models import Salesman, CommissionStatement
+from .forms import SalesmanForm, CommissionApprovalForm
+from .commissions import DEFAULT_RECALCULATION_MONTHS, recalculate, approve_statements
 
 def salesman_list(request):
     """Display list of all salesmen with search and pagination"""
@@ -107,3 +113,87 @@ def salesman_delete(request, pk):
         'salesman': salesman
     }
     return render(request, 'salesman/salesman_confirm_delete.html', context)
+
+
+def _parse_month(value):
+    """First day of a YYYY-MM month, or None"""
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except (TypeError, ValueError):
+        return None
+
+
+@login_required
+def commission_statements(request):
+    """Monthly commission statements with recalculation and approval"""
+    period = _parse_month(request.GET.get('period', ''))
+    status_filter = request.GET.get('status', '')
+    
+    statements = CommissionStatement.objects.select_related('salesman', 'journal_entry')
+    if period:
+        statements = statements.filter(period=period)
+    if status_filter:
+        statements = statements.filter(status=status_filter)
+    
+    totals = statements.aggregate(
+        paid_sales=Sum('paid_sales'),
+        credit_notes=Sum('credit_notes'),
+        clawback=Sum('clawback'),
+        commission=Sum('commission_amount'),
+    )
+    
+    paginator = Paginator(statements, 25)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    context = {
+        'page_obj': page_obj,
+        'totals': totals,
+        'period': request.GET.get('period', '') if period else '',
+        'status_filter': status_filter,
+        'status_choices': CommissionStatement.STATUS_CHOICES,
+        'approval_form': CommissionApprovalForm(),
+        'default_months': DEFAULT_RECALCULATION_MONTHS,
+    }
+    return render(request, 'salesman/commission_statements.html', context)
+
+
+@login_required
+@require_POST
+def commission_recalculate(request):
+    """Rebuild the draft statements of recent months"""
+    try:
+        months = max(1, min(int(request.POST.get('months', DEFAULT_RECALCULATION_MONTHS)), 36))
+    except ValueError:
+        months = DEFAULT_RECALCULATION_MONTHS
+    summary = recalculate(months=months)
+    messages.success(
+        request,
+        f"Recalculated {summary['statements']} statements for {summary['start']:%b %Y} - {summary['end']:%b %Y}."
+    )
+    if summary['skipped_approved']:
+        messages.info(request, f"{summary['skipped_approved']} approved statements were left unchanged.")
+    return redirect('salesman:commission_statements')
+
+
+@login_required
+@require_POST
+def commission_approve(request):
+    """Approve the draft statements of a month into one payable journal"""
+    period = _parse_month(request.POST.get('period', ''))
+    form = CommissionApprovalForm(request.POST)
+    if not period:
+        messages.error(request, 'Select the month to approve.')
+    elif not form.is_valid():
+        messages.error(request, 'Select the commission expense and payable accounts.')
+    else:
+        success, message = approve_statements(
+            CommissionStatement.objects.filter(period=period),
+            form.cleaned_data['expense_account'],
+            form.cleaned_data['payable_account'],
+            request.user,
+        )
+        if success:
+            messages.success(request, message)
+        else:
+            messages.error(request, message)
+    return redirect(f"{reverse('salesman:commission_statements')}?period={request.POST.get('period', '')}")
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import StockTransfer, StockTransferItem, StockLedger
+from .models import StockTransfer, StockTransferItem, StockLedger, StockOnHand
 
 
 class StockTransferItemInline(admin.TabularInline):
@@ -192,17 +192,17 @@ class StockLedgerAdmin(admin.ModelAdmin):
     ]
     
     readonly_fields = [
-        'running_balance', 'total_value', 'created_at'
+        'running_balance', 'total_value', 'source', 'created_at'
     ]
     
     fieldsets = (
         ('Movement Information', {
             'fields': (
-                'movement_date', 'movement_type', 'reference_number'
+                'movement_date', 'movement_type', 'reference_number', 'source'
             )
         }),
         ('Item and Location', {
-            'fields': ('item', 'facility', 'location')
+            'fields': ('customer', 'item', 'facility', 'facility_location', 'location')
         }),
         ('Quantity Information', {
             'fields': ('quantity_in', 'quantity_out', 'running_balance')
@@ -236,3 +236,22 @@ class StockLedgerAdmin(admin.ModelAdmin):
     
     def has_delete_permission(self, request, obj=None):
         return False
+
+
+@admin.register(StockOnHand)
+class StockOnHandAdmin(admin.ModelAdmin):
+    """Read-only view of the on-hand table; quantities change through ledger entries"""
+    
+    list_display = ['item', 'customer', 'facility', 'location', 'batch_number', 'quantity', 'updated_at']
+    list_filter = ['facility']
+    search_fields = ['item__item_name', 'item__item_code', 'customer__customer_name', 'batch_number']
+    readonly_fields = ['customer', 'item', 'facility', 'location', 'batch_number', 'quantity', 'updated_at']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('item', 'customer', 'facility', 'location')
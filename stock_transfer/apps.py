@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class StockTransferConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stock_transfer'
+
+    def ready(self):
+        import stock_transfer.signals
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from stock_transfer.inventory import find_drift, fix_drift, sync_all
+
+
+class Command(BaseCommand):
+    help = 'Report (and optionally fix) stock on hand rows that drifted from the stock ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help='Backfill: build on-hand from the existing ledger, then post the movements of every GRN, '
+                 'putaway, delivery order, dispatch and transfer'
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Reset drifted on-hand rows to their ledger totals'
+        )
+
+    def handle(self, *args, **options):
+        if options['sync']:
+            # Documents are allocated against on-hand, so it must reflect the ledger first
+            fix_drift()
+            for label, count in sync_all().items():
+                self.stdout.write(f'{label}: {count} movements posted')
+        
+        drift = fix_drift() if options['fix'] else find_drift()
+        
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Stock on hand matches the stock ledger'))
+            return
+        
+        for key, stored, expected in sorted(drift, key=lambda row: (row[0].item_id, row[0].facility_id)):
+            self.stdout.write(
+                f'item {key.item_id} facility {key.facility_id} location {key.location_id or "-"} '
+                f'customer {key.customer_id or "-"} batch {key.batch_number or "-"}: '
+                f'stored {stored:,.2f}, expected {expected:,.2f}'
+            )
+        
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(drift)} stock on hand rows'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} stock on hand rows drifted; run with --fix to repair'))
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.23 on 2026-10-18 22:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.comparison
+
+
+def tag_transfer_entries(apps, schema_editor):
+    """Entries written by processed transfers belong to that transfer's postings"""
+    StockLedger = apps.get_model('stock_transfer', 'StockLedger')
+    transfer_ids = StockLedger.objects.filter(
+        stock_transfer__isnull=False, source=''
+    ).values_list('stock_transfer_id', flat=True).distinct()
+    for transfer_id in list(transfer_ids):
+        StockLedger.objects.filter(stock_transfer_id=transfer_id, source='').update(source=f'transfer:{transfer_id}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0003_item_cbm_item_country_of_origin_item_gross_weight_and_more'),
+        ('facility', '0002_facilitylocation'),
+        ('customer', '0010_customercreditexposure_customer_credit_check_mode'),
+        ('stock_transfer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockledger',
+            name='customer',
+            field=models.ForeignKey(blank=True, help_text='Owner of the stock', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='customer.customer'),
+        ),
+        migrations.AddField(
+            model_name='stockledger',
+            name='facility_location',
+            field=models.ForeignKey(blank=True, help_text='Storage location; empty for stock not yet put away', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='facility.facilitylocation'),
+        ),
+        migrations.AddField(
+            model_name='stockledger',
+            name='source',
+            field=models.CharField(blank=True, db_index=True, help_text='Posting document', max_length=50),
+        ),
+        migrations.CreateModel(
+            name='StockOnHand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_number', models.CharField(blank=True, default='', max_length=100)),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_on_hand', to='customer.customer')),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_on_hand', to='facility.facility')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_on_hand', to='items.item')),
+                ('location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_on_hand', to='facility.facilitylocation')),
+            ],
+            options={
+                'verbose_name': 'Stock On Hand',
+                'verbose_name_plural': 'Stock On Hand',
+                'ordering': ['item', 'facility', 'location', 'batch_number'],
+                'indexes': [models.Index(fields=['customer', 'item'], name='stock_trans_custome_d8eb71_idx'), models.Index(fields=['item', 'facility'], name='stock_trans_item_id_0ffe60_idx'), models.Index(fields=['location'], name='stock_trans_locatio_fd0458_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stockonhand',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce(models.F('customer'), models.Value(0)), models.F('item'), models.F('facility'), django.db.models.functions.comparison.Coalesce(models.F('location'), models.Value(0)), models.F('batch_number'), name='unique_stock_on_hand_key'),
+        ),
+        migrations.RunPython(tag_transfer_entries, migrations.RunPython.noop),
+    ]
@@ -2,8 +2,10 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
 from django.utils import timezone
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
 from decimal import Decimal
-from facility.models import Facility
+from facility.models import Facility, FacilityLocation
 from items.models import Item
 
 
@@ -117,8 +119,9 @@ class StockTransfer(models.Model):
         if not self.transfer_number:
             self.transfer_number = self.generate_transfer_number()
         
-        # Calculate totals from items
-        self.calculate_totals()
+        # Calculate totals from items (a new transfer has none yet)
+        if self.pk:
+            self.calculate_totals()
         
         super().save(*args, **kwargs)
     
@@ -276,8 +279,24 @@ class StockLedger(models.Model):
     reference_number = models.CharField(max_length=100, blank=True, help_text="Reference number (GRN, DO, Transfer, etc.)")
     
     # Item and Location
+    customer = models.ForeignKey(
+        'customer.Customer',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='stock_movements',
+        help_text="Owner of the stock"
+    )
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='stock_movements')
     facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='stock_movements')
+    facility_location = models.ForeignKey(
+        FacilityLocation,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='stock_movements',
+        help_text="Storage location; empty for stock not yet put away"
+    )
     location = models.CharField(max_length=100, blank=True, help_text="Specific location within facility")
     
     # Quantity Information
@@ -293,6 +312,9 @@ class StockLedger(models.Model):
     unit_cost = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, help_text="Unit cost at time of movement")
     total_value = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True, help_text="Total value of movement")
     
+    # Source document that posted the movement, e.g. "grn:12"; empty for manual entries
+    source = models.CharField(max_length=50, blank=True, db_index=True, help_text="Posting document")
+    
     # Related Transfer (if applicable)
     stock_transfer = models.ForeignKey(
         StockTransfer, 
@@ -368,3 +390,52 @@ class StockLedger(models.Model):
     def is_out_movement(self):
         """Check if this is an outgoing movement"""
         return self.movement_type in ['out', 'transfer_out', 'damage'] and self.quantity_out > 0
+
+
+class StockOnHand(models.Model):
+    """Current quantity per customer, item, facility, location and batch.
+
+    Maintained from StockLedger movements by stock_transfer.inventory; do not
+    edit quantities directly.
+    """
+    
+    customer = models.ForeignKey(
+        'customer.Customer',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='stock_on_hand'
+    )
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='stock_on_hand')
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='stock_on_hand')
+    location = models.ForeignKey(
+        FacilityLocation,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='stock_on_hand'
+    )
+    batch_number = models.CharField(max_length=100, blank=True, default='')
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['item', 'facility', 'location', 'batch_number']
+        verbose_name = "Stock On Hand"
+        verbose_name_plural = "Stock On Hand"
+        constraints = [
+            # Unowned and unlocated stock share one row per key, so NULLs are folded to 0
+            models.UniqueConstraint(
+                Coalesce(F('customer'), Value(0)), F('item'), F('facility'),
+                Coalesce(F('location'), Value(0)), F('batch_number'),
+                name='unique_stock_on_hand_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['customer', 'item']),
+            models.Index(fields=['item', 'facility']),
+            models.Index(fields=['location']),
+        ]
+    
+    def __str__(self):
+        return f"{self.item} @ {self.facility} - {self.quantity}"
@@ -0,0 +1,82 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .inventory import DOCUMENTS, StockKey, apply_on_hand_deltas, sync_document
+
+# Line models whose changes re-synchronize their document: (line model, document label, document field)
+DOCUMENT_LINES = [
+    ('grn.GRNItem', 'grn.grn', 'grn_id'),
+    ('delivery_order.DeliveryOrderItem', 'delivery_order.deliveryorder', 'delivery_order_id'),
+    ('dispatchnote.DispatchItem', 'dispatchnote.dispatchnote', 'dispatch_note_id'),
+    ('stock_transfer.StockTransferItem', 'stock_transfer.stocktransfer', 'transfer_id'),
+]
+# Deleting these cascades to the ledger and on-hand rows themselves, so nothing is reversed
+KEY_MODELS = {'customer.customer', 'items.item', 'facility.facility', 'facility.facilitylocation'}
+
+
+def _cascaded_from_key_model(origin):
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model._meta.label_lower in KEY_MODELS
+
+
+def _connect_documents():
+    for label in DOCUMENTS:
+        def sync(sender, instance, label=label, origin=None, **kwargs):
+            if not _cascaded_from_key_model(origin):
+                sync_document(label, instance.pk)
+        post_save.connect(sync, sender=label, weak=False, dispatch_uid=f'stock_sync_{label}_save')
+        post_delete.connect(sync, sender=label, weak=False, dispatch_uid=f'stock_sync_{label}_delete')
+
+    for line_label, label, field in DOCUMENT_LINES:
+        def sync_parent(sender, instance, label=label, field=field, origin=None, **kwargs):
+            if not _cascaded_from_key_model(origin):
+                sync_document(label, getattr(instance, field))
+        post_save.connect(sync_parent, sender=line_label, weak=False, dispatch_uid=f'stock_sync_{line_label}_save')
+        post_delete.connect(sync_parent, sender=line_label, weak=False, dispatch_uid=f'stock_sync_{line_label}_delete')
+
+
+_connect_documents()
+
+
+def _ledger_effect(customer_id, item_id, facility_id, location_id, batch_number, quantity_in, quantity_out):
+    return StockKey(customer_id, item_id, facility_id, location_id, batch_number or ''), quantity_in - quantity_out
+
+
+@receiver(pre_save, sender='stock_transfer.StockLedger')
+def remember_ledger_effect(sender, instance, **kwargs):
+    """Keep the stored movement of an edited entry so post_save can apply the difference"""
+    instance._stock_previous = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values_list(
+            'customer_id', 'item_id', 'facility_id', 'facility_location_id', 'batch_number', 'quantity_in', 'quantity_out'
+        ).first()
+        instance._stock_previous = _ledger_effect(*previous) if previous else None
+
+
+@receiver(post_save, sender='stock_transfer.StockLedger')
+def update_on_hand_on_ledger_save(sender, instance, **kwargs):
+    """Manual entries and adjustments; document postings are bulk inserted and applied by the inventory module"""
+    previous = getattr(instance, '_stock_previous', None)
+    instance._stock_previous = None
+    key, quantity = _ledger_effect(
+        instance.customer_id, instance.item_id, instance.facility_id, instance.facility_location_id,
+        instance.batch_number, instance.quantity_in, instance.quantity_out
+    )
+    deltas = {key: quantity}
+    if previous:
+        deltas[previous[0]] = deltas.get(previous[0], 0) - previous[1]
+    apply_on_hand_deltas(deltas)
+
+
+@receiver(post_delete, sender='stock_transfer.StockLedger')
+def update_on_hand_on_ledger_delete(sender, instance, origin=None, **kwargs):
+    if _cascaded_from_key_model(origin):
+        return
+    key, quantity = _ledger_effect(
+        instance.customer_id, instance.item_id, instance.facility_id, instance.facility_location_id,
+        instance.batch_number, instance.quantity_in, instance.quantity_out
+    )
+    apply_on_hand_deltas({key: -quantity})
@@ -1,3 +1,107 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from customer.models import Customer
+from delivery_order.models import DeliveryOrder, DeliveryOrderItem
+from facility.models import Facility
+from grn.models import GRN, GRNItem
+from items.models import Item
+from .inventory import (
+    ANY, StockKey, StockLine, allocate, available_quantity, find_drift, fix_drift, posted_by_source, sync_document
+)
+from .models import StockLedger, StockOnHand
+
+
+class StockOnHandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.customer = Customer.objects.create(customer_code='CUST001', customer_name='Test Customer')
+        self.facility = Facility.objects.create(
+            facility_code='WH01', facility_name='Main Warehouse', address='1 Dock Road',
+            city='Dubai', state='Dubai', postal_code='00000'
+        )
+        self.item = Item.objects.create(item_code='SKU-001', item_name='Test Item', barcode='1000000001')
+
+    def receive(self, quantity, batch_number=''):
+        grn = GRN.objects.create(
+            customer=self.customer, facility=self.facility, status='received', created_by=self.user
+        )
+        GRNItem.objects.create(
+            grn=grn, item=self.item, item_code=self.item.item_code, received_qty=quantity, batch_number=batch_number
+        )
+        return grn
+
+    def ship(self, quantity, status='shipped'):
+        delivery_order = DeliveryOrder.objects.create(
+            customer=self.customer, facility=self.facility, status=status, created_by=self.user
+        )
+        DeliveryOrderItem.objects.create(delivery_order=delivery_order, item=self.item, requested_qty=quantity)
+        return delivery_order
+
+    def test_documents_post_their_movements(self):
+        """Receipts add to on-hand, shipped delivery orders issue from it"""
+        grn = self.receive(Decimal('100'))
+        self.assertEqual(available_quantity(self.customer, self.item), Decimal('100'))
+
+        delivery_order = self.ship(Decimal('30'))
+        self.assertEqual(available_quantity(self.customer, self.item), Decimal('70'))
+        self.assertEqual(posted_by_source(f'do:{delivery_order.pk}'), {
+            StockKey(self.customer.pk, self.item.pk, self.facility.pk, None, ''): Decimal('-30')
+        })
+
+        line = grn.items.get()
+        line.received_qty = Decimal('120')
+        line.save()
+        self.assertEqual(available_quantity(self.customer, self.item), Decimal('90'))
+
+        delivery_order.status = 'cancelled'
+        delivery_order.save()
+        self.assertEqual(available_quantity(self.customer, self.item), Decimal('120'))
+        self.assertEqual(find_drift(), [])
+
+    def test_resync_of_unchanged_document_writes_nothing(self):
+        self.receive(Decimal('50'))
+        delivery_order = self.ship(Decimal('20'))
+        entries = StockLedger.objects.count()
+
+        self.assertEqual(sync_document('delivery_order.deliveryorder', delivery_order.pk), [])
+        self.assertEqual(StockLedger.objects.count(), entries)
+
+    def test_deleted_document_is_reversed(self):
+        grn = self.receive(Decimal('40'))
+        grn.delete()
+        self.assertEqual(available_quantity(self.customer, self.item), Decimal('0'))
+        self.assertEqual(find_drift(), [])
+
+    def test_allocate_reuses_earlier_allocation(self):
+        """An issue draws on the rows it already issued from before other stock"""
+        first = StockKey(self.customer.pk, self.item.pk, self.facility.pk, None, 'A')
+        second = StockKey(self.customer.pk, self.item.pk, self.facility.pk, None, 'B')
+        line = StockLine('issue', StockKey(self.customer.pk, self.item.pk, self.facility.pk, ANY, ANY), Decimal('10'))
+
+        deltas = allocate([line], {second: Decimal('-10')}, available={first: Decimal('25'), second: Decimal('5')})
+
+        self.assertEqual(dict(deltas), {second: Decimal('-10')})
+
+    def test_shortfall_is_booked_against_the_line(self):
+        line = StockLine('issue', StockKey(self.customer.pk, self.item.pk, self.facility.pk, ANY, ANY), Decimal('8'))
+        key = StockKey(self.customer.pk, self.item.pk, self.facility.pk, None, 'A')
+
+        deltas = allocate([line], {}, available={key: Decimal('5')})
+
+        self.assertEqual(dict(deltas), {
+            key: Decimal('-5'),
+            StockKey(self.customer.pk, self.item.pk, self.facility.pk, None, ''): Decimal('-3'),
+        })
+
+    def test_fix_drift_restores_on_hand_from_the_ledger(self):
+        self.receive(Decimal('60'))
+        StockOnHand.objects.update(quantity=Decimal('1'))
+        self.assertEqual(len(find_drift()), 1)
+
+        fix_drift()
+
+        self.assertEqual(find_drift(), [])
+        self.assertEqual(available_quantity(self.customer, self.item), Decimal('60'))
@@ -9,7 +9,8 @@ from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 import json
 
-from .models import StockTransfer, StockTransferItem, StockLedger
+from .models import StockTransfer, StockTransferItem, StockLedger, StockOnHand
+from .inventory import available_quantity
 from .forms import (
     StockTransferForm, StockTransferItemForm, StockTransferSearchForm,
     StockLedgerSearchForm, StockTransferApprovalForm, StockTransferProcessingForm,
@@ -214,12 +215,9 @@ def stock_transfer_process(request, pk):
     if request.method == 'POST':
         form = StockTransferProcessingForm(request.POST, instance=transfer)
         if form.is_valid():
-            # Process the transfer
+            # Completing the transfer posts its stock movements
             transfer.process(request.user)
             
-            # Create stock ledger entries
-            create_stock_ledger_entries(transfer, request.user)
-            
             messages.success(request, f'Stock transfer {transfer.transfer_number} processed successfully.')
             return redirect('stock_transfer:stock_transfer_detail', pk=transfer.pk)
     else:
@@ -313,17 +311,31 @@ def stock_ledger_list(request):
 def stock_balance_report(request):
     """Generate stock balance report"""
     
-    # Get current stock balances
-    balances = StockLedger.objects.values(
-        'item__item_name', 'item__item_code', 'facility__facility_name'
-    ).annotate(
-        current_balance=Sum('quantity_in') - Sum('quantity_out')
-    ).filter(
-        current_balance__gt=0
-    ).order_by('item__item_name', 'facility__facility_name')
+    search_query = request.GET.get('search', '')
+    facility_id = request.GET.get('facility', '')
+    
+    # Current stock from the on-hand table
+    balances = StockOnHand.objects.exclude(quantity=0).select_related('customer', 'item', 'facility', 'location')
+    if search_query:
+        balances = balances.filter(
+            Q(item__item_name__icontains=search_query) |
+            Q(item__item_code__icontains=search_query) |
+            Q(customer__customer_name__icontains=search_query) |
+            Q(batch_number__icontains=search_query)
+        )
+    if facility_id:
+        balances = balances.filter(facility_id=facility_id)
+    balances = balances.order_by('item__item_name', 'facility__facility_name', 'location__location_code', 'batch_number')
+    
+    paginator = Paginator(balances, 50)
+    page_obj = paginator.get_page(request.GET.get('page'))
     
     context = {
-        'balances': balances,
+        'page_obj': page_obj,
+        'total_quantity': balances.aggregate(total=Sum('quantity'))['total'] or 0,
+        'facilities': Facility.objects.order_by('facility_name'),
+        'search_query': search_query,
+        'facility_id': facility_id,
     }
     
     return render(request, 'stock_transfer/stock_balance_report.html', context)
@@ -408,58 +420,6 @@ def search_items(request):
 
 def get_available_quantity(item, facility_id):
     """Get available quantity for an item at a specific facility"""
-    # This is a placeholder implementation
-    # You would need to implement this based on your stock tracking system
-    
-    try:
-        # Get the latest stock balance for this item and facility
-        latest_entry = StockLedger.objects.filter(
-            item=item,
-            facility_id=facility_id
-        ).order_by('-movement_date', '-created_at').first()
-        
-        if latest_entry:
-            return latest_entry.running_balance
-        else:
-            return 0
-    except:
+    if not facility_id:
         return 0
-
-
-def create_stock_ledger_entries(transfer, user):
-    """Create stock ledger entries for a completed transfer"""
-    
-    for item in transfer.items.all():
-        # Create transfer out entry for source facility
-        StockLedger.objects.create(
-            movement_date=transfer.transfer_date,
-            movement_type='transfer_out',
-            reference_number=transfer.transfer_number,
-            item=item.item,
-            facility=transfer.source_facility,
-            location=item.source_location,
-            quantity_out=item.quantity,
-            unit_cost=item.unit_cost,
-            batch_number=item.batch_number,
-            serial_number=item.serial_number,
-            stock_transfer=transfer,
-            notes=f"Transfer to {transfer.destination_facility.facility_name}",
-            created_by=user
-        )
-        
-        # Create transfer in entry for destination facility
-        StockLedger.objects.create(
-            movement_date=transfer.transfer_date,
-            movement_type='transfer_in',
-            reference_number=transfer.transfer_number,
-            item=item.item,
-            facility=transfer.destination_facility,
-            location=item.destination_location,
-            quantity_in=item.quantity,
-            unit_cost=item.unit_cost,
-            batch_number=item.batch_number,
-            serial_number=item.serial_number,
-            stock_transfer=transfer,
-            notes=f"Transfer from {transfer.source_facility.facility_name}",
-            created_by=user
-        )
+    return available_quantity(item=item, facility=int(facility_id))
@@ -0,0 +1,277 @@
+"""
+Storage billing engine.
+
+Bills a storage period for many customers at once from StorageLog movements
+and charges.Charge rates. Every log of the billed customers up to the end of
+the period is loaded in one query and turned into a daily occupancy matrix
+per (customer, item) with NumPy: movements before the period form the
+opening balance, 'in' movements count from their day and 'out' movements
+from the day after (the dispatch day is still billed). 'transfer' movements
+relocate stock without changing what the customer occupies.
+
+A Charge applies from its effective date until the next Charge of the same
+customer, item and type takes over, so each charge row prices only its own
+window of days. Windows are summed from cumulative occupancy arrays, which
+keeps the pricing a handful of array lookups regardless of the number of
+customers:
+
+  - per_cbm_days: rate x volume-days
+  - per_weight_days: rate x weight-days
+  - per_sqmts_days: rate x quantity-days (as Charge.calculate_amount)
+  - weekly / monthly: rate x occupied days / 7 or / 30
+  - fixed: rate once when the item was stored during the window
+
+Invoices and their lines are written with bulk inserts.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+import pandas as pd
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import StorageInvoice, StorageInvoiceItem, StorageLog
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 1000
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+# Invoices that block billing the same customer and period again
+OPEN_INVOICE_STATUSES = ('draft', 'finalized')
+
+LOG_COLUMNS = [
+    'customer_id', 'item_id', 'location_id', 'quantity', 'weight', 'volume', 'activity_type', 'activity_date',
+]
+CHARGE_COLUMNS = ['customer_id', 'item_id', 'charge_type', 'rate', 'effective_date']
+ACTIVITY_SIGNS = {'in': 1.0, 'out': -1.0, 'transfer': 0.0}
+
+
+def to_money(value):
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def load_logs(period_to, customer_ids=None):
+    """Storage logs up to the end of the period as a DataFrame"""
+    logs = StorageLog.objects.filter(activity_date__date__lte=period_to)
+    if customer_ids is not None:
+        logs = logs.filter(customer_id__in=customer_ids)
+    rows = list(logs.order_by('activity_date', 'id').values_list(*LOG_COLUMNS))
+    frame = pd.DataFrame(rows, columns=LOG_COLUMNS)
+    for column in ('quantity', 'weight', 'volume'):
+        frame[column] = frame[column].astype('float64')
+    return frame
+
+
+def load_charges(period_to, customer_ids):
+    """Active charges of the customers that are effective by the end of the period"""
+    Charge = apps.get_model('charges', 'Charge')
+    rows = list(Charge.objects.filter(
+        customer_id__in=customer_ids, status='active', effective_date__lte=period_to
+    ).order_by('customer_id', 'item_id', 'charge_type', 'effective_date').values_list(*CHARGE_COLUMNS))
+    frame = pd.DataFrame(rows, columns=CHARGE_COLUMNS)
+    frame['rate'] = frame['rate'].astype('float64')
+    return frame
+
+
+def local_dates(moments):
+    """Calendar day of each timestamp in the current time zone, as the date filters see it"""
+    moments = pd.to_datetime(moments)
+    if settings.USE_TZ:
+        moments = moments.dt.tz_convert(timezone.get_current_timezone_name()).dt.tz_localize(None)
+    return moments.dt.normalize()
+
+
+def daily_occupancy(logs, period_from, period_to):
+    """Cumulative occupancy per (customer, item) key.
+
+    Returns (keys, cumulative) where keys is a DataFrame of customer_id,
+    item_id and the last location_id, and cumulative has shape
+    (4, len(keys), days + 1): running sums over the period's days of
+    quantity, volume, weight and occupied-day flags, so the total over days
+    [a, b) is cumulative[:, :, b] - cumulative[:, :, a].
+    """
+    days = (period_to - period_from).days + 1
+    key_codes, key_index = pd.MultiIndex.from_frame(logs[['customer_id', 'item_id']]).factorize()
+    key_frame = key_index.to_frame(index=False, name=['customer_id', 'item_id'])
+    # Where the stock was last logged names the invoice line
+    key_frame['location_id'] = logs.groupby(key_codes)['location_id'].last().to_numpy()
+
+    sign = logs['activity_type'].map(ACTIVITY_SIGNS).fillna(0).to_numpy()
+    log_days = (local_dates(logs['activity_date']) - pd.Timestamp(period_from)).dt.days.to_numpy()
+    # Issues stop billing from the following day
+    log_days = np.where(sign < 0, log_days + 1, log_days)
+    log_days = np.clip(log_days, 0, days)
+
+    deltas = np.zeros((3, len(key_frame), days + 1))
+    for position, column in enumerate(('quantity', 'volume', 'weight')):
+        np.add.at(deltas[position], (key_codes, log_days), sign * logs[column].to_numpy())
+    balances = np.clip(np.cumsum(deltas, axis=2)[:, :, :days], 0, None)
+    occupied = (balances[0] > 0).astype('float64')
+
+    daily = np.concatenate([balances, occupied[None, :, :]], axis=0)
+    cumulative = np.concatenate([np.zeros((4, len(key_frame), 1)), np.cumsum(daily, axis=2)], axis=2)
+    return key_frame, cumulative
+
+
+def price_charges(charges, keys, cumulative, period_from, period_to):
+    """Priced charge windows as a DataFrame, one row per charge rate in effect during the period"""
+    days = (period_to - period_from).days + 1
+    priced = charges.merge(keys.reset_index().rename(columns={'index': 'key'}), on=['customer_id', 'item_id'])
+    if priced.empty:
+        return priced
+
+    group = ['customer_id', 'item_id', 'charge_type']
+    start = (pd.to_datetime(priced['effective_date']) - pd.Timestamp(period_from)).dt.days
+    priced['start'] = start.clip(lower=0, upper=days)
+    # A charge is superseded by the next one of the same customer, item and type
+    priced['end'] = priced.groupby(group)['start'].shift(-1).fillna(days).astype('int64')
+    priced = priced[priced['end'] > priced['start']].copy()
+
+    key, window_start, window_end = priced['key'].to_numpy(), priced['start'].to_numpy(), priced['end'].to_numpy()
+    totals = cumulative[:, key, window_end] - cumulative[:, key, window_start]
+    priced['quantity_days'], priced['volume_days'], priced['weight_days'], priced['days'] = totals
+    priced = priced[priced['days'] > 0].copy()
+
+    rate, charge_type = priced['rate'], priced['charge_type']
+    priced['amount'] = np.select(
+        [
+            charge_type == 'per_cbm_days',
+            charge_type == 'per_weight_days',
+            charge_type == 'per_sqmts_days',
+            charge_type == 'weekly',
+            charge_type == 'monthly',
+        ],
+        [
+            rate * priced['volume_days'],
+            rate * priced['weight_days'],
+            rate * priced['quantity_days'],
+            rate * priced['days'] / 7,
+            rate * priced['days'] / 30,
+        ],
+        default=rate,
+    ).round(2)
+    return priced[priced['amount'] > 0]
+
+
+def _line_description(row, charge_labels, period_from):
+    window_from = period_from + timedelta(days=int(row.start))
+    window_to = period_from + timedelta(days=int(row.end) - 1)
+    measure = {
+        'per_cbm_days': f"{row.volume_days:,.2f} m³-days",
+        'per_weight_days': f"{row.weight_days:,.2f} kg-days",
+        'per_sqmts_days': f"{row.quantity_days:,.2f} unit-days",
+    }.get(row.charge_type, f"{int(row.days)} days stored")
+    return (
+        f"{charge_labels.get(row.charge_type, row.charge_type)} at {row.rate:,.2f}: {measure} "
+        f"({window_from:%d %b} - {window_to:%d %b %Y})"
+    )
+
+
+def next_invoice_numbers(count):
+    """Invoice numbers continuing the STIyyyymmNNNN sequence StorageInvoice.generate_invoice_number uses"""
+    now = timezone.now()
+    prefix = f"STI{now.year}{now.month:02d}"
+    last = StorageInvoice.objects.filter(invoice_number__startswith=prefix).order_by(
+        '-invoice_number'
+    ).values_list('invoice_number', flat=True).first()
+    try:
+        start = int(last[-4:]) + 1 if last else 1
+    except ValueError:
+        start = 1
+    return [f"{prefix}{sequence:04d}" for sequence in range(start, start + count)]
+
+
+def run_billing(period_from, period_to, invoice_date, user=None, customer_ids=None, notes=''):
+    """Create draft storage invoices for a billing period.
+
+    customer_ids limits the run to those customers; by default every customer
+    with storage logs is billed. Customers that already have a draft or
+    finalized invoice for the period are skipped. Returns a summary dict.
+    """
+    Charge = apps.get_model('charges', 'Charge')
+    logs = load_logs(period_to, customer_ids)
+    billed_customers = sorted(set(logs['customer_id']))
+    existing = set(StorageInvoice.objects.filter(
+        customer_id__in=billed_customers,
+        storage_period_from=period_from,
+        storage_period_to=period_to,
+        status__in=OPEN_INVOICE_STATUSES,
+    ).values_list('customer_id', flat=True))
+    logs = logs[~logs['customer_id'].isin(existing)]
+
+    summary = {
+        'invoices': 0,
+        'lines': 0,
+        'total': ZERO,
+        'skipped_existing': len(existing),
+        'customers_without_charges': 0,
+    }
+    if logs.empty:
+        return summary
+
+    keys, cumulative = daily_occupancy(logs, period_from, period_to)
+    charges = load_charges(period_to, sorted(set(keys['customer_id'])))
+    priced = price_charges(charges, keys, cumulative, period_from, period_to)
+    summary['customers_without_charges'] = len(set(keys['customer_id']) - set(priced['customer_id']))
+    if priced.empty:
+        return summary
+
+    charge_labels = dict(Charge.CHARGE_TYPES)
+    priced = priced.sort_values(['customer_id', 'item_id', 'charge_type', 'start'])
+    lines_by_customer = {}
+    for row in priced.itertuples(index=False):
+        days = int(row.days)
+        lines_by_customer.setdefault(int(row.customer_id), []).append(StorageInvoiceItem(
+            item_id=int(row.item_id),
+            location_id=int(row.location_id),
+            quantity=to_money(row.quantity_days / days),
+            weight=to_money(row.weight_days / days),
+            volume=to_money(row.volume_days / days),
+            storage_days=days,
+            charge_type=row.charge_type,
+            rate=to_money(row.rate),
+            line_total=to_money(row.amount),
+            description=_line_description(row, charge_labels, period_from),
+        ))
+
+    with transaction.atomic():
+        # Locked so concurrent runs do not hand out the same invoice numbers
+        list(StorageInvoice.objects.select_for_update().order_by('-invoice_number').values_list('id', flat=True)[:1])
+        customers = sorted(lines_by_customer)
+        invoices = []
+        for number, customer_id in zip(next_invoice_numbers(len(customers)), customers):
+            subtotal = sum((line.line_total for line in lines_by_customer[customer_id]), ZERO)
+            invoices.append(StorageInvoice(
+                invoice_number=number,
+                customer_id=customer_id,
+                invoice_date=invoice_date,
+                storage_period_from=period_from,
+                storage_period_to=period_to,
+                subtotal=subtotal,
+                tax_amount=ZERO,
+                total_amount=subtotal,
+                notes=notes,
+                generated_by=user,
+                status='draft',
+            ))
+        StorageInvoice.objects.bulk_create(invoices, batch_size=BULK_BATCH_SIZE)
+
+        lines = []
+        for invoice in invoices:
+            for line in lines_by_customer[invoice.customer_id]:
+                line.invoice = invoice
+                lines.append(line)
+        StorageInvoiceItem.objects.bulk_create(lines, batch_size=BULK_BATCH_SIZE)
+
+    summary.update(
+        invoices=len(invoices),
+        lines=len(lines),
+        total=sum((invoice.total_amount for invoice in invoices), ZERO),
+    )
+    logger.info(f'Storage billing {period_from} - {period_to}: {summary}')
+    return summary
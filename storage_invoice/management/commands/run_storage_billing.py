@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from storage_invoice.billing import run_billing
+
+
+class Command(BaseCommand):
+    help = 'Generate draft storage invoices for every customer with storage activity in a billing month'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            type=str,
+            help='Month to bill (YYYY-MM, default: previous month)'
+        )
+        parser.add_argument(
+            '--invoice-date',
+            type=str,
+            help='Invoice date (YYYY-MM-DD, default: today)'
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        if options['month']:
+            try:
+                period_from = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('Invalid --month. Use YYYY-MM format.')
+        else:
+            period_from = today.replace(day=1) - relativedelta(months=1)
+        period_to = period_from + relativedelta(months=1, days=-1)
+        if period_to > today:
+            raise CommandError('The billing month has not ended yet.')
+        
+        invoice_date = today
+        if options['invoice_date']:
+            try:
+                invoice_date = datetime.strptime(options['invoice_date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Invalid --invoice-date. Use YYYY-MM-DD format.')
+        
+        summary = run_billing(period_from, period_to, invoice_date)
+        
+        self.stdout.write(
+            f"{period_from:%b %Y}: {summary['invoices']} invoices, {summary['lines']} lines, "
+            f"total {summary['total']:,.2f}"
+        )
+        if summary['skipped_existing']:
+            self.stdout.write(self.style.WARNING(
+                f"{summary['skipped_existing']} customers already had an invoice for the month"
+            ))
+        if summary['customers_without_charges']:
+            self.stdout.write(self.style.WARNING(
+                f"{summary['customers_without_charges']} customers with stored goods have no active storage charges"
+            ))
+        self.stdout.write(self.style.SUCCESS('Storage billing completed'))
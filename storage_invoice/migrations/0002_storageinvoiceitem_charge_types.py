@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-18 22:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage_invoice', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='storageinvoiceitem',
+            name='charge_type',
+            field=models.CharField(choices=[('per_pallet_day', 'Per Pallet/Day'), ('per_cbm_day', 'Per CBM/Day'), ('per_item_day', 'Per Item/Day'), ('per_weight_day', 'Per Weight/Day'), ('fixed_monthly', 'Fixed Monthly'), ('per_cbm_days', 'Per CBM/Days'), ('per_sqmts_days', 'Per SQMTS/Days'), ('per_weight_days', 'Per Weight/Days'), ('fixed', 'Fixed'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], max_length=20, verbose_name='Charge Type'),
+        ),
+    ]
@@ -6,6 +6,7 @@ from decimal import Decimal
 from customer.models import Customer
 from facility.models import FacilityLocation
 from items.models import Item
+from charges.models import Charge
 
 class StorageCharges(models.Model):
     """Master table for storage charges per customer"""
@@ -317,6 +318,9 @@ class StorageInvoice(models.Model):
 
 class StorageInvoiceItem(models.Model):
     """Line items for storage invoice"""
+    # Manual lines use the storage charge types, billing runs the charges.Charge types
+    CHARGE_TYPES = StorageCharges.CHARGE_TYPES + Charge.CHARGE_TYPES
+    
     invoice = models.ForeignKey(
         StorageInvoice, 
         on_delete=models.CASCADE,
@@ -358,7 +362,7 @@ class StorageInvoiceItem(models.Model):
     storage_days = models.IntegerField(verbose_name="Storage Days")
     charge_type = models.CharField(
         max_length=20,
-        choices=StorageCharges.CHARGE_TYPES,
+        choices=CHARGE_TYPES,
         verbose_name="Charge Type"
     )
     rate = models.DecimalField(
@@ -1,3 +1,103 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils import timezone
+
+from charges.models import Charge
+from customer.models import Customer
+from facility.models import Facility, FacilityLocation
+from items.models import Item
+from .billing import run_billing
+from .models import StorageInvoice, StorageLog
+
+
+class StorageBillingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.customer = Customer.objects.create(customer_code='CUST001', customer_name='Test Customer')
+        facility = Facility.objects.create(
+            facility_code='WH01', facility_name='Main Warehouse', address='1 Dock Road',
+            city='Dubai', state='Dubai', postal_code='00000'
+        )
+        self.location = FacilityLocation.objects.create(
+            facility=facility, location_code='A-01', location_name='Rack A-01'
+        )
+        self.item = Item.objects.create(item_code='SKU-001', item_name='Test Item', barcode='1000000001')
+        self.period = (date(2025, 6, 1), date(2025, 6, 30))
+
+    def log(self, day, activity_type, quantity, volume='0', customer=None):
+        return StorageLog.objects.create(
+            customer=customer or self.customer, location=self.location, item=self.item,
+            quantity=Decimal(quantity), volume=Decimal(volume), activity_type=activity_type,
+            activity_date=timezone.make_aware(datetime(day.year, day.month, day.day, 12, 0))
+        )
+
+    def charge(self, charge_type, rate, effective_date=date(2025, 5, 1), customer=None):
+        return Charge.objects.create(
+            customer=customer or self.customer, item=self.item, charge_type=charge_type,
+            rate=Decimal(rate), effective_date=effective_date
+        )
+
+    def bill(self, **kwargs):
+        return run_billing(*self.period, invoice_date=date(2025, 7, 1), user=self.user, **kwargs)
+
+    def line_totals(self):
+        invoice = StorageInvoice.objects.get(customer=self.customer)
+        return invoice, list(invoice.items.order_by('charge_type', 'id').values_list('charge_type', 'line_total'))
+
+    def test_dispatch_day_is_billed(self):
+        """Stock counts from its receipt day up to and including the day it leaves"""
+        self.log(date(2025, 6, 11), 'in', '10')
+        self.log(date(2025, 6, 20), 'out', '10')
+        self.charge('per_sqmts_days', '1.00')
+        self.charge('weekly', '7.00')
+
+        summary = self.bill()
+
+        self.assertEqual(summary['invoices'], 1)
+        invoice, lines = self.line_totals()
+        self.assertEqual(lines, [('per_sqmts_days', Decimal('100.00')), ('weekly', Decimal('10.00'))])
+        self.assertEqual(invoice.total_amount, Decimal('110.00'))
+        self.assertEqual(invoice.items.get(charge_type='weekly').storage_days, 10)
+
+    def test_opening_balance_and_rate_change(self):
+        """Stock received before the period is billed from day one; a new rate takes over from its date"""
+        self.log(date(2025, 5, 20), 'in', '5', volume='1')
+        self.log(date(2025, 6, 10), 'transfer', '5', volume='1')
+        self.charge('per_cbm_days', '1.00')
+        self.charge('per_cbm_days', '2.00', effective_date=date(2025, 6, 16))
+        self.charge('monthly', '30.00')
+
+        self.bill()
+
+        invoice, lines = self.line_totals()
+        self.assertEqual(lines, [
+            ('monthly', Decimal('30.00')),
+            ('per_cbm_days', Decimal('15.00')),
+            ('per_cbm_days', Decimal('30.00')),
+        ])
+        self.assertEqual(invoice.total_amount, Decimal('75.00'))
+
+    def test_billed_customers_are_skipped(self):
+        other = Customer.objects.create(customer_code='CUST002', customer_name='Other Customer')
+        self.log(date(2025, 6, 1), 'in', '1')
+        self.log(date(2025, 6, 1), 'in', '1', customer=other)
+        self.charge('fixed', '25.00')
+
+        summary = self.bill()
+        self.assertEqual(summary['invoices'], 1)
+        self.assertEqual(summary['total'], Decimal('25.00'))
+        self.assertEqual(summary['customers_without_charges'], 1)
+
+        summary = self.bill()
+        self.assertEqual(summary['invoices'], 0)
+        self.assertEqual(summary['skipped_existing'], 1)
+        self.assertEqual(StorageInvoice.objects.count(), 1)
 
-# Create your tests here.
+    def test_run_limited_to_customers(self):
+        self.log(date(2025, 6, 1), 'in', '1')
+        self.charge('fixed', '25.00')
+        self.assertEqual(self.bill(customer_ids=[self.customer.pk + 1])['invoices'], 0)
+        self.assertEqual(self.bill(customer_ids=[self.customer.pk])['invoices'], 1)
@@ -11,15 +11,13 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 import json
 
-from .models import StorageInvoice, StorageInvoiceItem
+from .models import StorageInvoice
+from .billing import run_billing
 from .forms import (
     StorageInvoiceSearchForm, GenerateInvoiceForm,
     StorageInvoiceForm, StorageInvoiceItemForm, MonthSelectionForm,
     BulkInvoiceForm
 )
-from customer.models import Customer
-from facility.models import FacilityLocation
-from items.models import Item
 
 @login_required
 def storage_invoice_list(request):
@@ -144,74 +142,40 @@ def generate_invoice(request):
             invoice_date = form.cleaned_data['invoice_date']
             notes = form.cleaned_data.get('notes', '')
             
-            # Determine customers to process
+            # Determine customers to process; all customers means everyone with storage activity
             if customer_selection == 'all':
-                customers = Customer.objects.all()
+                customer_ids = None
             else:
                 specific_customer = form.cleaned_data.get('specific_customer')
                 if specific_customer:
-                    customers = [specific_customer]
+                    customer_ids = [specific_customer.pk]
                 else:
                     messages.error(request, 'Please select a specific customer.')
                     return redirect('storage_invoice:generate_invoice')
             
-            generated_count = 0
+            summary = run_billing(
+                storage_period_from,
+                storage_period_to,
+                invoice_date,
+                user=request.user,
+                customer_ids=customer_ids,
+                notes=notes,
+            )
             
-            for customer in customers:
-                # Check if invoice already exists for this customer and period
-                existing_invoice = StorageInvoice.objects.filter(
-                    customer=customer,
-                    storage_period_from=storage_period_from,
-                    storage_period_to=storage_period_to,
-                    status__in=['draft', 'finalized']
-                ).first()
-                
-                if existing_invoice:
-                    messages.warning(request, f'Invoice already exists for {customer.customer_name} for this period.')
-                    continue
-                
-                # Create invoice
-                invoice = StorageInvoice.objects.create(
-                    customer=customer,
-                    invoice_date=invoice_date,
-                    storage_period_from=storage_period_from,
-                    storage_period_to=storage_period_to,
-                    notes=notes,
-                    generated_by=request.user,
-                    status='draft'
-                )
-                
-                # Calculate storage days
-                storage_days = (storage_period_to - storage_period_from).days + 1
-                
-                # Create sample line items (you can modify this based on your business logic)
-                # For now, we'll create a simple line item
-                sample_item = Item.objects.first()
-                sample_location = FacilityLocation.objects.first()
-                
-                if sample_item and sample_location:
-                    StorageInvoiceItem.objects.create(
-                        invoice=invoice,
-                        item=sample_item,
-                        location=sample_location,
-                        quantity=Decimal('1.00'),
-                        weight=Decimal('10.00'),
-                        volume=Decimal('1.00'),
-                        storage_days=storage_days,
-                        charge_type='per_pallet_day',
-                        rate=Decimal('5.00'),
-                        line_total=Decimal('5.00') * storage_days
-                    )
-                
-                # Calculate totals
-                invoice.calculate_totals()
-                generated_count += 1
+            if summary['skipped_existing']:
+                messages.warning(request, f"{summary['skipped_existing']} customer(s) already have an invoice for this period.")
+            if summary['customers_without_charges']:
+                messages.warning(request, f"{summary['customers_without_charges']} customer(s) with stored goods have no active storage charges.")
             
-            if generated_count > 0:
-                messages.success(request, f'Successfully generated {generated_count} invoice(s).')
+            if summary['invoices'] > 0:
+                messages.success(
+                    request,
+                    f"Successfully generated {summary['invoices']} invoice(s) with {summary['lines']} line(s), "
+                    f"totalling {summary['total']:,.2f}."
+                )
                 return redirect('storage_invoice:storage_invoice_list')
             else:
-                messages.error(request, 'No invoices were generated. Please check your settings.')
+                messages.error(request, 'No invoices were generated. Please check the storage logs and charges for this period.')
     else:
         form = GenerateInvoiceForm()
     
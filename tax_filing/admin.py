@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import TaxFilingReport, TaxFilingTransaction, TaxFilingValidation, TaxFilingExport, TaxFilingSettings
+from .models import (
+    TaxFilingReport, TaxFilingTransaction, TaxFilingValidation, TaxFilingExport, TaxFilingSettings,
+    VATReturnLine
+)
 
 
 @admin.register(TaxFilingReport)
@@ -154,3 +157,14 @@ class TaxFilingSettingsAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(VATReturnLine)
+class VATReturnLineAdmin(admin.ModelAdmin):
+    list_display = [
+        'report', 'box', 'direction', 'vat_rate', 'taxable_amount',
+        'vat_amount', 'document_count', 'created_at'
+    ]
+    list_filter = ['box', 'direction', 'vat_rate']
+    search_fields = ['report__report_name']
+    readonly_fields = ['id', 'created_at']
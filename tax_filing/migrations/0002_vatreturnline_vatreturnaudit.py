@@ -0,0 +1,52 @@
+# Generated by Django 4.2.23 on 2026-10-18 21:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tax_filing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VATReturnLine',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('box', models.CharField(choices=[('1', 'Box 1 - Standard rated supplies'), ('3', 'Box 3 - Supplies subject to reverse charge'), ('4', 'Box 4 - Zero rated supplies'), ('5', 'Box 5 - Exempt supplies'), ('9', 'Box 9 - Standard rated expenses'), ('10', 'Box 10 - Reverse charge recoverable')], max_length=5)),
+                ('direction', models.CharField(choices=[('output', 'Output Tax'), ('input', 'Input Tax'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('vat_rate', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('taxable_amount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('vat_amount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('document_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='return_lines', to='tax_filing.taxfilingreport')),
+            ],
+            options={
+                'verbose_name': 'VAT Return Line',
+                'verbose_name_plural': 'VAT Return Lines',
+                'ordering': ['report', 'box', 'direction', 'vat_rate'],
+                'unique_together': {('report', 'box', 'direction', 'vat_rate')},
+            },
+        ),
+        migrations.CreateModel(
+            name='VATReturnAudit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField(default=0)),
+                ('document_count', models.PositiveIntegerField(default=0)),
+                ('document_ids', models.BinaryField()),
+                ('line', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audit_chunks', to='tax_filing.vatreturnline')),
+            ],
+            options={
+                'verbose_name': 'VAT Return Audit',
+                'verbose_name_plural': 'VAT Return Audits',
+                'ordering': ['line', 'sequence'],
+                'unique_together': {('line', 'sequence')},
+            },
+        ),
+    ]
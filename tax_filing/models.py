@@ -205,3 +205,71 @@ class TaxFilingSettings(models.Model):
     
     def __str__(self):
         return f"Tax Filing Settings - {self.tax_authority_name}"
+
+
+class VATReturnLine(models.Model):
+    """Model for aggregated VAT return lines grouped by box, direction and rate"""
+    BOX_CHOICES = [
+        ('1', 'Box 1 - Standard rated supplies'),
+        ('3', 'Box 3 - Supplies subject to reverse charge'),
+        ('4', 'Box 4 - Zero rated supplies'),
+        ('5', 'Box 5 - Exempt supplies'),
+        ('9', 'Box 9 - Standard rated expenses'),
+        ('10', 'Box 10 - Reverse charge recoverable'),
+    ]
+    
+    DIRECTIONS = [
+        ('output', 'Output Tax'),
+        ('input', 'Input Tax'),
+        ('adjustment', 'Adjustment'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    report = models.ForeignKey(TaxFilingReport, on_delete=models.CASCADE, related_name='return_lines')
+    box = models.CharField(max_length=5, choices=BOX_CHOICES)
+    direction = models.CharField(max_length=20, choices=DIRECTIONS)
+    vat_rate = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    taxable_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    vat_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    total_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    document_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['report', 'box', 'direction', 'vat_rate']
+        unique_together = ['report', 'box', 'direction', 'vat_rate']
+        verbose_name = 'VAT Return Line'
+        verbose_name_plural = 'VAT Return Lines'
+    
+    def __str__(self):
+        return f"{self.get_box_display()} ({self.get_direction_display()} @ {self.vat_rate}%)"
+    
+    def get_document_ids(self):
+        """Return the IDs of all tax transactions contributing to this line"""
+        from .vat_computation import unpack_document_ids
+        
+        document_ids = []
+        for chunk in self.audit_chunks.order_by('sequence').values_list('document_ids', flat=True):
+            document_ids.extend(unpack_document_ids(chunk))
+        return document_ids
+
+
+class VATReturnAudit(models.Model):
+    """Model for the compact audit trail behind a VAT return line.
+    
+    Contributing tax transaction IDs are stored as packed 16-byte UUIDs,
+    split across rows of at most AUDIT_CHUNK_SIZE documents.
+    """
+    line = models.ForeignKey(VATReturnLine, on_delete=models.CASCADE, related_name='audit_chunks')
+    sequence = models.PositiveIntegerField(default=0)
+    document_count = models.PositiveIntegerField(default=0)
+    document_ids = models.BinaryField()
+    
+    class Meta:
+        ordering = ['line', 'sequence']
+        unique_together = ['line', 'sequence']
+        verbose_name = 'VAT Return Audit'
+        verbose_name_plural = 'VAT Return Audits'
+    
+    def __str__(self):
+        return f"{self.line} - chunk {self.sequence} ({self.document_count} documents)"
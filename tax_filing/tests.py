@@ -1,3 +1,118 @@
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+
+from customer.models import Customer
+from tax_settings.models import TaxJurisdiction, TaxRate, TaxTransaction, TaxType
+from .models import TaxFilingReport
+from .vat_computation import AUDIT_CHUNK_SIZE, VATComputationEngine, pack_document_ids, unpack_document_ids
+
+
+class VATComputationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        jurisdiction = TaxJurisdiction.objects.create(name='United Arab Emirates', code='AE')
+        self.rates = {}
+        for tax_type, percentage in (('standard_vat', '5.00'), ('zero_rated', '0.00'), ('reverse_charge', '5.00')):
+            kind = TaxType.objects.create(name=tax_type, code=tax_type.upper(), tax_type=tax_type)
+            self.rates[tax_type] = TaxRate.objects.create(
+                name=tax_type, rate_percentage=Decimal(percentage), tax_type=kind,
+                jurisdiction=jurisdiction, effective_from=date(2025, 1, 1)
+            )
+        self.customer = Customer.objects.create(customer_code='CUST001', customer_name='Test Customer')
+        self.number = 0
+
+    def add(self, transaction_type, tax_type, taxable, customer=None, document_date=date(2025, 1, 15)):
+        self.number += 1
+        rate = self.rates[tax_type]
+        taxable = Decimal(taxable)
+        tax = taxable * rate.rate_percentage / 100
+        return TaxTransaction.objects.create(
+            transaction_type=transaction_type, document_type='Invoice', document_number=f'DOC-{self.number}',
+            document_date=document_date, customer=customer, supplier_name='' if customer else 'Supplier LLC',
+            tax_rate=rate, taxable_amount=taxable, tax_amount=tax, total_amount=taxable + tax
+        )
+
+    def line_totals(self, lines):
+        return {
+            (line['box'], line['direction'], line['vat_rate']): (line['vat_amount'], line['document_count'])
+            for line in lines
+        }
+
+    def test_lines_group_by_box_direction_and_rate(self):
+        """Sales, purchases and special tax types land in their return boxes"""
+        self.add('sale', 'standard_vat', '1000', customer=self.customer)
+        self.add('sale', 'standard_vat', '200', customer=self.customer)
+        self.add('sale', 'zero_rated', '300', customer=self.customer)
+        self.add('purchase', 'standard_vat', '400')
+        self.add('purchase', 'reverse_charge', '100')
+        self.add('refund', 'standard_vat', '-100', customer=self.customer)
+
+        lines = VATComputationEngine(TaxTransaction.objects.all()).compute_lines()
+
+        self.assertEqual(self.line_totals(lines), {
+            ('1', 'adjustment', Decimal('5.00')): (Decimal('-5.00'), 1),
+            ('1', 'output', Decimal('5.00')): (Decimal('60.00'), 2),
+            ('10', 'input', Decimal('5.00')): (Decimal('5.00'), 1),
+            ('4', 'output', Decimal('0.00')): (Decimal('0.00'), 1),
+            ('9', 'input', Decimal('5.00')): (Decimal('20.00'), 1),
+        })
+        totals = VATComputationEngine.totals_by_direction(lines)
+        self.assertEqual(totals['output'], {'vat_amount': Decimal('60.00'), 'document_count': 3})
+        self.assertEqual(totals['input'], {'vat_amount': Decimal('25.00'), 'document_count': 2})
+
+    def test_document_ids_cover_every_line(self):
+        documents = [
+            self.add('sale', 'standard_vat', '100', customer=self.customer),
+            self.add('sale', 'zero_rated', '100', customer=self.customer),
+        ]
+        engine = VATComputationEngine(TaxTransaction.objects.all())
+
+        packed = engine.document_ids_by_line()
+
+        self.assertEqual(set(packed), {(line['box'], line['direction'], line['vat_rate']) for line in engine.compute_lines()})
+        self.assertEqual(
+            sorted(document_id for blob in packed.values() for document_id in unpack_document_ids(blob)),
+            sorted(document.pk for document in documents)
+        )
+
+    def test_packed_ids_split_into_audit_chunks(self):
+        ids = [uuid.uuid4() for _ in range(AUDIT_CHUNK_SIZE + 1)]
+        chunks = list(VATComputationEngine.chunk_packed_ids(pack_document_ids(ids)))
+        self.assertEqual([(sequence, count) for sequence, count, _ in chunks], [(0, AUDIT_CHUNK_SIZE), (1, 1)])
+        self.assertEqual(unpack_document_ids(b''.join(chunk for _, _, chunk in chunks)), ids)
+
+    def test_generate_report_writes_lines_audit_and_totals(self):
+        sale = self.add('sale', 'standard_vat', '1000', customer=self.customer)
+        self.add('purchase', 'standard_vat', '400')
+        self.add('sale', 'standard_vat', '500', customer=self.customer, document_date=date(2024, 12, 31))
+        report = TaxFilingReport.objects.create(
+            report_name='January 2025', start_date=date(2025, 1, 1), end_date=date(2025, 1, 31)
+        )
+
+        response = self.client.post(reverse('tax_filing:generate_report', args=[report.pk]))
+        self.assertEqual(response.status_code, 302)
+
+        report.refresh_from_db()
+        self.assertEqual(report.status, 'generated')
+        self.assertEqual(
+            (report.total_output_tax, report.total_input_tax, report.net_tax_payable),
+            (Decimal('50.00'), Decimal('20.00'), Decimal('30.00'))
+        )
+        self.assertEqual(report.transactions.count(), 2)
+        # The supplier has no VAT number on file
+        self.assertTrue(report.has_missing_vat_numbers)
+
+        output_line = report.return_lines.get(box='1')
+        self.assertEqual(output_line.get_document_ids(), [sale.pk])
+        drilldown = self.client.get(reverse('tax_filing:box_drilldown', args=[report.pk, '1'])).json()
+        self.assertEqual([document['document_number'] for document in drilldown['documents']], ['DOC-1'])
 
-# Create your tests here.
+        # Generating again replaces the earlier lines
+        self.client.post(reverse('tax_filing:generate_report', args=[report.pk]))
+        self.assertEqual(report.return_lines.count(), 2)
@@ -17,6 +17,7 @@ urlpatterns = [
     path('reports/<uuid:pk>/transactions/', views.tax_filing_transactions, name='transactions'),
     path('reports/<uuid:pk>/validations/', views.tax_filing_validations, name='validations'),
     path('reports/<uuid:pk>/export/', views.export_tax_filing, name='export_report'),
+    path('reports/<uuid:pk>/boxes/<str:box>/', views.tax_filing_box_drilldown, name='box_drilldown'),
     
     # API
     path('api/', views.tax_filing_api, name='api'),
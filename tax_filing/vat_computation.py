@@ -0,0 +1,151 @@
+"""
+VAT computation engine shared by the tax summary and tax filing reports.
+
+Output and input VAT are grouped by return box, direction and rate in a single
+SQL aggregate instead of walking every document in Python. The documents that
+contribute to each return line are kept as packed 16-byte UUIDs so a box can be
+drilled into without rescanning the period.
+"""
+import uuid
+from decimal import Decimal
+
+from django.db.models import Case, When, Value, CharField, DecimalField, F, Sum, Count, Q
+from django.db.models.functions import Coalesce
+
+
+# TaxTransaction.transaction_type -> VAT return direction
+DIRECTION_BY_TRANSACTION_TYPE = {
+    'sale': 'output',
+    'purchase': 'input',
+    'refund': 'adjustment',
+    'adjustment': 'adjustment',
+}
+
+# (direction, TaxType.tax_type) -> VAT return box. Unlisted tax types fall back
+# on the standard rated box of their direction.
+BOX_BY_DIRECTION_AND_TAX_TYPE = {
+    ('output', 'reverse_charge'): '3',
+    ('output', 'zero_rated'): '4',
+    ('output', 'exempt'): '5',
+    ('input', 'reverse_charge'): '10',
+}
+DEFAULT_BOX_BY_DIRECTION = {
+    'output': '1',
+    'input': '9',
+    'adjustment': '1',
+}
+
+# Number of document IDs packed into a single audit row
+AUDIT_CHUNK_SIZE = 4096
+UUID_BYTES = 16
+
+
+def pack_document_ids(document_ids):
+    """Pack an iterable of UUIDs into a compact bytes blob"""
+    return b''.join(document_id.bytes for document_id in document_ids)
+
+
+def unpack_document_ids(blob):
+    """Unpack a blob produced by pack_document_ids back into UUIDs"""
+    blob = bytes(blob or b'')
+    return [uuid.UUID(bytes=blob[i:i + UUID_BYTES]) for i in range(0, len(blob), UUID_BYTES)]
+
+
+class VATComputationEngine:
+    """Aggregates tax transactions into VAT return lines"""
+
+    def __init__(self, queryset):
+        self.queryset = queryset.filter(
+            transaction_type__in=DIRECTION_BY_TRANSACTION_TYPE.keys()
+        ).annotate(
+            direction=self._direction_expression(),
+            box=self._box_expression(),
+            # Documents without a rate are reported at 0%, so they share the 0% line
+            vat_rate=Coalesce(
+                F('tax_rate__rate_percentage'), Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=5, decimal_places=2)
+            ),
+        )
+
+    @staticmethod
+    def _direction_expression():
+        return Case(
+            *[When(transaction_type=transaction_type, then=Value(direction))
+              for transaction_type, direction in DIRECTION_BY_TRANSACTION_TYPE.items()],
+            output_field=CharField(),
+        )
+
+    @staticmethod
+    def _box_expression():
+        whens = []
+        for (direction, tax_type), box in BOX_BY_DIRECTION_AND_TAX_TYPE.items():
+            transaction_types = [t for t, d in DIRECTION_BY_TRANSACTION_TYPE.items() if d == direction]
+            whens.append(When(
+                Q(transaction_type__in=transaction_types) & Q(tax_rate__tax_type__tax_type=tax_type),
+                then=Value(box),
+            ))
+        for direction, box in DEFAULT_BOX_BY_DIRECTION.items():
+            transaction_types = [t for t, d in DIRECTION_BY_TRANSACTION_TYPE.items() if d == direction]
+            whens.append(When(transaction_type__in=transaction_types, then=Value(box)))
+        return Case(*whens, output_field=CharField())
+
+    def compute_lines(self):
+        """Return one aggregated row per (box, direction, vat rate)"""
+        zero = Value(Decimal('0.00'))
+        rows = self.queryset.values(
+            'box', 'direction', 'vat_rate'
+        ).annotate(
+            taxable_amount=Coalesce(Sum('taxable_amount'), zero),
+            vat_amount=Coalesce(Sum('tax_amount'), zero),
+            total_amount=Coalesce(Sum('total_amount'), zero),
+            document_count=Count('id'),
+        ).order_by('box', 'direction', 'vat_rate')
+
+        return [
+            {
+                'box': row['box'],
+                'direction': row['direction'],
+                'vat_rate': row['vat_rate'],
+                'taxable_amount': row['taxable_amount'],
+                'vat_amount': row['vat_amount'],
+                'total_amount': row['total_amount'],
+                'document_count': row['document_count'],
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def totals_by_direction(lines):
+        """Collapse computed lines into VAT and document totals per direction"""
+        totals = {
+            direction: {'vat_amount': Decimal('0.00'), 'document_count': 0}
+            for direction in DEFAULT_BOX_BY_DIRECTION
+        }
+        for line in lines:
+            totals[line['direction']]['vat_amount'] += line['vat_amount']
+            totals[line['direction']]['document_count'] += line['document_count']
+        return totals
+
+    def document_ids_by_line(self):
+        """
+        Map each (box, direction, vat rate) key to the packed IDs of its documents.
+
+        Only the grouping columns and primary keys are streamed from the database,
+        so no model instances are built.
+        """
+        packed = {}
+        rows = self.queryset.values_list(
+            'box', 'direction', 'vat_rate', 'id'
+        ).order_by().iterator(chunk_size=5000)
+        for box, direction, rate, document_id in rows:
+            key = (box, direction, rate)
+            packed.setdefault(key, bytearray()).extend(document_id.bytes)
+        return packed
+
+    @staticmethod
+    def chunk_packed_ids(blob):
+        """Split a packed ID blob into audit sized chunks"""
+        step = AUDIT_CHUNK_SIZE * UUID_BYTES
+        for sequence, start in enumerate(range(0, len(blob), step)):
+            chunk = bytes(blob[start:start + step])
+            yield sequence, len(chunk) // UUID_BYTES, chunk
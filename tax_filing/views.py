@@ -12,13 +12,18 @@ from django.template.loader import render_to_string
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.db.models.functions import Coalesce
+from django.db import transaction as db_transaction
 import json
 from decimal import Decimal
 from datetime import datetime, timedelta
 
-from .models import TaxFilingReport, TaxFilingTransaction, TaxFilingValidation, TaxFilingExport, TaxFilingSettings
+from .models import (
+    TaxFilingReport, TaxFilingTransaction, TaxFilingValidation, TaxFilingExport, TaxFilingSettings,
+    VATReturnLine, VATReturnAudit
+)
 from .forms import TaxFilingReportForm, TaxFilingFilterForm, TaxFilingExportForm, TaxFilingSearchForm, TaxFilingValidationForm, TaxFilingSettingsForm
 from tax_settings.models import TaxTransaction
+from .vat_computation import VATComputationEngine
 
 
 @login_required
@@ -225,103 +230,102 @@ def generate_tax_filing(request, pk):
             document_date__lte=report.end_date,
             currency=report.currency
         )
+        engine = VATComputationEngine(transactions)
         
-        # Clear existing transactions for this report
-        report.transactions.all().delete()
-        report.validations.all().delete()
-        
-        # Process transactions
-        output_tax_total = Decimal('0.00')
-        input_tax_total = Decimal('0.00')
-        adjustment_tax_total = Decimal('0.00')
-        output_count = 0
-        input_count = 0
-        adjustment_count = 0
-        
-        validation_issues = []
-        
-        for transaction in transactions:
-            # Determine transaction type
-            if transaction.transaction_type == 'sale':
-                transaction_type = 'output'
-                output_tax_total += transaction.tax_amount or Decimal('0.00')
-                output_count += 1
-            elif transaction.transaction_type == 'purchase':
-                transaction_type = 'input'
-                input_tax_total += transaction.tax_amount or Decimal('0.00')
-                input_count += 1
-            elif transaction.transaction_type in ['refund', 'adjustment']:
-                transaction_type = 'adjustment'
-                adjustment_tax_total += transaction.tax_amount or Decimal('0.00')
-                adjustment_count += 1
-            else:
-                continue
+        with db_transaction.atomic():
+            # Clear existing transactions for this report
+            report.transactions.all().delete()
+            report.validations.all().delete()
+            report.return_lines.all().delete()
             
-            # Get party name
-            if transaction.customer:
-                party_name = transaction.customer.name if hasattr(transaction.customer, 'name') else str(transaction.customer)
-            else:
-                party_name = transaction.supplier_name or 'Unknown'
+            # Aggregate VAT per box, direction and rate in SQL
+            lines = engine.compute_lines()
+            totals = VATComputationEngine.totals_by_direction(lines)
             
-            # Check for validation issues
-            has_vat_number = bool(transaction.customer and hasattr(transaction.customer, 'tax_registration_number') and transaction.customer.tax_registration_number)
-            vat_rate_matches = True  # TODO: Implement VAT rate validation
+            return_lines = {}
+            for line in lines:
+                return_lines[(line['box'], line['direction'], line['vat_rate'])] = VATReturnLine(
+                    report=report, **line
+                )
+            VATReturnLine.objects.bulk_create(return_lines.values(), batch_size=500)
             
-            # Create tax filing transaction
-            filing_transaction = TaxFilingTransaction.objects.create(
-                report=report,
-                transaction_date=transaction.document_date,
-                invoice_number=transaction.document_number,
-                party_name=party_name,
-                vat_number='',  # TODO: Add VAT number from customer/supplier profile
-                transaction_type=transaction_type,
-                adjustment_type='' if transaction_type != 'adjustment' else 'correction',
-                taxable_amount=transaction.taxable_amount or Decimal('0.00'),
-                vat_percentage=transaction.tax_rate.rate_percentage if transaction.tax_rate else Decimal('0.00'),
-                vat_amount=transaction.tax_amount or Decimal('0.00'),
-                total_amount=transaction.total_amount or Decimal('0.00'),
-                currency=transaction.currency,
-                original_transaction_id=str(transaction.id),
-                original_transaction_type=transaction.transaction_type,
-                has_vat_number=has_vat_number,
-                vat_rate_matches=vat_rate_matches
-            )
+            # Audit trail mapping each return line to its contributing documents
+            audit_rows = []
+            for key, packed_ids in engine.document_ids_by_line().items():
+                for sequence, document_count, chunk in VATComputationEngine.chunk_packed_ids(packed_ids):
+                    audit_rows.append(VATReturnAudit(
+                        line=return_lines[key],
+                        sequence=sequence,
+                        document_count=document_count,
+                        document_ids=chunk
+                    ))
+            VATReturnAudit.objects.bulk_create(audit_rows, batch_size=100)
             
-            # Create validation issues if needed
-            if not has_vat_number:
-                TaxFilingValidation.objects.create(
-                    report=report,
-                    transaction=filing_transaction,
-                    validation_type='missing_vat_number',
-                    severity='medium',
-                    description=f'Missing VAT number for {party_name}',
-                    field_name='vat_number'
-                )
-                validation_issues.append('missing_vat_number')
+            # Document level rows, streamed without building TaxTransaction instances
+            filing_transactions = []
+            validations = []
+            documents = engine.queryset.values(
+                'id', 'document_date', 'document_number', 'transaction_type', 'direction',
+                'customer__customer_name', 'customer__tax_number', 'supplier_name',
+                'taxable_amount', 'tax_amount', 'total_amount', 'currency',
+                'tax_rate__rate_percentage'
+            ).order_by().iterator(chunk_size=2000)
             
-            if not vat_rate_matches:
-                TaxFilingValidation.objects.create(
+            for document in documents:
+                party_name = document['customer__customer_name'] or document['supplier_name'] or 'Unknown'
+                vat_number = document['customer__tax_number'] or ''
+                has_vat_number = bool(vat_number)
+                
+                filing_transaction = TaxFilingTransaction(
                     report=report,
-                    transaction=filing_transaction,
-                    validation_type='mismatched_rate',
-                    severity='high',
-                    description=f'VAT rate mismatch for {party_name}',
-                    field_name='vat_percentage'
+                    transaction_date=document['document_date'],
+                    invoice_number=document['document_number'],
+                    party_name=party_name,
+                    vat_number=vat_number,
+                    transaction_type=document['direction'],
+                    adjustment_type='correction' if document['direction'] == 'adjustment' else '',
+                    taxable_amount=document['taxable_amount'] or Decimal('0.00'),
+                    vat_percentage=document['tax_rate__rate_percentage'] or Decimal('0.00'),
+                    vat_amount=document['tax_amount'] or Decimal('0.00'),
+                    total_amount=document['total_amount'] or Decimal('0.00'),
+                    currency=document['currency'],
+                    original_transaction_id=str(document['id']),
+                    original_transaction_type=document['transaction_type'],
+                    has_vat_number=has_vat_number
                 )
-                validation_issues.append('mismatched_rate')
-        
-        # Update report totals
-        report.total_output_tax = output_tax_total
-        report.total_input_tax = input_tax_total
-        report.total_adjustments = adjustment_tax_total
-        report.net_tax_payable = output_tax_total - input_tax_total + adjustment_tax_total
-        report.output_transactions_count = output_count
-        report.input_transactions_count = input_count
-        report.adjustment_transactions_count = adjustment_count
-        report.has_missing_vat_numbers = 'missing_vat_number' in validation_issues
-        report.has_mismatched_rates = 'mismatched_rate' in validation_issues
-        report.status = 'generated'
-        report.save()
+                filing_transactions.append(filing_transaction)
+                
+                # Create validation issues if needed
+                if not has_vat_number:
+                    validations.append(TaxFilingValidation(
+                        report=report,
+                        transaction=filing_transaction,
+                        validation_type='missing_vat_number',
+                        severity='medium',
+                        description=f'Missing VAT number for {party_name}',
+                        field_name='vat_number'
+                    ))
+                
+                if len(filing_transactions) >= 2000:
+                    TaxFilingTransaction.objects.bulk_create(filing_transactions)
+                    TaxFilingValidation.objects.bulk_create(validations)
+                    filing_transactions, validations = [], []
+            
+            TaxFilingTransaction.objects.bulk_create(filing_transactions)
+            TaxFilingValidation.objects.bulk_create(validations)
+            
+            # Update report totals
+            report.total_output_tax = totals['output']['vat_amount']
+            report.total_input_tax = totals['input']['vat_amount']
+            report.total_adjustments = totals['adjustment']['vat_amount']
+            report.net_tax_payable = report.total_output_tax - report.total_input_tax + report.total_adjustments
+            report.output_transactions_count = totals['output']['document_count']
+            report.input_transactions_count = totals['input']['document_count']
+            report.adjustment_transactions_count = totals['adjustment']['document_count']
+            report.has_missing_vat_numbers = report.validations.filter(validation_type='missing_vat_number').exists()
+            report.has_mismatched_rates = report.validations.filter(validation_type='mismatched_rate').exists()
+            report.status = 'generated'
+            report.save()
         
         messages.success(request, f'Tax filing report "{report.report_name}" generated successfully.')
         return redirect('tax_filing:report_detail', pk=report.pk)
@@ -329,6 +333,58 @@ def generate_tax_filing(request, pk):
     return render(request, 'tax_filing/generate_report.html', {'report': report})
 
 
+@login_required
+def tax_filing_box_drilldown(request, pk, box):
+    """Drill down from a VAT return box to its contributing tax transactions"""
+    report = get_object_or_404(TaxFilingReport, pk=pk)
+    lines = report.return_lines.filter(box=box)
+    
+    direction = request.GET.get('direction')
+    if direction:
+        lines = lines.filter(direction=direction)
+    
+    document_ids = []
+    for line in lines:
+        document_ids.extend(line.get_document_ids())
+    
+    paginator = Paginator(document_ids, 100)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    documents = TaxTransaction.objects.filter(id__in=list(page_obj)).values(
+        'id', 'document_type', 'document_number', 'document_date', 'transaction_type',
+        'taxable_amount', 'tax_amount', 'total_amount'
+    ).order_by('document_date', 'document_number')
+    
+    return JsonResponse({
+        'box': box,
+        'lines': [
+            {
+                'direction': line.direction,
+                'vat_rate': float(line.vat_rate),
+                'taxable_amount': float(line.taxable_amount),
+                'vat_amount': float(line.vat_amount),
+                'document_count': line.document_count,
+            }
+            for line in lines
+        ],
+        'documents': [
+            {
+                'id': str(document['id']),
+                'document_type': document['document_type'],
+                'document_number': document['document_number'],
+                'document_date': document['document_date'].isoformat(),
+                'transaction_type': document['transaction_type'],
+                'taxable_amount': float(document['taxable_amount']),
+                'tax_amount': float(document['tax_amount']),
+                'total_amount': float(document['total_amount']),
+            }
+            for document in documents
+        ],
+        'page': page_obj.number,
+        'num_pages': paginator.num_pages,
+        'total_documents': paginator.count,
+    })
+
+
 @login_required
 def tax_filing_transactions(request, pk):
     """View transactions for a specific tax filing report"""
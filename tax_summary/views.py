@@ -12,6 +12,7 @@ from django.template.loader import render_to_string
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.db.models.functions import Coalesce
+from django.db import transaction as db_transaction
 import json
 from decimal import Decimal
 from datetime import datetime, timedelta
@@ -19,6 +20,7 @@ from datetime import datetime, timedelta
 from .models import TaxSummaryReport, TaxSummaryTransaction, TaxSummaryFilter, TaxSummaryExport
 from .forms import TaxSummaryReportForm, TaxSummaryFilterForm, TaxSummaryExportForm, TaxSummarySearchForm
 from tax_settings.models import TaxTransaction
+from tax_filing.vat_computation import VATComputationEngine
 
 
 @login_required
@@ -204,59 +206,53 @@ def generate_tax_summary(request, pk):
             currency=report.currency
         )
         
-        # Clear existing transactions for this report
-        report.transactions.all().delete()
+        engine = VATComputationEngine(transactions.filter(transaction_type__in=['sale', 'purchase']))
         
-        # Process transactions
-        input_tax_total = Decimal('0.00')
-        output_tax_total = Decimal('0.00')
-        input_count = 0
-        output_count = 0
-        
-        for transaction in transactions:
-            # Determine transaction type
-            if transaction.transaction_type == 'purchase':
-                transaction_type = 'input'
-                input_tax_total += transaction.tax_amount or Decimal('0.00')
-                input_count += 1
-            elif transaction.transaction_type == 'sale':
-                transaction_type = 'output'
-                output_tax_total += transaction.tax_amount or Decimal('0.00')
-                output_count += 1
-            else:
-                continue
+        with db_transaction.atomic():
+            # Clear existing transactions for this report
+            report.transactions.all().delete()
             
-            # Get party name
-            if transaction.customer:
-                party_name = transaction.customer.name if hasattr(transaction.customer, 'name') else str(transaction.customer)
-            else:
-                party_name = transaction.supplier_name or 'Unknown'
+            # Aggregate input and output VAT in SQL
+            totals = VATComputationEngine.totals_by_direction(engine.compute_lines())
             
-            # Create tax summary transaction
-            TaxSummaryTransaction.objects.create(
-                report=report,
-                transaction_date=transaction.document_date,
-                invoice_number=transaction.document_number,
-                party_name=party_name,
-                vat_number='',  # TODO: Add VAT number from customer/supplier profile
-                transaction_type=transaction_type,
-                taxable_amount=transaction.taxable_amount or Decimal('0.00'),
-                vat_percentage=transaction.tax_rate.rate_percentage if transaction.tax_rate else Decimal('0.00'),
-                vat_amount=transaction.tax_amount or Decimal('0.00'),
-                total_amount=transaction.total_amount or Decimal('0.00'),
-                currency=transaction.currency,
-                original_transaction_id=str(transaction.id),
-                original_transaction_type=transaction.transaction_type
-            )
-        
-        # Update report totals
-        report.total_input_tax = input_tax_total
-        report.total_output_tax = output_tax_total
-        report.net_vat_payable = output_tax_total - input_tax_total
-        report.input_transactions_count = input_count
-        report.output_transactions_count = output_count
-        report.status = 'generated'
-        report.save()
+            # Document level rows, streamed without building TaxTransaction instances
+            summary_transactions = []
+            documents = engine.queryset.values(
+                'id', 'document_date', 'document_number', 'transaction_type', 'direction',
+                'customer__customer_name', 'customer__tax_number', 'supplier_name',
+                'taxable_amount', 'tax_amount', 'total_amount', 'currency',
+                'tax_rate__rate_percentage'
+            ).order_by().iterator(chunk_size=2000)
+            
+            for document in documents:
+                summary_transactions.append(TaxSummaryTransaction(
+                    report=report,
+                    transaction_date=document['document_date'],
+                    invoice_number=document['document_number'],
+                    party_name=document['customer__customer_name'] or document['supplier_name'] or 'Unknown',
+                    vat_number=document['customer__tax_number'] or '',
+                    transaction_type=document['direction'],
+                    taxable_amount=document['taxable_amount'] or Decimal('0.00'),
+                    vat_percentage=document['tax_rate__rate_percentage'] or Decimal('0.00'),
+                    vat_amount=document['tax_amount'] or Decimal('0.00'),
+                    total_amount=document['total_amount'] or Decimal('0.00'),
+                    currency=document['currency'],
+                    original_transaction_id=str(document['id']),
+                    original_transaction_type=document['transaction_type']
+                ))
+                if len(summary_transactions) >= 2000:
+                    TaxSummaryTransaction.objects.bulk_create(summary_transactions)
+                    summary_transactions = []
+            TaxSummaryTransaction.objects.bulk_create(summary_transactions)
+            
+            # Update report totals
+            report.total_input_tax = totals['input']['vat_amount']
+            report.total_output_tax = totals['output']['vat_amount']
+            report.net_vat_payable = report.total_output_tax - report.total_input_tax
+            report.input_transactions_count = totals['input']['document_count']
+            report.output_transactions_count = totals['output']['document_count']
+            report.status = 'generated'
+            report.save()
         
         messages.success(request, f'Tax summary report "{report.report_name}" generated successfully.')
         return redirect('tax_summary:report_detail', pk=report.pk)